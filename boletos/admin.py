@@ -8,8 +8,14 @@ from boletos.models import (
     Cliente,
     ClienteListaNegra,
     ControleFiado,
+    ExposicaoCreditoCliente,
+    HistoricoStatusBoleto,
+    ImportacaoBoletosVencidos,
     ParcelaBoleto,
     RamoAtuacao,
+    RemessaBancaria,
+    RetornoBancario,
+    VarreduraVencimentos,
 )
 
 
@@ -35,7 +41,7 @@ class RamoAtuacaoAdmin(admin.ModelAdmin):
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
     list_display = ("nome", "cpf_cnpj", "ramo_atuacao", "telefone", "ativo", "em_lista_negra")
-    search_fields = ("nome", "nome_normalizado", "cpf_cnpj", "email")
+    search_fields = ("nome", "nome_normalizado", "cpf_cnpj", "documento", "email")
     list_filter = ("ativo", "criado_em", "ramo_atuacao")
     readonly_fields = ("nome_normalizado", "criado_em")
     fieldsets = (
@@ -152,3 +158,84 @@ class ControleFiadoAdmin(admin.ModelAdmin):
     def percentual_display(self, obj):
         return f"{obj.percentual_utilizado:.1f}%"
     percentual_display.short_description = "% Utilizado"
+
+
+@admin.register(ExposicaoCreditoCliente)
+class ExposicaoCreditoClienteAdmin(admin.ModelAdmin):
+    list_display = (
+        "cliente",
+        "valor_exposicao_total",
+        "valor_vencido",
+        "dias_atraso",
+        "limite_credito",
+        "bloqueado",
+        "atualizado_em",
+    )
+    search_fields = ("cliente__nome", "cliente__cpf_cnpj")
+    list_filter = ("bloqueado",)
+    readonly_fields = [f.name for f in ExposicaoCreditoCliente._meta.fields]
+
+
+@admin.register(ImportacaoBoletosVencidos)
+class ImportacaoBoletosVencidosAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "nome_arquivo",
+        "status",
+        "linhas",
+        "boletos_atualizados",
+        "boletos_criados",
+        "nao_encontrados",
+        "criado_por",
+        "criado_em",
+        "concluido_em",
+    )
+    list_filter = ("status", "banco")
+    readonly_fields = [f.name for f in ImportacaoBoletosVencidos._meta.fields]
+
+
+@admin.register(HistoricoStatusBoleto)
+class HistoricoStatusBoletoAdmin(admin.ModelAdmin):
+    list_display = ("boleto", "parcela", "status_anterior", "status_novo", "origem", "criado_em")
+    list_filter = ("origem", "status_novo")
+    search_fields = ("boleto__numero_boleto", "boleto__cliente__nome")
+    raw_id_fields = ("boleto", "parcela")
+
+
+@admin.register(VarreduraVencimentos)
+class VarreduraVencimentosAdmin(admin.ModelAdmin):
+    list_display = (
+        "data_corte",
+        "completa",
+        "boletos_vencidos",
+        "parcelas_vencidas",
+        "recebiveis_vencidos",
+        "clientes_atualizados",
+        "executada_em",
+    )
+    readonly_fields = [f.name for f in VarreduraVencimentos._meta.fields]
+
+
+@admin.register(RetornoBancario)
+class RetornoBancarioAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "nome_arquivo",
+        "banco",
+        "layout",
+        "status",
+        "registros",
+        "liquidados",
+        "nao_encontrados",
+        "valor_pago_total",
+        "criado_em",
+    )
+    list_filter = ("status", "banco", "layout")
+    readonly_fields = [f.name for f in RetornoBancario._meta.fields]
+
+
+@admin.register(RemessaBancaria)
+class RemessaBancariaAdmin(admin.ModelAdmin):
+    list_display = ("sequencial", "banco", "layout", "quantidade", "valor_total", "criado_por", "criado_em")
+    list_filter = ("banco", "layout")
+    readonly_fields = [f.name for f in RemessaBancaria._meta.fields]
@@ -9,8 +9,10 @@ from boletos.models import (
     ClienteListaNegra,
     RamoAtuacao,
     ControleFiado,
+    LayoutCnabChoices,
     ParcelaBoleto,
 )
+from core.services.normalizacao import somente_digitos
 
 
 class ClienteForm(forms.ModelForm):
@@ -30,6 +32,20 @@ class ClienteForm(forms.ModelForm):
             "data_nascimento": forms.DateInput(attrs={"type": "date"}),
             "endereco": forms.Textarea(attrs={"rows": 3}),
         }
+
+    def clean_cpf_cnpj(self):
+        cpf_cnpj = (self.cleaned_data.get("cpf_cnpj") or "").strip()
+        documento = somente_digitos(cpf_cnpj)
+        # Mesmo documento com outra mascara (ex.: 123.456.789-09 x 12345678909) e duplicado.
+        # Duplicado legado sem documento continua editavel enquanto nao trocar o numero.
+        inalterado = self.instance.pk and documento == somente_digitos(self.instance.cpf_cnpj)
+        if (
+            documento
+            and not inalterado
+            and Cliente.objects.filter(documento=documento).exclude(pk=self.instance.pk).exists()
+        ):
+            raise forms.ValidationError("Já existe cliente cadastrado com este CPF/CNPJ.")
+        return cpf_cnpj
 
 
 class BoletoForm(forms.ModelForm):
@@ -137,3 +153,19 @@ class ImportVencidosForm(forms.Form):
         required=False,
         label="Filtrar por banco (opcional)",
     )
+
+
+class RetornoBancarioForm(forms.Form):
+    arquivo = forms.FileField(label="Arquivo de retorno (CNAB 240/400)")
+
+
+class RemessaBancariaForm(forms.Form):
+    banco = forms.ChoiceField(
+        choices=[
+            (Boleto.BancoChoices.BRASIL, "Banco do Brasil"),
+            (Boleto.BancoChoices.CAIXA, "Caixa Econômica Federal"),
+            (Boleto.BancoChoices.SICREDI, "Sicredi"),
+        ],
+        label="Banco",
+    )
+    layout = forms.ChoiceField(choices=LayoutCnabChoices.choices, initial=LayoutCnabChoices.CNAB240, label="Leiaute")
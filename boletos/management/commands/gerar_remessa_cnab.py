@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boletos.models import LayoutCnabChoices
+from boletos.services.cnab_service import CODIGO_POR_BANCO, gerar_remessa
+
+
+class Command(BaseCommand):
+    help = "Gera a remessa CNAB de registro dos boletos em aberto ainda nao remetidos ao banco."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--banco", required=True, choices=[str(b) for b in CODIGO_POR_BANCO])
+        parser.add_argument("--layout", default=LayoutCnabChoices.CNAB240, choices=LayoutCnabChoices.values)
+
+    def handle(self, *args, **options):
+        try:
+            remessa = gerar_remessa(options["banco"], layout=options["layout"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"OK. Remessa #{remessa.sequencial} | boletos: {remessa.quantidade} | "
+                f"valor: {remessa.valor_total} | arquivo: {remessa.arquivo.name}"
+            )
+        )
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from boletos.models import ImportacaoBoletosVencidos, StatusImportacaoChoices
+from boletos.services.importacao_vencidos_service import (
+    processar_importacao_vencidos,
+    retomar_importacoes_travadas,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa as importacoes de boletos vencidos pendentes (ex.: apos reinicio do servidor) "
+        "e retoma as que ficaram travadas em processamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--travadas-minutos",
+            type=int,
+            default=30,
+            help="Importacoes em processamento ha mais de N minutos voltam para a fila (default: 30).",
+        )
+
+    def handle(self, *args, **options):
+        retomadas = retomar_importacoes_travadas(minutos=options["travadas_minutos"])
+        pendentes = list(
+            ImportacaoBoletosVencidos.objects.filter(status=StatusImportacaoChoices.PENDENTE)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        concluidas = erros = 0
+        for importacao_id in pendentes:
+            importacao = processar_importacao_vencidos(importacao_id)
+            if importacao is None:
+                continue
+            if importacao.status == StatusImportacaoChoices.ERRO:
+                erros += 1
+                self.stderr.write(f"Importacao #{importacao_id}: {importacao.erro}")
+            else:
+                concluidas += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"OK. Importacoes processadas: {concluidas} | com erro: {erros} | retomadas: {retomadas}"
+            )
+        )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from boletos.models import StatusImportacaoChoices
+from boletos.services.cnab_service import registrar_retorno
+
+
+class Command(BaseCommand):
+    help = "Processa arquivos de retorno CNAB 240/400 locais: liquida os boletos pagos e grava o relatorio."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivos", nargs="+", help="Caminho(s) do(s) arquivo(s) de retorno.")
+
+    def handle(self, *args, **options):
+        for caminho in options["arquivos"]:
+            path = Path(caminho)
+            if not path.is_file():
+                raise CommandError(f"Arquivo nao encontrado: {caminho}")
+            try:
+                with path.open("rb") as fh:
+                    retorno = registrar_retorno(File(fh, name=path.name))
+            except ValueError as exc:
+                self.stdout.write(self.style.WARNING(f"{path.name}: {exc}"))
+                continue
+            if retorno.status == StatusImportacaoChoices.ERRO:
+                self.stdout.write(self.style.ERROR(f"{path.name}: {retorno.erro}"))
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"OK. {path.name} ({retorno.get_layout_display()} {retorno.codigo_banco}) | "
+                    f"registros: {retorno.registros} | liquidados: {retorno.liquidados} | "
+                    f"ja pagos: {retorno.ja_liquidados} | nao encontrados: {retorno.nao_encontrados} | "
+                    f"valor pago: {retorno.valor_pago_total}"
+                )
+            )
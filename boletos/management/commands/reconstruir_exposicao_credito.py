@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from boletos.services.exposicao_service import ExposicaoCreditoService
+
+
+class Command(BaseCommand):
+    help = "Reconstroi em lote o resumo de exposicao de credito de todos os clientes (boletos, recebiveis e fiado)."
+
+    def handle(self, *args, **options):
+        total = ExposicaoCreditoService.reconstruir_todas()
+        self.stdout.write(self.style.SUCCESS(f"OK. Exposicoes reconstruidas: {total}"))
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from boletos.services.vencimentos_service import varrer_vencimentos
+
+
+class Command(BaseCommand):
+    help = (
+        "Passa a VENCIDO boletos e parcelas em aberto com vencimento passado, grava o historico "
+        "e atualiza a exposicao dos clientes (agendar 1x/dia)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--completa",
+            action="store_true",
+            help="Recalcula a exposicao por recebiveis de todo o passado, nao so desde a ultima varredura.",
+        )
+
+    def handle(self, *args, **options):
+        resultado = varrer_vencimentos(completa=options["completa"])
+        desde = resultado.desde.strftime("%d/%m/%Y") if resultado.desde else "inicio"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"OK. Janela: {desde} a {resultado.data_corte:%d/%m/%Y} | boletos vencidos: {resultado.boletos} | "
+                f"parcelas: {resultado.parcelas} | recebiveis: {resultado.recebiveis} | "
+                f"clientes atualizados: {resultado.clientes}"
+            )
+        )
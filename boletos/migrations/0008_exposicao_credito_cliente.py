@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0007_add_cliente_data_nascimento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExposicaoCreditoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor_boletos_aberto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('valor_recebiveis_aberto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('saldo_fiado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('valor_vencido', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('valor_exposicao_total', models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('limite_credito', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('vencimento_mais_antigo', models.DateField(blank=True, null=True)),
+                ('bloqueado', models.BooleanField(db_index=True, default=False)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='exposicao_credito', to='boletos.cliente')),
+            ],
+            options={
+                'verbose_name': 'Exposição de Crédito',
+                'verbose_name_plural': 'Exposições de Crédito',
+            },
+        ),
+    ]
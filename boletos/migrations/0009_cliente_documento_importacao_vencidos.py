@@ -0,0 +1,77 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:40
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_documento(apps, schema_editor):
+    # Digitos do cpf_cnpj (mesma regra de core.services.normalizacao.somente_digitos).
+    # Cadastros repetidos com mascaras diferentes: so o mais antigo recebe o documento.
+    Cliente = apps.get_model("boletos", "Cliente")
+    usados = set()
+    alterados = []
+    for cliente in Cliente.objects.order_by("id").only("id", "cpf_cnpj").iterator(chunk_size=2000):
+        documento = re.sub(r"\D", "", cliente.cpf_cnpj or "")
+        if not documento or documento in usados:
+            continue
+        usados.add(documento)
+        cliente.documento = documento
+        alterados.append(cliente)
+        if len(alterados) >= 2000:
+            Cliente.objects.bulk_update(alterados, ["documento"])
+            alterados = []
+    Cliente.objects.bulk_update(alterados, ["documento"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0008_exposicao_credito_cliente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoBoletosVencidos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(upload_to='boletos/importacoes/')),
+                ('nome_arquivo', models.CharField(blank=True, default='', max_length=255)),
+                ('banco', models.CharField(blank=True, choices=[('SICREDI', 'Sicredi'), ('BRASIL', 'Banco do Brasil'), ('OUTRO', 'Outro')], default='', max_length=20)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=20)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('linhas', models.PositiveIntegerField(default=0)),
+                ('boletos_atualizados', models.PositiveIntegerField(default=0)),
+                ('boletos_criados', models.PositiveIntegerField(default=0)),
+                ('clientes_criados', models.PositiveIntegerField(default=0)),
+                ('nao_encontrados', models.PositiveIntegerField(default=0)),
+                ('relatorio', models.JSONField(blank=True, default=dict)),
+                ('erro', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Importação de Boletos Vencidos',
+                'verbose_name_plural': 'Importações de Boletos Vencidos',
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='documento',
+            field=models.CharField(blank=True, default='', editable=False, max_length=18),
+        ),
+        migrations.RunPython(preencher_documento, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(condition=models.Q(('documento', ''), _negated=True), fields=('documento',), name='uniq_cliente_documento'),
+        ),
+        migrations.AddField(
+            model_name='importacaoboletosvencidos',
+            name='criado_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importacoes_boletos_vencidos', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
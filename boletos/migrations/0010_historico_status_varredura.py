@@ -0,0 +1,71 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0009_cliente_documento_importacao_vencidos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoStatusBoleto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_anterior', models.CharField(choices=[('ABERTO', 'Aberto'), ('PAGO', 'Pago'), ('VENCIDO', 'Vencido'), ('CANCELADO', 'Cancelado'), ('PENDENTE', 'Pendente')], max_length=20)),
+                ('status_novo', models.CharField(choices=[('ABERTO', 'Aberto'), ('PAGO', 'Pago'), ('VENCIDO', 'Vencido'), ('CANCELADO', 'Cancelado'), ('PENDENTE', 'Pendente')], max_length=20)),
+                ('origem', models.CharField(choices=[('VARREDURA', 'Varredura de vencimentos'), ('IMPORTACAO', 'Importação de vencidos')], max_length=20)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Histórico de Status do Boleto',
+                'verbose_name_plural': 'Históricos de Status de Boletos',
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VarreduraVencimentos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_corte', models.DateField(db_index=True)),
+                ('completa', models.BooleanField(default=False)),
+                ('boletos_vencidos', models.PositiveIntegerField(default=0)),
+                ('parcelas_vencidas', models.PositiveIntegerField(default=0)),
+                ('recebiveis_vencidos', models.PositiveIntegerField(default=0)),
+                ('clientes_atualizados', models.PositiveIntegerField(default=0)),
+                ('executada_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Varredura de Vencimentos',
+                'verbose_name_plural': 'Varreduras de Vencimentos',
+                'ordering': ['-data_corte', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='boleto',
+            index=models.Index(fields=['status', 'data_vencimento'], name='idx_boleto_status_venc'),
+        ),
+        migrations.AddIndex(
+            model_name='parcelaboleto',
+            index=models.Index(fields=['status', 'data_vencimento'], name='idx_parcela_status_venc'),
+        ),
+        migrations.AddField(
+            model_name='historicostatusboleto',
+            name='boleto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_status', to='boletos.boleto'),
+        ),
+        migrations.AddField(
+            model_name='historicostatusboleto',
+            name='parcela',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='historico_status', to='boletos.parcelaboleto'),
+        ),
+        migrations.AddIndex(
+            model_name='historicostatusboleto',
+            index=models.Index(fields=['boleto', 'criado_em'], name='idx_hist_boleto_data'),
+        ),
+    ]
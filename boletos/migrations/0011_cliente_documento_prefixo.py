@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0010_historico_status_varredura'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['documento'], name='idx_cliente_doc_prefixo', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
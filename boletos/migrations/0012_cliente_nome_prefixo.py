@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0011_cliente_documento_prefixo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nome_normalizado'], name='idx_cliente_nome_prefixo', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:07
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0012_cliente_nome_prefixo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boleto',
+            name='valor_pago',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='boleto',
+            name='valor_tarifa',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='boleto',
+            name='banco',
+            field=models.CharField(choices=[('SICREDI', 'Sicredi'), ('BRASIL', 'Banco do Brasil'), ('CAIXA', 'Caixa Econômica Federal'), ('OUTRO', 'Outro')], db_index=True, default='OUTRO', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='historicostatusboleto',
+            name='origem',
+            field=models.CharField(choices=[('VARREDURA', 'Varredura de vencimentos'), ('IMPORTACAO', 'Importação de vencidos'), ('RETORNO', 'Retorno bancário (CNAB)')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='importacaoboletosvencidos',
+            name='banco',
+            field=models.CharField(blank=True, choices=[('SICREDI', 'Sicredi'), ('BRASIL', 'Banco do Brasil'), ('CAIXA', 'Caixa Econômica Federal'), ('OUTRO', 'Outro')], default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='RemessaBancaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('banco', models.CharField(choices=[('SICREDI', 'Sicredi'), ('BRASIL', 'Banco do Brasil'), ('CAIXA', 'Caixa Econômica Federal'), ('OUTRO', 'Outro')], max_length=20)),
+                ('layout', models.CharField(choices=[('CNAB240', 'CNAB 240'), ('CNAB400', 'CNAB 400')], max_length=10)),
+                ('sequencial', models.PositiveIntegerField()),
+                ('arquivo', models.FileField(upload_to='boletos/remessas/')),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='remessas_bancarias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Remessa Bancária',
+                'verbose_name_plural': 'Remessas Bancárias',
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='boleto',
+            name='remessa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='boletos', to='boletos.remessabancaria'),
+        ),
+        migrations.CreateModel(
+            name='RetornoBancario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(upload_to='boletos/retornos/')),
+                ('nome_arquivo', models.CharField(blank=True, default='', max_length=255)),
+                ('hash_conteudo', models.CharField(max_length=64, unique=True)),
+                ('banco', models.CharField(blank=True, choices=[('SICREDI', 'Sicredi'), ('BRASIL', 'Banco do Brasil'), ('CAIXA', 'Caixa Econômica Federal'), ('OUTRO', 'Outro')], default='', max_length=20)),
+                ('codigo_banco', models.CharField(blank=True, default='', max_length=3)),
+                ('layout', models.CharField(blank=True, choices=[('CNAB240', 'CNAB 240'), ('CNAB400', 'CNAB 400')], default='', max_length=10)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=20)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('registros', models.PositiveIntegerField(default=0)),
+                ('liquidados', models.PositiveIntegerField(default=0)),
+                ('ja_liquidados', models.PositiveIntegerField(default=0)),
+                ('baixados', models.PositiveIntegerField(default=0)),
+                ('confirmados', models.PositiveIntegerField(default=0)),
+                ('rejeitados', models.PositiveIntegerField(default=0)),
+                ('nao_encontrados', models.PositiveIntegerField(default=0)),
+                ('valor_pago_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('valor_tarifas_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('relatorio', models.JSONField(blank=True, default=dict)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retornos_bancarios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Retorno Bancário',
+                'verbose_name_plural': 'Retornos Bancários',
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='remessabancaria',
+            constraint=models.UniqueConstraint(fields=('banco', 'sequencial'), name='uniq_remessa_banco_sequencial'),
+        ),
+    ]
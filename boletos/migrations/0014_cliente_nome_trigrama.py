@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:56
+
+from django.db import migrations
+
+
+def criar_indice_trigrama(apps, schema_editor):
+    # Busca de cliente por trecho do nome (LIKE '%x%'); sem equivalente no SQLite.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cliente_nome_trgm "
+        "ON boletos_cliente USING gin (nome_normalizado gin_trgm_ops)"
+    )
+
+
+def remover_indice_trigrama(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_cliente_nome_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0013_cnab_remessa_retorno'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_trigrama, remover_indice_trigrama),
+        migrations.RemoveIndex(
+            model_name='cliente',
+            name='idx_cliente_nome_prefixo',
+        ),
+    ]
@@ -6,7 +6,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 
-from core.services.normalizacao import normalizar_nome
+from core.services.normalizacao import normalizar_nome, somente_digitos
 
 
 class StatusBoletoChoices(models.TextChoices):
@@ -46,6 +46,8 @@ class Cliente(models.Model):
     data_nascimento = models.DateField(blank=True, null=True)
     nome_normalizado = models.CharField(max_length=255, db_index=True)
     cpf_cnpj = models.CharField(max_length=18, unique=True, db_index=True)
+    # So os digitos de cpf_cnpj: chave de busca de importadores (formatado ou nao).
+    documento = models.CharField(max_length=18, blank=True, default="", editable=False)
     email = models.EmailField(blank=True, default="")
     telefone = models.CharField(max_length=20, blank=True, default="")
     endereco = models.TextField(blank=True, default="")
@@ -64,13 +66,35 @@ class Cliente(models.Model):
             models.Index(fields=["nome_normalizado"], name="idx_cliente_nome_norm"),
             models.Index(fields=["cpf_cnpj"], name="idx_cliente_cpf_cnpj"),
             models.Index(fields=["ativo"], name="idx_cliente_ativo"),
+            # Busca por prefixo do CPF/CNPJ; opclasses so tem efeito no PostgreSQL.
+            models.Index(fields=["documento"], name="idx_cliente_doc_prefixo", opclasses=["varchar_pattern_ops"]),
+            # Busca por trecho do nome: indice GIN pg_trgm criado so no PostgreSQL pela migracao 0014.
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["documento"],
+                condition=~models.Q(documento=""),
+                name="uniq_cliente_documento",
+            ),
         ]
         ordering = ["nome"]
 
     def save(self, *args, **kwargs):
         self.nome = (self.nome or "").strip()
         self.nome_normalizado = normalizar_nome(self.nome)
+        documento = somente_digitos(self.cpf_cnpj)
+        if documento != self.documento:
+            # Duplicados legados (migracao 0009) ficam sem documento: o numero e do cadastro mais antigo.
+            if documento and Cliente._base_manager.filter(documento=documento).exclude(pk=self.pk).exists():
+                documento = ""
+            self.documento = documento
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if not adding and hasattr(self, "vendas"):
+            # Mantem a copia desnormalizada usada na busca do historico de vendas.
+            self.vendas.exclude(cliente_nome_normalizado=self.nome_normalizado).update(
+                cliente_nome_normalizado=self.nome_normalizado
+            )
 
     def __str__(self) -> str:
         return self.nome
@@ -138,6 +162,7 @@ class Boleto(models.Model):
     class BancoChoices(models.TextChoices):
         SICREDI = "SICREDI", "Sicredi"
         BRASIL = "BRASIL", "Banco do Brasil"
+        CAIXA = "CAIXA", "Caixa Econômica Federal"
         OUTRO = "OUTRO", "Outro"
 
     banco = models.CharField(
@@ -155,6 +180,17 @@ class Boleto(models.Model):
         help_text="Identificador do banco (Nosso Número)",
     )
 
+    # Preenchidos pela liquidacao do arquivo de retorno (CNAB)
+    valor_pago = models.DecimalField(max_digits=14, decimal_places=2, blank=True, null=True)
+    valor_tarifa = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    remessa = models.ForeignKey(
+        "RemessaBancaria",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="boletos"
+    )
+
     necessita_comprovante = models.BooleanField(
         default=False,
         db_index=True,
@@ -177,6 +213,7 @@ class Boleto(models.Model):
             models.Index(fields=["cliente", "status"], name="idx_boleto_cliente_status"),
             models.Index(fields=["data_vencimento"], name="idx_boleto_vencimento"),
             models.Index(fields=["vendedor"], name="idx_boleto_vendedor"),
+            models.Index(fields=["status", "data_vencimento"], name="idx_boleto_status_venc"),
         ]
         ordering = ["-data_vencimento", "-id"]
 
@@ -262,6 +299,253 @@ class ParcelaBoleto(models.Model):
     class Meta:
         unique_together = ("boleto", "numero_parcela")
         ordering = ["numero_parcela"]
+        indexes = [
+            models.Index(fields=["status", "data_vencimento"], name="idx_parcela_status_venc"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.boleto.numero_boleto} - Parcela {self.numero_parcela}"
+
+
+class ExposicaoCreditoCliente(models.Model):
+    """
+    Resumo desnormalizado da exposicao de credito do cliente.
+    Mantido pelos servicos de faturamento, pagamento e conciliacao
+    (ExposicaoCreditoService) para consulta O(1) na aprovacao de vendas a prazo.
+    """
+    cliente = models.OneToOneField(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name="exposicao_credito"
+    )
+    valor_boletos_aberto = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    valor_recebiveis_aberto = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    saldo_fiado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    valor_vencido = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    valor_exposicao_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        db_index=True
+    )
+    limite_credito = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    vencimento_mais_antigo = models.DateField(blank=True, null=True)
+    bloqueado = models.BooleanField(default=False, db_index=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Exposição de Crédito"
+        verbose_name_plural = "Exposições de Crédito"
+
+    def __str__(self) -> str:
+        return f"Exposição {self.cliente.nome} - R$ {self.valor_exposicao_total}"
+
+    @property
+    def dias_atraso(self) -> int:
+        """Dias desde o vencimento em aberto mais antigo (0 se nada vencido)"""
+        if not self.vencimento_mais_antigo:
+            return 0
+        return max(0, (timezone.localdate() - self.vencimento_mais_antigo).days)
+
+    @property
+    def saldo_disponivel(self) -> Decimal | None:
+        """Credito ainda disponivel; None quando o cliente nao tem limite definido"""
+        if self.limite_credito <= 0:
+            return None
+        return self.limite_credito - self.valor_exposicao_total
+
+
+class StatusImportacaoChoices(models.TextChoices):
+    PENDENTE = "PENDENTE", "Pendente"
+    PROCESSANDO = "PROCESSANDO", "Processando"
+    CONCLUIDA = "CONCLUIDA", "Concluída"
+    ERRO = "ERRO", "Erro"
+
+
+class ImportacaoBoletosVencidos(models.Model):
+    """
+    Importacao do CSV de boletos vencidos do banco. O arquivo e gravado e processado
+    fora da requisicao (importacao_vencidos_service); o resultado fica no relatorio.
+    """
+    arquivo = models.FileField(upload_to="boletos/importacoes/")
+    nome_arquivo = models.CharField(max_length=255, blank=True, default="")
+    banco = models.CharField(max_length=20, choices=Boleto.BancoChoices.choices, blank=True, default="")
+    status = models.CharField(
+        max_length=20,
+        choices=StatusImportacaoChoices.choices,
+        default=StatusImportacaoChoices.PENDENTE,
+        db_index=True
+    )
+    criado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="importacoes_boletos_vencidos"
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    linhas = models.PositiveIntegerField(default=0)
+    boletos_atualizados = models.PositiveIntegerField(default=0)
+    boletos_criados = models.PositiveIntegerField(default=0)
+    clientes_criados = models.PositiveIntegerField(default=0)
+    nao_encontrados = models.PositiveIntegerField(default=0)
+    # {"nao_encontrados": [{"linha", "numero", "motivo"}], "boleto_ids": [...]}
+    relatorio = models.JSONField(default=dict, blank=True)
+    erro = models.TextField(blank=True, default="")
+
+    class Meta:
+        verbose_name = "Importação de Boletos Vencidos"
+        verbose_name_plural = "Importações de Boletos Vencidos"
+        ordering = ["-criado_em", "-id"]
+
+    def __str__(self) -> str:
+        return f"Importação #{self.pk} - {self.get_status_display()}"
+
+    @property
+    def finalizada(self) -> bool:
+        return self.status in (StatusImportacaoChoices.CONCLUIDA, StatusImportacaoChoices.ERRO)
+
+class OrigemHistoricoStatusChoices(models.TextChoices):
+    VARREDURA = "VARREDURA", "Varredura de vencimentos"
+    IMPORTACAO = "IMPORTACAO", "Importação de vencidos"
+    RETORNO = "RETORNO", "Retorno bancário (CNAB)"
+
+
+class HistoricoStatusBoleto(models.Model):
+    """Transicoes de status de boletos e parcelas feitas pelos processos em lote"""
+    boleto = models.ForeignKey(
+        Boleto,
+        on_delete=models.CASCADE,
+        related_name="historico_status"
+    )
+    parcela = models.ForeignKey(
+        ParcelaBoleto,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="historico_status"
+    )
+    status_anterior = models.CharField(max_length=20, choices=StatusBoletoChoices.choices)
+    status_novo = models.CharField(max_length=20, choices=StatusBoletoChoices.choices)
+    origem = models.CharField(max_length=20, choices=OrigemHistoricoStatusChoices.choices)
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Histórico de Status do Boleto"
+        verbose_name_plural = "Históricos de Status de Boletos"
+        ordering = ["-criado_em", "-id"]
+        indexes = [
+            models.Index(fields=["boleto", "criado_em"], name="idx_hist_boleto_data"),
+        ]
+
+    def __str__(self) -> str:
+        alvo = f"parcela {self.parcela.numero_parcela}" if self.parcela_id else f"boleto {self.boleto_id}"
+        return f"{alvo}: {self.status_anterior} -> {self.status_novo}"
+
+
+class VarreduraVencimentos(models.Model):
+    """
+    Execucao da varredura de vencimentos. data_corte e o "hoje" da execucao: tudo que
+    vencia antes dela ja foi varrido, e a proxima execucao comeca dali.
+    """
+    data_corte = models.DateField(db_index=True)
+    completa = models.BooleanField(default=False)
+    boletos_vencidos = models.PositiveIntegerField(default=0)
+    parcelas_vencidas = models.PositiveIntegerField(default=0)
+    recebiveis_vencidos = models.PositiveIntegerField(default=0)
+    clientes_atualizados = models.PositiveIntegerField(default=0)
+    executada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Varredura de Vencimentos"
+        verbose_name_plural = "Varreduras de Vencimentos"
+        ordering = ["-data_corte", "-id"]
+
+    def __str__(self) -> str:
+        return f"Varredura {self.data_corte} - {self.boletos_vencidos} boleto(s)"
+
+
+class LayoutCnabChoices(models.TextChoices):
+    CNAB240 = "CNAB240", "CNAB 240"
+    CNAB400 = "CNAB400", "CNAB 400"
+
+
+class RemessaBancaria(models.Model):
+    """Arquivo de remessa (registro de boletos novos no banco) gerado por cnab_service"""
+    banco = models.CharField(max_length=20, choices=Boleto.BancoChoices.choices)
+    layout = models.CharField(max_length=10, choices=LayoutCnabChoices.choices)
+    sequencial = models.PositiveIntegerField()
+    arquivo = models.FileField(upload_to="boletos/remessas/")
+    quantidade = models.PositiveIntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    criado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="remessas_bancarias"
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Remessa Bancária"
+        verbose_name_plural = "Remessas Bancárias"
+        ordering = ["-criado_em", "-id"]
+        constraints = [
+            models.UniqueConstraint(fields=["banco", "sequencial"], name="uniq_remessa_banco_sequencial"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Remessa {self.get_banco_display()} #{self.sequencial}"
+
+
+class RetornoBancario(models.Model):
+    """
+    Arquivo de retorno do banco (CNAB 240/400). O conteudo e identificado pelo hash,
+    entao o mesmo arquivo nao e liquidado duas vezes; o resultado fica no relatorio.
+    """
+    arquivo = models.FileField(upload_to="boletos/retornos/")
+    nome_arquivo = models.CharField(max_length=255, blank=True, default="")
+    hash_conteudo = models.CharField(max_length=64, unique=True)
+    banco = models.CharField(max_length=20, choices=Boleto.BancoChoices.choices, blank=True, default="")
+    codigo_banco = models.CharField(max_length=3, blank=True, default="")
+    layout = models.CharField(max_length=10, choices=LayoutCnabChoices.choices, blank=True, default="")
+    status = models.CharField(
+        max_length=20,
+        choices=StatusImportacaoChoices.choices,
+        default=StatusImportacaoChoices.PENDENTE,
+        db_index=True
+    )
+    criado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="retornos_bancarios"
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    registros = models.PositiveIntegerField(default=0)
+    liquidados = models.PositiveIntegerField(default=0)
+    ja_liquidados = models.PositiveIntegerField(default=0)
+    baixados = models.PositiveIntegerField(default=0)
+    confirmados = models.PositiveIntegerField(default=0)
+    rejeitados = models.PositiveIntegerField(default=0)
+    nao_encontrados = models.PositiveIntegerField(default=0)
+    valor_pago_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    valor_tarifas_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    # {"nao_encontrados": [...], "ocorrencias": [...], "boleto_ids": [...]}
+    relatorio = models.JSONField(default=dict, blank=True)
+    erro = models.TextField(blank=True, default="")
+
+    class Meta:
+        verbose_name = "Retorno Bancário"
+        verbose_name_plural = "Retornos Bancários"
+        ordering = ["-criado_em", "-id"]
+
+    def __str__(self) -> str:
+        return f"Retorno #{self.pk} - {self.get_status_display()}"
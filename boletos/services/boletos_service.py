@@ -4,6 +4,7 @@ from decimal import Decimal
 from datetime import timedelta
 from django.utils import timezone
 from django.db import transaction, models
+from django.db.models.functions import Coalesce
 
 from boletos.models import (
     Boleto,
@@ -13,6 +14,10 @@ from boletos.models import (
     StatusBoletoChoices,
     StatusFiadoChoices,
 )
+from boletos.services.estatisticas_service import estatisticas_boletos, invalidar_estatisticas_boletos
+from boletos.services.exposicao_service import STATUS_BOLETO_EM_ABERTO, ExposicaoCreditoService
+from boletos.services.vencimentos_service import varrer_vencimentos
+from core.services.normalizacao import normalizar_nome, somente_digitos
 
 
 class BoletoService:
@@ -43,6 +48,8 @@ class BoletoService:
             observacoes=observacoes,
             status=StatusBoletoChoices.ABERTO,
         )
+        ExposicaoCreditoService.recalcular(cliente)
+        transaction.on_commit(invalidar_estatisticas_boletos)
 
         return boleto
 
@@ -62,19 +69,14 @@ class BoletoService:
             boleto.comprovante_pagamento = comprovante
 
         boleto.save()
+        ExposicaoCreditoService.recalcular(boleto.cliente_id)
+        transaction.on_commit(invalidar_estatisticas_boletos)
         return boleto
 
     @staticmethod
-    def verificar_vencimentos_em_atraso():
-        """Atualiza boletos que passaram da data de vencimento"""
-        hoje = timezone.now().date()
-        boletos_vencidos = Boleto.objects.filter(
-            data_vencimento__lt=hoje,
-            status__in=[StatusBoletoChoices.ABERTO, StatusBoletoChoices.PENDENTE],
-        )
-
-        boletos_vencidos.update(status=StatusBoletoChoices.VENCIDO)
-        return boletos_vencidos.count()
+    def verificar_vencimentos_em_atraso(completa: bool = False) -> int:
+        """Atualiza boletos (e parcelas) que passaram da data de vencimento; retorna os boletos alterados"""
+        return varrer_vencimentos(completa=completa).boletos
 
     @staticmethod
     def listar_boletos_criticos(dias_antecedencia: int = 7):
@@ -90,38 +92,17 @@ class BoletoService:
     @staticmethod
     def obter_total_em_aberto(cliente: Cliente = None) -> Decimal:
         """Calcula total de boletos em aberto"""
-        qs = Boleto.objects.filter(
-            status__in=[StatusBoletoChoices.ABERTO, StatusBoletoChoices.PENDENTE]
-        )
-
         if cliente:
-            qs = qs.filter(cliente=cliente)
+            return ExposicaoCreditoService.obter(cliente).valor_boletos_aberto
 
-        return sum(b.valor for b in qs) or Decimal("0.00")
+        return Boleto.objects.filter(status__in=STATUS_BOLETO_EM_ABERTO).aggregate(
+            total=models.Sum("valor")
+        )["total"] or Decimal("0.00")
 
     @staticmethod
     def obter_estatisticas():
-        """Retorna estatísticas gerais de boletos"""
-        hoje = timezone.now().date()
-
-        return {
-            "total_abertos": Boleto.objects.filter(
-                status=StatusBoletoChoices.ABERTO
-            ).count(),
-            "total_pendentes": Boleto.objects.filter(
-                status=StatusBoletoChoices.PENDENTE
-            ).count(),
-            "total_pagos": Boleto.objects.filter(
-                status=StatusBoletoChoices.PAGO
-            ).count(),
-            "total_vencidos": Boleto.objects.filter(
-                status=StatusBoletoChoices.VENCIDO
-            ).count(),
-            "valor_total_aberto": Boleto.objects.filter(
-                status__in=[StatusBoletoChoices.ABERTO, StatusBoletoChoices.PENDENTE]
-            ).aggregate(total=models.Sum("valor"))["total"]
-            or Decimal("0.00"),
-        }
+        """Retorna estatísticas gerais de boletos (uma query agregada, em cache)"""
+        return estatisticas_boletos()
 
 
 class ClienteService:
@@ -141,6 +122,7 @@ class ClienteService:
             lista_negra.ativo = True
             lista_negra.save()
 
+        ExposicaoCreditoService.recalcular(cliente)
         return lista_negra
 
     @staticmethod
@@ -151,13 +133,53 @@ class ClienteService:
             lista_negra.ativo = False
             lista_negra.save()
         except ClienteListaNegra.DoesNotExist:
-            pass
+            return
+        ExposicaoCreditoService.recalcular(cliente)
 
     @staticmethod
     def obter_clientes_em_lista_negra():
         """Retorna todos os clientes na lista negra ativa"""
         return Cliente.objects.filter(lista_negra__ativo=True)
 
+    @staticmethod
+    def buscar(qs, termo: str):
+        """
+        Filtra por trecho do nome normalizado (sobrenome acha "Ana Silva"; indice pg_trgm no
+        PostgreSQL) ou, se o termo for so numeros/mascara, por prefixo do documento
+        (CPF/CNPJ so digitos, indice varchar_pattern_ops).
+        """
+        termo = (termo or "").strip()
+        if not termo:
+            return qs
+        documento = somente_digitos(termo)
+        if documento and not any(c.isalpha() for c in termo):
+            return qs.filter(documento__startswith=documento)
+        return qs.filter(nome_normalizado__contains=normalizar_nome(termo))
+
+    @staticmethod
+    def com_resumo_boletos(qs=None, hoje=None):
+        """
+        Anota qtd/valor em aberto, valor vencido, ultimo pagamento e lista negra
+        em SQL (um JOIN agrupado), no lugar de carregar os boletos de cada cliente.
+        """
+        qs = Cliente.objects.all() if qs is None else qs
+        hoje = hoje or timezone.localdate()
+        em_aberto = models.Q(boletos__status__in=STATUS_BOLETO_EM_ABERTO)
+        vencido = em_aberto & (
+            models.Q(boletos__data_vencimento__lt=hoje) | models.Q(boletos__status=StatusBoletoChoices.VENCIDO)
+        )
+        zero = models.Value(Decimal("0.00"), output_field=models.DecimalField(max_digits=16, decimal_places=2))
+        return qs.annotate(
+            qtd_boletos=models.Count("boletos"),
+            qtd_aberto=models.Count("boletos", filter=em_aberto),
+            valor_aberto=Coalesce(models.Sum("boletos__valor", filter=em_aberto), zero),
+            valor_vencido=Coalesce(models.Sum("boletos__valor", filter=vencido), zero),
+            ultimo_pagamento=models.Max("boletos__data_pagamento"),
+            em_lista_negra=models.Exists(
+                ClienteListaNegra.objects.filter(cliente=models.OuterRef("pk"), ativo=True)
+            ),
+        )
+
 
 class ControleFiadoService:
     """Serviço para controle de fiados"""
@@ -188,6 +210,7 @@ class ControleFiadoService:
 
         controle.saldo_fiado += valor
         controle.save()
+        ExposicaoCreditoService.recalcular(cliente)
 
         return controle
 
@@ -199,6 +222,7 @@ class ControleFiadoService:
 
         controle.saldo_fiado = max(Decimal("0.00"), controle.saldo_fiado - valor)
         controle.save()
+        ExposicaoCreditoService.recalcular(cliente)
 
         return controle
 
@@ -214,6 +238,7 @@ class ControleFiadoService:
             controle.limite_credito = limite
             controle.save()
 
+        ExposicaoCreditoService.recalcular(cliente)
         return controle
 
     @staticmethod
@@ -224,7 +249,8 @@ class ControleFiadoService:
             controle.status = StatusFiadoChoices.BLOQUEADO
             controle.save()
         except ControleFiado.DoesNotExist:
-            pass
+            return
+        ExposicaoCreditoService.recalcular(cliente)
 
     @staticmethod
     def desbloquear_fiado(cliente: Cliente):
@@ -234,4 +260,5 @@ class ControleFiadoService:
             controle.status = StatusFiadoChoices.ATIVO
             controle.save()
         except ControleFiado.DoesNotExist:
-            pass
+            return
+        ExposicaoCreditoService.recalcular(cliente)
@@ -0,0 +1,698 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import mmap
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from boletos.models import (
+    Boleto,
+    HistoricoStatusBoleto,
+    LayoutCnabChoices,
+    OrigemHistoricoStatusChoices,
+    RemessaBancaria,
+    RetornoBancario,
+    StatusBoletoChoices,
+    StatusImportacaoChoices,
+)
+from boletos.services.estatisticas_service import invalidar_estatisticas_boletos
+from boletos.services.exposicao_service import ExposicaoCreditoService
+from core.services.normalizacao import normalizar_nome, somente_digitos
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_RETORNO = 1000
+LIMITE_ITENS_RELATORIO = 500
+# Nosso numero gerado na remessa quando o boleto nao tem um (pk com zeros a esquerda).
+TAMANHO_NOSSO_NUMERO = 10
+
+CODIGO_POR_BANCO = {
+    Boleto.BancoChoices.BRASIL: "001",
+    Boleto.BancoChoices.CAIXA: "104",
+    Boleto.BancoChoices.SICREDI: "748",
+}
+BANCO_POR_CODIGO = {codigo: banco for banco, codigo in CODIGO_POR_BANCO.items()}
+NOME_BANCO = {"001": "BANCO DO BRASIL S.A.", "104": "CAIXA ECONOMICA FEDERAL", "748": "SICREDI"}
+
+# Posicoes 1-based inclusivas, como nos manuais dos bancos.
+# CNAB 240 (FEBRABAN): segmentos T e U do retorno.
+_CAMPOS_240 = {
+    "nosso_numero": (38, 57),
+    "numero_documento": (59, 73),
+    "vencimento": (74, 81),
+    "valor_titulo": (82, 96),
+    "uso_empresa": (106, 130),
+    "valor_tarifa": (199, 213),
+    # segmento U
+    "valor_juros": (18, 32),
+    "valor_pago": (78, 92),
+    "data_ocorrencia": (138, 145),
+    "data_credito": (146, 153),
+    # Campos casados com o numero_boleto inteiro (o resto so por nosso numero).
+    "chaves_numero": ("uso_empresa", "numero_documento"),
+}
+_CAMPOS_240_BANCO = {
+    "104": {"nosso_numero": (40, 56)},
+}
+# CNAB 400: detalhe do retorno; cada banco muda algumas posicoes.
+_CAMPOS_400 = {
+    "tipo_detalhe": "1",
+    "uso_empresa": (38, 62),
+    "nosso_numero": (71, 82),
+    "ocorrencia": (109, 110),
+    "data_ocorrencia": (111, 116),
+    "numero_documento": (117, 126),
+    "vencimento": (147, 152),
+    "valor_titulo": (153, 165),
+    "valor_tarifa": (176, 188),
+    "valor_pago": (254, 266),
+    "valor_juros": (267, 279),
+    "data_credito": (296, 301),
+    # numero_documento do 400 leva so os 10 primeiros caracteres do numero_boleto (ver _remessa_400).
+    "chaves_numero": ("uso_empresa",),
+}
+_CAMPOS_400_BANCO = {
+    # Banco do Brasil, convenio de 7 digitos: detalhe tipo 7
+    "001": {
+        "tipo_detalhe": "7",
+        "uso_empresa": (39, 63),
+        "nosso_numero": (64, 80),
+        "data_credito": (176, 181),
+        "valor_tarifa": (182, 188),
+    },
+    "104": {"uso_empresa": (32, 56), "nosso_numero": (57, 73), "data_credito": (294, 299)},
+    "748": {"uso_empresa": None, "nosso_numero": (48, 62)},
+}
+
+# Codigos de movimento/ocorrencia do retorno.
+LIQUIDACAO, BAIXA, ENTRADA, REJEICAO = "LIQUIDACAO", "BAIXA", "ENTRADA", "REJEICAO"
+_MOVIMENTOS_240 = {"06": LIQUIDACAO, "17": LIQUIDACAO, "09": BAIXA, "02": ENTRADA, "03": REJEICAO}
+_MOVIMENTOS_400 = {
+    "06": LIQUIDACAO, "15": LIQUIDACAO, "17": LIQUIDACAO,
+    "09": BAIXA, "10": BAIXA, "02": ENTRADA, "03": REJEICAO,
+}
+_MOVIMENTOS_400_BANCO = {
+    "001": {
+        "05": LIQUIDACAO, "06": LIQUIDACAO, "07": LIQUIDACAO, "08": LIQUIDACAO, "15": LIQUIDACAO,
+        "09": BAIXA, "10": BAIXA, "02": ENTRADA, "03": REJEICAO,
+    },
+    "104": {"21": LIQUIDACAO, "22": LIQUIDACAO, "02": BAIXA, "23": BAIXA, "01": ENTRADA, "03": REJEICAO},
+}
+
+
+@dataclass(frozen=True)
+class OcorrenciaRetorno:
+    linha: int
+    codigo: str
+    nosso_numero: str
+    uso_empresa: str
+    numero_documento: str
+    # Numeros do boleto seguros para casar com numero_boleto (ver _numero_inteiro).
+    numeros_boleto: Tuple[str, ...]
+    vencimento: Optional[date]
+    valor_titulo: Decimal
+    valor_pago: Decimal
+    valor_tarifa: Decimal
+    valor_juros: Decimal
+    data_ocorrencia: Optional[date]
+    data_credito: Optional[date]
+
+
+@dataclass(frozen=True)
+class RetornoResult:
+    registros: int
+    liquidados: int
+    ja_liquidados: int
+    baixados: int
+    confirmados: int
+    rejeitados: int
+    nao_encontrados: int
+    itens_nao_encontrados: Tuple[dict, ...]
+    ocorrencias: Tuple[dict, ...]
+    valor_pago: Decimal
+    valor_tarifas: Decimal
+    boleto_ids: Tuple[int, ...]
+
+
+@dataclass
+class _Acumulado:
+    registros: int = 0
+    liquidados: Set[int] = field(default_factory=set)
+    ja_liquidados: int = 0
+    contagem: Dict[str, int] = field(default_factory=dict)
+    clientes: Set[int] = field(default_factory=set)
+    nao_encontrados: int = 0
+    itens_nao_encontrados: List[dict] = field(default_factory=list)
+    ocorrencias: List[dict] = field(default_factory=list)
+    valor_pago: Decimal = Decimal("0.00")
+    valor_tarifas: Decimal = Decimal("0.00")
+
+
+# ==================== LEITURA ====================
+
+
+@contextmanager
+def mapear_arquivo(caminho):
+    """Arquivo aberto via mmap (somente leitura); o parser fatia o mapa sem copiar o arquivo."""
+    with open(caminho, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+
+
+def _registros(dados) -> Iterator[Tuple[int, memoryview]]:
+    """
+    Registros de largura fixa como fatias de memoryview do buffer (mmap ou bytes).
+    Cada fatia e liberada antes da proxima, entao o mmap pode ser fechado em seguida.
+    """
+    total = len(dados)
+    inicio = 0
+    numero = 0
+    with memoryview(dados) as visao:
+        while inicio < total:
+            fim = dados.find(b"\n", inicio)
+            if fim == -1:
+                fim = total
+            final = fim
+            if final > inicio and visao[final - 1] == 13:
+                final -= 1
+            numero += 1
+            if final > inicio:
+                with visao[inicio:final] as registro:
+                    yield numero, registro
+            inicio = fim + 1
+
+
+def _texto(registro: memoryview, posicao: Optional[Tuple[int, int]]) -> str:
+    if posicao is None:
+        return ""
+    inicio, fim = posicao
+    return str(registro[inicio - 1:fim], "latin-1").strip()
+
+
+def _numero_inteiro(registro: memoryview, posicao: Optional[Tuple[int, int]]) -> str:
+    """Texto do campo so se sobrou espaco: valor ocupando o campo todo pode ter sido truncado na remessa."""
+    texto = _texto(registro, posicao)
+    if posicao is None or len(texto) >= posicao[1] - posicao[0] + 1:
+        return ""
+    return texto
+
+
+def _valor(texto: str) -> Decimal:
+    digitos = somente_digitos(texto)
+    return (Decimal(int(digitos)) / 100).quantize(Decimal("0.01")) if digitos else Decimal("0.00")
+
+
+def _data(texto: str) -> Optional[date]:
+    digitos = somente_digitos(texto)
+    if not digitos or int(digitos) == 0:
+        return None
+    formato = "%d%m%Y" if len(digitos) == 8 else "%d%m%y"
+    try:
+        return datetime.strptime(digitos, formato).date()
+    except ValueError:
+        return None
+
+
+def detectar_layout(dados) -> Tuple[str, str]:
+    """(layout, codigo do banco) pelo tamanho do primeiro registro e pelo header do arquivo."""
+    registros = _registros(dados)
+    try:
+        for _, registro in registros:
+            tamanho = len(registro)
+            if tamanho == 240:
+                return LayoutCnabChoices.CNAB240, _texto(registro, (1, 3))
+            if tamanho == 400:
+                return LayoutCnabChoices.CNAB400, _texto(registro, (77, 79))
+            raise ValueError(f"Registro com {tamanho} posições: o arquivo não é CNAB 240 nem 400.")
+    finally:
+        # libera a fatia do mmap antes de o arquivo ser fechado
+        registros.close()
+    raise ValueError("Arquivo de retorno vazio.")
+
+
+def _ocorrencia(linha: int, codigo: str, campos: dict, t: memoryview, u: Optional[memoryview] = None) -> OcorrenciaRetorno:
+    # No CNAB 240 os valores pagos e datas vem no segmento U; no 400 tudo esta no mesmo registro.
+    v = u if u is not None else t
+    return OcorrenciaRetorno(
+        linha=linha,
+        codigo=codigo,
+        nosso_numero=_texto(t, campos["nosso_numero"]),
+        uso_empresa=_texto(t, campos["uso_empresa"]),
+        numero_documento=_texto(t, campos["numero_documento"]),
+        numeros_boleto=tuple(
+            numero for numero in (_numero_inteiro(t, campos[nome]) for nome in campos["chaves_numero"]) if numero
+        ),
+        vencimento=_data(_texto(t, campos["vencimento"])),
+        valor_titulo=_valor(_texto(t, campos["valor_titulo"])),
+        valor_pago=_valor(_texto(v, campos["valor_pago"])),
+        valor_tarifa=_valor(_texto(t, campos["valor_tarifa"])),
+        valor_juros=_valor(_texto(v, campos["valor_juros"])),
+        data_ocorrencia=_data(_texto(v, campos["data_ocorrencia"])),
+        data_credito=_data(_texto(v, campos["data_credito"])),
+    )
+
+
+def _ler_240(dados, codigo_banco: str) -> Iterator[OcorrenciaRetorno]:
+    campos = {**_CAMPOS_240, **_CAMPOS_240_BANCO.get(codigo_banco, {})}
+    pendente: Optional[Tuple[int, str, bytes]] = None
+    for numero, registro in _registros(dados):
+        if _texto(registro, (8, 8)) != "3":
+            continue
+        segmento = _texto(registro, (14, 14)).upper()
+        if segmento == "T":
+            if pendente is not None:
+                linha, codigo, t = pendente
+                yield _ocorrencia(linha, codigo, campos, memoryview(t))
+            # O T precisa sobreviver ate o U seguinte: unica copia (240 bytes) do parser.
+            pendente = (numero, _texto(registro, (16, 17)), bytes(registro))
+        elif segmento == "U" and pendente is not None:
+            linha, codigo, t = pendente
+            pendente = None
+            yield _ocorrencia(linha, codigo, campos, memoryview(t), registro)
+    if pendente is not None:
+        linha, codigo, t = pendente
+        yield _ocorrencia(linha, codigo, campos, memoryview(t))
+
+
+def _ler_400(dados, codigo_banco: str) -> Iterator[OcorrenciaRetorno]:
+    campos = {**_CAMPOS_400, **_CAMPOS_400_BANCO.get(codigo_banco, {})}
+    tipo = campos["tipo_detalhe"]
+    for numero, registro in _registros(dados):
+        if _texto(registro, (1, 1)) != tipo:
+            continue
+        yield _ocorrencia(numero, _texto(registro, campos["ocorrencia"]), campos, registro)
+
+
+def ler_ocorrencias(dados, layout: str, codigo_banco: str) -> Iterator[OcorrenciaRetorno]:
+    if layout == LayoutCnabChoices.CNAB240:
+        return _ler_240(dados, codigo_banco)
+    return _ler_400(dados, codigo_banco)
+
+
+def tipo_movimento(layout: str, codigo_banco: str, codigo: str) -> str:
+    if layout == LayoutCnabChoices.CNAB240:
+        movimentos = _MOVIMENTOS_240
+    else:
+        movimentos = _MOVIMENTOS_400_BANCO.get(codigo_banco, _MOVIMENTOS_400)
+    return movimentos.get(codigo, "")
+
+
+# ==================== LIQUIDACAO ====================
+
+
+def _chaves_nosso_numero(valor: str) -> List[str]:
+    """O banco devolve o nosso numero com zeros/espacos; o cadastro pode ter ou nao os zeros."""
+    valor = valor.strip()
+    if not valor:
+        return []
+    sem_zeros = valor.lstrip("0")
+    chaves = {valor, sem_zeros}
+    if sem_zeros:
+        chaves.add(sem_zeros.zfill(TAMANHO_NOSSO_NUMERO))
+    return [c for c in chaves if c]
+
+
+def _item(ocorrencia: OcorrenciaRetorno, motivo: str) -> dict:
+    return {
+        "linha": ocorrencia.linha,
+        "nosso_numero": ocorrencia.nosso_numero,
+        "documento": ocorrencia.uso_empresa or ocorrencia.numero_documento,
+        "codigo": ocorrencia.codigo,
+        "valor": str(ocorrencia.valor_pago or ocorrencia.valor_titulo),
+        "motivo": motivo,
+    }
+
+
+def _liquidar_lote(
+    lote: List[OcorrenciaRetorno], *, layout: str, codigo_banco: str, hoje: date, agora, acumulado: _Acumulado
+) -> None:
+    liquidacoes = [o for o in lote if tipo_movimento(layout, codigo_banco, o.codigo) == LIQUIDACAO]
+    for ocorrencia in lote:
+        tipo = tipo_movimento(layout, codigo_banco, ocorrencia.codigo)
+        if tipo != LIQUIDACAO:
+            acumulado.contagem[tipo] = acumulado.contagem.get(tipo, 0) + 1
+            if tipo in (BAIXA, REJEICAO) and len(acumulado.ocorrencias) < LIMITE_ITENS_RELATORIO:
+                acumulado.ocorrencias.append(_item(ocorrencia, "Baixa" if tipo == BAIXA else "Entrada rejeitada"))
+    if not liquidacoes:
+        return
+
+    # Uma query por lote: numero do boleto (campo de uso da empresa) ou nosso numero.
+    numeros = {numero for o in liquidacoes for numero in o.numeros_boleto}
+    nossos = {chave for o in liquidacoes for chave in _chaves_nosso_numero(o.nosso_numero)}
+    por_numero: Dict[str, Boleto] = {}
+    por_nosso: Dict[str, Boleto] = {}
+    candidatos = (
+        Boleto.objects.select_for_update()
+        .filter(Q(numero_boleto__in=numeros) | Q(nosso_numero__in=nossos))
+        .only("id", "cliente_id", "numero_boleto", "nosso_numero", "status", "valor")
+        .order_by("id")
+    )
+    # Nosso numero so e unico dentro do banco: o retorno nao liquida boleto de outro banco
+    # (boletos sem banco definido, importados antes da remessa, continuam elegiveis).
+    banco = BANCO_POR_CODIGO.get(codigo_banco)
+    if banco is not None:
+        candidatos = candidatos.filter(banco__in=(banco, Boleto.BancoChoices.OUTRO))
+    for boleto in candidatos:
+        por_numero.setdefault(boleto.numero_boleto, boleto)
+        if boleto.nosso_numero:
+            por_nosso.setdefault(boleto.nosso_numero, boleto)
+
+    alterados: Dict[int, Boleto] = {}
+    historico: List[HistoricoStatusBoleto] = []
+    for ocorrencia in liquidacoes:
+        boleto = next((por_numero[n] for n in ocorrencia.numeros_boleto if n in por_numero), None)
+        if boleto is None:
+            boleto = next(
+                (por_nosso[c] for c in _chaves_nosso_numero(ocorrencia.nosso_numero) if c in por_nosso), None
+            )
+        if boleto is None:
+            acumulado.nao_encontrados += 1
+            if len(acumulado.itens_nao_encontrados) < LIMITE_ITENS_RELATORIO:
+                acumulado.itens_nao_encontrados.append(_item(ocorrencia, "Boleto não encontrado"))
+            continue
+        if boleto.status in (StatusBoletoChoices.PAGO, StatusBoletoChoices.CANCELADO):
+            acumulado.ja_liquidados += 1
+            continue
+
+        historico.append(
+            HistoricoStatusBoleto(
+                boleto_id=boleto.pk,
+                status_anterior=boleto.status,
+                status_novo=StatusBoletoChoices.PAGO,
+                origem=OrigemHistoricoStatusChoices.RETORNO,
+            )
+        )
+        boleto.status = StatusBoletoChoices.PAGO
+        boleto.data_pagamento = ocorrencia.data_ocorrencia or ocorrencia.data_credito or hoje
+        boleto.valor_pago = ocorrencia.valor_pago or boleto.valor
+        boleto.valor_tarifa = ocorrencia.valor_tarifa
+        boleto.atualizado_em = agora
+        alterados[boleto.pk] = boleto
+        acumulado.valor_pago += boleto.valor_pago
+        acumulado.valor_tarifas += boleto.valor_tarifa
+        acumulado.clientes.add(boleto.cliente_id)
+
+    Boleto.objects.bulk_update(
+        alterados.values(),
+        ["status", "data_pagamento", "valor_pago", "valor_tarifa", "atualizado_em"],
+        batch_size=TAMANHO_LOTE_RETORNO,
+    )
+    HistoricoStatusBoleto.objects.bulk_create(historico, batch_size=TAMANHO_LOTE_RETORNO)
+    acumulado.liquidados.update(alterados)
+
+
+@transaction.atomic
+def liquidar_retorno(
+    ocorrencias: Iterable[OcorrenciaRetorno],
+    *,
+    layout: str,
+    codigo_banco: str,
+    hoje: Optional[date] = None,
+    tamanho_lote: int = TAMANHO_LOTE_RETORNO,
+) -> RetornoResult:
+    """
+    Liquida os boletos das ocorrencias de liquidacao em lotes:
+    - uma query IN por lote (numero do boleto ou nosso numero) e bulk_update de
+      status, data_pagamento, valor_pago e valor_tarifa
+    - boletos ja pagos/cancelados sao ignorados (reprocessar um retorno nao duplica nada)
+    - baixas, confirmacoes de entrada e rejeicoes so entram nos contadores/relatorio
+    """
+    hoje = hoje or timezone.localdate()
+    agora = timezone.now()
+    acumulado = _Acumulado()
+    ocorrencias = iter(ocorrencias)
+    while True:
+        lote = list(itertools.islice(ocorrencias, tamanho_lote))
+        if not lote:
+            break
+        acumulado.registros += len(lote)
+        _liquidar_lote(lote, layout=layout, codigo_banco=codigo_banco, hoje=hoje, agora=agora, acumulado=acumulado)
+
+    if acumulado.clientes:
+        ExposicaoCreditoService.recalcular_clientes(acumulado.clientes)
+    if acumulado.liquidados:
+        transaction.on_commit(invalidar_estatisticas_boletos)
+    return RetornoResult(
+        registros=acumulado.registros,
+        liquidados=len(acumulado.liquidados),
+        ja_liquidados=acumulado.ja_liquidados,
+        baixados=acumulado.contagem.get(BAIXA, 0),
+        confirmados=acumulado.contagem.get(ENTRADA, 0),
+        rejeitados=acumulado.contagem.get(REJEICAO, 0),
+        nao_encontrados=acumulado.nao_encontrados,
+        itens_nao_encontrados=tuple(acumulado.itens_nao_encontrados),
+        ocorrencias=tuple(acumulado.ocorrencias),
+        valor_pago=acumulado.valor_pago,
+        valor_tarifas=acumulado.valor_tarifas,
+        boleto_ids=tuple(sorted(acumulado.liquidados)),
+    )
+
+
+@contextmanager
+def _conteudo(arquivo):
+    """mmap do arquivo gravado; storages sem caminho local caem para leitura em memoria."""
+    try:
+        caminho = arquivo.path
+    except NotImplementedError:
+        arquivo.open("rb")
+        try:
+            yield arquivo.read()
+        finally:
+            arquivo.close()
+        return
+    with mapear_arquivo(caminho) as dados:
+        yield dados
+
+
+def processar_retorno(retorno: RetornoBancario) -> RetornoBancario:
+    """
+    Le o arquivo do retorno e grava o resultado (ou o erro) no proprio registro.
+    Qualquer falha deixa o registro em ERRO (nunca preso em PROCESSANDO) para poder ser reprocessado.
+    """
+    boleto_ids_anteriores = (retorno.relatorio or {}).get("boleto_ids", [])
+    retorno.status = StatusImportacaoChoices.PROCESSANDO
+    retorno.erro = ""
+    retorno.save(update_fields=["status", "erro"])
+    try:
+        with _conteudo(retorno.arquivo) as dados:
+            layout, codigo_banco = detectar_layout(dados)
+            ocorrencias = ler_ocorrencias(dados, layout, codigo_banco)
+            try:
+                resultado = liquidar_retorno(ocorrencias, layout=layout, codigo_banco=codigo_banco)
+            finally:
+                ocorrencias.close()
+    except Exception as exc:
+        if not isinstance(exc, ValueError):
+            logger.exception("Falha no processamento do retorno bancario #%s", retorno.pk)
+        retorno.status = StatusImportacaoChoices.ERRO
+        retorno.erro = str(exc) or exc.__class__.__name__
+        retorno.concluido_em = timezone.now()
+        retorno.save(update_fields=["status", "erro", "concluido_em"])
+        return retorno
+
+    retorno.layout = layout
+    retorno.codigo_banco = codigo_banco
+    retorno.banco = BANCO_POR_CODIGO.get(codigo_banco, Boleto.BancoChoices.OUTRO)
+    retorno.registros = resultado.registros
+    retorno.liquidados = resultado.liquidados
+    retorno.ja_liquidados = resultado.ja_liquidados
+    retorno.baixados = resultado.baixados
+    retorno.confirmados = resultado.confirmados
+    retorno.rejeitados = resultado.rejeitados
+    retorno.nao_encontrados = resultado.nao_encontrados
+    retorno.valor_pago_total = resultado.valor_pago
+    retorno.valor_tarifas_total = resultado.valor_tarifas
+    retorno.relatorio = {
+        "nao_encontrados": list(resultado.itens_nao_encontrados),
+        "ocorrencias": list(resultado.ocorrencias),
+        # No reprocessamento os ja liquidados pelo mesmo arquivo continuam no relatorio.
+        "boleto_ids": sorted(set(boleto_ids_anteriores) | set(resultado.boleto_ids)),
+    }
+    retorno.status = StatusImportacaoChoices.CONCLUIDA
+    retorno.concluido_em = timezone.now()
+    retorno.save()
+    return retorno
+
+
+def registrar_retorno(arquivo, *, usuario=None) -> RetornoBancario:
+    """
+    Grava o arquivo de retorno e liquida. O mesmo conteudo enviado de novo so e recusado
+    se o retorno anterior concluiu sem boletos nao encontrados; caso contrario (erro,
+    processamento interrompido ou boletos cadastrados depois) o registro existente e reprocessado.
+    """
+    hasher = hashlib.sha256()
+    for pedaco in arquivo.chunks():
+        hasher.update(pedaco)
+    arquivo.seek(0)
+    hash_conteudo = hasher.hexdigest()
+    existente = RetornoBancario.objects.filter(hash_conteudo=hash_conteudo).first()
+    if existente is not None:
+        if existente.status == StatusImportacaoChoices.CONCLUIDA and not existente.nao_encontrados:
+            raise ValueError(f"Este arquivo de retorno já foi processado (retorno #{existente.pk}).")
+        return processar_retorno(existente)
+
+    retorno = RetornoBancario.objects.create(
+        arquivo=arquivo,
+        nome_arquivo=os.path.basename(getattr(arquivo, "name", "") or "")[:255],
+        hash_conteudo=hash_conteudo,
+        criado_por=usuario if getattr(usuario, "is_authenticated", False) else None,
+    )
+    return processar_retorno(retorno)
+
+
+# ==================== REMESSA ====================
+
+
+def _registro(tamanho: int, campos: Dict[int, str]) -> str:
+    """Monta um registro de largura fixa: {posicao inicial 1-based: texto ja formatado}."""
+    linha = [" "] * tamanho
+    for inicio, texto in campos.items():
+        linha[inicio - 1:inicio - 1 + len(texto)] = texto
+    return "".join(linha[:tamanho])
+
+
+def _num(valor, tamanho: int) -> str:
+    return somente_digitos(str(valor or ""))[-tamanho:].zfill(tamanho)
+
+
+def _alfa(valor, tamanho: int) -> str:
+    # Remessas aceitam so ASCII maiusculo; normalizar_nome tira acentos e pontuacao.
+    return normalizar_nome(valor or "")[:tamanho].ljust(tamanho)
+
+
+def _dinheiro(valor: Decimal, tamanho: int) -> str:
+    return str(int((valor or Decimal("0")) * 100)).zfill(tamanho)[-tamanho:]
+
+
+def _pagador(boleto: Boleto) -> Tuple[str, str]:
+    documento = boleto.cliente.documento or somente_digitos(boleto.cliente.cpf_cnpj)
+    return ("2" if len(documento) > 11 else "1"), documento
+
+
+def _remessa_240(boletos: List[Boleto], *, codigo: str, sequencial: int, agora) -> List[str]:
+    cedente = settings.BOLETOS_CEDENTE
+    data = agora.strftime("%d%m%Y")
+    base = {
+        18: "2",
+        19: _num(cedente["cnpj"], 14),
+        33: _alfa(cedente["convenio"], 20),
+        53: _num(cedente["agencia"], 5),
+        59: _num(cedente["conta"], 12),
+    }
+    linhas = [
+        _registro(240, {
+            1: codigo, 4: "0000", 8: "0", **base, 73: _alfa(cedente["nome"], 30),
+            103: _alfa(NOME_BANCO.get(codigo, ""), 30), 143: "1", 144: data, 152: agora.strftime("%H%M%S"),
+            158: _num(sequencial, 6), 164: "089", 167: "00000",
+        }),
+        _registro(240, {
+            1: codigo, 4: "0001", 8: "1", 9: "R", 10: "01", 14: "045", 18: "2",
+            19: _num(cedente["cnpj"], 15), 34: _alfa(cedente["convenio"], 20), 54: _num(cedente["agencia"], 5),
+            60: _num(cedente["conta"], 12), 74: _alfa(cedente["nome"], 30), 184: _num(sequencial, 8), 192: data,
+        }),
+    ]
+    for i, boleto in enumerate(boletos):
+        tipo_inscricao, documento = _pagador(boleto)
+        linhas.append(_registro(240, {
+            1: codigo, 4: "0001", 8: "3", 9: _num(2 * i + 1, 5), 14: "P", 16: "01",
+            18: _num(cedente["agencia"], 5), 24: _num(cedente["conta"], 12),
+            38: boleto.nosso_numero[:20].ljust(20), 58: _num(cedente["carteira"], 1),
+            63: boleto.numero_boleto[:15].ljust(15), 78: boleto.data_vencimento.strftime("%d%m%Y"),
+            86: _dinheiro(boleto.valor, 15), 107: "02", 109: "N", 110: boleto.data_emissao.strftime("%d%m%Y"),
+            196: boleto.numero_boleto[:25].ljust(25), 229: "09",
+        }))
+        linhas.append(_registro(240, {
+            1: codigo, 4: "0001", 8: "3", 9: _num(2 * i + 2, 5), 14: "Q", 16: "01",
+            18: tipo_inscricao, 19: _num(documento, 15), 34: _alfa(boleto.cliente.nome, 40),
+            74: _alfa(boleto.cliente.endereco, 40),
+        }))
+    linhas.append(_registro(240, {1: codigo, 4: "0001", 8: "5", 18: _num(len(boletos) * 2 + 2, 6)}))
+    linhas.append(_registro(240, {1: codigo, 4: "9999", 8: "9", 18: _num(1, 6), 24: _num(len(linhas) + 1, 6)}))
+    return linhas
+
+
+def _remessa_400(boletos: List[Boleto], *, codigo: str, sequencial: int, agora) -> List[str]:
+    cedente = settings.BOLETOS_CEDENTE
+    linhas = [
+        _registro(400, {
+            1: "0", 2: "1", 3: "REMESSA", 10: "01", 12: _alfa("COBRANCA", 15), 27: _num(cedente["convenio"], 20),
+            47: _alfa(cedente["nome"], 30), 77: codigo, 80: _alfa(NOME_BANCO.get(codigo, ""), 15),
+            95: agora.strftime("%d%m%y"), 111: _num(sequencial, 7), 395: _num(1, 6),
+        })
+    ]
+    for boleto in boletos:
+        tipo_inscricao, documento = _pagador(boleto)
+        linhas.append(_registro(400, {
+            1: "1", 21: _num(f"{cedente['carteira']}{cedente['agencia']}{cedente['conta']}", 17),
+            38: boleto.numero_boleto[:25].ljust(25), 71: _num(boleto.nosso_numero, 12), 109: "01",
+            111: boleto.numero_boleto[:10].ljust(10), 121: boleto.data_vencimento.strftime("%d%m%y"),
+            127: _dinheiro(boleto.valor, 13), 148: "01", 150: "N", 151: boleto.data_emissao.strftime("%d%m%y"),
+            219: "0" + tipo_inscricao, 221: _num(documento, 14), 235: _alfa(boleto.cliente.nome, 40),
+            275: _alfa(boleto.cliente.endereco, 40), 395: _num(len(linhas) + 1, 6),
+        }))
+    linhas.append(_registro(400, {1: "9", 395: _num(len(linhas) + 1, 6)}))
+    return linhas
+
+
+@transaction.atomic
+def gerar_remessa(banco: str, *, layout: str = LayoutCnabChoices.CNAB240, usuario=None) -> RemessaBancaria:
+    """
+    Gera a remessa de registro (movimento 01) dos boletos ABERTO do banco que ainda
+    nao foram remetidos. Boletos sem nosso numero recebem o pk com zeros a esquerda.
+    O CNAB 400 segue o leiaute de remessa padrao (registro tipo 1); bancos com
+    leiaute 400 proprio (ex.: BB convenio de 7 digitos) devem usar o 240.
+    """
+    codigo = CODIGO_POR_BANCO.get(banco)
+    if codigo is None:
+        raise ValueError("Banco sem código CNAB configurado para remessa.")
+    boletos = list(
+        Boleto.objects.select_for_update(of=("self",))
+        .select_related("cliente")
+        .filter(banco=banco, status=StatusBoletoChoices.ABERTO, remessa__isnull=True)
+        .order_by("id")
+    )
+    if not boletos:
+        raise ValueError("Nenhum boleto novo para remeter a este banco.")
+
+    sequencial = (RemessaBancaria.objects.filter(banco=banco).aggregate(ultimo=Max("sequencial"))["ultimo"] or 0) + 1
+    agora = timezone.localtime()
+    sem_nosso_numero = [b for b in boletos if not b.nosso_numero]
+    for boleto in sem_nosso_numero:
+        boleto.nosso_numero = str(boleto.pk).zfill(TAMANHO_NOSSO_NUMERO)
+
+    gerar = _remessa_240 if layout == LayoutCnabChoices.CNAB240 else _remessa_400
+    linhas = gerar(boletos, codigo=codigo, sequencial=sequencial, agora=agora)
+    conteudo = ("\r\n".join(linhas) + "\r\n").encode("latin-1", errors="replace")
+
+    remessa = RemessaBancaria(
+        banco=banco,
+        layout=layout,
+        sequencial=sequencial,
+        quantidade=len(boletos),
+        valor_total=sum((b.valor for b in boletos), Decimal("0.00")),
+        criado_por=usuario if getattr(usuario, "is_authenticated", False) else None,
+    )
+    extensao = "rem" if layout == LayoutCnabChoices.CNAB240 else "txt"
+    remessa.arquivo.save(f"remessa_{codigo}_{sequencial:06d}.{extensao}", ContentFile(conteudo), save=False)
+    remessa.save()
+
+    for boleto in boletos:
+        boleto.remessa = remessa
+        boleto.atualizado_em = timezone.now()
+    Boleto.objects.bulk_update(boletos, ["remessa", "nosso_numero", "atualizado_em"], batch_size=TAMANHO_LOTE_RETORNO)
+    return remessa
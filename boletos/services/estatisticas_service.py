@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from boletos.models import Boleto, StatusBoletoChoices
+
+CACHE_VERSAO_ESTATISTICAS = "boletos:estatisticas:versao"
+CACHE_TTL_ESTATISTICAS = 300
+
+
+def _soma(filtro: Q):
+    return Coalesce(
+        Sum("valor", filter=filtro),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+
+
+def _versao() -> int:
+    versao = cache.get(CACHE_VERSAO_ESTATISTICAS)
+    if versao is None:
+        versao = 1
+        cache.add(CACHE_VERSAO_ESTATISTICAS, versao, None)
+    return versao
+
+
+def invalidar_estatisticas_boletos() -> None:
+    """Chamar apos gravar boletos (criacao, pagamento, mudanca de status)."""
+    try:
+        cache.incr(CACHE_VERSAO_ESTATISTICAS)
+    except ValueError:
+        cache.set(CACHE_VERSAO_ESTATISTICAS, 2, None)
+
+
+def _calcular() -> dict:
+    """Contagem e soma por status e total vencido por banco em uma unica agregacao condicional."""
+    agregados = {}
+    for status in StatusBoletoChoices.values:
+        agregados[f"qtd_{status}"] = Count("id", filter=Q(status=status))
+        agregados[f"valor_{status}"] = _soma(Q(status=status))
+    for banco in Boleto.BancoChoices.values:
+        agregados[f"vencido_{banco}"] = _soma(Q(status=StatusBoletoChoices.VENCIDO, banco=banco))
+    linha = Boleto.objects.aggregate(**agregados)
+
+    por_status = {
+        status: {"qtd": linha[f"qtd_{status}"], "valor": linha[f"valor_{status}"]}
+        for status in StatusBoletoChoices.values
+    }
+    return {
+        "total_abertos": por_status[StatusBoletoChoices.ABERTO]["qtd"],
+        "total_pendentes": por_status[StatusBoletoChoices.PENDENTE]["qtd"],
+        "total_pagos": por_status[StatusBoletoChoices.PAGO]["qtd"],
+        "total_vencidos": por_status[StatusBoletoChoices.VENCIDO]["qtd"],
+        "valor_total_aberto": (
+            por_status[StatusBoletoChoices.ABERTO]["valor"] + por_status[StatusBoletoChoices.PENDENTE]["valor"]
+        ),
+        "por_status": por_status,
+        "vencidos_por_banco": {banco: linha[f"vencido_{banco}"] for banco in Boleto.BancoChoices.values},
+    }
+
+
+def estatisticas_boletos() -> dict:
+    """Estatisticas da listagem de boletos, em cache ate a proxima gravacao (ou CACHE_TTL_ESTATISTICAS)."""
+    chave = f"boletos:estatisticas:{_versao()}"
+    estatisticas = cache.get(chave)
+    if estatisticas is None:
+        estatisticas = _calcular()
+        cache.set(chave, estatisticas, CACHE_TTL_ESTATISTICAS)
+    return estatisticas
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import tempfile
+from decimal import Decimal
+from typing import IO, Iterable, Iterator, Mapping, Sequence
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from boletos.models import Boleto, StatusBoletoChoices
+from core.services.formato_brl import format_brl
+
+# Linhas buscadas por vez no banco; as exportacoes nunca materializam o queryset inteiro.
+TAMANHO_LOTE_EXPORTACAO = 2000
+# Acima disso o PDF vai para disco em vez de ficar em memoria.
+PDF_MAX_MEMORIA = 5 * 1024 * 1024
+# O canvas do reportlab guarda todas as paginas ate o save(): memoria cresce com as linhas.
+# ~300 paginas; acima disso use CSV/XLSX (streaming, memoria constante).
+PDF_MAX_LINHAS = 10000
+
+CAMPOS_EXPORTACAO = (
+    "numero_boleto",
+    "nosso_numero",
+    "cliente__nome",
+    "cliente__cpf_cnpj",
+    "valor",
+    "data_vencimento",
+    "banco",
+    "status",
+)
+CABECALHO_EXPORTACAO = (
+    "numero_boleto",
+    "nosso_numero",
+    "cliente",
+    "cpf_cnpj",
+    "valor",
+    "data_vencimento",
+    "banco",
+    "status",
+)
+
+
+def filtrar_boletos(qs: QuerySet, params: Mapping[str, str]) -> QuerySet:
+    """Filtros da listagem de boletos (status, cliente, vendedor, banco, comprovante), reusados nas exportacoes."""
+    status = (params.get("status") or "").strip()
+    cliente_id = (params.get("cliente") or "").strip()
+    vendedor_id = (params.get("vendedor") or "").strip()
+    banco = (params.get("banco") or "").strip()
+
+    if status:
+        qs = qs.filter(status=status)
+    if cliente_id.isdigit():
+        qs = qs.filter(cliente_id=cliente_id)
+    if vendedor_id.isdigit():
+        qs = qs.filter(vendedor_id=vendedor_id)
+    if banco:
+        qs = qs.filter(banco=banco)
+
+    # Filtrar apenas boletos marcados como necessitam de comprovante
+    necessita = (params.get("necessita_comprovante") or "").lower()
+    if necessita in ("1", "true", "on"):
+        qs = qs.filter(necessita_comprovante=True)
+    return qs
+
+
+def linhas_exportacao(qs: QuerySet, *, tamanho_lote: int = TAMANHO_LOTE_EXPORTACAO) -> Iterator[tuple]:
+    """Tuplas na ordem de CABECALHO_EXPORTACAO, lidas em lotes (sem instanciar modelos)."""
+    return (
+        qs.order_by("data_vencimento", "id")
+        .values_list(*CAMPOS_EXPORTACAO)
+        .iterator(chunk_size=tamanho_lote)
+    )
+
+
+def _cortar(pdf, texto: str, largura: float, fonte: str, tamanho: float) -> str:
+    texto = texto or ""
+    if pdf.stringWidth(texto, fonte, tamanho) <= largura:
+        return texto
+    while texto and pdf.stringWidth(texto + "...", fonte, tamanho) > largura:
+        texto = texto[:-1]
+    return texto + "..."
+
+
+def gerar_pdf_boletos(
+    linhas: Iterable[Sequence],
+    *,
+    titulo: str,
+    filtros: str = "",
+    max_linhas: int = PDF_MAX_LINHAS,
+) -> IO[bytes]:
+    """
+    PDF paginado (A4 paisagem) com as linhas de `linhas_exportacao` e totais no fim.
+    As paginas sao comprimidas e o documento vai para um arquivo temporario
+    (em disco acima de PDF_MAX_MEMORIA); devolve o arquivo posicionado no inicio.
+    Levanta ValueError acima de `max_linhas` (o documento inteiro fica em memoria ate o save).
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    bancos = dict(Boleto.BancoChoices.choices)
+    status_rotulos = dict(StatusBoletoChoices.choices)
+
+    destino = tempfile.SpooledTemporaryFile(max_size=PDF_MAX_MEMORIA)
+    pdf = canvas.Canvas(destino, pagesize=landscape(A4), pageCompression=1)
+    largura, altura = landscape(A4)
+    esquerda = 10 * mm
+    direita = largura - 10 * mm
+    altura_linha = 5 * mm
+    # (titulo, x inicial, largura, alinhado a direita)
+    colunas = [
+        ("Numero", 0, 32 * mm, False),
+        ("Nosso numero", 32 * mm, 30 * mm, False),
+        ("Cliente", 62 * mm, 80 * mm, False),
+        ("CPF/CNPJ", 142 * mm, 36 * mm, False),
+        ("Vencimento", 178 * mm, 22 * mm, False),
+        ("Banco", 200 * mm, 26 * mm, False),
+        ("Status", 226 * mm, 22 * mm, False),
+        ("Valor", 248 * mm, 29 * mm, True),
+    ]
+    gerado_em = f"Gerado em {timezone.localtime():%d/%m/%Y %H:%M}"
+    pagina = 0
+    y = 0.0
+
+    def cabecalho() -> None:
+        nonlocal pagina, y
+        pagina += 1
+        pdf.setFillColor(colors.HexColor("#111827"))
+        pdf.setFont("Helvetica-Bold", 13)
+        pdf.drawString(esquerda, altura - 14 * mm, titulo)
+        pdf.setFont("Helvetica", 8)
+        pdf.setFillColor(colors.HexColor("#374151"))
+        if filtros:
+            pdf.drawString(esquerda, altura - 19 * mm, _cortar(pdf, filtros, 200 * mm, "Helvetica", 8))
+        pdf.drawRightString(direita, altura - 14 * mm, gerado_em)
+        pdf.drawRightString(direita, altura - 19 * mm, f"Pagina {pagina}")
+        y = altura - 27 * mm
+        pdf.setFillColor(colors.HexColor("#f3f4f6"))
+        pdf.rect(esquerda, y - 1.5 * mm, direita - esquerda, altura_linha, fill=1, stroke=0)
+        pdf.setFillColor(colors.HexColor("#111827"))
+        pdf.setFont("Helvetica-Bold", 8)
+        for nome, x, largura_col, a_direita in colunas:
+            if a_direita:
+                pdf.drawRightString(esquerda + x + largura_col, y, nome)
+            else:
+                pdf.drawString(esquerda + x, y, nome)
+        y -= altura_linha
+        pdf.setFont("Helvetica", 8)
+
+    cabecalho()
+    quantidade = 0
+    total = Decimal("0.00")
+    for numero, nosso_numero, cliente, cpf_cnpj, valor, vencimento, banco, status in linhas:
+        if quantidade >= max_linhas:
+            destino.close()
+            raise ValueError(f"PDF limitado a {max_linhas} boletos; use CSV/XLSX para exportar mais.")
+        if y < 12 * mm:
+            pdf.showPage()
+            cabecalho()
+        valores = [
+            numero,
+            nosso_numero or "",
+            cliente or "",
+            cpf_cnpj or "",
+            vencimento.strftime("%d/%m/%Y") if vencimento else "",
+            bancos.get(banco, banco or ""),
+            status_rotulos.get(status, status or ""),
+            format_brl(valor),
+        ]
+        for (_, x, largura_col, a_direita), texto in zip(colunas, valores):
+            texto = _cortar(pdf, str(texto), largura_col - 2 * mm, "Helvetica", 8)
+            if a_direita:
+                pdf.drawRightString(esquerda + x + largura_col, y, texto)
+            else:
+                pdf.drawString(esquerda + x, y, texto)
+        y -= altura_linha
+        quantidade += 1
+        total += valor or Decimal("0.00")
+
+    if y < 20 * mm:
+        pdf.showPage()
+        cabecalho()
+    pdf.setStrokeColor(colors.HexColor("#d1d5db"))
+    pdf.line(esquerda, y + 3 * mm, direita, y + 3 * mm)
+    pdf.setFont("Helvetica-Bold", 9)
+    pdf.drawString(esquerda, y - 2 * mm, f"Total de boletos: {quantidade}")
+    pdf.drawRightString(direita, y - 2 * mm, f"Valor total: {format_brl(total)}")
+    pdf.save()
+    destino.seek(0)
+    return destino
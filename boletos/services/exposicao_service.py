@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Min, Q, Sum
+from django.utils import timezone
+
+from boletos.models import (
+    Boleto,
+    Cliente,
+    ClienteListaNegra,
+    ControleFiado,
+    ExposicaoCreditoCliente,
+    StatusBoletoChoices,
+    StatusFiadoChoices,
+)
+from financeiro.models import Recebivel, StatusRecebivelChoices
+
+STATUS_BOLETO_EM_ABERTO = (
+    StatusBoletoChoices.ABERTO,
+    StatusBoletoChoices.PENDENTE,
+    StatusBoletoChoices.VENCIDO,
+)
+
+CAMPOS_EXPOSICAO = [
+    "valor_boletos_aberto",
+    "valor_recebiveis_aberto",
+    "saldo_fiado",
+    "valor_vencido",
+    "valor_exposicao_total",
+    "limite_credito",
+    "vencimento_mais_antigo",
+    "bloqueado",
+    "atualizado_em",
+]
+
+
+@dataclass
+class _Acumulado:
+    valor_boletos_aberto: Decimal = Decimal("0.00")
+    valor_recebiveis_aberto: Decimal = Decimal("0.00")
+    saldo_fiado: Decimal = Decimal("0.00")
+    valor_vencido: Decimal = Decimal("0.00")
+    limite_credito: Decimal = Decimal("0.00")
+    vencimento_mais_antigo: date | None = None
+    bloqueado: bool = False
+
+    def registrar_vencido(self, valor: Decimal, vencimento: date | None) -> None:
+        self.valor_vencido += valor
+        if vencimento and (self.vencimento_mais_antigo is None or vencimento < self.vencimento_mais_antigo):
+            self.vencimento_mais_antigo = vencimento
+
+
+class ExposicaoCreditoService:
+    """Mantem e consulta o resumo de exposicao de credito por cliente"""
+
+    @staticmethod
+    def _calcular(cliente_ids: list[int] | None = None) -> dict[int, _Acumulado]:
+        """
+        Agrega boletos, recebiveis de vendas e fiado por cliente.
+        Com cliente_ids=None calcula para toda a base (usado na reconstrucao).
+        """
+        hoje = timezone.localdate()
+        resultado: dict[int, _Acumulado] = {}
+
+        def filtrar(qs, campo: str):
+            return qs if cliente_ids is None else qs.filter(**{f"{campo}__in": cliente_ids})
+
+        vencido = Q(data_vencimento__lt=hoje) | Q(status=StatusBoletoChoices.VENCIDO)
+        boletos = filtrar(Boleto.objects.filter(status__in=STATUS_BOLETO_EM_ABERTO), "cliente_id")
+        for row in boletos.values("cliente_id").annotate(
+            total=Sum("valor"),
+            vencido=Sum("valor", filter=vencido),
+            mais_antigo=Min("data_vencimento", filter=vencido),
+        ):
+            acc = resultado.setdefault(row["cliente_id"], _Acumulado())
+            acc.valor_boletos_aberto += row["total"] or Decimal("0.00")
+            acc.registrar_vencido(row["vencido"] or Decimal("0.00"), row["mais_antigo"])
+
+        # Parcelas de venda com boleto: a parte em boleto ja entra pelo proprio boleto.
+        boleto_por_parcela: dict[tuple[int, int], Decimal] = {}
+        boletos_venda = filtrar(
+            Boleto.objects.filter(venda_link__isnull=False).exclude(status=StatusBoletoChoices.CANCELADO),
+            "cliente_id",
+        )
+        for venda_id, parcela, valor in boletos_venda.values_list(
+            "venda_link__venda_id", "venda_link__numero_parcela", "valor"
+        ):
+            boleto_por_parcela[(venda_id, parcela)] = valor
+
+        recebiveis = filtrar(
+            Recebivel.objects.filter(status=StatusRecebivelChoices.ABERTO, venda_link__isnull=False),
+            "venda_link__venda__cliente_id",
+        )
+        for cliente_id, venda_id, parcela, valor, data_prevista in recebiveis.values_list(
+            "venda_link__venda__cliente_id",
+            "venda_link__venda_id",
+            "venda_link__numero_parcela",
+            "valor",
+            "data_prevista",
+        ).iterator():
+            restante = (valor or Decimal("0.00")) - boleto_por_parcela.get((venda_id, parcela), Decimal("0.00"))
+            if restante <= 0:
+                continue
+            acc = resultado.setdefault(cliente_id, _Acumulado())
+            acc.valor_recebiveis_aberto += restante
+            if data_prevista < hoje:
+                acc.registrar_vencido(restante, data_prevista)
+
+        for cliente_id, saldo, limite, status in filtrar(ControleFiado.objects.all(), "cliente_id").values_list(
+            "cliente_id", "saldo_fiado", "limite_credito", "status"
+        ):
+            acc = resultado.setdefault(cliente_id, _Acumulado())
+            acc.saldo_fiado = saldo or Decimal("0.00")
+            acc.limite_credito = limite or Decimal("0.00")
+            acc.bloqueado = acc.bloqueado or status == StatusFiadoChoices.BLOQUEADO
+
+        for cliente_id in filtrar(ClienteListaNegra.objects.filter(ativo=True), "cliente_id").values_list(
+            "cliente_id", flat=True
+        ):
+            resultado.setdefault(cliente_id, _Acumulado()).bloqueado = True
+
+        return resultado
+
+    @staticmethod
+    def _montar(cliente_id: int, acc: _Acumulado) -> ExposicaoCreditoCliente:
+        return ExposicaoCreditoCliente(
+            cliente_id=cliente_id,
+            valor_boletos_aberto=acc.valor_boletos_aberto,
+            valor_recebiveis_aberto=acc.valor_recebiveis_aberto,
+            saldo_fiado=acc.saldo_fiado,
+            valor_vencido=acc.valor_vencido,
+            valor_exposicao_total=acc.valor_boletos_aberto + acc.valor_recebiveis_aberto + acc.saldo_fiado,
+            limite_credito=acc.limite_credito,
+            vencimento_mais_antigo=acc.vencimento_mais_antigo,
+            bloqueado=acc.bloqueado,
+            atualizado_em=timezone.now(),
+        )
+
+    @staticmethod
+    def _gravar(registros: list[ExposicaoCreditoCliente]) -> None:
+        ExposicaoCreditoCliente.objects.bulk_create(
+            registros,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["cliente"],
+            update_fields=CAMPOS_EXPOSICAO,
+        )
+
+    @classmethod
+    def recalcular_clientes(cls, cliente_ids: Iterable[int]) -> None:
+        """Recalcula o resumo dos clientes afetados por uma operacao"""
+        ids = sorted({int(pk) for pk in cliente_ids if pk})
+        if not ids:
+            return
+        calculado = cls._calcular(ids)
+        cls._gravar([cls._montar(pk, calculado.get(pk, _Acumulado())) for pk in ids])
+
+    @classmethod
+    def recalcular(cls, cliente: Cliente | int) -> ExposicaoCreditoCliente:
+        cliente_id = getattr(cliente, "pk", cliente)
+        cls.recalcular_clientes([cliente_id])
+        return ExposicaoCreditoCliente.objects.get(cliente_id=cliente_id)
+
+    @classmethod
+    def recalcular_por_recebiveis(cls, recebiveis: Iterable[Recebivel]) -> None:
+        ids = [r.pk for r in recebiveis]
+        cls.recalcular_clientes(
+            Cliente.objects.filter(vendas__recebiveis__recebivel_id__in=ids).values_list("id", flat=True)
+        )
+
+    @classmethod
+    def obter(cls, cliente: Cliente | int) -> ExposicaoCreditoCliente:
+        """Leitura O(1) do resumo; calcula na primeira consulta do cliente"""
+        cliente_id = getattr(cliente, "pk", cliente)
+        exposicao = ExposicaoCreditoCliente.objects.filter(cliente_id=cliente_id).first()
+        return exposicao or cls.recalcular(cliente_id)
+
+    @classmethod
+    def validar_credito(cls, cliente: Cliente, valor: Decimal) -> ExposicaoCreditoCliente:
+        """Bloqueia venda a prazo de cliente bloqueado ou acima do limite de credito"""
+        exposicao = cls.obter(cliente)
+        if exposicao.bloqueado:
+            raise ValueError(f"Cliente {cliente.nome} está bloqueado para vendas a prazo.")
+        disponivel = exposicao.saldo_disponivel
+        if disponivel is not None and (valor or Decimal("0.00")) > disponivel:
+            raise ValueError(
+                f"Limite de crédito excedido para {cliente.nome}. "
+                f"Disponível: R$ {max(disponivel, Decimal('0.00'))}"
+            )
+        return exposicao
+
+    @classmethod
+    @transaction.atomic
+    def reconstruir_todas(cls) -> int:
+        """Reconstrucao completa em lote (comando reconstruir_exposicao_credito)"""
+        calculado = cls._calcular()
+        # Apaga tudo e regrava na mesma transacao: um NOT IN com todos os clientes estouraria o
+        # limite de parametros do SQLite e pesaria no PostgreSQL.
+        ExposicaoCreditoCliente.objects.all().delete()
+        cls._gravar([cls._montar(pk, acc) for pk, acc in calculado.items()])
+        return len(calculado)
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import csv
+import itertools
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from boletos.models import (
+    Boleto,
+    Cliente,
+    HistoricoStatusBoleto,
+    ImportacaoBoletosVencidos,
+    OrigemHistoricoStatusChoices,
+    StatusBoletoChoices,
+    StatusImportacaoChoices,
+)
+from boletos.services.estatisticas_service import invalidar_estatisticas_boletos
+from boletos.services.exposicao_service import ExposicaoCreditoService
+from core.services.arquivos_csv import abrir_csv_texto, linhas_com_amostra
+from core.services.normalizacao import normalizar_nome, somente_digitos
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_VENCIDOS = 1000
+AMOSTRA_DELIMITADOR = 8192
+LIMITE_NAO_ENCONTRADOS_RELATORIO = 500
+
+# Campo -> nomes de coluna aceitos (exatos primeiro; depois comparados normalizados).
+_COLUNAS = {
+    "numero": ("Nosso_Numero", "NossoNumero", "Nosso-Numero", "nosso_numero", "numero_boleto", "numero"),
+    "cpf_cnpj": ("CPF_CNPJ", "cpf_cnpj", "cpf", "cnpj"),
+    "pagador": ("Pagador", "pagador", "nome"),
+    "valor": ("Valor", "valor", "Valor(R$)"),
+    "vencimento": ("Vencimento", "vencimento", "data_vencimento"),
+}
+_MAX_NUMERO_BOLETO = Boleto._meta.get_field("numero_boleto").max_length
+
+
+@dataclass(frozen=True)
+class LinhaVencido:
+    linha: int
+    numero: str
+    cpf_cnpj: str
+    pagador: str
+    valor: Optional[Decimal]
+    vencimento: Optional[date]
+
+    @property
+    def documento(self) -> str:
+        return somente_digitos(self.cpf_cnpj)
+
+
+@dataclass(frozen=True)
+class ImportacaoVencidosResult:
+    linhas: int
+    boletos_atualizados: int
+    boletos_criados: int
+    clientes_criados: int
+    nao_encontrados: Tuple[dict, ...]
+    boleto_ids: Tuple[int, ...]
+
+
+@dataclass
+class _Acumulado:
+    linhas: int = 0
+    atualizados: Set[int] = field(default_factory=set)
+    criados: Set[int] = field(default_factory=set)
+    clientes_criados: int = 0
+    clientes_afetados: Set[int] = field(default_factory=set)
+    nao_encontrados: List[dict] = field(default_factory=list)
+
+
+def _chave_coluna(nome: str) -> str:
+    return re.sub(r"[^a-z0-9]", "_", (nome or "").strip().lower())
+
+
+def _indices_colunas(cabecalho: List[str]) -> Dict[str, Optional[int]]:
+    normalizados = [_chave_coluna(c) for c in cabecalho]
+    indices: Dict[str, Optional[int]] = {}
+    for campo, candidatos in _COLUNAS.items():
+        indice = next((cabecalho.index(c) for c in candidatos if c in cabecalho), None)
+        if indice is None:
+            indice = next(
+                (normalizados.index(_chave_coluna(c)) for c in candidatos if _chave_coluna(c) in normalizados),
+                None,
+            )
+        indices[campo] = indice
+    return indices
+
+
+def _parse_data(valor: str) -> Optional[date]:
+    valor = (valor or "").strip()
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(valor, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_valor(valor: str) -> Optional[Decimal]:
+    """'1.234,56', '1234,56', 'R$ 10,00' ou '1234.56'."""
+    valor = (valor or "").replace("R$", "").strip()
+    if "," in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(valor)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def ler_linhas_vencidos(file: IO[str]) -> Iterator[LinhaVencido]:
+    """CSV do banco (';' ou ','), lido em streaming. Linhas sem numero sao ignoradas."""
+    amostra, linhas = linhas_com_amostra(file, tamanho=AMOSTRA_DELIMITADOR)
+    if not amostra.strip():
+        return
+    try:
+        delimitador = csv.Sniffer().sniff(amostra, delimiters=";,").delimiter
+    except csv.Error:
+        delimitador = ";"
+
+    reader = csv.reader(linhas, delimiter=delimitador)
+    cabecalho = next(reader, None)
+    if not cabecalho:
+        return
+    indices = _indices_colunas(cabecalho)
+
+    def celula(row: List[str], campo: str) -> str:
+        indice = indices[campo]
+        if indice is None or indice >= len(row):
+            return ""
+        return (row[indice] or "").strip()
+
+    for row in reader:
+        numero = celula(row, "numero")
+        if not numero:
+            continue
+        yield LinhaVencido(
+            linha=reader.line_num,
+            numero=numero,
+            cpf_cnpj=celula(row, "cpf_cnpj"),
+            pagador=celula(row, "pagador"),
+            valor=_parse_valor(celula(row, "valor")),
+            vencimento=_parse_data(celula(row, "vencimento")),
+        )
+
+
+def _nao_encontrado(linha: LinhaVencido, motivo: str) -> dict:
+    return {"linha": linha.linha, "numero": linha.numero, "cpf_cnpj": linha.cpf_cnpj, "motivo": motivo}
+
+
+def _processar_lote(lote: List[LinhaVencido], *, banco: str, hoje: date, agora, acumulado: _Acumulado) -> None:
+    """Um lote do arquivo com numero fixo de queries, independente do tamanho do lote."""
+    numeros = {linha.numero for linha in lote}
+    boletos = {b.numero_boleto: b for b in Boleto.objects.filter(numero_boleto__in=numeros)}
+    por_nosso_numero: Dict[str, Boleto] = {}
+    faltantes = numeros - set(boletos)
+    if faltantes:
+        for boleto in Boleto.objects.filter(nosso_numero__in=faltantes).order_by("id"):
+            por_nosso_numero.setdefault(boleto.nosso_numero, boleto)
+    boletos.update({n: b for n, b in por_nosso_numero.items() if n not in boletos})
+
+    sem_boleto = [linha for linha in lote if linha.numero not in boletos]
+    documentos = {linha.documento for linha in sem_boleto if linha.documento}
+    clientes: Dict[str, int] = {}
+    if documentos:
+        clientes = dict(Cliente.objects.filter(documento__in=documentos).values_list("documento", "id"))
+
+    # Ultimo recurso (boleto emitido com outro numero): mesmo cliente, valor e vencimento.
+    por_cliente_valor_vencimento: Dict[tuple, Boleto] = {}
+    vencimentos = {linha.vencimento for linha in sem_boleto if linha.vencimento and linha.documento in clientes}
+    if vencimentos:
+        for boleto in Boleto.objects.filter(
+            cliente_id__in=set(clientes.values()), data_vencimento__in=vencimentos
+        ).order_by("-id"):
+            por_cliente_valor_vencimento.setdefault((boleto.cliente_id, boleto.valor, boleto.data_vencimento), boleto)
+
+    existentes: Dict[int, Boleto] = {}
+    novos: Dict[str, LinhaVencido] = {}
+    for linha in lote:
+        boleto = boletos.get(linha.numero)
+        if boleto is None and linha.documento in clientes and linha.valor is not None and linha.vencimento:
+            boleto = por_cliente_valor_vencimento.get((clientes[linha.documento], linha.valor, linha.vencimento))
+        if boleto is not None:
+            existentes[boleto.pk] = boleto
+        elif linha.numero in novos:
+            continue
+        elif len(linha.numero) > _MAX_NUMERO_BOLETO:
+            acumulado.nao_encontrados.append(_nao_encontrado(linha, "Número do boleto maior que o permitido."))
+        elif linha.documento in clientes or len(linha.documento) in (11, 14):
+            novos[linha.numero] = linha
+        else:
+            acumulado.nao_encontrados.append(
+                _nao_encontrado(linha, "Boleto não encontrado e linha sem CPF/CNPJ válido para cadastrar o cliente.")
+            )
+
+    # Clientes novos: um por documento, com os campos que Cliente.save() calcularia.
+    clientes_novos: Dict[str, Cliente] = {}
+    for linha in novos.values():
+        if linha.documento in clientes or linha.documento in clientes_novos:
+            continue
+        nome = (linha.pagador or f"Cliente {linha.numero}").strip()
+        clientes_novos[linha.documento] = Cliente(
+            nome=nome,
+            nome_normalizado=normalizar_nome(nome),
+            cpf_cnpj=linha.documento,
+            documento=linha.documento,
+            ativo=True,
+        )
+    if clientes_novos:
+        Cliente.objects.bulk_create(clientes_novos.values(), batch_size=TAMANHO_LOTE_VENCIDOS)
+        clientes.update({documento: c.pk for documento, c in clientes_novos.items()})
+        acumulado.clientes_criados += len(clientes_novos)
+
+    # Boleto provisorio para rastrear a necessidade de comprovante.
+    criados = Boleto.objects.bulk_create(
+        [
+            Boleto(
+                cliente_id=clientes[linha.documento],
+                numero_boleto=linha.numero,
+                descricao=f"Importado - {linha.pagador or 'importado'}"[:255],
+                valor=linha.valor or Decimal("0.00"),
+                data_vencimento=linha.vencimento or hoje,
+                status=StatusBoletoChoices.VENCIDO,
+                nosso_numero=linha.numero,
+                banco=banco or Boleto.BancoChoices.OUTRO,
+                necessita_comprovante=True,
+            )
+            for linha in novos.values()
+        ],
+        batch_size=TAMANHO_LOTE_VENCIDOS,
+    )
+
+    historico = []
+    for boleto in existentes.values():
+        if boleto.status != StatusBoletoChoices.VENCIDO:
+            historico.append(
+                HistoricoStatusBoleto(
+                    boleto_id=boleto.pk,
+                    status_anterior=boleto.status,
+                    status_novo=StatusBoletoChoices.VENCIDO,
+                    origem=OrigemHistoricoStatusChoices.IMPORTACAO,
+                )
+            )
+        boleto.status = StatusBoletoChoices.VENCIDO
+        if banco:
+            boleto.banco = banco
+        boleto.atualizado_em = agora
+    Boleto.objects.bulk_update(
+        existentes.values(), ["status", "banco", "atualizado_em"], batch_size=TAMANHO_LOTE_VENCIDOS
+    )
+    HistoricoStatusBoleto.objects.bulk_create(historico, batch_size=TAMANHO_LOTE_VENCIDOS)
+
+    acumulado.linhas += len(lote)
+    acumulado.atualizados.update(existentes)
+    acumulado.criados.update(b.pk for b in criados)
+    acumulado.clientes_afetados.update(b.cliente_id for b in itertools.chain(existentes.values(), criados))
+
+
+@transaction.atomic
+def importar_vencidos(
+    linhas: Iterable[LinhaVencido], *, banco: str = "", tamanho_lote: int = TAMANHO_LOTE_VENCIDOS
+) -> ImportacaoVencidosResult:
+    """
+    Marca como VENCIDO os boletos do arquivo do banco, em lotes:
+    - numero do arquivo casa com numero_boleto e depois com nosso_numero (queries IN)
+    - sem boleto: cliente pelo documento (CPF/CNPJ so digitos) + valor + vencimento
+    - o que sobra vira boleto provisorio VENCIDO com necessita_comprovante
+      (cliente criado pelo CPF/CNPJ quando ainda nao existe)
+    - gravacao com bulk_create/bulk_update; exposicao de credito recalculada uma vez no fim
+    """
+    hoje = timezone.localdate()
+    agora = timezone.now()
+    acumulado = _Acumulado()
+    linhas = iter(linhas)
+    while True:
+        lote = list(itertools.islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        _processar_lote(lote, banco=banco, hoje=hoje, agora=agora, acumulado=acumulado)
+
+    ExposicaoCreditoService.recalcular_clientes(acumulado.clientes_afetados)
+    transaction.on_commit(invalidar_estatisticas_boletos)
+    return ImportacaoVencidosResult(
+        linhas=acumulado.linhas,
+        boletos_atualizados=len(acumulado.atualizados),
+        boletos_criados=len(acumulado.criados),
+        clientes_criados=acumulado.clientes_criados,
+        nao_encontrados=tuple(acumulado.nao_encontrados),
+        boleto_ids=tuple(sorted(acumulado.atualizados | acumulado.criados)),
+    )
+
+
+# ==================== PROCESSAMENTO EM SEGUNDO PLANO ====================
+
+
+def criar_importacao_vencidos(arquivo, *, banco: str = "", usuario=None) -> ImportacaoBoletosVencidos:
+    """Grava o arquivo e agenda o processamento para depois do commit."""
+    importacao = ImportacaoBoletosVencidos.objects.create(
+        arquivo=arquivo,
+        nome_arquivo=getattr(arquivo, "name", "")[:255],
+        banco=banco or "",
+        criado_por=usuario,
+    )
+    transaction.on_commit(lambda: agendar_importacao_vencidos(importacao.pk))
+    return importacao
+
+
+def agendar_importacao_vencidos(importacao_id: int) -> None:
+    """
+    Sem fila de tarefas no deploy: processa em uma thread do proprio processo web.
+    Importacoes que ficarem pendentes (reinicio do servidor) sao retomadas pelo
+    comando processar_importacoes_vencidos.
+    """
+    if not getattr(settings, "BOLETOS_IMPORTACAO_EM_SEGUNDO_PLANO", True):
+        processar_importacao_vencidos(importacao_id)
+        return
+    threading.Thread(
+        target=_processar_em_thread,
+        args=(importacao_id,),
+        name=f"importacao-vencidos-{importacao_id}",
+        daemon=True,
+    ).start()
+
+
+def _processar_em_thread(importacao_id: int) -> None:
+    try:
+        processar_importacao_vencidos(importacao_id)
+    finally:
+        # A thread abriu a propria conexao; nao deixa ela pendurada no banco.
+        connection.close()
+
+
+def processar_importacao_vencidos(importacao_id: int) -> Optional[ImportacaoBoletosVencidos]:
+    """
+    Processa uma importacao PENDENTE e grava o relatorio. Devolve None se ela ja foi
+    assumida por outro processo (o UPDATE condicional garante um unico executor).
+    """
+    assumida = ImportacaoBoletosVencidos.objects.filter(
+        pk=importacao_id, status=StatusImportacaoChoices.PENDENTE
+    ).update(status=StatusImportacaoChoices.PROCESSANDO, iniciado_em=timezone.now())
+    if not assumida:
+        return None
+
+    importacao = ImportacaoBoletosVencidos.objects.get(pk=importacao_id)
+    try:
+        with importacao.arquivo.open("rb") as arquivo:
+            resultado = importar_vencidos(ler_linhas_vencidos(abrir_csv_texto(arquivo)), banco=importacao.banco)
+    except Exception as exc:
+        logger.exception("Falha na importacao de boletos vencidos #%s", importacao_id)
+        importacao.status = StatusImportacaoChoices.ERRO
+        importacao.erro = str(exc) or exc.__class__.__name__
+        importacao.concluido_em = timezone.now()
+        importacao.save(update_fields=["status", "erro", "concluido_em"])
+        return importacao
+
+    importacao.status = StatusImportacaoChoices.CONCLUIDA
+    importacao.linhas = resultado.linhas
+    importacao.boletos_atualizados = resultado.boletos_atualizados
+    importacao.boletos_criados = resultado.boletos_criados
+    importacao.clientes_criados = resultado.clientes_criados
+    importacao.nao_encontrados = len(resultado.nao_encontrados)
+    importacao.relatorio = {
+        "nao_encontrados": list(resultado.nao_encontrados[:LIMITE_NAO_ENCONTRADOS_RELATORIO]),
+        "boleto_ids": list(resultado.boleto_ids),
+    }
+    importacao.concluido_em = timezone.now()
+    importacao.save(
+        update_fields=[
+            "status",
+            "linhas",
+            "boletos_atualizados",
+            "boletos_criados",
+            "clientes_criados",
+            "nao_encontrados",
+            "relatorio",
+            "concluido_em",
+        ]
+    )
+    logger.info(
+        "Importacao de vencidos #%s: %s linhas, %s atualizados, %s criados, %s nao encontrados",
+        importacao_id,
+        resultado.linhas,
+        resultado.boletos_atualizados,
+        resultado.boletos_criados,
+        len(resultado.nao_encontrados),
+    )
+    return importacao
+
+
+def retomar_importacoes_travadas(*, minutos: int = 30) -> int:
+    """
+    Importacoes em PROCESSANDO ha mais de `minutos` voltam a PENDENTE (o processo caiu no meio;
+    a importacao e atomica, entao nada dela foi gravado).
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return ImportacaoBoletosVencidos.objects.filter(
+        status=StatusImportacaoChoices.PROCESSANDO, iniciado_em__lt=limite
+    ).update(status=StatusImportacaoChoices.PENDENTE, iniciado_em=None)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+
+from boletos.models import (
+    Boleto,
+    HistoricoStatusBoleto,
+    OrigemHistoricoStatusChoices,
+    ParcelaBoleto,
+    StatusBoletoChoices,
+    VarreduraVencimentos,
+)
+from boletos.services.estatisticas_service import invalidar_estatisticas_boletos
+from boletos.services.exposicao_service import ExposicaoCreditoService
+from financeiro.models import Recebivel, StatusRecebivelChoices
+
+TAMANHO_LOTE_VARREDURA = 500
+
+STATUS_A_VENCER = (StatusBoletoChoices.ABERTO, StatusBoletoChoices.PENDENTE)
+
+
+@dataclass(frozen=True)
+class VarreduraResult:
+    data_corte: date
+    desde: Optional[date]
+    boletos: int
+    parcelas: int
+    recebiveis: int
+    clientes: int
+
+
+def _janela(qs: QuerySet, campo: str, desde: Optional[date], hoje: date) -> QuerySet:
+    """Vencimentos em [desde, hoje); sem `desde`, todo o passado."""
+    qs = qs.filter(**{f"{campo}__lt": hoje})
+    if desde is not None:
+        qs = qs.filter(**{f"{campo}__gte": desde})
+    return qs
+
+
+def _marcar_vencidos(model, pks: List[int], agora) -> int:
+    """UPDATE em lotes de pk; o filtro de status repetido garante a contagem exata."""
+    campos = {"status": StatusBoletoChoices.VENCIDO}
+    if model is Boleto:
+        campos["atualizado_em"] = agora
+    total = 0
+    for inicio in range(0, len(pks), TAMANHO_LOTE_VARREDURA):
+        total += model.objects.filter(
+            pk__in=pks[inicio:inicio + TAMANHO_LOTE_VARREDURA], status__in=STATUS_A_VENCER
+        ).update(**campos)
+    return total
+
+
+def ultima_data_corte() -> Optional[date]:
+    return VarreduraVencimentos.objects.aggregate(ultima=Max("data_corte"))["ultima"]
+
+
+@transaction.atomic
+def varrer_vencimentos(*, hoje: Optional[date] = None, completa: bool = False) -> VarreduraResult:
+    """
+    Passa a VENCIDO boletos e parcelas ABERTO/PENDENTE com vencimento anterior a hoje,
+    sem janela de datas: status + vencimento (indice status/data_vencimento) ja so pega
+    os recem-vencidos, inclusive lancados/importados/reabertos com vencimento retroativo.
+    - UPDATE por lotes de pk e historico de cada transicao via bulk_create
+    - exposicao recalculada para os clientes com boleto ou parcela vencidos agora e com
+      recebivel de venda que venceu desde a ultima varredura (completa=True: todo o passado)
+    """
+    hoje = hoje or timezone.localdate()
+    agora = timezone.now()
+    desde = None if completa else ultima_data_corte()
+
+    boletos: List[Tuple[int, int, str]] = list(
+        Boleto.objects.select_for_update()
+        .filter(status__in=STATUS_A_VENCER, data_vencimento__lt=hoje)
+        .values_list("id", "cliente_id", "status")
+    )
+    parcelas: List[Tuple[int, int, int, str]] = list(
+        ParcelaBoleto.objects.select_for_update()
+        .filter(status__in=STATUS_A_VENCER, data_vencimento__lt=hoje)
+        .values_list("id", "boleto_id", "boleto__cliente_id", "status")
+    )
+
+    total_boletos = _marcar_vencidos(Boleto, [pk for pk, _, _ in boletos], agora)
+    total_parcelas = _marcar_vencidos(ParcelaBoleto, [pk for pk, _, _, _ in parcelas], agora)
+
+    historico = [
+        HistoricoStatusBoleto(
+            boleto_id=pk,
+            status_anterior=status,
+            status_novo=StatusBoletoChoices.VENCIDO,
+            origem=OrigemHistoricoStatusChoices.VARREDURA,
+        )
+        for pk, _, status in boletos
+    ]
+    historico += [
+        HistoricoStatusBoleto(
+            boleto_id=boleto_id,
+            parcela_id=pk,
+            status_anterior=status,
+            status_novo=StatusBoletoChoices.VENCIDO,
+            origem=OrigemHistoricoStatusChoices.VARREDURA,
+        )
+        for pk, boleto_id, _, status in parcelas
+    ]
+    HistoricoStatusBoleto.objects.bulk_create(historico, batch_size=TAMANHO_LOTE_VARREDURA)
+
+    recebiveis = list(
+        _janela(
+            Recebivel.objects.filter(status=StatusRecebivelChoices.ABERTO, venda_link__isnull=False),
+            "data_prevista",
+            desde,
+            hoje,
+        ).values_list("venda_link__venda__cliente_id", flat=True)
+    )
+    clientes = {cliente_id for _, cliente_id, _ in boletos}
+    clientes.update(cliente_id for _, _, cliente_id, _ in parcelas)
+    clientes.update(c for c in recebiveis if c)
+    ExposicaoCreditoService.recalcular_clientes(clientes)
+    if total_boletos:
+        transaction.on_commit(invalidar_estatisticas_boletos)
+
+    VarreduraVencimentos.objects.create(
+        data_corte=hoje,
+        completa=desde is None,
+        boletos_vencidos=total_boletos,
+        parcelas_vencidas=total_parcelas,
+        recebiveis_vencidos=len(recebiveis),
+        clientes_atualizados=len(clientes),
+    )
+    return VarreduraResult(
+        data_corte=hoje,
+        desde=desde,
+        boletos=total_boletos,
+        parcelas=total_parcelas,
+        recebiveis=len(recebiveis),
+        clientes=len(clientes),
+    )
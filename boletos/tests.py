@@ -0,0 +1,630 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+import zipfile
+from unittest.mock import patch
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from boletos.forms import ClienteForm
+from boletos.models import (
+    Boleto,
+    Cliente,
+    ExposicaoCreditoCliente,
+    HistoricoStatusBoleto,
+    ImportacaoBoletosVencidos,
+    LayoutCnabChoices,
+    OrigemHistoricoStatusChoices,
+    ParcelaBoleto,
+    RemessaBancaria,
+    RetornoBancario,
+    StatusBoletoChoices,
+    StatusImportacaoChoices,
+)
+from boletos.services.boletos_service import BoletoService, ClienteService, ControleFiadoService
+from boletos.services.cnab_service import _registro, gerar_remessa, registrar_retorno
+from boletos.services.estatisticas_service import estatisticas_boletos
+from boletos.services.exportacao_service import gerar_pdf_boletos, linhas_exportacao
+from boletos.services.exposicao_service import ExposicaoCreditoService
+from boletos.services.importacao_vencidos_service import LinhaVencido, importar_vencidos
+from boletos.services.vencimentos_service import varrer_vencimentos
+
+MEDIA_TESTES = tempfile.mkdtemp(prefix="boletos-tests-")
+MEDIA_CNAB = tempfile.mkdtemp(prefix="boletos-cnab-")
+
+
+def _consultas_fora_do_cache(ctx) -> list[str]:
+    """Consultas capturadas sem as do DatabaseCache (leitura/gravacao da tabela de cache)."""
+    return [
+        q["sql"]
+        for q in ctx.captured_queries
+        if "django_cache" not in q["sql"] and "SAVEPOINT" not in q["sql"]
+    ]
+
+
+class ExposicaoCreditoServiceTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin_bol", "admin_bol@example.com", "pass")
+        self.cliente = Cliente.objects.create(nome="Cliente Credito", cpf_cnpj="22233344455")
+
+    def test_boletos_e_fiado_compoem_exposicao(self):
+        hoje = timezone.localdate()
+        BoletoService.criar_boleto(self.cliente, "B-1", "Vencido", Decimal("50.00"), hoje - timedelta(days=10))
+        boleto = BoletoService.criar_boleto(self.cliente, "B-2", "A vencer", Decimal("30.00"), hoje + timedelta(days=5))
+        ControleFiadoService.estabelecer_limite(self.cliente, Decimal("500.00"))
+        ControleFiadoService.adicionar_fiado(self.cliente, Decimal("20.00"))
+
+        exposicao = ExposicaoCreditoService.obter(self.cliente)
+        self.assertEqual(exposicao.valor_boletos_aberto, Decimal("80.00"))
+        self.assertEqual(exposicao.saldo_fiado, Decimal("20.00"))
+        self.assertEqual(exposicao.valor_exposicao_total, Decimal("100.00"))
+        self.assertEqual(exposicao.valor_vencido, Decimal("50.00"))
+        self.assertEqual(exposicao.dias_atraso, 10)
+        self.assertEqual(exposicao.saldo_disponivel, Decimal("400.00"))
+
+        BoletoService.registrar_pagamento(boleto)
+        exposicao.refresh_from_db()
+        self.assertEqual(exposicao.valor_exposicao_total, Decimal("70.00"))
+
+    def test_validar_credito_bloqueia_lista_negra_e_limite(self):
+        ControleFiadoService.estabelecer_limite(self.cliente, Decimal("100.00"))
+        ExposicaoCreditoService.validar_credito(self.cliente, Decimal("100.00"))
+        with self.assertRaisesMessage(ValueError, "Limite de crédito excedido"):
+            ExposicaoCreditoService.validar_credito(self.cliente, Decimal("100.01"))
+
+        ClienteService.adicionar_lista_negra(self.cliente, "inadimplente", self.user)
+        with self.assertRaisesMessage(ValueError, "bloqueado"):
+            ExposicaoCreditoService.validar_credito(self.cliente, Decimal("1.00"))
+        ClienteService.remover_lista_negra(self.cliente)
+        ExposicaoCreditoService.validar_credito(self.cliente, Decimal("1.00"))
+
+    def test_comando_reconstroi_resumos(self):
+        BoletoService.criar_boleto(self.cliente, "B-3", "Aberto", Decimal("40.00"), timezone.localdate())
+        ExposicaoCreditoCliente.objects.all().delete()
+        outro = Cliente.objects.create(nome="Sem Credito", cpf_cnpj="99988877766")
+        ExposicaoCreditoCliente.objects.create(cliente=outro, valor_exposicao_total=Decimal("999.00"))
+
+        out = StringIO()
+        call_command("reconstruir_exposicao_credito", stdout=out)
+        self.assertIn("Exposicoes reconstruidas: 1", out.getvalue())
+        self.assertEqual(
+            ExposicaoCreditoCliente.objects.get(cliente=self.cliente).valor_exposicao_total,
+            Decimal("40.00"),
+        )
+        self.assertFalse(ExposicaoCreditoCliente.objects.filter(cliente=outro).exists())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, BOLETOS_IMPORTACAO_EM_SEGUNDO_PLANO=False)
+class ImportacaoVencidosTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TESTES, ignore_errors=True)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin_imp", "admin_imp@example.com", "pass")
+        self.client.force_login(self.user)
+        self.cliente = Cliente.objects.create(nome="Cliente Mascara", cpf_cnpj="123.456.789-09")
+        self.venc = date(2026, 3, 10)
+        self.por_numero = BoletoService.criar_boleto(self.cliente, "B-10", "Numero", Decimal("10.00"), self.venc)
+        self.por_nosso = BoletoService.criar_boleto(self.cliente, "B-20", "Nosso", Decimal("20.00"), self.venc)
+        Boleto.objects.filter(pk=self.por_nosso.pk).update(nosso_numero="NN-2")
+        self.por_cpf = BoletoService.criar_boleto(self.cliente, "B-30", "Cpf", Decimal("75.50"), self.venc)
+
+    def test_documento_normalizado_e_unico(self):
+        self.assertEqual(self.cliente.documento, "12345678909")
+        form = ClienteForm(data={"nome": "Outro", "cpf_cnpj": "12345678909", "ativo": True})
+        self.assertFalse(form.is_valid())
+        self.assertIn("cpf_cnpj", form.errors)
+
+    def test_duplicado_legado_sem_documento_continua_editavel(self):
+        # Como a migracao 0009 deixa o cadastro repetido mais novo: mesmo numero, sem documento.
+        legado = Cliente.objects.create(nome="Cliente Legado", cpf_cnpj="999.999.999-99")
+        Cliente.objects.filter(pk=legado.pk).update(cpf_cnpj="12345678909", documento="")
+        legado.refresh_from_db()
+
+        legado.telefone = "11999999999"
+        legado.save()
+        legado.refresh_from_db()
+        self.assertEqual(legado.documento, "")
+
+        form = ClienteForm(
+            instance=legado, data={"nome": "Cliente Legado Editado", "cpf_cnpj": "12345678909", "ativo": True}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Cliente.objects.get(pk=legado.pk).nome, "Cliente Legado Editado")
+
+        # Trocar para um numero livre grava o documento normalmente.
+        form = ClienteForm(instance=legado, data={"nome": "Cliente Legado", "cpf_cnpj": "111.444.777-35", "ativo": True})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().documento, "11144477735")
+
+    def test_upload_processa_em_lote_e_grava_relatorio(self):
+        csv_texto = (
+            "Nosso_Numero;CPF_CNPJ;Pagador;Valor;Vencimento\n"
+            "B-10;;Cliente Mascara;10,00;10/03/2026\n"
+            "NN-2;;Cliente Mascara;20,00;10/03/2026\n"
+            "X-99;123.456.789-09;Cliente Mascara;75,50;10/03/2026\n"
+            "NOVO-1;987.654.321-00;Fulano de Tal;1.234,56;01/02/2026\n"
+            "NOVO-2;98765432100;Fulano de Tal;5,00;02/02/2026\n"
+            "NOVO-1;987.654.321-00;Fulano de Tal;1.234,56;01/02/2026\n"
+            "SEM-DOC;;Sem Documento;9,00;01/02/2026\n"
+            ";;Linha sem numero;1,00;01/02/2026\n"
+        )
+        arquivo = SimpleUploadedFile("vencidos.csv", csv_texto.encode("latin-1"), content_type="text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("boletos:boleto_import_vencidos"), {"arquivo": arquivo, "banco": "SICREDI"}
+            )
+
+        importacao = ImportacaoBoletosVencidos.objects.get()
+        self.assertRedirects(response, reverse("boletos:importacao_vencidos_detail", args=[importacao.pk]))
+        self.assertEqual(importacao.status, StatusImportacaoChoices.CONCLUIDA)
+        self.assertEqual(importacao.linhas, 7)
+        self.assertEqual(importacao.boletos_atualizados, 3)
+        self.assertEqual(importacao.boletos_criados, 2)
+        self.assertEqual(importacao.clientes_criados, 1)
+        self.assertEqual(importacao.nao_encontrados, 1)
+        self.assertEqual(importacao.relatorio["nao_encontrados"][0]["numero"], "SEM-DOC")
+
+        for boleto in (self.por_numero, self.por_nosso, self.por_cpf):
+            boleto.refresh_from_db()
+            self.assertEqual(boleto.status, StatusBoletoChoices.VENCIDO)
+            self.assertEqual(boleto.banco, Boleto.BancoChoices.SICREDI)
+        self.assertEqual(
+            HistoricoStatusBoleto.objects.filter(origem=OrigemHistoricoStatusChoices.IMPORTACAO).count(), 3
+        )
+
+        novo = Cliente.objects.get(documento="98765432100")
+        self.assertEqual(novo.nome_normalizado, "FULANO DE TAL")
+        criado = Boleto.objects.get(numero_boleto="NOVO-1")
+        self.assertEqual(criado.cliente, novo)
+        self.assertEqual(criado.valor, Decimal("1234.56"))
+        self.assertTrue(criado.necessita_comprovante)
+        self.assertEqual(ExposicaoCreditoCliente.objects.get(cliente=novo).valor_vencido, Decimal("1239.56"))
+
+        detalhe = self.client.get(response["Location"])
+        self.assertContains(detalhe, "SEM-DOC")
+        self.assertContains(detalhe, "NOVO-2")
+
+    def test_consultas_nao_crescem_com_o_arquivo(self):
+        def linhas(prefixo, inicio, quantidade):
+            return [
+                LinhaVencido(i, f"{prefixo}-{i}", f"{i:011d}", f"Pagador {i}", Decimal("10.00"), self.venc)
+                for i in range(inicio, inicio + quantidade)
+            ]
+
+        with CaptureQueriesContext(connection) as poucas:
+            importar_vencidos(linhas("A", 1, 3) + [LinhaVencido(99, "B-20", "", "", None, None)])
+        with CaptureQueriesContext(connection) as muitas:
+            importar_vencidos(linhas("B", 1001, 40) + [LinhaVencido(99, "B-10", "", "", None, None)])
+        self.assertEqual(len(poucas), len(muitas))
+        self.assertEqual(Boleto.objects.filter(numero_boleto__startswith="B-").count(), 43)
+
+    def test_comando_processa_pendentes_e_retoma_travadas(self):
+        conteudo = ContentFile(b"numero;cpf;valor;vencimento\nB-10;;10.00;2026-03-10\n", name="pendente.csv")
+        pendente = ImportacaoBoletosVencidos.objects.create(arquivo=conteudo)
+        travada = ImportacaoBoletosVencidos.objects.create(
+            arquivo=ContentFile(b"numero\nNN-2\n", name="travada.csv"),
+            status=StatusImportacaoChoices.PROCESSANDO,
+            iniciado_em=timezone.now() - timedelta(hours=2),
+        )
+
+        out = StringIO()
+        call_command("processar_importacoes_vencidos", stdout=out)
+        self.assertIn("Importacoes processadas: 2", out.getvalue())
+        pendente.refresh_from_db()
+        travada.refresh_from_db()
+        self.assertEqual(pendente.status, StatusImportacaoChoices.CONCLUIDA)
+        self.assertEqual(travada.status, StatusImportacaoChoices.CONCLUIDA)
+        self.por_nosso.refresh_from_db()
+        self.assertEqual(self.por_nosso.status, StatusBoletoChoices.VENCIDO)
+
+
+class VarreduraVencimentosTest(TestCase):
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        self.cliente = Cliente.objects.create(nome="Cliente Atraso", cpf_cnpj="55566677788")
+        criar = BoletoService.criar_boleto
+        self.vencido_aberto = criar(self.cliente, "V-1", "Aberto", Decimal("10.00"), self.hoje - timedelta(days=5))
+        self.vencido_pendente = criar(self.cliente, "V-2", "Pendente", Decimal("20.00"), self.hoje - timedelta(days=1))
+        Boleto.objects.filter(pk=self.vencido_pendente.pk).update(status=StatusBoletoChoices.PENDENTE)
+        self.a_vencer = criar(self.cliente, "V-3", "A vencer", Decimal("30.00"), self.hoje + timedelta(days=3))
+        self.pago = criar(self.cliente, "V-4", "Pago", Decimal("40.00"), self.hoje - timedelta(days=10))
+        BoletoService.registrar_pagamento(self.pago)
+        self.parcela = ParcelaBoleto.objects.create(
+            boleto=self.a_vencer, numero_parcela=1, valor=Decimal("15.00"), data_vencimento=self.hoje - timedelta(days=2)
+        )
+
+    def test_varredura_conta_exato_e_grava_historico(self):
+        self.assertEqual(BoletoService.verificar_vencimentos_em_atraso(), 2)
+
+        status = dict(Boleto.objects.values_list("numero_boleto", "status"))
+        self.assertEqual(status["V-1"], StatusBoletoChoices.VENCIDO)
+        self.assertEqual(status["V-2"], StatusBoletoChoices.VENCIDO)
+        self.assertEqual(status["V-3"], StatusBoletoChoices.ABERTO)
+        self.assertEqual(status["V-4"], StatusBoletoChoices.PAGO)
+        self.parcela.refresh_from_db()
+        self.assertEqual(self.parcela.status, StatusBoletoChoices.VENCIDO)
+
+        historico = HistoricoStatusBoleto.objects.filter(origem=OrigemHistoricoStatusChoices.VARREDURA)
+        self.assertEqual(historico.count(), 3)
+        self.assertTrue(
+            historico.filter(
+                boleto=self.vencido_pendente, parcela__isnull=True, status_anterior=StatusBoletoChoices.PENDENTE
+            ).exists()
+        )
+        self.assertTrue(historico.filter(parcela=self.parcela).exists())
+        exposicao = ExposicaoCreditoCliente.objects.get(cliente=self.cliente)
+        self.assertEqual(exposicao.valor_vencido, Decimal("30.00"))
+
+    def test_retroativo_vence_na_varredura_diaria(self):
+        varrer_vencimentos(hoje=self.hoje)
+        retroativo = BoletoService.criar_boleto(
+            self.cliente, "V-5", "Lancado depois", Decimal("5.00"), self.hoje - timedelta(days=30)
+        )
+
+        seguinte = varrer_vencimentos(hoje=self.hoje + timedelta(days=4))
+        self.assertEqual(seguinte.desde, self.hoje)
+        self.assertEqual(seguinte.boletos, 2)
+        self.a_vencer.refresh_from_db()
+        self.assertEqual(self.a_vencer.status, StatusBoletoChoices.VENCIDO)
+        retroativo.refresh_from_db()
+        self.assertEqual(retroativo.status, StatusBoletoChoices.VENCIDO)
+        exposicao = ExposicaoCreditoCliente.objects.get(cliente=self.cliente)
+        self.assertEqual(exposicao.valor_vencido, Decimal("65.00"))
+
+        out = StringIO()
+        call_command("varrer_vencimentos", "--completa", stdout=out)
+        self.assertIn("boletos vencidos: 0", out.getvalue())
+
+
+class EstatisticasBoletosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_superuser("admin_est", "admin_est@example.com", "pass")
+        self.cliente = Cliente.objects.create(nome="Joao da Silva", cpf_cnpj="111.222.333-44")
+        Cliente.objects.create(nome="Maria Souza", cpf_cnpj="55.666.777/0001-88")
+        venc = timezone.localdate()
+        BoletoService.criar_boleto(self.cliente, "E-1", "Aberto", Decimal("10.00"), venc)
+        vencido = BoletoService.criar_boleto(self.cliente, "E-2", "Vencido", Decimal("25.00"), venc)
+        Boleto.objects.filter(pk=vencido.pk).update(status=StatusBoletoChoices.VENCIDO, banco=Boleto.BancoChoices.BRASIL)
+
+    def test_estatisticas_em_uma_query_e_invalidadas_na_gravacao(self):
+        with CaptureQueriesContext(connection) as ctx:
+            stats = estatisticas_boletos()
+        self.assertEqual(len(_consultas_fora_do_cache(ctx)), 1)
+        self.assertEqual(stats["total_abertos"], 1)
+        self.assertEqual(stats["total_vencidos"], 1)
+        self.assertEqual(stats["valor_total_aberto"], Decimal("10.00"))
+        self.assertEqual(stats["vencidos_por_banco"][Boleto.BancoChoices.BRASIL], Decimal("25.00"))
+        self.assertEqual(stats["vencidos_por_banco"][Boleto.BancoChoices.SICREDI], Decimal("0.00"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            estatisticas_boletos()
+        self.assertEqual(_consultas_fora_do_cache(ctx), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BoletoService.criar_boleto(self.cliente, "E-3", "Novo", Decimal("5.00"), timezone.localdate())
+        stats = estatisticas_boletos()
+        self.assertEqual(stats["total_abertos"], 2)
+        self.assertEqual(stats["valor_total_aberto"], Decimal("15.00"))
+
+    def test_autocomplete_por_nome_e_documento(self):
+        self.client.force_login(self.user)
+        url = reverse("boletos:cliente_autocomplete")
+
+        resp = self.client.get(url, {"q": "joão"})
+        self.assertEqual([c["nome"] for c in resp.json()["results"]], ["Joao da Silva"])
+
+        # Sobrenome (trecho do meio do nome) tambem encontra.
+        resp = self.client.get(url, {"q": "silva"})
+        self.assertEqual([c["nome"] for c in resp.json()["results"]], ["Joao da Silva"])
+
+        resp = self.client.get(url, {"q": "55.666"})
+        self.assertEqual([c["nome"] for c in resp.json()["results"]], ["Maria Souza"])
+
+        resp = self.client.get(url, {"q": "j"})
+        self.assertEqual(resp.json()["results"], [])
+
+        resp = self.client.get(reverse("boletos:boleto_list"), {"cliente": self.cliente.pk})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["cliente_filtro"], self.cliente)
+        self.assertEqual(len(resp.context["boletos"]), 2)
+
+
+class ExportacaoBoletosTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin_exp", "admin_exp@example.com", "pass")
+        self.client.force_login(self.user)
+        cliente = Cliente.objects.create(nome="Cliente Export & Cia", cpf_cnpj="10120230344")
+        venc = date(2026, 5, 1)
+        for i in range(120):
+            BoletoService.criar_boleto(cliente, f"X-{i:03d}", "Export", Decimal("10.00"), venc + timedelta(days=i))
+        Boleto.objects.filter(numero_boleto__in=["X-000", "X-001"]).update(
+            status=StatusBoletoChoices.PAGO, necessita_comprovante=True
+        )
+
+    def test_csv_e_xlsx_em_streaming_com_filtros_da_listagem(self):
+        url = reverse("boletos:boleto_export", args=["csv"])
+        resp = self.client.get(url, {"status": StatusBoletoChoices.ABERTO})
+        self.assertTrue(resp.streaming)
+        linhas = b"".join(resp.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(linhas), 119)
+        self.assertTrue(linhas[0].startswith("numero_boleto,nosso_numero,cliente"))
+        self.assertTrue(linhas[1].startswith("X-002,,Cliente Export & Cia,10120230344,10.00,2026-05-03"))
+
+        resp = self.client.get(reverse("boletos:boleto_export", args=["xlsx"]), {"status": StatusBoletoChoices.PAGO})
+        self.assertTrue(resp.streaming)
+        with zipfile.ZipFile(BytesIO(b"".join(resp.streaming_content))) as arquivo:
+            planilha = arquivo.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertEqual(planilha.count("<row>"), 3)
+        self.assertIn("Cliente Export &amp; Cia", planilha)
+        self.assertIn("<c><v>10.00</v></c>", planilha)
+
+        resp = self.client.get(reverse("boletos:boleto_export_necessita_comprovante"))
+        self.assertEqual(len(b"".join(resp.streaming_content).splitlines()), 3)
+        self.assertEqual(self.client.get(reverse("boletos:boleto_export", args=["doc"])).status_code, 404)
+
+    def test_pdf_paginado(self):
+        from pypdf import PdfReader
+
+        resp = self.client.get(reverse("boletos:boleto_export", args=["pdf"]))
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        conteudo = b"".join(resp.streaming_content)
+        leitor = PdfReader(BytesIO(conteudo))
+        self.assertGreater(len(leitor.pages), 1)
+        self.assertIn("X-000", leitor.pages[0].extract_text())
+        self.assertIn("Total de boletos: 120", leitor.pages[-1].extract_text())
+
+    def test_pdf_acima_do_limite_volta_para_listagem(self):
+        with patch("boletos.views.PDF_MAX_LINHAS", 100):
+            resp = self.client.get(reverse("boletos:boleto_export", args=["pdf"]), {"banco": ""})
+        self.assertRedirects(resp, reverse("boletos:boleto_list") + "?banco=", fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse("boletos:boleto_export", args=["csv"])).status_code, 200)
+
+        with self.assertRaises(ValueError):
+            gerar_pdf_boletos(linhas_exportacao(Boleto.objects.all()), titulo="Boletos", max_linhas=100)
+
+
+class ClienteResumoBoletosTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin_cli", "admin_cli@example.com", "pass")
+        self.client.force_login(self.user)
+        self.hoje = timezone.localdate()
+        self.cliente = Cliente.objects.create(nome="Ana Paula Lima", cpf_cnpj="321.654.987-00")
+        criar = BoletoService.criar_boleto
+        for i in range(25):
+            criar(self.cliente, f"C-{i:02d}", "Historico", Decimal("10.00"), self.hoje + timedelta(days=i + 1))
+        criar(self.cliente, "C-VENC", "Vencido", Decimal("7.50"), self.hoje - timedelta(days=3))
+        pago = criar(self.cliente, "C-PAGO", "Pago", Decimal("99.00"), self.hoje - timedelta(days=20))
+        BoletoService.registrar_pagamento(pago, data_pagamento=self.hoje - timedelta(days=2))
+        ClienteService.adicionar_lista_negra(self.cliente, "atraso", self.user)
+        for i in range(5):
+            outro = Cliente.objects.create(nome=f"Outro {i}", cpf_cnpj=f"0000000000{i}")
+            criar(outro, f"O-{i}", "Outro", Decimal("1.00"), self.hoje)
+
+    def test_resumo_anotado_em_sql(self):
+        cliente = ClienteService.com_resumo_boletos().get(pk=self.cliente.pk)
+        self.assertEqual(cliente.qtd_boletos, 27)
+        self.assertEqual(cliente.qtd_aberto, 26)
+        self.assertEqual(cliente.valor_aberto, Decimal("257.50"))
+        self.assertEqual(cliente.valor_vencido, Decimal("7.50"))
+        self.assertEqual(cliente.ultimo_pagamento, self.hoje - timedelta(days=2))
+        self.assertTrue(cliente.em_lista_negra)
+
+    def test_listagem_e_detalhe_sem_carregar_boletos(self):
+        url = reverse("boletos:cliente_list")
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(any('FROM "boletos_boleto"' in q["sql"] for q in ctx.captured_queries))
+        self.assertContains(resp, "257,50")
+
+        resp = self.client.get(url, {"search": "ana paula"})
+        self.assertEqual([c.pk for c in resp.context["clientes"]], [self.cliente.pk])
+        resp = self.client.get(url, {"search": "321.654"})
+        self.assertEqual([c.pk for c in resp.context["clientes"]], [self.cliente.pk])
+
+        detalhe = reverse("boletos:cliente_detail", args=[self.cliente.pk])
+        resp = self.client.get(detalhe, {"page_size": 20})
+        self.assertEqual(len(resp.context["boletos"]), 20)
+        self.assertEqual(resp.context["boletos_page"].paginator.count, 27)
+        self.assertEqual(resp.context["total_em_aberto"], Decimal("257.50"))
+        self.assertTrue(resp.context["em_lista_negra"])
+        resp = self.client.get(detalhe, {"page_size": 20, "page": 2})
+        self.assertEqual(len(resp.context["boletos"]), 7)
+
+
+def _retorno_240(detalhes):
+    """Arquivo CNAB 240 do BB: (codigo, nosso_numero, uso_empresa, valor_pago, tarifa, data DDMMAAAA)."""
+    linhas = [_registro(240, {1: "001", 8: "0", 143: "2"}), _registro(240, {1: "001", 8: "1", 9: "T"})]
+    for i, (codigo, nosso, uso, pago, tarifa, data) in enumerate(detalhes):
+        linhas.append(_registro(240, {
+            1: "001", 8: "3", 9: f"{2 * i + 1:05d}", 14: "T", 16: codigo, 38: nosso.ljust(20),
+            82: "000000000001000", 106: uso.ljust(25), 199: f"{tarifa:015d}",
+        }))
+        linhas.append(_registro(240, {
+            1: "001", 8: "3", 9: f"{2 * i + 2:05d}", 14: "U", 16: codigo, 18: "000000000000050",
+            78: f"{pago:015d}", 138: data, 146: data,
+        }))
+    linhas.append(_registro(240, {1: "001", 8: "9"}))
+    return ("\r\n".join(linhas) + "\r\n").encode("latin-1")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_CNAB)
+class CnabRetornoRemessaTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_CNAB, ignore_errors=True)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser("admin_cnab", "admin_cnab@example.com", "pass")
+        self.client.force_login(self.user)
+        self.cliente = Cliente.objects.create(nome="Cliente Cobranca", cpf_cnpj="11.222.333/0001-81")
+        criar = BoletoService.criar_boleto
+        venc = date(2026, 6, 10)
+        self.por_nosso = criar(self.cliente, "R-1", "Nosso", Decimal("10.00"), venc)
+        self.por_numero = criar(self.cliente, "R-2", "Numero", Decimal("10.00"), venc)
+        self.pago = criar(self.cliente, "R-3", "Pago", Decimal("10.00"), venc)
+        self.baixado = criar(self.cliente, "R-4", "Baixa", Decimal("10.00"), venc)
+        Boleto.objects.filter(pk=self.por_nosso.pk).update(nosso_numero="12345", banco=Boleto.BancoChoices.BRASIL)
+        BoletoService.registrar_pagamento(self.pago)
+        Boleto.objects.filter(pk=self.pago.pk).update(nosso_numero="777")
+
+    def test_retorno_240_liquida_em_lote_e_recusa_reenvio(self):
+        conteudo = _retorno_240([
+            ("06", "00000000000000012345", "", 1050, 180, "12062026"),
+            ("06", "", "R-2", 1000, 180, "11062026"),
+            ("06", "777", "", 1000, 180, "11062026"),
+            ("06", "99999", "", 1000, 180, "11062026"),
+            ("09", "", "R-4", 0, 0, "11062026"),
+        ])
+        url = reverse("boletos:cnab")
+        resp = self.client.post(url, {"arquivo": SimpleUploadedFile("ret.ret", conteudo)})
+        retorno = RetornoBancario.objects.get()
+        self.assertRedirects(resp, reverse("boletos:retorno_detail", args=[retorno.pk]))
+        self.assertEqual(retorno.status, StatusImportacaoChoices.CONCLUIDA)
+        self.assertEqual((retorno.layout, retorno.banco), (LayoutCnabChoices.CNAB240, Boleto.BancoChoices.BRASIL))
+        self.assertEqual(
+            (retorno.registros, retorno.liquidados, retorno.ja_liquidados, retorno.nao_encontrados, retorno.baixados),
+            (5, 2, 1, 1, 1),
+        )
+        self.assertEqual(retorno.valor_pago_total, Decimal("20.50"))
+        self.assertEqual(retorno.valor_tarifas_total, Decimal("3.60"))
+
+        self.por_nosso.refresh_from_db()
+        self.assertEqual(self.por_nosso.status, StatusBoletoChoices.PAGO)
+        self.assertEqual(self.por_nosso.data_pagamento, date(2026, 6, 12))
+        self.assertEqual(self.por_nosso.valor_pago, Decimal("10.50"))
+        self.assertEqual(self.por_nosso.valor_tarifa, Decimal("1.80"))
+        self.por_numero.refresh_from_db()
+        self.assertEqual(self.por_numero.status, StatusBoletoChoices.PAGO)
+        self.baixado.refresh_from_db()
+        self.assertEqual(self.baixado.status, StatusBoletoChoices.ABERTO)
+        self.assertEqual(
+            HistoricoStatusBoleto.objects.filter(origem=OrigemHistoricoStatusChoices.RETORNO).count(), 2
+        )
+        self.assertEqual(ExposicaoCreditoCliente.objects.get(cliente=self.cliente).valor_boletos_aberto, Decimal("10.00"))
+        resp = self.client.get(reverse("boletos:retorno_detail", args=[retorno.pk]))
+        self.assertContains(resp, "99999")
+
+        # Com boleto nao encontrado o reenvio reprocessa o mesmo registro depois do cadastro.
+        faltante = BoletoService.criar_boleto(self.cliente, "R-5", "Faltante", Decimal("10.00"), date(2026, 6, 10))
+        Boleto.objects.filter(pk=faltante.pk).update(nosso_numero="99999", banco=Boleto.BancoChoices.BRASIL)
+        resp = self.client.post(url, {"arquivo": SimpleUploadedFile("copia.ret", conteudo)})
+        self.assertRedirects(resp, reverse("boletos:retorno_detail", args=[retorno.pk]))
+        retorno.refresh_from_db()
+        self.assertEqual((retorno.liquidados, retorno.ja_liquidados, retorno.nao_encontrados), (1, 3, 0))
+        self.assertEqual(
+            retorno.relatorio["boleto_ids"], sorted([self.por_nosso.pk, self.por_numero.pk, faltante.pk])
+        )
+        faltante.refresh_from_db()
+        self.assertEqual(faltante.status, StatusBoletoChoices.PAGO)
+
+        resp = self.client.post(url, {"arquivo": SimpleUploadedFile("copia.ret", conteudo)}, follow=True)
+        self.assertContains(resp, "já foi processado")
+        self.assertEqual(RetornoBancario.objects.count(), 1)
+
+    def test_retorno_com_falha_fica_em_erro_e_pode_ser_reprocessado(self):
+        conteudo = _retorno_240([("06", "00000000000000012345", "", 1000, 0, "12062026")])
+        with patch(
+            "boletos.services.cnab_service.liquidar_retorno", side_effect=RuntimeError("conexao perdida")
+        ), self.assertLogs("boletos.services.cnab_service", "ERROR"):
+            retorno = registrar_retorno(SimpleUploadedFile("ret.ret", conteudo))
+        retorno.refresh_from_db()
+        self.assertEqual((retorno.status, retorno.erro), (StatusImportacaoChoices.ERRO, "conexao perdida"))
+
+        reprocessado = registrar_retorno(SimpleUploadedFile("ret.ret", conteudo))
+        self.assertEqual(reprocessado.pk, retorno.pk)
+        self.assertEqual((reprocessado.status, reprocessado.erro), (StatusImportacaoChoices.CONCLUIDA, ""))
+        self.assertEqual(reprocessado.liquidados, 1)
+        self.assertEqual(RetornoBancario.objects.count(), 1)
+
+    def test_retorno_nao_liquida_boleto_de_outro_banco(self):
+        Boleto.objects.filter(pk=self.por_nosso.pk).update(banco=Boleto.BancoChoices.SICREDI)
+        retorno = registrar_retorno(
+            SimpleUploadedFile("ret.ret", _retorno_240([("06", "00000000000000012345", "", 1000, 0, "12062026")]))
+        )
+        self.assertEqual((retorno.liquidados, retorno.nao_encontrados), (0, 1))
+        self.por_nosso.refresh_from_db()
+        self.assertEqual(self.por_nosso.status, StatusBoletoChoices.ABERTO)
+
+    def test_retorno_400_bb_pelo_comando(self):
+        Boleto.objects.filter(pk=self.por_numero.pk).update(nosso_numero="1234567" + "0000000042")
+        linhas = [
+            _registro(400, {1: "0", 2: "2", 77: "001"}),
+            _registro(400, {
+                1: "7", 64: "12345670000000042", 109: "06", 111: "150626", 153: "0000000001000",
+                182: "0000195", 254: "0000000001000",
+            }),
+            _registro(400, {1: "9"}),
+        ]
+        caminho = Path(MEDIA_CNAB) / "retorno_bb.txt"
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_bytes("\n".join(linhas).encode("latin-1"))
+
+        out = StringIO()
+        call_command("processar_retorno_cnab", str(caminho), stdout=out)
+        self.assertIn("liquidados: 1", out.getvalue())
+        self.por_numero.refresh_from_db()
+        self.assertEqual(self.por_numero.status, StatusBoletoChoices.PAGO)
+        self.assertEqual(self.por_numero.data_pagamento, date(2026, 6, 15))
+        self.assertEqual(self.por_numero.valor_tarifa, Decimal("1.95"))
+
+    def test_retorno_400_nao_casa_numero_documento_truncado(self):
+        # numero_documento do 400 leva so 10 caracteres: "R-LONGO-00" e o prefixo do longo, nao o curto.
+        longo = BoletoService.criar_boleto(self.cliente, "R-LONGO-0001-X", "Longo", Decimal("10.00"), date(2026, 6, 10))
+        curto = BoletoService.criar_boleto(self.cliente, "R-LONGO-00", "Curto", Decimal("10.00"), date(2026, 6, 10))
+        Boleto.objects.filter(pk=longo.pk).update(nosso_numero="1234567" + "0000000099")
+        conteudo = "\n".join([
+            _registro(400, {1: "0", 2: "2", 77: "001"}),
+            _registro(400, {
+                1: "7", 64: "12345670000000099", 109: "06", 111: "150626", 117: "R-LONGO-00",
+                153: "0000000001000", 254: "0000000001000",
+            }),
+            _registro(400, {1: "9"}),
+        ]).encode("latin-1")
+
+        retorno = registrar_retorno(SimpleUploadedFile("ret400.txt", conteudo))
+        self.assertEqual(retorno.liquidados, 1)
+        self.assertEqual(retorno.relatorio["boleto_ids"], [longo.pk])
+        curto.refresh_from_db()
+        self.assertEqual(curto.status, StatusBoletoChoices.ABERTO)
+
+    def test_remessa_registra_boletos_novos(self):
+        Boleto.objects.filter(pk__in=[self.por_numero.pk, self.baixado.pk]).update(banco=Boleto.BancoChoices.BRASIL)
+        resp = self.client.post(reverse("boletos:remessa_gerar"), {"banco": "BRASIL", "layout": "CNAB240"})
+        self.assertRedirects(resp, reverse("boletos:cnab"))
+
+        remessa = RemessaBancaria.objects.get()
+        self.assertEqual((remessa.sequencial, remessa.quantidade), (1, 3))
+        with remessa.arquivo.open("rb") as fh:
+            linhas = fh.read().decode("latin-1").splitlines()
+        self.assertTrue(all(len(linha) == 240 for linha in linhas))
+        self.assertEqual(len(linhas), 2 + 3 * 2 + 2)
+        self.por_numero.refresh_from_db()
+        self.assertEqual(self.por_numero.remessa, remessa)
+        self.assertEqual(self.por_numero.nosso_numero, str(self.por_numero.pk).zfill(10))
+        self.assertIn(self.por_numero.nosso_numero, linhas[4])
+
+        with self.assertRaisesMessage(ValueError, "Nenhum boleto novo"):
+            gerar_remessa(Boleto.BancoChoices.BRASIL)
+        resp = self.client.get(reverse("boletos:remessa_download", args=[remessa.pk]))
+        self.assertEqual(b"".join(resp.streaming_content).count(b"\r\n"), 10)
@@ -7,6 +7,7 @@ from boletos.views import (
     BoletoUpdateView,
     BoletoRegistrarPagamentoView,
     ClienteListView,
+    ClienteAutocompleteView,
     ClienteDetailView,
     ClienteCreateView,
     ClienteUpdateView,
@@ -17,6 +18,12 @@ from boletos.views import (
     ControleFiadoUpdateView,
     ControleFiadoListView,
     BoletoImportVencidosView,
+    ImportacaoVencidosDetailView,
+    CnabView,
+    RetornoBancarioDetailView,
+    RemessaGerarView,
+    RemessaDownloadView,
+    BoletoExportView,
     BoletoExportComprovantesView,
     BoletoExportPDFView,
 )
@@ -36,6 +43,7 @@ urlpatterns = [
     ),
     # Clientes
     path("clientes/", ClienteListView.as_view(), name="cliente_list"),
+    path("clientes/autocomplete/", ClienteAutocompleteView.as_view(), name="cliente_autocomplete"),
     path("cliente/<int:pk>/", ClienteDetailView.as_view(), name="cliente_detail"),
     path("cliente/novo/", ClienteCreateView.as_view(), name="cliente_create"),
     path("cliente/<int:pk>/editar/", ClienteUpdateView.as_view(), name="cliente_update"),
@@ -59,6 +67,17 @@ urlpatterns = [
         BoletoImportVencidosView.as_view(),
         name="boleto_import_vencidos",
     ),
+    path(
+        "importar-vencidos/<int:pk>/",
+        ImportacaoVencidosDetailView.as_view(),
+        name="importacao_vencidos_detail",
+    ),
+    path("exportar/<str:formato>/", BoletoExportView.as_view(), name="boleto_export"),
+    # CNAB: retorno (liquidacao) e remessa
+    path("cnab/", CnabView.as_view(), name="cnab"),
+    path("cnab/retorno/<int:pk>/", RetornoBancarioDetailView.as_view(), name="retorno_detail"),
+    path("cnab/remessa/gerar/", RemessaGerarView.as_view(), name="remessa_gerar"),
+    path("cnab/remessa/<int:pk>/download/", RemessaDownloadView.as_view(), name="remessa_download"),
     path("export-necessita-comprovante/", BoletoExportComprovantesView.as_view(), name="boleto_export_necessita_comprovante"),
     path("export-necessita-comprovante/pdf/", BoletoExportPDFView.as_view(), name="boleto_export_necessita_comprovante_pdf"),
     # Controle de Fiado
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import os
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Sum
+from django.core.paginator import Paginator
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views import View
@@ -15,13 +17,18 @@ from boletos.forms import (
     ClienteListaNegraForm,
     ControleFiadoForm,
     ParcelaBoletoFormSet,
+    RemessaBancariaForm,
+    RetornoBancarioForm,
 )
 from boletos.models import (
     Boleto,
     Cliente,
     ClienteListaNegra,
     ControleFiado,
+    ImportacaoBoletosVencidos,
     RamoAtuacao,
+    RemessaBancaria,
+    RetornoBancario,
     StatusBoletoChoices,
 )
 from boletos.services.boletos_service import (
@@ -29,19 +36,24 @@ from boletos.services.boletos_service import (
     ClienteService,
     ControleFiadoService,
 )
+from boletos.services.cnab_service import gerar_remessa, registrar_retorno
+from boletos.services.estatisticas_service import invalidar_estatisticas_boletos
+from boletos.services.exportacao_service import (
+    CABECALHO_EXPORTACAO,
+    PDF_MAX_LINHAS,
+    filtrar_boletos,
+    gerar_pdf_boletos,
+    linhas_exportacao,
+)
+from boletos.services.exposicao_service import ExposicaoCreditoService
+from boletos.services.importacao_vencidos_service import criar_importacao_vencidos
+from core.services.exportacao import csv_em_streaming, xlsx_em_streaming
 from core.services.paginacao import get_pagination_params
 from core.services.permissoes import GroupRequiredMixin
 from boletos.forms import ImportVencidosForm
-import csv
-import io
-import re
-from decimal import Decimal, InvalidOperation
-from datetime import datetime
 from django.views.generic.edit import FormView
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.views import View
-from django.template.loader import render_to_string
 
 
 class BoletoAccessMixin(GroupRequiredMixin):
@@ -65,229 +77,212 @@ class BoletoListView(BoletoAccessMixin, ListView):
         qs = Boleto.objects.select_related("cliente", "vendedor").order_by(
             "-data_vencimento", "-id"
         )
-
-        # Filtros
-        status = self.request.GET.get("status", "").strip()
-        cliente_id = self.request.GET.get("cliente", "").strip()
-        vendedor_id = self.request.GET.get("vendedor", "").strip()
-
-        if status:
-            qs = qs.filter(status=status)
-        if cliente_id:
-            qs = qs.filter(cliente_id=cliente_id)
-        if vendedor_id:
-            qs = qs.filter(vendedor_id=vendedor_id)
-
-        # Filtrar apenas boletos marcados como necessitam de comprovante
-        necessita = self.request.GET.get("necessita_comprovante", "").lower()
-        if necessita in ("1", "true", "on"):
-            qs = qs.filter(necessita_comprovante=True)
-
-        return qs
+        return filtrar_boletos(qs, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["status_choices"] = StatusBoletoChoices.choices
-        context["clientes"] = Cliente.objects.filter(ativo=True)
-        context["stats"] = BoletoService.obter_estatisticas()
-        # Totais por banco para boletos vencidos
-        vencidos_qs = Boleto.objects.filter(status=StatusBoletoChoices.VENCIDO)
-        totals = (
-            vencidos_qs.values("banco")
-            .annotate(total_valor=Sum("valor"))
-            .order_by("banco")
+        # Cliente do filtro e escolhido pelo autocomplete; so o selecionado e carregado.
+        cliente_id = self.request.GET.get("cliente", "").strip()
+        context["cliente_filtro"] = (
+            Cliente.objects.filter(pk=cliente_id).only("id", "nome").first() if cliente_id.isdigit() else None
         )
-        # Convert to dict for template convenience
-        context["vencidos_by_bank"] = {item["banco"]: item["total_valor"] for item in totals}
+        context["stats"] = BoletoService.obter_estatisticas()
+        context["vencidos_by_bank"] = context["stats"]["vencidos_por_banco"]
         context["import_form"] = ImportVencidosForm()
         context["filter_necessita_comprovante"] = self.request.GET.get("necessita_comprovante", "")
         return context
 
 
-class BoletoExportComprovantesView(BoletoAccessMixin, View):
-    """Exporta CSV com boletos que precisam de comprovante (filtro opcional por banco)."""
+class ClienteAutocompleteView(BoletoAccessMixin, View):
+    """Clientes ativos por prefixo do nome ou do CPF/CNPJ (JSON para os filtros)."""
+
+    limite = 20
 
     def get(self, request, *args, **kwargs):
-        qs = Boleto.objects.select_related("cliente").filter(necessita_comprovante=True)
-        bank = request.GET.get("banco", "").strip()
-        if bank:
-            qs = qs.filter(banco=bank)
-
-        # Build CSV
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = "attachment; filename=boletos_necessitam_comprovante.csv"
-        writer = csv.writer(response)
-        writer.writerow(["numero_boleto", "nosso_numero", "cliente", "cpf_cnpj", "valor", "data_vencimento", "banco", "status"])
-        for b in qs.order_by("data_vencimento"):
-            writer.writerow([
-                b.numero_boleto,
-                b.nosso_numero or "",
-                b.cliente.nome if b.cliente else "",
-                b.cliente.cpf_cnpj if b.cliente else "",
-                f"{b.valor}",
-                b.data_vencimento.isoformat() if b.data_vencimento else "",
-                b.banco,
-                b.status,
-            ])
+        termo = (request.GET.get("q") or "").strip()
+        if len(termo) < 2:
+            return JsonResponse({"results": []})
 
-        return response
+        qs = ClienteService.buscar(Cliente.objects.filter(ativo=True), termo).order_by("nome_normalizado")
+        resultados = list(qs.values("id", "nome", "cpf_cnpj")[: self.limite])
+        return JsonResponse({"results": resultados})
 
 
-class BoletoExportPDFView(BoletoAccessMixin, View):
-    """Exporta PDF com boletos que precisam de comprovante (filtro opcional por banco)."""
+class BoletoExportView(BoletoAccessMixin, View):
+    """
+    Exporta os boletos filtrados como na listagem (mesmos parametros GET) em CSV, XLSX ou PDF.
+    CSV/XLSX saem em streaming, lidos do banco em lotes; o PDF e paginado pelo reportlab
+    e limitado a PDF_MAX_LINHAS (acima disso volta para a listagem com aviso).
+    """
 
-    def get(self, request, *args, **kwargs):
-        qs = Boleto.objects.select_related("cliente").filter(necessita_comprovante=True)
-        bank = request.GET.get("banco", "").strip()
-        if bank:
-            qs = qs.filter(banco=bank)
+    formatos = ("csv", "xlsx", "pdf")
+    apenas_necessita_comprovante = False
+    nome_arquivo = "boletos"
+    titulo_pdf = "Boletos"
 
-        boletos = qs.order_by("data_vencimento")
+    def get_queryset(self):
+        qs = filtrar_boletos(Boleto.objects.all(), self.request.GET)
+        if self.apenas_necessita_comprovante:
+            qs = qs.filter(necessita_comprovante=True)
+        return qs
 
-        html_string = render_to_string("boletos/boleto_export_pdf.html", {"boletos": boletos, "bank": bank})
+    def get(self, request, *args, formato="csv", **kwargs):
+        formato = formato.lower()
+        if formato not in self.formatos:
+            raise Http404("Formato de exportação inválido.")
+        qs = self.get_queryset()
+        if formato == "pdf" and qs.count() > PDF_MAX_LINHAS:
+            messages.warning(
+                request,
+                f"O PDF é limitado a {PDF_MAX_LINHAS} boletos. Refine os filtros ou exporte em CSV/XLSX.",
+            )
+            return redirect(f"{reverse('boletos:boleto_list')}?{request.GET.urlencode()}")
+        linhas = linhas_exportacao(qs)
+
+        if formato == "pdf":
+            filtros = ", ".join(f"{k}={v}" for k, v in request.GET.items() if v)
+            arquivo = gerar_pdf_boletos(linhas, titulo=self.titulo_pdf, filtros=filtros)
+            return FileResponse(
+                arquivo, as_attachment=True, filename=f"{self.nome_arquivo}.pdf", content_type="application/pdf"
+            )
+        if formato == "xlsx":
+            response = StreamingHttpResponse(
+                xlsx_em_streaming(CABECALHO_EXPORTACAO, linhas, nome_aba="Boletos"),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        else:
+            response = StreamingHttpResponse(
+                csv_em_streaming(CABECALHO_EXPORTACAO, linhas), content_type="text/csv; charset=utf-8"
+            )
+        response["Content-Disposition"] = f"attachment; filename={self.nome_arquivo}.{formato}"
+        return response
+
+
+class BoletoExportComprovantesView(BoletoExportView):
+    """Exporta CSV com boletos que precisam de comprovante (filtro opcional por banco)."""
+
+    apenas_necessita_comprovante = True
+    nome_arquivo = "boletos_necessitam_comprovante"
+    titulo_pdf = "Boletos que necessitam de comprovante"
 
-   
 
-        # Fallback: return rendered HTML with content-type text/html
-        return HttpResponse(html_string)
+class BoletoExportPDFView(BoletoExportComprovantesView):
+    """Exporta PDF com boletos que precisam de comprovante (filtro opcional por banco)."""
+
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, formato="pdf", **kwargs)
 
 
 class BoletoImportVencidosView(BoletoAccessMixin, FormView):
     template_name = "boletos/boleto_import.html"
     form_class = ImportVencidosForm
-    success_url = reverse_lazy("boletos:boleto_list")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["importacoes"] = ImportacaoBoletosVencidos.objects.select_related("criado_por")[:10]
+        return context
 
     def form_valid(self, form):
-        arquivo = form.cleaned_data["arquivo"]
-        banco_filter = form.cleaned_data.get("banco")
+        # Arquivo gravado e processado fora da requisicao; o resultado fica no relatorio da importacao.
+        importacao = criar_importacao_vencidos(
+            form.cleaned_data["arquivo"],
+            banco=form.cleaned_data.get("banco") or "",
+            usuario=self.request.user,
+        )
+        messages.info(self.request, "Arquivo recebido. A importação está sendo processada.")
+        return redirect("boletos:importacao_vencidos_detail", pk=importacao.pk)
+
+
+class ImportacaoVencidosDetailView(BoletoAccessMixin, DetailView):
+    model = ImportacaoBoletosVencidos
+    template_name = "boletos/importacao_vencidos_detail.html"
+    context_object_name = "importacao"
+
+    def get_queryset(self):
+        return ImportacaoBoletosVencidos.objects.select_related("criado_por")
 
-        # Read raw bytes and try to decode (latin-1 is permissive for Windows CSVs)
-        data = arquivo.read()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        relatorio = self.object.relatorio or {}
+        context["nao_encontrados"] = relatorio.get("nao_encontrados", [])
+        context["boletos"] = (
+            Boleto.objects.filter(pk__in=relatorio.get("boleto_ids", [])[:200])
+            .select_related("cliente")
+            .order_by("cliente__nome", "data_vencimento")
+        )
+        return context
+
+
+class CnabView(BoletoAccessMixin, FormView):
+    """Envio de arquivos de retorno (liquidacao em lote) e geracao de remessas CNAB."""
+
+    template_name = "boletos/cnab.html"
+    form_class = RetornoBancarioForm
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["remessa_form"] = RemessaBancariaForm()
+        context["retornos"] = RetornoBancario.objects.select_related("criado_por")[:10]
+        context["remessas"] = RemessaBancaria.objects.select_related("criado_por")[:10]
+        return context
+
+    def form_valid(self, form):
         try:
-            text = data.decode("utf-8")
-        except Exception:
-            text = data.decode("latin-1")
+            retorno = registrar_retorno(form.cleaned_data["arquivo"], usuario=self.request.user)
+        except ValueError as exc:
+            messages.error(self.request, str(exc))
+            return redirect("boletos:cnab")
+        return redirect("boletos:retorno_detail", pk=retorno.pk)
+
+
+class RetornoBancarioDetailView(BoletoAccessMixin, DetailView):
+    model = RetornoBancario
+    template_name = "boletos/retorno_detail.html"
+    context_object_name = "retorno"
+
+    def get_queryset(self):
+        return RetornoBancario.objects.select_related("criado_por")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        relatorio = self.object.relatorio or {}
+        context["nao_encontrados"] = relatorio.get("nao_encontrados", [])
+        context["ocorrencias"] = relatorio.get("ocorrencias", [])
+        context["boletos"] = (
+            Boleto.objects.filter(pk__in=relatorio.get("boleto_ids", [])[:200])
+            .select_related("cliente")
+            .order_by("cliente__nome", "data_vencimento")
+        )
+        return context
 
-        # Detect delimiter (prefer ';' for bank exports)
-        sample = text[:8192]
+
+class RemessaGerarView(BoletoAccessMixin, View):
+    def post(self, request, *args, **kwargs):
+        form = RemessaBancariaForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, "Selecione o banco e o leiaute da remessa.")
+            return redirect("boletos:cnab")
         try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=';,')
-            delimiter = dialect.delimiter
-        except Exception:
-            delimiter = ';'
-
-        reader = csv.DictReader(io.StringIO(text), delimiter=delimiter)
-
-        encontrados = []
-        nao_encontrados = []
-
-        def normalize_key(k: str) -> str:
-            return re.sub(r"[^a-z0-9]", "_", (k or "").strip().lower())
-
-        def get_cell(row, *candidates):
-            for c in candidates:
-                # try direct
-                if c in row and row[c] is not None:
-                    return row[c].strip()
-            # try normalized keys
-            norm_map = {normalize_key(k): v for k, v in row.items()}
-            for c in candidates:
-                key = normalize_key(c)
-                if key in norm_map and norm_map[key] is not None:
-                    return norm_map[key].strip()
-            return ""
-
-        def parse_date(s: str):
-            s = (s or "").strip()
-            for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
-                try:
-                    return datetime.strptime(s, fmt).date()
-                except Exception:
-                    continue
-            return None
-
-        def parse_decimal(s: str):
-            s = (s or "").strip().replace('.', '').replace(',', '.') if s.count(',') > 0 and s.count('.')>1 else (s or '').replace(',', '.')
-            try:
-                return Decimal(s)
-            except (InvalidOperation, ValueError):
-                return None
-
-        for row in reader:
-            numero = get_cell(row, "Nosso_Numero", "NossoNumero", "Nosso-Numero", "nosso_numero", "numero_boleto", "numero")
-            cpf = get_cell(row, "CPF_CNPJ", "cpf_cnpj", "cpf", "cnpj")
-            pagador = get_cell(row, "Pagador", "pagador", "nome")
-            valor_raw = get_cell(row, "Valor", "valor", "Valor(R$)")
-            venc_raw = get_cell(row, "Vencimento", "vencimento", "data_vencimento")
-
-            numero = (numero or "").strip()
-            if not numero:
-                # skip rows without identifier
-                continue
-
-            valor = parse_decimal(valor_raw)
-            venc = parse_date(venc_raw)
-
-            # Try direct lookup by numero_boleto, then nosso_numero, then fallback by cpf+valor+venc
-            boleto = None
-            try:
-                boleto = Boleto.objects.get(numero_boleto=numero)
-            except Boleto.DoesNotExist:
-                try:
-                    boleto = Boleto.objects.get(nosso_numero=numero)
-                except Boleto.DoesNotExist:
-                    # fallback: try find by cliente cpf + valor + vencimento
-                    if cpf:
-                        cpf_norm = re.sub(r"\D", "", cpf)
-                        cliente = None
-                        for c in Cliente.objects.all():
-                            if re.sub(r"\D", "", (c.cpf_cnpj or "")) == cpf_norm:
-                                cliente = c
-                                break
-                        if cliente and valor is not None and venc is not None:
-                            qs = Boleto.objects.filter(cliente=cliente, valor=valor, data_vencimento=venc)
-                            if qs.exists():
-                                boleto = qs.first()
-
-            if not boleto:
-                # criar boleto provisório para rastrear necessidade de comprovante
-                cliente = None
-                if cpf:
-                    cpf_norm = re.sub(r"\D", "", cpf)
-                    for c in Cliente.objects.all():
-                        if re.sub(r"\D", "", (c.cpf_cnpj or "")) == cpf_norm:
-                            cliente = c
-                            break
-                if not cliente:
-                    # criar cliente mínimo
-                    cliente = Cliente.objects.create(nome=pagador or f"Cliente {numero}", cpf_cnpj=cpf or "", ativo=True)
-
-                boleto = Boleto.objects.create(
-                    cliente=cliente,
-                    numero_boleto=numero,
-                    descricao=f"Importado - {pagador or 'importado'}",
-                    valor=valor or 0,
-                    data_vencimento=venc or datetime.now().date(),
-                    status=StatusBoletoChoices.VENCIDO,
-                    nosso_numero=numero,
-                    banco=banco_filter or Boleto.BancoChoices.OUTRO,
-                    necessita_comprovante=True,
-                )
-                encontrados.append(boleto)
-
-            if banco_filter:
-                boleto.banco = banco_filter
-
-            if boleto.status != StatusBoletoChoices.VENCIDO:
-                boleto.status = StatusBoletoChoices.VENCIDO
-
-            boleto.save()
-            encontrados.append(boleto)
-
-        messages.success(self.request, f"Importação processada: {len(encontrados)} encontrados, {len(nao_encontrados)} não encontrados.")
-        self.request.session["import_encontrados"] = [b.pk for b in encontrados]
-        self.request.session["import_nao_encontrados"] = nao_encontrados
-        return super().form_valid(form)
+            remessa = gerar_remessa(
+                form.cleaned_data["banco"], layout=form.cleaned_data["layout"], usuario=request.user
+            )
+        except ValueError as exc:
+            messages.error(request, str(exc))
+            return redirect("boletos:cnab")
+        messages.success(request, f"Remessa #{remessa.sequencial} gerada com {remessa.quantidade} boleto(s).")
+        return redirect("boletos:cnab")
+
+
+class RemessaDownloadView(BoletoAccessMixin, View):
+    def get(self, request, pk, *args, **kwargs):
+        remessa = get_object_or_404(RemessaBancaria, pk=pk)
+        return FileResponse(
+            remessa.arquivo.open("rb"),
+            as_attachment=True,
+            filename=os.path.basename(remessa.arquivo.name),
+            content_type="text/plain",
+        )
 
 
 class BoletoDetailView(BoletoAccessMixin, DetailView):
@@ -308,8 +303,11 @@ class BoletoCreateView(BoletoAccessMixin, CreateView):
         return reverse("boletos:boleto_detail", kwargs={"pk": self.object.pk})
 
     def form_valid(self, form):
+        response = super().form_valid(form)
+        ExposicaoCreditoService.recalcular(self.object.cliente_id)
+        invalidar_estatisticas_boletos()
         messages.success(self.request, "Boleto criado com sucesso!")
-        return super().form_valid(form)
+        return response
 
 
 class BoletoUpdateView(BoletoAccessMixin, UpdateView):
@@ -321,8 +319,12 @@ class BoletoUpdateView(BoletoAccessMixin, UpdateView):
         return reverse("boletos:boleto_detail", kwargs={"pk": self.object.pk})
 
     def form_valid(self, form):
+        cliente_anterior_id = Boleto.objects.filter(pk=self.object.pk).values_list("cliente_id", flat=True).first()
+        response = super().form_valid(form)
+        ExposicaoCreditoService.recalcular_clientes([cliente_anterior_id, self.object.cliente_id])
+        invalidar_estatisticas_boletos()
         messages.success(self.request, "Boleto atualizado com sucesso!")
-        return super().form_valid(form)
+        return response
 
 
 class BoletoRegistrarPagamentoView(BoletoAccessMixin, UpdateView):
@@ -356,26 +358,20 @@ class ClienteListView(BoletoAccessMixin, ListView):
         return get_pagination_params(self.request).page_size
 
     def get_queryset(self):
-        qs = Cliente.objects.prefetch_related("boletos", "lista_negra").order_by(
-            "nome"
-        )
+        qs = Cliente.objects.select_related("ramo_atuacao").order_by("nome")
 
         search = self.request.GET.get("search", "").strip()
         ramo_id = self.request.GET.get("ramo", "").strip()
         em_lista_negra = self.request.GET.get("lista_negra", "").strip()
 
-        if search:
-            qs = qs.filter(
-                Q(nome__icontains=search)
-                | Q(nome_normalizado__icontains=search)
-                | Q(cpf_cnpj__icontains=search)
-            )
+        qs = ClienteService.buscar(qs, search)
         if ramo_id:
             qs = qs.filter(ramo_atuacao_id=ramo_id)
         if em_lista_negra == "sim":
             qs = qs.filter(lista_negra__ativo=True)
 
-        return qs
+        # Totais de boletos agregados em SQL; a pagina nao carrega os boletos.
+        return ClienteService.com_resumo_boletos(qs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -389,18 +385,25 @@ class ClienteDetailView(BoletoAccessMixin, DetailView):
     context_object_name = "cliente"
 
     def get_queryset(self):
-        return Cliente.objects.prefetch_related("boletos", "controle_fiado")
+        return ClienteService.com_resumo_boletos(
+            Cliente.objects.select_related("ramo_atuacao", "controle_fiado", "lista_negra")
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         cliente = self.object
-        context["boletos"] = cliente.boletos.all().order_by("-data_vencimento")
-        context["total_em_aberto"] = BoletoService.obter_total_em_aberto(cliente)
-        context["em_lista_negra"] = hasattr(cliente, "lista_negra") and cliente.lista_negra.ativo
-        
+        # Historico paginado: clientes antigos tem centenas de boletos.
+        boletos = cliente.boletos.order_by("-data_vencimento", "-id")
+        paginator = Paginator(boletos, get_pagination_params(self.request).page_size)
+        context["boletos_page"] = paginator.get_page(self.request.GET.get("page"))
+        context["boletos"] = context["boletos_page"].object_list
+        context["exposicao"] = ExposicaoCreditoService.obter(cliente)
+        context["total_em_aberto"] = cliente.valor_aberto
+        context["em_lista_negra"] = cliente.em_lista_negra
+
         if hasattr(cliente, "controle_fiado"):
             context["controle_fiado"] = cliente.controle_fiado
-        
+
         return context
 
 
@@ -487,8 +490,10 @@ class ControleFiadoUpdateView(BoletoAccessMixin, UpdateView):
         return reverse("boletos:controle_fiado_detail", kwargs={"pk": self.object.pk})
 
     def form_valid(self, form):
+        response = super().form_valid(form)
+        ExposicaoCreditoService.recalcular(self.object.cliente_id)
         messages.success(self.request, "Controle de fiado atualizado com sucesso!")
-        return super().form_valid(form)
+        return response
 
 
 class ControleFiadoListView(BoletoAccessMixin, ListView):
@@ -6,9 +6,11 @@ from compras.models import (
     Fornecedor,
     FornecedorAlias,
     Produto,
+    ProdutoAlias,
     Compra,
     ItemCompra,
     Garantia,
+    HistoricoPrecoFornecedor,
 )
 
 
@@ -28,11 +30,19 @@ class FornecedorAdmin(admin.ModelAdmin):
     readonly_fields = ("nome_normalizado", "criado_em")
 
 
+class ProdutoAliasInline(admin.TabularInline):
+    model = ProdutoAlias
+    extra = 0
+    fields = ("nome", "nome_normalizado")
+    readonly_fields = ("nome_normalizado",)
+
+
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
     list_display = ("nome", "sku", "ativo", "criado_em")
     search_fields = ("nome", "nome_normalizado", "sku")
     list_filter = ("ativo", "criado_em")
+    inlines = [ProdutoAliasInline]
     readonly_fields = ("nome_normalizado", "criado_em")
 
 
@@ -77,8 +87,25 @@ class FornecedorAliasAdmin(admin.ModelAdmin):
     readonly_fields = ("nome_normalizado", "criado_em")
 
 
+@admin.register(ProdutoAlias)
+class ProdutoAliasAdmin(admin.ModelAdmin):
+    list_display = ("nome", "principal")
+    search_fields = ("nome", "nome_normalizado", "principal__nome", "principal__nome_normalizado")
+    autocomplete_fields = ("principal",)
+    readonly_fields = ("nome_normalizado", "criado_em")
+
+
 @admin.register(ItemCompra)
 class ItemCompraAdmin(admin.ModelAdmin):
     list_display = ("id", "compra", "produto", "quantidade", "preco_unitario")
     search_fields = ("compra__id", "produto__nome", "produto__nome_normalizado")
     autocomplete_fields = ("compra", "produto")
+
+
+@admin.register(HistoricoPrecoFornecedor)
+class HistoricoPrecoFornecedorAdmin(admin.ModelAdmin):
+    list_display = ("produto", "fornecedor", "mes", "preco_minimo", "preco_medio", "ultimo_preco", "quantidade")
+    list_filter = ("mes",)
+    search_fields = ("produto__nome", "produto__sku", "fornecedor__nome")
+    autocomplete_fields = ("produto", "fornecedor")
+    readonly_fields = ("atualizado_em",)
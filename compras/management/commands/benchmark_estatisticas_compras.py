@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from compras.models import CentroCustoChoices, Compra, Fornecedor, ItemCompra, Produto
+from compras.services.statistics_service import ComprasStatisticsService
+
+
+class Command(BaseCommand):
+    help = "Mede o painel de compras sobre uma massa sintetica (desfeita ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--itens", type=int, default=500_000)
+        parser.add_argument("--itens-por-compra", type=int, default=5)
+        parser.add_argument("--produtos", type=int, default=2_000)
+        parser.add_argument("--fornecedores", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _popular(self, opts) -> int:
+        rnd = random.Random(opts["seed"])
+        Fornecedor.objects.bulk_create(
+            [Fornecedor(nome=f"BENCH FORN {i}", nome_normalizado=f"BENCH FORN {i}") for i in range(opts["fornecedores"])],
+            batch_size=1000,
+        )
+        Produto.objects.bulk_create(
+            [Produto(nome=f"BENCH PROD {i}", nome_normalizado=f"BENCH PROD {i}") for i in range(opts["produtos"])],
+            batch_size=1000,
+        )
+        fornecedores = list(Fornecedor.objects.filter(nome_normalizado__startswith="BENCH").values_list("id", flat=True))
+        produtos = list(Produto.objects.filter(nome_normalizado__startswith="BENCH").values_list("id", flat=True))
+        centros = CentroCustoChoices.values
+        hoje = timezone.localdate()
+
+        n_compras = max(opts["itens"] // opts["itens_por_compra"], 1)
+        compras = [
+            Compra(
+                fornecedor_id=rnd.choice(fornecedores),
+                centro_custo=rnd.choice(centros),
+                data_compra=hoje - timedelta(days=rnd.randint(0, 730)),
+                valor_total=Decimal(rnd.randint(100, 500_000)) / 100,
+            )
+            for _ in range(n_compras)
+        ]
+        Compra.objects.bulk_create(compras, batch_size=2000)
+
+        lote = []
+        for compra in compras:
+            for _ in range(opts["itens_por_compra"]):
+                lote.append(ItemCompra(
+                    compra_id=compra.pk,
+                    produto_id=rnd.choice(produtos),
+                    quantidade=Decimal(rnd.randint(1, 50)),
+                    preco_unitario=Decimal(rnd.randint(100, 50_000)) / 100,
+                ))
+            if len(lote) >= 5000:
+                ItemCompra.objects.bulk_create(lote)
+                lote = []
+        ItemCompra.objects.bulk_create(lote)
+        return produtos[0]
+
+    def _medir(self, nome: str, func) -> None:
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            func()
+            duracao = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(f"{nome:<32} {duracao:>9.1f} ms  {len(ctx):>3} queries")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            produto_id = self._popular(opts)
+            self.stdout.write(f"Massa: {opts['itens']} itens em {time.perf_counter() - inicio:.1f}s")
+
+            self._medir("obter_painel", ComprasStatisticsService.obter_painel)
+            self._medir("obter_compras_por_periodo", lambda: ComprasStatisticsService.obter_compras_por_periodo(90))
+            self._medir("obter_produtos_mais_comprados", lambda: list(ComprasStatisticsService.obter_produtos_mais_comprados()))
+            self._medir("obter_precos_por_produto", lambda: ComprasStatisticsService.obter_precos_por_produto(produto_id))
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("OK. Massa sintetica desfeita."))
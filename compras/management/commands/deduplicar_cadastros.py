@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from compras.models import Fornecedor, Produto
+from compras.services.deduplicacao_service import (
+    aplicar_fusoes,
+    propor_fusoes_fornecedores,
+    propor_fusoes_produtos,
+)
+from core.services.deduplicacao import LIMIAR_PADRAO
+
+
+class Command(BaseCommand):
+    help = "Detecta fornecedores/produtos quase duplicados e (com --aplicar) funde no principal."
+
+    def add_arguments(self, parser):
+        parser.add_argument("entidade", choices=["fornecedores", "produtos"])
+        parser.add_argument("--limiar", type=float, default=LIMIAR_PADRAO, help="Similaridade minima (0-1).")
+        parser.add_argument("--aplicar", action="store_true", help="Aplica as fusoes (default: so lista).")
+        parser.add_argument("--limite-exibicao", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options["entidade"] == "fornecedores":
+            model, grupos = Fornecedor, propor_fusoes_fornecedores(limiar=options["limiar"])
+        else:
+            model, grupos = Produto, propor_fusoes_produtos(limiar=options["limiar"])
+
+        for grupo in grupos[: options["limite_exibicao"]]:
+            self.stdout.write(f"#{grupo.principal_id} {grupo.principal_nome}")
+            for pk, nome, score in grupo.duplicados:
+                self.stdout.write(f"    <- #{pk} {nome} ({score:.2f})")
+
+        duplicados = sum(len(g.duplicados) for g in grupos)
+        if not options["aplicar"]:
+            self.stdout.write(self.style.SUCCESS(f"OK. Grupos: {len(grupos)}, duplicados: {duplicados} (simulacao)"))
+            return
+
+        result = aplicar_fusoes(model, grupos)
+        self.stdout.write(self.style.SUCCESS(
+            f"OK. Grupos: {result.grupos}, removidos: {result.registros_removidos}, "
+            f"aliases: {result.aliases_criados}, repontados: {result.linhas_repontadas}, "
+            f"consolidados: {result.linhas_consolidadas}"
+        ))
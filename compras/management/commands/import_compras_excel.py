@@ -8,13 +8,10 @@ Características:
 """
 from __future__ import annotations
 
-from decimal import Decimal
-from datetime import datetime
 import pandas as pd
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
-from compras.models import Fornecedor, Produto, Compra, ItemCompra, CentroCustoChoices
-from core.services.normalizacao import normalizar_nome
+from compras.models import CentroCustoChoices
+from compras.services.importacao_service import ImportadorComprasLote, montar_linha
 
 
 class Command(BaseCommand):
@@ -66,135 +63,62 @@ class Command(BaseCommand):
 
         self.stdout.write(f"📊 Total de registros: {len(df)}")
 
-        # Inicializar contadores
+        df['data'] = pd.to_datetime(df['data'], errors='coerce')
+
+        # Monta as linhas validadas; o motor em lote resolve fornecedores/produtos de uma vez.
+        # A conversao/validacao e por linha (so em memoria, mesma regra do CSV em montar_linha);
+        # o que toca o banco e o motor em lote. Linha invalida aborta a importacao inteira,
+        # como antes; com --skip-errors vira aviso e as demais sao importadas.
+        linhas = []
+        avisos = []
+        for idx, row in zip(df.index, df.itertuples(index=False)):
+            try:
+                linhas.append(
+                    montar_linha(
+                        idx,
+                        data_compra=None if pd.isna(row.data) else row.data.date(),
+                        centro_custo=centro_custo,
+                        fornecedor=str(row.fornecedor),
+                        produto=str(row.descricao),
+                        quantidade=row.quantidade,
+                        preco_unitario=row.valor_unitario,
+                    )
+                )
+            except ValueError as e:
+                if not skip_errors:
+                    raise CommandError(f"Importação abortada: Linha {idx}: {e}")
+                avisos.append(f"Linha {idx}: {e}")
+
+        for aviso in avisos:
+            self.stdout.write(self.style.WARNING(f"⚠️ {aviso}"))
+
         stats = {
             'fornecedores_criados': 0,
             'produtos_criados': 0,
             'compras_criadas': 0,
             'itens_criados': 0,
             'erros': 0,
-            'avisos': 0,
+            'avisos': len(avisos),
         }
 
         try:
-            with transaction.atomic():
-                # Processar por grupos de fornecedor e data
-                df['data'] = pd.to_datetime(df['data'], errors='coerce')
-                grouped = df.groupby(['fornecedor', 'data'])
-
-                for (fornecedor_nome, data_compra), grupo in grouped:
-                    try:
-                        # Criar/obter Fornecedor
-                        fornecedor, created = self._get_or_create_fornecedor(fornecedor_nome)
-                        if created:
-                            stats['fornecedores_criados'] += 1
-
-                        # Criar Compra
-                        compra = Compra.objects.create(
-                            fornecedor=fornecedor,
-                            centro_custo=centro_custo,
-                            data_compra=data_compra.date(),
-                            observacoes="Importação inicial do sistema"
-                        )
-                        stats['compras_criadas'] += 1
-
-                        valor_total_compra = Decimal('0')
-
-                        # Processar itens do grupo
-                        for idx, row in grupo.iterrows():
-                            try:
-                                produto, created = self._get_or_create_produto(row['descricao'])
-                                if created:
-                                    stats['produtos_criados'] += 1
-
-                                # Validar e converter valores
-                                try:
-                                    quantidade = Decimal(str(row['quantidade']).strip())
-                                    preco_unitario = Decimal(str(row['valor_unitario']).strip())
-                                except (ValueError, TypeError) as e:
-                                    self.stdout.write(
-                                        self.style.WARNING(
-                                            f"⚠️ Linha {idx}: Valor inválido - {e}"
-                                        )
-                                    )
-                                    stats['avisos'] += 1
-                                    continue
-
-                                if quantidade <= 0 or preco_unitario < 0:
-                                    self.stdout.write(
-                                        self.style.WARNING(
-                                            f"⚠️ Linha {idx}: Quantidade ou preço inválido"
-                                        )
-                                    )
-                                    stats['avisos'] += 1
-                                    continue
-
-                                # Criar item de compra
-                                ItemCompra.objects.create(
-                                    compra=compra,
-                                    produto=produto,
-                                    quantidade=quantidade,
-                                    preco_unitario=preco_unitario
-                                )
-                                stats['itens_criados'] += 1
-                                valor_total_compra += (quantidade * preco_unitario)
-
-                            except Exception as e:
-                                if skip_errors:
-                                    self.stdout.write(
-                                        self.style.WARNING(f"⚠️ Erro na linha {idx}: {e}")
-                                    )
-                                    stats['avisos'] += 1
-                                    continue
-                                else:
-                                    raise
-
-                        # Atualizar valor total da compra
-                        compra.valor_total = valor_total_compra
-                        compra.save()
-
-                    except Exception as e:
-                        stats['erros'] += 1
-                        if not skip_errors:
-                            raise
-                        self.stdout.write(
-                            self.style.ERROR(f"❌ Erro ao processar grupo {fornecedor_nome}/{data_compra}: {e}")
-                        )
-
+            result = ImportadorComprasLote(observacoes="Importação inicial do sistema").importar(linhas)
         except Exception as e:
+            stats['erros'] += 1
             self.stdout.write(self.style.ERROR(f"❌ Erro crítico: {e}"))
             if not skip_errors:
                 raise CommandError(f"Importação abortada: {e}")
+        else:
+            stats.update(
+                fornecedores_criados=result.fornecedores_criados,
+                produtos_criados=result.produtos_criados,
+                compras_criadas=result.compras_criadas,
+                itens_criados=result.itens_criados,
+            )
 
         # Exibir relatório
         self._exibir_relatorio(stats)
 
-    def _get_or_create_fornecedor(self, nome: str) -> tuple[Fornecedor, bool]:
-        """Obter ou criar fornecedor, normalizando o nome."""
-        nome = (nome or "").strip()
-        if not nome:
-            raise ValueError("Nome do fornecedor vazio")
-
-        nome_norm = normalizar_nome(nome)
-        fornecedor, created = Fornecedor.objects.get_or_create(
-            nome_normalizado=nome_norm,
-            defaults={'nome': nome}
-        )
-        return fornecedor, created
-
-    def _get_or_create_produto(self, descricao: str) -> tuple[Produto, bool]:
-        """Obter ou criar produto, normalizando o nome."""
-        descricao = (descricao or "").strip()
-        if not descricao:
-            raise ValueError("Descrição do produto vazia")
-
-        nome_norm = normalizar_nome(descricao)
-        produto, created = Produto.objects.get_or_create(
-            nome_normalizado=nome_norm,
-            defaults={'nome': descricao}
-        )
-        return produto, created
-
     def _exibir_relatorio(self, stats: dict):
         """Exibir relatório detalhado da importação."""
         self.stdout.write("\n" + "=" * 60)
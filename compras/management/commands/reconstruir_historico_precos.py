@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from compras.services.historico_precos_service import reconstruir_historico_precos
+
+
+class Command(BaseCommand):
+    help = "Reconstroi o historico mensal de precos por produto x fornecedor a partir dos itens de compra."
+
+    def handle(self, *args, **options):
+        total = reconstruir_historico_precos()
+        self.stdout.write(self.style.SUCCESS(f"OK. Celulas de historico: {total}"))
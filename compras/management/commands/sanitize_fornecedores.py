@@ -10,11 +10,11 @@ class Command(BaseCommand):
     help = "Recalcula nome_normalizado de fornecedores e garante consistência."
 
     def handle(self, *args, **options):
-        updated = 0
-        for f in Fornecedor.objects.all():
+        alterados = []
+        for f in Fornecedor.objects.only("id", "nome", "nome_normalizado").iterator():
             new_norm = normalizar_nome(f.nome)
             if f.nome_normalizado != new_norm:
                 f.nome_normalizado = new_norm
-                f.save(update_fields=["nome_normalizado"])
-                updated += 1
-        self.stdout.write(self.style.SUCCESS(f"OK. Fornecedores atualizados: {updated}"))
+                alterados.append(f)
+        Fornecedor.objects.bulk_update(alterados, ["nome_normalizado"], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"OK. Fornecedores atualizados: {len(alterados)}"))
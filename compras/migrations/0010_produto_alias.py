@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0009_alter_compraevento_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255)),
+                ('nome_normalizado', models.CharField(db_index=True, max_length=255, unique=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('principal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='compras.produto')),
+            ],
+            options={
+                'ordering': ['nome'],
+                'indexes': [models.Index(fields=['principal'], name='idx_prodalias_principal')],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:12
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_historico(apps, schema_editor):
+    ItemCompra = apps.get_model("compras", "ItemCompra")
+    HistoricoPrecoFornecedor = apps.get_model("compras", "HistoricoPrecoFornecedor")
+    agora = timezone.now()
+    acumulado = {}
+    linhas = (
+        ItemCompra.objects.exclude(compra__status="CANCELADA")
+        .order_by("compra__data_compra", "id")
+        .values_list("produto_id", "compra__fornecedor_id", "compra__data_compra", "quantidade", "preco_unitario")
+    )
+    for produto_id, fornecedor_id, data_compra, quantidade, preco in linhas.iterator(chunk_size=2000):
+        chave = (produto_id, fornecedor_id, data_compra.replace(day=1))
+        hist = acumulado.get(chave)
+        if hist is None:
+            hist = acumulado[chave] = HistoricoPrecoFornecedor(
+                produto_id=produto_id,
+                fornecedor_id=fornecedor_id,
+                mes=chave[2],
+                preco_minimo=preco,
+                ultimo_preco=preco,
+                ultima_compra_em=data_compra,
+                quantidade=Decimal("0.000"),
+                valor_total=Decimal("0"),
+                itens=0,
+                atualizado_em=agora,
+            )
+        hist.preco_minimo = min(hist.preco_minimo, preco)
+        hist.ultimo_preco = preco
+        hist.ultima_compra_em = data_compra
+        hist.quantidade += quantidade
+        hist.valor_total += quantidade * preco
+        hist.itens += 1
+    for hist in acumulado.values():
+        hist.preco_medio = (hist.valor_total / hist.quantidade).quantize(Decimal("0.0001")) if hist.quantidade else hist.ultimo_preco
+        hist.valor_total = hist.valor_total.quantize(Decimal("0.01"))
+    HistoricoPrecoFornecedor.objects.bulk_create(acumulado.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0010_produto_alias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoPrecoFornecedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('preco_minimo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('preco_medio', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=14)),
+                ('ultimo_preco', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('ultima_compra_em', models.DateField()),
+                ('quantidade', models.DecimalField(decimal_places=3, default=Decimal('0.000'), max_digits=14)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('itens', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('fornecedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_precos', to='compras.fornecedor')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_precos', to='compras.produto')),
+            ],
+            options={
+                'ordering': ['produto_id', '-mes', 'preco_medio'],
+                'indexes': [models.Index(fields=['produto', 'mes'], name='idx_hist_preco_prod_mes')],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'fornecedor', 'mes'), name='uniq_hist_preco_prod_forn_mes')],
+            },
+        ),
+        migrations.RunPython(preencher_historico, migrations.RunPython.noop),
+    ]
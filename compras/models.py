@@ -98,6 +98,30 @@ class Produto(models.Model):
         return self.nome
 
 
+class ProdutoAlias(models.Model):
+    """
+    Nomes alternativos de um Produto (gravados na deduplicacao); importadores resolvem por aqui.
+    """
+    principal = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name="aliases")
+    nome = models.CharField(max_length=255)
+    nome_normalizado = models.CharField(max_length=255, db_index=True, unique=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["principal"], name="idx_prodalias_principal"),
+        ]
+        ordering = ["nome"]
+
+    def save(self, *args, **kwargs):
+        self.nome = (self.nome or "").strip()
+        self.nome_normalizado = normalizar_nome(self.nome)
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f"{self.nome} -> {self.principal.nome}"
+
+
 def compra_upload_path(instance: "Compra", filename: str) -> str:
     return f"compras/notas/{instance.data_compra:%Y/%m}/{instance.id or 'novo'}_{filename}"
 
@@ -207,6 +231,37 @@ class ItemCompra(models.Model):
         return f"{self.compra_id} - {self.produto.nome}"
 
 
+class HistoricoPrecoFornecedor(models.Model):
+    """
+    Resumo mensal de precos pagos por produto x fornecedor (compras nao canceladas).
+    Mantido por compras.services.historico_precos_service.
+    """
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name="historico_precos")
+    fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, related_name="historico_precos")
+    mes = models.DateField()
+
+    preco_minimo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    preco_medio = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0.0000"))
+    ultimo_preco = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    ultima_compra_em = models.DateField()
+    quantidade = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal("0.000"))
+    valor_total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    itens = models.IntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["produto_id", "-mes", "preco_medio"]
+        constraints = [
+            models.UniqueConstraint(fields=["produto", "fornecedor", "mes"], name="uniq_hist_preco_prod_forn_mes"),
+        ]
+        indexes = [
+            models.Index(fields=["produto", "mes"], name="idx_hist_preco_prod_mes"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.produto_id}/{self.fornecedor_id} {self.mes:%m/%Y} {self.preco_medio}"
+
+
 class Garantia(models.Model):
     """
     Garantia vinculada ao item.
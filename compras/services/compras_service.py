@@ -7,6 +7,7 @@ from typing import Iterable
 from django.db import transaction
 
 from compras.models import Compra, ItemCompra, Produto, Fornecedor
+from compras.services.historico_precos_service import atualizar_historico_por_compras
 
 
 @dataclass(frozen=True)
@@ -59,4 +60,5 @@ def criar_compra_com_itens(
     # Atualiza o total
     compra = Compra.objects.select_for_update().get(pk=compra.pk)
     compra = recalcular_total(compra)
+    atualizar_historico_por_compras([compra.pk])
     return compra
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Type
+
+from django.db import transaction
+from django.db.models import Case, Expression, F, IntegerField, Model, UniqueConstraint, Value, When
+
+from compras.models import Fornecedor, FornecedorAlias, Produto, ProdutoAlias
+from compras.services.historico_precos_service import reconstruir_historico_precos
+from core.services.deduplicacao import LIMIAR_PADRAO, GrupoDuplicados, propor_grupos
+from core.services.normalizacao import normalizar_nome
+
+TAMANHO_LOTE_FUSAO = 500
+
+# Tabelas com chave unica envolvendo o FK: na colisao, estes campos sao somados na linha do
+# principal e a linha do duplicado e apagada. Sem entrada aqui, vale a linha do principal.
+CAMPOS_SOMADOS_NA_FUSAO: Dict[str, tuple] = {
+    "estoque.produtoestoque": ("saldo_atual",),
+    "estoque.produtoestoqueunidade": ("saldo_atual",),
+    "vendas.cubovendamensal": ("quantidade", "receita", "custo", "itens"),
+}
+
+ALIAS_POR_MODELO: Dict[Type[Model], Type[Model]] = {
+    Fornecedor: FornecedorAlias,
+    Produto: ProdutoAlias,
+}
+
+
+@dataclass(frozen=True)
+class FusaoResult:
+    grupos: int
+    registros_removidos: int
+    aliases_criados: int
+    linhas_repontadas: int
+    linhas_consolidadas: int
+
+
+def propor_fusoes_fornecedores(*, limiar: float = LIMIAR_PADRAO) -> List[GrupoDuplicados]:
+    return propor_grupos(Fornecedor.objects.values_list("id", "nome").iterator(), limiar=limiar)
+
+
+def propor_fusoes_produtos(*, limiar: float = LIMIAR_PADRAO) -> List[GrupoDuplicados]:
+    # Produto com sku vira principal do grupo (o sku e a identidade mais confiavel).
+    com_sku = {pk: 1 for pk in Produto.objects.exclude(sku="").values_list("id", flat=True).iterator()}
+    return propor_grupos(Produto.objects.values_list("id", "nome").iterator(), limiar=limiar, prioridade=com_sku)
+
+
+def _relacoes(model: Type[Model]):
+    """FKs (inclusive related_name='+') de outros models apontando para `model`."""
+    for rel in model._meta.get_fields(include_hidden=True):
+        if (rel.one_to_many or rel.one_to_one) and rel.auto_created and not rel.concrete:
+            yield rel.related_model, rel.field
+
+
+def _campo_da_expressao(expressao) -> Optional[str]:
+    """Campo por tras de um termo de constraint por expressao: F("x") ou Coalesce("x", Value(0)) -> "x"."""
+    if isinstance(expressao, F):
+        return expressao.name
+    if isinstance(expressao, Expression):
+        nomes = [nome for nome in map(_campo_da_expressao, expressao.get_source_expressions()) if nome]
+        return nomes[0] if len(nomes) == 1 else None
+    return None
+
+
+def _chave_unica(model: Type[Model], campo) -> tuple:
+    if campo.unique:
+        return (campo.name,)
+    for campos in model._meta.unique_together:
+        if campo.name in campos:
+            return tuple(campos)
+    for constraint in model._meta.constraints:
+        if not isinstance(constraint, UniqueConstraint) or constraint.condition is not None:
+            continue
+        campos = tuple(constraint.fields) or tuple(map(_campo_da_expressao, constraint.expressions))
+        # Ex.: CuboVendaMensal usa Coalesce("vendedor", ...): vendedor nulo conta como um valor so,
+        # o mesmo que a comparacao de tuplas em _consolidar faz com None.
+        if campo.name in campos and None not in campos:
+            return campos
+    return ()
+
+
+def _repontar(model: Type[Model], campo, destino: Dict[int, int], *, por: str = "") -> int:
+    """
+    UPDATE em lote: fk = CASE <por> WHEN chave THEN principal ... END.
+    `por` e a coluna casada com as chaves de `destino` (default: o proprio fk).
+    """
+    por = por or campo.attname
+    total = 0
+    pares = list(destino.items())
+    for inicio in range(0, len(pares), TAMANHO_LOTE_FUSAO):
+        lote = pares[inicio:inicio + TAMANHO_LOTE_FUSAO]
+        total += model._base_manager.filter(**{f"{por}__in": [d for d, _ in lote]}).update(
+            **{
+                campo.attname: Case(
+                    *[When(**{por: d}, then=Value(p)) for d, p in lote],
+                    output_field=IntegerField(),
+                )
+            }
+        )
+    return total
+
+
+def _consolidar(model: Type[Model], campo, chave: tuple, destino: Dict[int, int]) -> tuple[int, int]:
+    """Repontamento de tabela com chave unica: colisoes sao somadas (ou descartadas) no principal."""
+    outros = [model._meta.get_field(nome).attname for nome in chave if nome != campo.name]
+    somados = CAMPOS_SOMADOS_NA_FUSAO.get(model._meta.label_lower, ())
+    ids_envolvidos = set(destino) | set(destino.values())
+    linhas = model._base_manager.filter(**{f"{campo.attname}__in": ids_envolvidos}).values(
+        "pk", campo.attname, *outros, *somados
+    )
+
+    existentes: Dict[tuple, int] = {}
+    duplicadas = []
+    for linha in linhas:
+        if linha[campo.attname] in destino:
+            duplicadas.append(linha)
+        else:
+            existentes[(linha[campo.attname], *(linha[o] for o in outros))] = linha["pk"]
+
+    repontar: Dict[int, int] = {}
+    apagar: List[int] = []
+    for linha in duplicadas:
+        alvo = (destino[linha[campo.attname]], *(linha[o] for o in outros))
+        if alvo in existentes:
+            if somados:
+                model._base_manager.filter(pk=existentes[alvo]).update(
+                    **{s: F(s) + linha[s] for s in somados}
+                )
+            apagar.append(linha["pk"])
+        else:
+            repontar[linha["pk"]] = destino[linha[campo.attname]]
+            existentes[alvo] = linha["pk"]
+
+    if apagar:
+        model._base_manager.filter(pk__in=apagar).delete()
+    _repontar(model, campo, repontar, por="pk")
+    return len(repontar), len(apagar)
+
+
+@transaction.atomic
+def aplicar_fusoes(model: Type[Model], grupos: Iterable[GrupoDuplicados]) -> FusaoResult:
+    """
+    Funde os duplicados de cada grupo no principal: repontam-se todas as tabelas que referenciam
+    o model (ItemCompra, ItemVenda, EstoqueMovimento, Lote, ...), os nomes dos duplicados viram
+    alias do principal e os duplicados sao apagados.
+    """
+    grupos = list(grupos)
+    destino: Dict[int, int] = {}
+    for grupo in grupos:
+        for pk, _, _ in grupo.duplicados:
+            if pk != grupo.principal_id:
+                destino[pk] = grupo.principal_id
+    if not destino:
+        return FusaoResult(len(grupos), 0, 0, 0, 0)
+
+    principais = set(destino.values())
+    if principais & set(destino):
+        raise ValueError("Um registro não pode ser principal e duplicado ao mesmo tempo.")
+
+    alias_model = ALIAS_POR_MODELO[model]
+    duplicados = list(model.objects.filter(pk__in=list(destino)).values("pk", "nome", "nome_normalizado"))
+    normalizado_principal = dict(model.objects.filter(pk__in=principais).values_list("pk", "nome_normalizado"))
+
+    repontadas = consolidadas = 0
+    for related_model, campo in _relacoes(model):
+        chave = _chave_unica(related_model, campo)
+        if chave:
+            movidas, removidas = _consolidar(related_model, campo, chave, destino)
+            repontadas += movidas
+            consolidadas += removidas
+        else:
+            repontadas += _repontar(related_model, campo, destino)
+
+    skus: Dict[int, str] = {}
+    if model is Produto:
+        # Principal sem sku herda o do duplicado (o sku e unico: so depois de apagar o duplicado).
+        sem_sku = set(Produto.objects.filter(pk__in=principais, sku="").values_list("pk", flat=True))
+        for pk, sku in Produto.objects.filter(pk__in=list(destino)).exclude(sku="").values_list("pk", "sku"):
+            if destino[pk] in sem_sku:
+                skus.setdefault(destino[pk], sku)
+
+    aliases = [
+        alias_model(
+            principal_id=destino[d["pk"]],
+            nome=d["nome"],
+            nome_normalizado=d["nome_normalizado"] or normalizar_nome(d["nome"]),
+        )
+        for d in duplicados
+        if d["nome_normalizado"] != normalizado_principal.get(destino[d["pk"]])
+    ]
+    model.objects.filter(pk__in=list(destino)).delete()
+    antes = alias_model.objects.count()
+    alias_model.objects.bulk_create(aliases, batch_size=TAMANHO_LOTE_FUSAO, ignore_conflicts=True)
+    aliases_criados = alias_model.objects.count() - antes
+
+    if skus:
+        Produto.objects.bulk_update(
+            [Produto(pk=pk, sku=sku) for pk, sku in skus.items()], ["sku"], batch_size=TAMANHO_LOTE_FUSAO
+        )
+
+    # Celulas do historico que colidiram ficaram com a linha do principal: refaz a partir dos itens.
+    if model is Produto:
+        reconstruir_historico_precos(produto_ids=principais)
+    else:
+        reconstruir_historico_precos(fornecedor_ids=principais)
+
+    return FusaoResult(
+        grupos=len(grupos),
+        registros_removidos=len(duplicados),
+        aliases_criados=aliases_criados,
+        linhas_repontadas=repontadas,
+        linhas_consolidadas=consolidadas,
+    )
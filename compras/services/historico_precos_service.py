@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from compras.models import Compra, HistoricoPrecoFornecedor, ItemCompra
+
+Celula = Tuple[int, int, date]  # (produto_id, fornecedor_id, mes)
+
+CAMPOS_HISTORICO = [
+    "preco_minimo",
+    "preco_medio",
+    "ultimo_preco",
+    "ultima_compra_em",
+    "quantidade",
+    "valor_total",
+    "itens",
+    "atualizado_em",
+]
+
+
+@dataclass(frozen=True)
+class PontoTendencia:
+    mes: date
+    preco_medio: Decimal
+    preco_minimo: Decimal
+
+
+@dataclass(frozen=True)
+class ResumoPrecoProduto:
+    produto_id: int
+    melhor_fornecedor_id: int
+    melhor_fornecedor_nome: str
+    melhor_preco_medio: Decimal
+    melhor_ultimo_preco: Decimal
+    ultima_compra_em: date
+    tendencia: Tuple[PontoTendencia, ...]
+    variacao_percentual: Decimal
+
+
+def _mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+
+def _proximo_mes(inicio: date) -> date:
+    return (inicio + timedelta(days=32)).replace(day=1)
+
+
+def _itens_base():
+    return (
+        ItemCompra.objects.exclude(compra__status=Compra.StatusChoices.CANCELADA)
+        .order_by("compra__data_compra", "id")
+        .values_list("produto_id", "compra__fornecedor_id", "compra__data_compra", "quantidade", "preco_unitario")
+    )
+
+
+def _acumular(linhas, somente: Optional[Set[Celula]] = None) -> Dict[Celula, HistoricoPrecoFornecedor]:
+    """Linhas em ordem de data/id: o ultimo preco visto e o ultimo preco do mes."""
+    agora = timezone.now()
+    acumulado: Dict[Celula, HistoricoPrecoFornecedor] = {}
+    for produto_id, fornecedor_id, data_compra, quantidade, preco in linhas.iterator():
+        celula = (produto_id, fornecedor_id, _mes(data_compra))
+        if somente is not None and celula not in somente:
+            continue
+        hist = acumulado.get(celula)
+        if hist is None:
+            hist = acumulado[celula] = HistoricoPrecoFornecedor(
+                produto_id=produto_id,
+                fornecedor_id=fornecedor_id,
+                mes=celula[2],
+                preco_minimo=preco,
+                ultimo_preco=preco,
+                ultima_compra_em=data_compra,
+                quantidade=Decimal("0.000"),
+                valor_total=Decimal("0"),
+                itens=0,
+                atualizado_em=agora,
+            )
+        hist.preco_minimo = min(hist.preco_minimo, preco)
+        hist.ultimo_preco = preco
+        hist.ultima_compra_em = data_compra
+        hist.quantidade += quantidade
+        hist.valor_total += quantidade * preco
+        hist.itens += 1
+
+    for hist in acumulado.values():
+        hist.preco_medio = (
+            (hist.valor_total / hist.quantidade).quantize(Decimal("0.0001")) if hist.quantidade else hist.ultimo_preco
+        )
+        hist.valor_total = hist.valor_total.quantize(Decimal("0.01"))
+    return acumulado
+
+
+def _gravar(registros: List[HistoricoPrecoFornecedor]) -> None:
+    HistoricoPrecoFornecedor.objects.bulk_create(
+        registros,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["produto", "fornecedor", "mes"],
+        update_fields=CAMPOS_HISTORICO,
+    )
+
+
+def celulas_das_compras(compra_ids: Iterable[int]) -> Set[Celula]:
+    """Celulas (produto, fornecedor, mes) tocadas pelos itens atuais das compras."""
+    ids = [pk for pk in compra_ids if pk]
+    if not ids:
+        return set()
+    return {
+        (produto_id, fornecedor_id, _mes(data_compra))
+        for produto_id, fornecedor_id, data_compra in ItemCompra.objects.filter(compra_id__in=ids)
+        .values_list("produto_id", "compra__fornecedor_id", "compra__data_compra")
+        .distinct()
+    }
+
+
+@transaction.atomic
+def recalcular_historico_precos(celulas: Iterable[Celula]) -> int:
+    """
+    Recalcula as celulas informadas a partir dos itens de compra (min/ultimo nao sao
+    decrementais, entao a celula inteira e refeita). Celulas sem itens sao removidas.
+    """
+    celulas = set(celulas)
+    if not celulas:
+        return 0
+    meses = [mes for _, _, mes in celulas]
+    linhas = _itens_base().filter(
+        produto_id__in={p for p, _, _ in celulas},
+        compra__fornecedor_id__in={f for _, f, _ in celulas},
+        compra__data_compra__gte=min(meses),
+        compra__data_compra__lt=_proximo_mes(max(meses)),
+    )
+    acumulado = _acumular(linhas, somente=celulas)
+    _gravar(list(acumulado.values()))
+
+    vazias = list(celulas - acumulado.keys())
+    for inicio in range(0, len(vazias), 200):
+        filtro = Q()
+        for produto_id, fornecedor_id, mes in vazias[inicio:inicio + 200]:
+            filtro |= Q(produto_id=produto_id, fornecedor_id=fornecedor_id, mes=mes)
+        HistoricoPrecoFornecedor.objects.filter(filtro).delete()
+    return len(acumulado)
+
+
+def atualizar_historico_por_compras(compra_ids: Iterable[int], celulas_anteriores: Iterable[Celula] = ()) -> int:
+    """
+    Atalho para quem grava compras. Em edicao, passe as celulas de antes da alteracao
+    (itens removidos/data trocada) para que tambem sejam refeitas.
+    """
+    return recalcular_historico_precos(set(celulas_anteriores) | celulas_das_compras(compra_ids))
+
+
+@transaction.atomic
+def reconstruir_historico_precos(
+    *, produto_ids: Optional[Iterable[int]] = None, fornecedor_ids: Optional[Iterable[int]] = None
+) -> int:
+    """Refaz o historico inteiro (ou so dos produtos/fornecedores informados)."""
+    existentes = HistoricoPrecoFornecedor.objects.all()
+    linhas = _itens_base()
+    if produto_ids is not None:
+        produto_ids = list(produto_ids)
+        existentes = existentes.filter(produto_id__in=produto_ids)
+        linhas = linhas.filter(produto_id__in=produto_ids)
+    if fornecedor_ids is not None:
+        fornecedor_ids = list(fornecedor_ids)
+        existentes = existentes.filter(fornecedor_id__in=fornecedor_ids)
+        linhas = linhas.filter(compra__fornecedor_id__in=fornecedor_ids)
+    existentes.delete()
+    acumulado = _acumular(linhas)
+    _gravar(list(acumulado.values()))
+    return len(acumulado)
+
+
+def resumo_precos_produtos(
+    produto_ids: Iterable[int], *, meses: int = 6, hoje: Optional[date] = None
+) -> Dict[int, ResumoPrecoProduto]:
+    """
+    Para N produtos (ex.: lista de reposicao), em uma unica query no historico:
+    melhor fornecedor (menor preco medio ponderado na janela; empate -> compra mais recente)
+    e tendencia mensal do preco medio.
+    """
+    ids = {int(pk) for pk in produto_ids}
+    if not ids:
+        return {}
+    inicio = _mes(hoje or timezone.localdate())
+    for _ in range(max(meses, 1) - 1):
+        inicio = _mes(inicio - timedelta(days=1))
+
+    por_fornecedor: Dict[Tuple[int, int], list] = {}
+    por_mes: Dict[Tuple[int, date], list] = {}
+    for (
+        produto_id, fornecedor_id, fornecedor_nome, mes, preco_minimo, valor_total, quantidade, ultimo_preco, ultima_em,
+    ) in HistoricoPrecoFornecedor.objects.filter(produto_id__in=ids, mes__gte=inicio).values_list(
+        "produto_id",
+        "fornecedor_id",
+        "fornecedor__nome",
+        "mes",
+        "preco_minimo",
+        "valor_total",
+        "quantidade",
+        "ultimo_preco",
+        "ultima_compra_em",
+    ):
+        forn = por_fornecedor.setdefault(
+            (produto_id, fornecedor_id), [fornecedor_nome, Decimal("0"), Decimal("0"), ultimo_preco, ultima_em]
+        )
+        forn[1] += valor_total
+        forn[2] += quantidade
+        if ultima_em >= forn[4]:
+            forn[3], forn[4] = ultimo_preco, ultima_em
+
+        ponto = por_mes.setdefault((produto_id, mes), [Decimal("0"), Decimal("0"), preco_minimo])
+        ponto[0] += valor_total
+        ponto[1] += quantidade
+        ponto[2] = min(ponto[2], preco_minimo)
+
+    def medio(valor: Decimal, quantidade: Decimal) -> Decimal:
+        return (valor / quantidade).quantize(Decimal("0.0001")) if quantidade else Decimal("0.0000")
+
+    melhores: Dict[int, tuple] = {}
+    for (produto_id, fornecedor_id), (nome, valor, quantidade, ultimo, ultima_em) in por_fornecedor.items():
+        candidato = (medio(valor, quantidade), -ultima_em.toordinal(), fornecedor_id, nome, ultimo, ultima_em)
+        if produto_id not in melhores or candidato < melhores[produto_id]:
+            melhores[produto_id] = candidato
+
+    tendencias: Dict[int, List[PontoTendencia]] = {}
+    for (produto_id, mes), (valor, quantidade, minimo) in sorted(por_mes.items()):
+        tendencias.setdefault(produto_id, []).append(PontoTendencia(mes, medio(valor, quantidade), minimo))
+
+    resultado: Dict[int, ResumoPrecoProduto] = {}
+    for produto_id, (preco, _, fornecedor_id, nome, ultimo, ultima_em) in melhores.items():
+        pontos = tendencias[produto_id]
+        primeiro, atual = pontos[0].preco_medio, pontos[-1].preco_medio
+        variacao = ((atual - primeiro) / primeiro * 100).quantize(Decimal("0.01")) if primeiro else Decimal("0.00")
+        resultado[produto_id] = ResumoPrecoProduto(
+            produto_id=produto_id,
+            melhor_fornecedor_id=fornecedor_id,
+            melhor_fornecedor_nome=nome,
+            melhor_preco_medio=preco,
+            melhor_ultimo_preco=ultimo,
+            ultima_compra_em=ultima_em,
+            tendencia=tuple(pontos),
+            variacao_percentual=variacao,
+        )
+    return resultado
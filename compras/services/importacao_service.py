@@ -1,15 +1,29 @@
 from __future__ import annotations
 
 import csv
+from collections import defaultdict
 from dataclasses import dataclass
-from decimal import Decimal
-from typing import IO, List, Optional
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import IO, Iterable, Iterator, List, Optional
 
 from django.db import transaction
 from django.utils.dateparse import parse_date
 
-from compras.models import Fornecedor, Produto, Compra, ItemCompra, CentroCustoChoices, FornecedorAlias
+from compras.models import (
+    CentroCustoChoices,
+    Compra,
+    Fornecedor,
+    FornecedorAlias,
+    ItemCompra,
+    Produto,
+    ProdutoAlias,
+)
+from compras.services.historico_precos_service import recalcular_historico_precos
 from core.services.normalizacao import normalizar_nome
+from core.services.resolvers import ResolvedorNomes
+
+TAMANHO_LOTE_IMPORTACAO = 1000
 
 
 @dataclass
@@ -21,45 +35,195 @@ class ImportResult:
     erros: List[str]
 
 
-def _get_or_create_fornecedor(nome: str) -> Fornecedor:
-    nome = (nome or "").strip()
-    norm = normalizar_nome(nome)
-    if not norm:
+@dataclass(frozen=True)
+class LinhaCompra:
+    """Uma linha ja validada do arquivo de origem (1 linha = 1 item)."""
+    numero: int
+    data_compra: date
+    centro_custo: str
+    fornecedor: str
+    produto: str
+    quantidade: Decimal
+    preco_unitario: Decimal
+    sku: str = ""
+
+
+def _decimal(valor, campo: str) -> Decimal:
+    texto = str(valor if valor is not None else "").strip().replace(",", ".")
+    try:
+        return Decimal(texto or "0")
+    except InvalidOperation:
+        raise ValueError(f"{campo} inválido: {valor}")
+
+
+def montar_linha(
+    numero: int,
+    *,
+    data_compra: Optional[date],
+    centro_custo: str,
+    fornecedor: str,
+    produto: str,
+    quantidade,
+    preco_unitario,
+    sku: str = "",
+) -> LinhaCompra:
+    """Converte e valida os campos brutos de uma linha; levanta ValueError se invalida."""
+    if not data_compra:
+        raise ValueError("data_compra inválida")
+    centro_custo = (centro_custo or "").strip()
+    if centro_custo not in CentroCustoChoices.values:
+        raise ValueError(f"centro_custo inválido: {centro_custo}")
+    # Nome sem letra/numero (ex.: "---") normaliza para vazio e nao e resolvido nem criado.
+    fornecedor = (fornecedor or "").strip()
+    if not normalizar_nome(fornecedor):
         raise ValueError("Fornecedor vazio")
+    produto = (produto or "").strip()
+    if not normalizar_nome(produto):
+        raise ValueError("Produto vazio")
 
-    # 1) tenta alias
-    alias = FornecedorAlias.objects.select_related("principal").filter(nome_normalizado=norm).first()
-    if alias:
-        return alias.principal
-
-    # 2) tenta principal
-    obj = Fornecedor.objects.filter(nome_normalizado=norm).first()
-    if obj:
-        return obj
-
-    return Fornecedor.objects.create(nome=nome)
+    qtd = _decimal(quantidade, "quantidade")
+    preco = _decimal(preco_unitario, "preco_unitario")
+    if qtd <= 0 or preco < 0:
+        raise ValueError("Quantidade ou preço inválido")
+
+    return LinhaCompra(
+        numero=numero,
+        data_compra=data_compra,
+        centro_custo=centro_custo,
+        fornecedor=fornecedor,
+        produto=produto,
+        quantidade=qtd,
+        preco_unitario=preco,
+        sku=(sku or "").strip(),
+    )
 
 
-def _get_or_create_produto(nome: str, sku: str = "") -> Produto:
-    nome = (nome or "").strip()
-    if not nome:
-        raise ValueError("Produto vazio")
-    sku = (sku or "").strip()
+def _em_lotes(itens: Iterable, tamanho: int) -> Iterator[list]:
+    lote: list = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
 
-    if sku:
-        obj = Produto.objects.filter(sku=sku).first()
-        if obj:
-            return obj
 
-    norm = normalizar_nome(nome)
-    obj = Produto.objects.filter(nome_normalizado=norm).first()
-    if obj:
-        return obj
+class ImportadorComprasLote:
+    """
+    Motor de importacao em lote compartilhado pelos comandos de CSV e Excel.
+    - resolve fornecedores (alias -> principal) e produtos (sku -> nome) via ResolvedorNomes,
+      com um IN por entidade
+    - cria os faltantes via bulk_create
+    - grava compras (com valor_total ja calculado) e itens em bulk inserts por lote
+    """
 
-    return Produto.objects.create(nome=nome, sku=sku)
+    def __init__(
+        self,
+        *,
+        observacoes: str = "",
+        tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO,
+        fornecedores: Optional[ResolvedorNomes] = None,
+        produtos: Optional[ResolvedorNomes] = None,
+    ):
+        self.observacoes = observacoes
+        self.tamanho_lote = tamanho_lote
+        # Resolvedores podem ser reaproveitados entre arquivos de uma mesma carga.
+        self.fornecedores = fornecedores or ResolvedorNomes(
+            Fornecedor, alias_model=FornecedorAlias, tamanho_lote=tamanho_lote
+        )
+        self.produtos = produtos or ResolvedorNomes(Produto, alias_model=ProdutoAlias, tamanho_lote=tamanho_lote)
+
+    def _resolver_produtos(self, linhas: list[LinhaCompra]) -> tuple[dict[str, int], dict[str, int], int]:
+        """Retorna ({sku: produto_id}, {nome: produto_id}, criados)."""
+        skus = {linha.sku for linha in linhas if linha.sku}
+        por_sku = dict(Produto.objects.filter(sku__in=skus).values_list("sku", "id")) if skus else {}
+
+        # Sku novo gera um produto so, com o nome da primeira linha em que aparece;
+        # outros nomes com o mesmo sku apontam para esse produto.
+        nome_por_sku: dict[str, str] = {}
+        sku_por_nome: dict[str, str] = {}
+        for linha in linhas:
+            if linha.sku in por_sku:
+                continue
+            if linha.sku and nome_por_sku.setdefault(linha.sku, linha.produto) != linha.produto:
+                continue
+            sku_por_nome.setdefault(linha.produto, linha.sku)
+        por_nome, criados = self.produtos.resolver_ou_criar_ids(
+            sku_por_nome,
+            lambda nome, norm: Produto(nome=nome, nome_normalizado=norm, sku=sku_por_nome[nome]),
+        )
+        for sku, nome in nome_por_sku.items():
+            por_sku.setdefault(sku, por_nome[nome])
+        return por_sku, por_nome, criados
+
+    @transaction.atomic
+    def importar(self, linhas: Iterable[LinhaCompra], erros: Optional[List[str]] = None) -> ImportResult:
+        linhas = list(linhas)
+        erros = list(erros or [])
+        if not linhas:
+            return ImportResult(0, 0, 0, 0, erros)
+
+        # bulk_create nao passa por save(): nome_normalizado vai preenchido pela fabrica.
+        fornecedor_ids, fornecedores_criados = self.fornecedores.resolver_ou_criar_ids(
+            (linha.fornecedor for linha in linhas),
+            lambda nome, norm: Fornecedor(nome=nome, nome_normalizado=norm),
+            ignorar_conflitos=True,
+        )
+        por_sku, por_nome, produtos_criados = self._resolver_produtos(linhas)
+
+        # Agrupa itens por compra (data + centro + fornecedor) e ja soma o total.
+        grupos: dict[tuple, list[tuple[LinhaCompra, int]]] = defaultdict(list)
+        for linha in linhas:
+            fornecedor_id = fornecedor_ids[linha.fornecedor]
+            produto_id = por_sku.get(linha.sku) if linha.sku else None
+            produto_id = produto_id or por_nome[linha.produto]
+            grupos[(linha.data_compra, linha.centro_custo, fornecedor_id)].append((linha, produto_id))
+
+        compras = [
+            Compra(
+                fornecedor_id=fornecedor_id,
+                centro_custo=centro,
+                data_compra=data_compra,
+                observacoes=self.observacoes,
+                valor_total=sum(
+                    (linha.quantidade * linha.preco_unitario for linha, _ in itens), Decimal("0.00")
+                ).quantize(Decimal("0.01")),
+            )
+            for (data_compra, centro, fornecedor_id), itens in grupos.items()
+        ]
+        Compra.objects.bulk_create(compras, batch_size=self.tamanho_lote)
+
+        itens_compra = (
+            ItemCompra(
+                compra_id=compra.pk,
+                produto_id=produto_id,
+                quantidade=linha.quantidade,
+                preco_unitario=linha.preco_unitario,
+            )
+            for compra, itens in zip(compras, grupos.values())
+            for linha, produto_id in itens
+        )
+        itens_criados = 0
+        for lote in _em_lotes(itens_compra, self.tamanho_lote):
+            ItemCompra.objects.bulk_create(lote)
+            itens_criados += len(lote)
+
+        recalcular_historico_precos(
+            (produto_id, fornecedor_id, data_compra.replace(day=1))
+            for (data_compra, _, fornecedor_id), itens in grupos.items()
+            for _, produto_id in itens
+        )
+
+        return ImportResult(
+            compras_criadas=len(compras),
+            itens_criados=itens_criados,
+            fornecedores_criados=fornecedores_criados,
+            produtos_criados=produtos_criados,
+            erros=erros,
+        )
 
 
-@transaction.atomic
 def import_compras_csv(file: IO[str]) -> ImportResult:
     """
     CSV esperado (colunas):
@@ -67,68 +231,23 @@ def import_compras_csv(file: IO[str]) -> ImportResult:
       fornecedor, produto, sku(opcional), quantidade, preco_unitario
     Cada linha = 1 item (agrupado por data+centro_custo+fornecedor).
     """
-    reader = csv.DictReader(file)
-    compras_map = {}  # key -> Compra
-    compras_criadas = itens_criados = fornecedores_criados = produtos_criados = 0
+    linhas: List[LinhaCompra] = []
     erros: List[str] = []
-
-    for i, row in enumerate(reader, start=2):
+    for i, row in enumerate(csv.DictReader(file), start=2):
         try:
-            data_compra = parse_date((row.get("data_compra") or "").strip())
-            if not data_compra:
-                raise ValueError("data_compra inválida")
-
-            centro = (row.get("centro_custo") or "").strip()
-            if centro not in CentroCustoChoices.values:
-                raise ValueError(f"centro_custo inválido: {centro}")
-
-            fornecedor_nome = (row.get("fornecedor") or "").strip()
-            fornecedor = _get_or_create_fornecedor(fornecedor_nome)
-
-            produto_nome = (row.get("produto") or "").strip()
-            sku = (row.get("sku") or "").strip()
-            produto = _get_or_create_produto(produto_nome, sku=sku)
-
-            quantidade = Decimal((row.get("quantidade") or "0").replace(",", "."))
-            preco = Decimal((row.get("preco_unitario") or "0").replace(",", "."))
-
-            key = (data_compra.isoformat(), centro, fornecedor.id)
-            compra = compras_map.get(key)
-            if not compra:
-                compra = Compra.objects.create(
-                    fornecedor=fornecedor,
-                    centro_custo=centro,
-                    data_compra=data_compra,
-                    observacoes="Importado via CSV",
+            linhas.append(
+                montar_linha(
+                    i,
+                    data_compra=parse_date((row.get("data_compra") or "").strip()),
+                    centro_custo=row.get("centro_custo"),
+                    fornecedor=row.get("fornecedor"),
+                    produto=row.get("produto"),
+                    sku=row.get("sku"),
+                    quantidade=row.get("quantidade"),
+                    preco_unitario=row.get("preco_unitario"),
                 )
-                compras_map[key] = compra
-                compras_criadas += 1
-
-            ItemCompra.objects.create(
-                compra=compra,
-                produto=produto,
-                quantidade=quantidade,
-                preco_unitario=preco,
             )
-            itens_criados += 1
-
-        except Exception as e:
+        except ValueError as e:
             erros.append(f"Linha {i}: {e}")
 
-    # Recalcula totals de todas as compras importadas
-    for compra in compras_map.values():
-        total = Decimal("0.00")
-        for it in compra.itens.all():
-            total += (it.quantidade or Decimal("0")) * (it.preco_unitario or Decimal("0"))
-        compra.valor_total = total.quantize(Decimal("0.01"))
-        compra.save(update_fields=["valor_total"])
-
-    # Contagens aproximadas de fornecedores/produtos criados (não rastreamos aqui com precisão sem mais queries)
-    # Mantemos como 0 por default para não mentir.
-    return ImportResult(
-        compras_criadas=compras_criadas,
-        itens_criados=itens_criados,
-        fornecedores_criados=fornecedores_criados,
-        produtos_criados=produtos_criados,
-        erros=erros,
-    )
+    return ImportadorComprasLote(observacoes="Importado via CSV").importar(linhas, erros)
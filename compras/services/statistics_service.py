@@ -5,24 +5,60 @@ Fornece dados agregados, tendências e insights
 from __future__ import annotations
 
 from decimal import Decimal
-from datetime import datetime, timedelta
-from django.db.models import Sum, Count, Q, Avg
+from datetime import date, timedelta
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
 from django.utils import timezone
 
 from compras.models import Compra, ItemCompra, Fornecedor, CentroCustoChoices
 
+VALOR_ITEM = ExpressionWrapper(
+    F("quantidade") * F("preco_unitario"), output_field=DecimalField(max_digits=20, decimal_places=5)
+)
+
+
+def _inicio_mes(dia: date) -> date:
+    return dia.replace(day=1)
+
+
+def _mes_anterior(inicio: date) -> date:
+    return (inicio - timedelta(days=1)).replace(day=1)
+
+
+def _proximo_mes(inicio: date) -> date:
+    return (inicio + timedelta(days=32)).replace(day=1)
+
 
 class ComprasStatisticsService:
     """Serviço de estatísticas avançadas de compras"""
 
     @staticmethod
-    def obter_estatisticas_gerais() -> dict:
-        """Obtém estatísticas gerais de compras"""
-        total_compras = Compra.objects.count()
-        total_itens = ItemCompra.objects.count()
-        total_valor = Compra.objects.aggregate(Sum('valor_total'))['valor_total__sum'] or Decimal('0')
-        total_fornecedores = Fornecedor.objects.count()
+    def _agregar_compras(hoje: date | None = None) -> dict:
+        """
+        Uma unica query (agregacao condicional) com totais gerais, por centro de custo
+        e dos meses atual/anterior. Meses filtrados por faixa para usar o indice de data_compra.
+        """
+        hoje = hoje or timezone.localdate()
+        inicio_mes = _inicio_mes(hoje)
+        inicio_anterior = _mes_anterior(inicio_mes)
+        medidas = {
+            "total_compras": Count("id"),
+            "total_valor": Sum("valor_total"),
+            "gasto_mes": Sum(
+                "valor_total", filter=Q(data_compra__gte=inicio_mes, data_compra__lt=_proximo_mes(inicio_mes))
+            ),
+            "gasto_mes_anterior": Sum(
+                "valor_total", filter=Q(data_compra__gte=inicio_anterior, data_compra__lt=inicio_mes)
+            ),
+        }
+        for i, (valor, _) in enumerate(CentroCustoChoices.choices):
+            medidas[f"centro_{i}_valor"] = Sum("valor_total", filter=Q(centro_custo=valor))
+            medidas[f"centro_{i}_qtd"] = Count("id", filter=Q(centro_custo=valor))
+        return Compra.objects.aggregate(**medidas)
 
+    @staticmethod
+    def _montar_gerais(agregado: dict, total_itens: int, total_fornecedores: int) -> dict:
+        total_compras = agregado["total_compras"] or 0
+        total_valor = agregado["total_valor"] or Decimal('0')
         return {
             'total_compras': total_compras,
             'total_itens': total_itens,
@@ -31,6 +67,50 @@ class ComprasStatisticsService:
             'ticket_medio': total_valor / total_compras if total_compras > 0 else Decimal('0'),
         }
 
+    @staticmethod
+    def _montar_por_centro(agregado: dict) -> dict:
+        return {
+            label: {
+                'valor': agregado[f"centro_{i}_valor"] or Decimal('0'),
+                'quantidade': agregado[f"centro_{i}_qtd"] or 0,
+            }
+            for i, (_, label) in enumerate(CentroCustoChoices.choices)
+        }
+
+    @staticmethod
+    def _montar_tendencias(agregado: dict) -> dict:
+        gasto_mes = agregado["gasto_mes"] or Decimal('0')
+        gasto_mes_anterior = agregado["gasto_mes_anterior"] or Decimal('0')
+
+        # Calcular variação
+        variacao = Decimal('0')
+        if gasto_mes_anterior > 0:
+            variacao = ((gasto_mes - gasto_mes_anterior) / gasto_mes_anterior) * 100
+
+        return {
+            'gasto_mes_atual': gasto_mes,
+            'gasto_mes_anterior': gasto_mes_anterior,
+            'variacao_percentual': variacao,
+            'tendencia': 'ALTA' if variacao > 0 else 'BAIXA' if variacao < 0 else 'ESTÁVEL',
+        }
+
+    @classmethod
+    def obter_painel(cls, top_fornecedores: int = 5) -> dict:
+        """Tudo que o painel de compras exibe, em 4 queries (independente do volume)."""
+        agregado = cls._agregar_compras()
+        return {
+            'stats': cls._montar_gerais(agregado, ItemCompra.objects.count(), Fornecedor.objects.count()),
+            'top_fornecedores': list(cls.obter_top_fornecedores(top_fornecedores)),
+            'tendencias': cls._montar_tendencias(agregado),
+            'compras_por_centro': cls._montar_por_centro(agregado),
+        }
+
+    @classmethod
+    def obter_estatisticas_gerais(cls) -> dict:
+        """Obtém estatísticas gerais de compras"""
+        agregado = Compra.objects.aggregate(total_compras=Count("id"), total_valor=Sum("valor_total"))
+        return cls._montar_gerais(agregado, ItemCompra.objects.count(), Fornecedor.objects.count())
+
     @staticmethod
     def obter_top_fornecedores(limit: int = 10) -> list:
         """Retorna os fornecedores com maior volume de compras"""
@@ -51,76 +131,43 @@ class ComprasStatisticsService:
             ItemCompra.objects.values('produto__nome', 'produto__id')
             .annotate(
                 quantidade_total=Sum('quantidade'),
-                valor_total=Sum(Sum('preco_unitario')),
+                valor_total=Sum(VALOR_ITEM),
                 vezes_comprado=Count('id'),
             )
             .order_by('-vezes_comprado')[:limit]
         )
 
-    @staticmethod
-    def obter_compras_por_centro_custo() -> dict:
+    @classmethod
+    def obter_compras_por_centro_custo(cls) -> dict:
         """Retorna estatísticas por centro de custo"""
-        result = {}
-        for choice_val, choice_label in CentroCustoChoices.choices:
-            stats = Compra.objects.filter(centro_custo=choice_val).aggregate(
-                total_valor=Sum('valor_total'),
-                quantidade=Count('id'),
-            )
-            result[choice_label] = {
-                'valor': stats['total_valor'] or Decimal('0'),
-                'quantidade': stats['quantidade'] or 0,
-            }
-        return result
+        medidas = {}
+        for i, (valor, _) in enumerate(CentroCustoChoices.choices):
+            medidas[f"centro_{i}_valor"] = Sum("valor_total", filter=Q(centro_custo=valor))
+            medidas[f"centro_{i}_qtd"] = Count("id", filter=Q(centro_custo=valor))
+        return cls._montar_por_centro(Compra.objects.aggregate(**medidas))
 
     @staticmethod
     def obter_compras_por_periodo(dias: int = 30) -> list:
         """Retorna compras agrupadas por período (últimos N dias)"""
-        data_inicio = timezone.now() - timedelta(days=dias)
+        # data_compra ja e DateField: agrupa pela propria coluna (sem .extra/DATE()).
+        data_inicio = timezone.localdate() - timedelta(days=dias)
         compras = (
             Compra.objects
-            .filter(data_compra__gte=data_inicio.date())
-            .extra(select={'data': 'DATE(data_compra)'})
-            .values('data')
+            .filter(data_compra__gte=data_inicio)
+            .values('data_compra')
             .annotate(
                 total=Sum('valor_total'),
                 quantidade=Count('id'),
             )
-            .order_by('data')
+            .order_by('data_compra')
+            .values('total', 'quantidade', data=F('data_compra'))
         )
         return list(compras)
 
-    @staticmethod
-    def obter_tendencias() -> dict:
+    @classmethod
+    def obter_tendencias(cls) -> dict:
         """Analisa tendências de compra"""
-        hoje = timezone.now().date()
-        mes_atual = hoje.month
-        ano_atual = hoje.year
-
-        # Gastos do mês atual
-        gasto_mes = Compra.objects.filter(
-            data_compra__month=mes_atual,
-            data_compra__year=ano_atual,
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or Decimal('0')
-
-        # Gastos do mês anterior
-        mes_anterior = mes_atual - 1 if mes_atual > 1 else 12
-        ano_anterior = ano_atual if mes_atual > 1 else ano_atual - 1
-        gasto_mes_anterior = Compra.objects.filter(
-            data_compra__month=mes_anterior,
-            data_compra__year=ano_anterior,
-        ).aggregate(Sum('valor_total'))['valor_total__sum'] or Decimal('0')
-
-        # Calcular variação
-        variacao = Decimal('0')
-        if gasto_mes_anterior > 0:
-            variacao = ((gasto_mes - gasto_mes_anterior) / gasto_mes_anterior) * 100
-
-        return {
-            'gasto_mes_atual': gasto_mes,
-            'gasto_mes_anterior': gasto_mes_anterior,
-            'variacao_percentual': variacao,
-            'tendencia': 'ALTA' if variacao > 0 else 'BAIXA' if variacao < 0 else 'ESTÁVEL',
-        }
+        return cls._montar_tendencias(cls._agregar_compras())
 
     @staticmethod
     def obter_fornecedores_por_categoria() -> dict:
@@ -155,32 +202,29 @@ class ComprasStatisticsService:
 
         Resultado: lista de dicts {fornecedor_id, fornecedor_nome, ultimo_preco, preco_medio, quantidade_total}
         """
-        desde = timezone.now().date() - timedelta(days=dias)
-        itens = (
-            ItemCompra.objects.filter(produto_id=produto_id, compra__data_compra__gte=desde)
-            .select_related("compra__fornecedor")
+        desde = timezone.localdate() - timedelta(days=dias)
+        itens = ItemCompra.objects.filter(produto_id=produto_id, compra__data_compra__gte=desde)
+        ultimo_preco = (
+            itens.filter(compra__fornecedor_id=OuterRef("compra__fornecedor_id"))
+            .order_by("-compra__data_compra", "-id")
+            .values("preco_unitario")[:1]
+        )
+        linhas = (
+            itens.values("compra__fornecedor_id", "compra__fornecedor__nome")
+            .annotate(
+                total_valor=Sum(VALOR_ITEM),
+                quantidade_total=Sum("quantidade"),
+                ultimo_preco=Subquery(ultimo_preco),
+            )
+            .order_by()
         )
-
-        agreg: dict[int, dict] = {}
-        for it in itens:
-            f = it.compra.fornecedor
-            fid = f.id
-            if fid not in agreg:
-                agreg[fid] = {"fornecedor_id": fid, "fornecedor_nome": f.nome, "ultimo_preco": it.preco_unitario, "total_valor": it.preco_unitario * it.quantidade, "quantidade_total": it.quantidade, "ultima_data": it.compra.data_compra}
-            else:
-                # atualiza ultimo_preco se data mais recente
-                if it.compra.data_compra >= agreg[fid]["ultima_data"]:
-                    agreg[fid]["ultimo_preco"] = it.preco_unitario
-                    agreg[fid]["ultima_data"] = it.compra.data_compra
-                agreg[fid]["total_valor"] += it.preco_unitario * it.quantidade
-                agreg[fid]["quantidade_total"] += it.quantidade
 
         resultados = []
-        for v in agreg.values():
+        for v in linhas:
             preco_medio = (v["total_valor"] / v["quantidade_total"]) if v["quantidade_total"] > 0 else Decimal("0")
             resultados.append({
-                "fornecedor_id": v["fornecedor_id"],
-                "fornecedor_nome": v["fornecedor_nome"],
+                "fornecedor_id": v["compra__fornecedor_id"],
+                "fornecedor_nome": v["compra__fornecedor__nome"],
                 "ultimo_preco": v["ultimo_preco"],
                 "preco_medio": preco_medio,
                 "quantidade_total": v["quantidade_total"],
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import io
+from datetime import timedelta
 from decimal import Decimal
 from django.test import TestCase
 from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from compras.models import Fornecedor, Produto, Compra, ItemCompra
+from compras.models import Fornecedor, FornecedorAlias, Produto, Compra, ItemCompra
 from compras.services.compras_service import recalcular_total
+from compras.services.importacao_service import import_compras_csv
 from compras.forms import CompraForm
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from estoque.models import ProdutoEstoque, EstoqueMovimento, Lote
 
 
@@ -146,3 +151,255 @@ class ComprasRegrasTest(TestCase):
         self.client.force_login(admin)
         resp_ok = self.client.get(reverse("compras:compra_aprovacao_list"))
         self.assertEqual(resp_ok.status_code, 200)
+
+
+class ImportacaoComprasLoteTest(TestCase):
+    def _csv(self, linhas):
+        cabecalho = "data_compra,centro_custo,fornecedor,produto,sku,quantidade,preco_unitario"
+        return io.StringIO("\n".join([cabecalho, *linhas]) + "\n")
+
+    def test_importa_csv_em_lote_resolvendo_alias_e_sku(self):
+        principal = Fornecedor.objects.create(nome="Eletrica Central LTDA")
+        FornecedorAlias.objects.create(principal=principal, nome="Elétrica Central")
+        existente = Produto.objects.create(nome="Lampada LED 9W", sku="LED-9W")
+
+        result = import_compras_csv(self._csv([
+            "2024-03-01,FM,Elétrica Central,Lampada 9W generica,LED-9W,10,\"7,50\"",
+            "2024-03-01,FM,eletrica central,Fita LED 5m,,2,40.00",
+            "2024-03-02,ML,Fornecedor Novo,fita led 5M,,1,35.00",
+            "2024-03-02,ML,Fornecedor Novo,Spot,,0,10.00",
+            "data-ruim,ML,Fornecedor Novo,Spot,,1,10.00",
+        ]))
+
+        self.assertEqual(result.compras_criadas, 2)
+        self.assertEqual(result.itens_criados, 3)
+        self.assertEqual(result.fornecedores_criados, 1)
+        self.assertEqual(result.produtos_criados, 1)
+        self.assertEqual(len(result.erros), 2)
+
+        compra_alias = Compra.objects.get(fornecedor=principal)
+        self.assertEqual(compra_alias.valor_total, Decimal("155.00"))
+        self.assertEqual(compra_alias.itens.filter(produto=existente).count(), 1)
+        fita = Produto.objects.get(nome_normalizado="FITA LED 5M")
+        self.assertEqual(ItemCompra.objects.filter(produto=fita).count(), 2)
+        self.assertEqual(Compra.objects.get(fornecedor__nome="Fornecedor Novo").valor_total, Decimal("35.00"))
+
+    def test_sku_novo_com_dois_nomes_cria_um_produto(self):
+        result = import_compras_csv(self._csv([
+            "2024-03-01,FM,Fornecedor A,Painel LED 18W,PNL-18,1,30.00",
+            "2024-03-01,FM,Fornecedor A,Painel 18W embutir,PNL-18,2,30.00",
+        ]))
+
+        self.assertEqual(result.erros, [])
+        self.assertEqual(result.produtos_criados, 1)
+        painel = Produto.objects.get(sku="PNL-18")
+        self.assertEqual(painel.nome, "Painel LED 18W")
+        self.assertEqual(ItemCompra.objects.filter(produto=painel).count(), 2)
+
+    def test_nome_que_normaliza_vazio_vira_erro_da_linha(self):
+        result = import_compras_csv(self._csv([
+            "2024-03-01,FM,---,Spot LED,,1,10.00",
+            "2024-03-01,FM,Fornecedor A,...,,1,10.00",
+            "2024-03-01,FM,Fornecedor A,Spot LED,,1,10.00",
+        ]))
+
+        self.assertEqual(result.erros, ["Linha 2: Fornecedor vazio", "Linha 3: Produto vazio"])
+        self.assertEqual(result.itens_criados, 1)
+
+    def test_numero_de_queries_nao_cresce_com_linhas(self):
+        def linhas(prefixo, n):
+            return [f"2024-04-{1 + i % 5:02d},FM,{prefixo} Fornecedor {i % 3},{prefixo} Produto {i},,1,1.00" for i in range(n)]
+
+        with CaptureQueriesContext(connection) as poucas:
+            import_compras_csv(self._csv(linhas("A", 5)))
+        with CaptureQueriesContext(connection) as muitas:
+            import_compras_csv(self._csv(linhas("B", 60)))
+        self.assertEqual(len(poucas), len(muitas))
+
+
+class DeduplicacaoCadastrosTest(TestCase):
+    def test_propoe_grupos_por_similaridade_sem_misturar_numeros(self):
+        from core.services.deduplicacao import propor_grupos
+
+        grupos = propor_grupos([
+            (1, "LED LAMP 9W BIVOLT"),
+            (2, "LAMPADA LED 9W BIV"),
+            (3, "Lâmpada LED 12W Bivolt"),
+            (4, "Fita LED 5m"),
+        ])
+        self.assertEqual(len(grupos), 1)
+        self.assertEqual(grupos[0].principal_id, 1)
+        self.assertEqual([pk for pk, _, _ in grupos[0].duplicados], [2])
+
+    def test_aplicar_fusao_reponta_consolida_e_cria_alias(self):
+        from compras.models import ProdutoAlias
+        from compras.services.deduplicacao_service import aplicar_fusoes, propor_fusoes_produtos
+        from estoque.models import ProdutoEstoqueUnidade, UnidadeLoja
+
+        sem_sku = Produto.objects.create(nome="LED LAMP 9W BIVOLT")
+        com_sku = Produto.objects.create(nome="LAMPADA LED 9W BIV", sku="LMP-9")
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor Dedup")
+        compra = Compra.objects.create(fornecedor=fornecedor, centro_custo="FM", data_compra=timezone.localdate())
+        item = ItemCompra.objects.create(compra=compra, produto=com_sku, quantidade=Decimal("3"), preco_unitario=Decimal("5.00"))
+        ProdutoEstoque.objects.create(produto=sem_sku, saldo_atual=Decimal("2.000"))
+        ProdutoEstoque.objects.create(produto=com_sku, saldo_atual=Decimal("3.000"))
+        ProdutoEstoqueUnidade.objects.create(produto=com_sku, unidade=UnidadeLoja.LOJA_2, saldo_atual=Decimal("3.000"))
+
+        grupos = propor_fusoes_produtos()
+        # Produto com sku tem prioridade para ser o principal.
+        self.assertEqual(grupos[0].principal_id, com_sku.id)
+        result = aplicar_fusoes(Produto, grupos)
+
+        self.assertEqual(result.registros_removidos, 1)
+        self.assertFalse(Produto.objects.filter(pk=sem_sku.pk).exists())
+        item.refresh_from_db()
+        self.assertEqual(item.produto_id, com_sku.id)
+        self.assertEqual(ProdutoEstoque.objects.get().saldo_atual, Decimal("5.000"))
+        self.assertEqual(ProdutoEstoqueUnidade.objects.get().produto_id, com_sku.id)
+        self.assertTrue(ProdutoAlias.objects.filter(principal=com_sku, nome_normalizado="LED LAMP 9W BIVOLT").exists())
+
+        # Importacoes seguintes resolvem o nome antigo pelo alias.
+        import_compras_csv(io.StringIO(
+            "data_compra,centro_custo,fornecedor,produto,sku,quantidade,preco_unitario\n"
+            "2024-05-01,FM,Fornecedor Dedup,Led Lamp 9W Bivolt,,1,5.00\n"
+        ))
+        self.assertEqual(Produto.objects.count(), 1)
+
+    def test_aplicar_fusao_soma_celulas_do_cubo_de_vendas(self):
+        from compras.services.deduplicacao_service import aplicar_fusoes
+        from core.services.deduplicacao import GrupoDuplicados
+        from estoque.models import UnidadeLoja
+        from vendas.models import CuboVendaMensal, TipoPagamentoChoices
+
+        principal = Produto.objects.create(nome="Fita LED 5m", sku="FITA-5")
+        duplicado = Produto.objects.create(nome="Fita de LED 5 metros")
+        vendedor = get_user_model().objects.create_user("vendedor_cubo", password="x")
+        mes = timezone.localdate().replace(day=1)
+
+        def celula(produto, vendedor, quantidade, receita):
+            return CuboVendaMensal.objects.create(
+                mes=mes, produto=produto, unidade=UnidadeLoja.LOJA_1, vendedor=vendedor,
+                tipo_pagamento=TipoPagamentoChoices.PIX, quantidade=quantidade, receita=receita,
+                custo=Decimal("1.00"), itens=1,
+            )
+
+        # Vendedor nulo e vendedor preenchido colidem cada um com a celula equivalente do principal.
+        celula(principal, None, Decimal("2.000"), Decimal("20.00"))
+        celula(duplicado, None, Decimal("3.000"), Decimal("30.00"))
+        celula(principal, vendedor, Decimal("1.000"), Decimal("10.00"))
+        celula(duplicado, vendedor, Decimal("4.000"), Decimal("40.00"))
+
+        result = aplicar_fusoes(
+            Produto, [GrupoDuplicados(principal.id, principal.nome, ((duplicado.id, duplicado.nome, 0.9),))]
+        )
+
+        self.assertEqual(result.registros_removidos, 1)
+        celulas = {c.vendedor_id: c for c in CuboVendaMensal.objects.all()}
+        self.assertEqual(set(celulas), {None, vendedor.id})
+        self.assertTrue(all(c.produto_id == principal.id for c in celulas.values()))
+        self.assertEqual((celulas[None].quantidade, celulas[None].receita), (Decimal("5.000"), Decimal("50.00")))
+        self.assertEqual(celulas[vendedor.id].quantidade, Decimal("5.000"))
+        self.assertEqual((celulas[vendedor.id].custo, celulas[vendedor.id].itens), (Decimal("2.00"), 2))
+
+
+class ComprasStatisticsServiceTest(TestCase):
+    def setUp(self):
+        from compras.services.statistics_service import ComprasStatisticsService
+
+        self.service = ComprasStatisticsService
+        hoje = timezone.localdate()
+        self.fornecedor_a = Fornecedor.objects.create(nome="Fornecedor Stats A")
+        self.fornecedor_b = Fornecedor.objects.create(nome="Fornecedor Stats B")
+        self.produto = Produto.objects.create(nome="Produto Stats")
+        mes_anterior = hoje.replace(day=1) - timedelta(days=1)
+        for fornecedor, centro, data, qtd, preco in [
+            (self.fornecedor_a, "FM", hoje, "2", "10.00"),
+            (self.fornecedor_a, "FM", mes_anterior, "1", "30.00"),
+            (self.fornecedor_b, "ML", hoje, "4", "5.00"),
+        ]:
+            compra = Compra.objects.create(fornecedor=fornecedor, centro_custo=centro, data_compra=data)
+            ItemCompra.objects.create(compra=compra, produto=self.produto, quantidade=Decimal(qtd), preco_unitario=Decimal(preco))
+            recalcular_total(compra)
+
+    def test_painel_em_numero_fixo_de_queries(self):
+        with self.assertNumQueries(4):
+            painel = self.service.obter_painel()
+        self.assertEqual(painel["stats"]["total_compras"], 3)
+        self.assertEqual(painel["stats"]["total_valor"], Decimal("70.00"))
+        self.assertEqual(painel["compras_por_centro"]["FM"], {"valor": Decimal("50.00"), "quantidade": 2})
+        self.assertEqual(painel["compras_por_centro"]["OUTROS"], {"valor": Decimal("0"), "quantidade": 0})
+        self.assertEqual(painel["tendencias"]["gasto_mes_atual"], Decimal("40.00"))
+        self.assertEqual(painel["tendencias"]["gasto_mes_anterior"], Decimal("30.00"))
+        self.assertEqual(painel["top_fornecedores"][0]["id"], self.fornecedor_a.id)
+
+    def test_precos_por_produto_agrega_no_banco(self):
+        with self.assertNumQueries(1):
+            precos = self.service.obter_precos_por_produto(self.produto.id, dias=120)
+        self.assertEqual([p["fornecedor_id"] for p in precos], [self.fornecedor_b.id, self.fornecedor_a.id])
+        self.assertEqual(precos[1]["ultimo_preco"], Decimal("10.00"))
+        self.assertEqual(precos[1]["preco_medio"], Decimal("50.00") / Decimal("3"))
+        self.assertEqual(precos[1]["quantidade_total"], Decimal("3.000"))
+
+
+class HistoricoPrecosTest(TestCase):
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        self.mes_anterior = self.hoje.replace(day=1) - timedelta(days=1)
+        self.barato = Fornecedor.objects.create(nome="Fornecedor Barato")
+        self.caro = Fornecedor.objects.create(nome="Fornecedor Caro")
+        self.lampada = Produto.objects.create(nome="Lampada Historico")
+        self.fita = Produto.objects.create(nome="Fita Historico")
+
+    def _comprar(self, fornecedor, data, *itens):
+        from compras.services.compras_service import ItemPayload, criar_compra_com_itens
+
+        return criar_compra_com_itens(
+            fornecedor=fornecedor,
+            centro_custo="FM",
+            data_compra=data,
+            itens=[ItemPayload(produto=p, quantidade=Decimal(q), preco_unitario=Decimal(v)) for p, q, v in itens],
+        )
+
+    def test_criar_compra_atualiza_historico_e_resumo_em_uma_query(self):
+        from compras.models import HistoricoPrecoFornecedor
+        from compras.services.historico_precos_service import resumo_precos_produtos
+
+        self._comprar(self.caro, self.mes_anterior, (self.lampada, "10", "12.00"))
+        self._comprar(self.caro, self.hoje, (self.lampada, "10", "14.00"), (self.fita, "1", "30.00"))
+        self._comprar(self.barato, self.hoje, (self.lampada, "5", "10.00"), (self.lampada, "5", "11.00"))
+
+        hist = HistoricoPrecoFornecedor.objects.get(produto=self.lampada, fornecedor=self.barato)
+        self.assertEqual(hist.preco_minimo, Decimal("10.00"))
+        self.assertEqual(hist.ultimo_preco, Decimal("11.00"))
+        self.assertEqual(hist.preco_medio, Decimal("10.5000"))
+        self.assertEqual(hist.quantidade, Decimal("10.000"))
+
+        with self.assertNumQueries(1):
+            resumo = resumo_precos_produtos([self.lampada.id, self.fita.id], meses=3)
+        self.assertEqual(resumo[self.lampada.id].melhor_fornecedor_id, self.barato.id)
+        self.assertEqual(resumo[self.lampada.id].melhor_preco_medio, Decimal("10.5000"))
+        self.assertEqual([p.preco_medio for p in resumo[self.lampada.id].tendencia], [Decimal("12.0000"), Decimal("12.2500")])
+        self.assertEqual(resumo[self.fita.id].melhor_fornecedor_id, self.caro.id)
+
+    def test_edicao_da_compra_refaz_celula_antiga(self):
+        from compras.models import HistoricoPrecoFornecedor
+        from compras.services.historico_precos_service import atualizar_historico_por_compras, celulas_das_compras
+
+        compra = self._comprar(self.caro, self.mes_anterior, (self.lampada, "1", "9.00"))
+        anteriores = celulas_das_compras([compra.pk])
+        compra.data_compra = self.hoje
+        compra.save(update_fields=["data_compra"])
+        atualizar_historico_por_compras([compra.pk], anteriores)
+
+        self.assertEqual(list(HistoricoPrecoFornecedor.objects.values_list("mes", flat=True)), [self.hoje.replace(day=1)])
+
+    def test_view_precos_produtos(self):
+        User = get_user_model()
+        admin = User.objects.create_superuser(username="admin_precos", email="p@example.com", password="pass")
+        self._comprar(self.barato, self.hoje, (self.fita, "2", "20.00"))
+        self.client.force_login(admin)
+        resp = self.client.get(reverse("compras:precos_produtos"), {"produtos": f"{self.fita.id},{self.lampada.id}"})
+        self.assertEqual(resp.status_code, 200)
+        dados = resp.json()
+        self.assertEqual(dados["produtos"][0]["melhor_fornecedor_nome"], "Fornecedor Barato")
+        self.assertEqual(dados["sem_historico"], [self.lampada.id])
@@ -12,6 +12,7 @@ from compras.views import (
     ProdutoQuickCreateView,
     MarcarRecebidaView,
     AprovarCompraView,
+    PrecosProdutosView,
 )
 
 app_name = "compras"
@@ -28,6 +29,8 @@ urlpatterns = [
     path("<int:pk>/aprovar/", AprovarCompraView.as_view(), name="compra_aprovar"),
     path("<int:pk>/marcar_recebida/", MarcarRecebidaView.as_view(), name="compra_marcar_recebida"),
 
+    path("precos/", PrecosProdutosView.as_view(), name="precos_produtos"),
+
     # Cadastro rápido
     path("quick/fornecedor/novo/", FornecedorQuickCreateView.as_view(), name="fornecedor_quick_create"),
     path("quick/produto/novo/", ProdutoQuickCreateView.as_view(), name="produto_quick_create"),
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from django.contrib import messages
 from django.db.models import Prefetch
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
@@ -26,9 +26,14 @@ from compras.models import (
     Produto,
 )
 from compras.services.compras_service import recalcular_total
+from compras.services.historico_precos_service import (
+    atualizar_historico_por_compras,
+    celulas_das_compras,
+    resumo_precos_produtos,
+)
 from compras.services.statistics_service import ComprasStatisticsService
 from core.services.paginacao import get_pagination_params
-from core.services.permissoes import GroupRequiredMixin
+from core.services.permissoes import GroupRequiredMixin, usuario_em_grupos
 from estoque.services.integracao_compras import dar_entrada_por_compra
 
 
@@ -37,7 +42,7 @@ class ComprasAccessMixin(GroupRequiredMixin):
 
 
 def _is_admin_ou_gestor(user) -> bool:
-    return bool(user and user.is_authenticated and (user.is_superuser or user.groups.filter(name="admin/gestor").exists()))
+    return bool(user and user.is_authenticated and (user.is_superuser or usuario_em_grupos(user, ("admin/gestor",))))
 
 
 def _is_estoquista(user) -> bool:
@@ -46,13 +51,13 @@ def _is_estoquista(user) -> bool:
         and user.is_authenticated
         and (
             user.is_superuser
-            or user.groups.filter(name__in=["admin/gestor", "estoquista", "compras/estoque"]).exists()
+            or usuario_em_grupos(user, ("admin/gestor", "estoquista", "compras/estoque"))
         )
     )
 
 
 def _is_comprador(user) -> bool:
-    return bool(user and user.is_authenticated and user.groups.filter(name="comprador").exists())
+    return bool(user and user.is_authenticated and usuario_em_grupos(user, ("comprador",)))
 
 
 class CompraListView(ComprasAccessMixin, ListView):
@@ -89,10 +94,7 @@ class CompraListView(ComprasAccessMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["centros_custo"] = CentroCustoChoices.choices
-        context["stats"] = ComprasStatisticsService.obter_estatisticas_gerais()
-        context["top_fornecedores"] = ComprasStatisticsService.obter_top_fornecedores(5)
-        context["tendencias"] = ComprasStatisticsService.obter_tendencias()
-        context["compras_por_centro"] = ComprasStatisticsService.obter_compras_por_centro_custo()
+        context.update(ComprasStatisticsService.obter_painel(top_fornecedores=5))
         return context
 
 
@@ -167,6 +169,7 @@ class CompraCreateView(ComprasAccessMixin, CreateView):
         formset.instance = self.object
         formset.save()
         recalcular_total(self.object)
+        atualizar_historico_por_compras([self.object.pk])
         messages.success(self.request, "Compra criada com sucesso.")
         return redirect(self.get_success_url())
 
@@ -193,9 +196,11 @@ class CompraUpdateView(ComprasAccessMixin, UpdateView):
         if not formset.is_valid():
             return self.form_invalid(form)
 
+        celulas_anteriores = celulas_das_compras([self.object.pk])
         self.object = form.save()
         formset.save()
         recalcular_total(self.object)
+        atualizar_historico_por_compras([self.object.pk], celulas_anteriores)
         messages.success(self.request, "Compra atualizada com sucesso.")
         return redirect(self.get_success_url())
 
@@ -365,3 +370,37 @@ class ProdutoQuickCreateView(ComprasAccessMixin, CreateView):
         if next_url:
             return redirect(next_url)
         return redirect("compras:compra_create")
+
+
+class PrecosProdutosView(ComprasAccessMixin, View):
+    """
+    Melhor fornecedor e tendencia de preco para uma lista de produtos, em JSON.
+    Querystring: ?produto=1&produto=2 (ou ?produtos=1,2)&meses=6
+    """
+
+    def get(self, request, *args, **kwargs):
+        brutos = request.GET.getlist("produto") + (request.GET.get("produtos") or "").split(",")
+        produto_ids = [int(v) for v in brutos if v.strip().isdigit()]
+        meses = request.GET.get("meses", "")
+        resumos = resumo_precos_produtos(produto_ids, meses=int(meses) if meses.isdigit() else 6)
+        return JsonResponse(
+            {
+                "produtos": [
+                    {
+                        "produto_id": r.produto_id,
+                        "melhor_fornecedor_id": r.melhor_fornecedor_id,
+                        "melhor_fornecedor_nome": r.melhor_fornecedor_nome,
+                        "melhor_preco_medio": str(r.melhor_preco_medio),
+                        "melhor_ultimo_preco": str(r.melhor_ultimo_preco),
+                        "ultima_compra_em": r.ultima_compra_em.isoformat(),
+                        "variacao_percentual": str(r.variacao_percentual),
+                        "tendencia": [
+                            {"mes": p.mes.isoformat()[:7], "preco_medio": str(p.preco_medio), "preco_minimo": str(p.preco_minimo)}
+                            for p in r.tendencia
+                        ],
+                    }
+                    for r in resumos.values()
+                ],
+                "sem_historico": sorted(set(produto_ids) - resumos.keys()),
+            }
+        )
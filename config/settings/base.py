@@ -107,6 +107,16 @@ LOGOUT_REDIRECT_URL = "/accounts/login/"
 # Mensagens
 MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
 
+# Cache compartilhado pelos workers do gunicorn: as chaves de versao (estatisticas, resumos,
+# permissoes) precisam mudar para todos os processos. Tabela criada pela migracao core 0001.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+        "OPTIONS": {"MAX_ENTRIES": config("DJANGO_CACHE_MAX_ENTRIES", default=20000, cast=int)},
+    }
+}
+
 # PaginaÃ§Ã£o padrÃ£o (20 / 50 / 100)
 PAGINATION_DEFAULT_SIZE = 20
 PAGINATION_ALLOWED_SIZES = (20, 40, 60)
@@ -119,3 +129,19 @@ CSRF_TRUSTED_ORIGINS = [
 SECURE_SSL_REDIRECT = config("SECURE_SSL_REDIRECT", default=False, cast=bool)
 
 
+# Importacao de boletos vencidos: processada em thread apos o upload
+# (False = processa na propria requisicao; pendentes: manage.py processar_importacoes_vencidos)
+BOLETOS_IMPORTACAO_EM_SEGUNDO_PLANO = config("BOLETOS_IMPORTACAO_EM_SEGUNDO_PLANO", default=True, cast=bool)
+
+# Dados do beneficiario nas remessas CNAB (boletos/services/cnab_service.py)
+BOLETOS_CEDENTE = {
+    "nome": config("BOLETOS_CEDENTE_NOME", default="MUNDO LED"),
+    "cnpj": config("BOLETOS_CEDENTE_CNPJ", default=""),
+    "agencia": config("BOLETOS_CEDENTE_AGENCIA", default=""),
+    "conta": config("BOLETOS_CEDENTE_CONTA", default=""),
+    "convenio": config("BOLETOS_CEDENTE_CONVENIO", default=""),
+    "carteira": config("BOLETOS_CEDENTE_CARTEIRA", default="1"),
+}
+
+# Processos para extrair texto de varios PDFs de caixa em paralelo (0/1 = serial)
+IMPORTADORES_PDF_PROCESSOS = config("IMPORTADORES_PDF_PROCESSOS", default=0, cast=int)
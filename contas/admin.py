@@ -57,13 +57,15 @@ class ContaAPagarAdmin(admin.ModelAdmin):
         "importado",
         "fonte_importacao",
         "linha_importacao",
+        "projecao",
+        "competencia",
     )
-    readonly_fields = ("importado", "fonte_importacao", "linha_importacao")
+    readonly_fields = ("importado", "fonte_importacao", "linha_importacao", "projecao", "competencia")
 
 
 @admin.register(ProjecaoMensal)
 class ProjecaoMensalAdmin(admin.ModelAdmin):
-    list_display = ("id", "nome", "centro_custo", "categoria", "valor", "ativo")
+    list_display = ("id", "nome", "centro_custo", "categoria", "valor", "dia_vencimento", "ativo")
     list_filter = ("ativo", "centro_custo", "categoria")
     search_fields = ("nome",)
     ordering = ("nome",)
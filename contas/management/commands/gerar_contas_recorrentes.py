@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contas.services.recorrencia_service import gerar_contas_recorrentes
+
+
+class Command(BaseCommand):
+    help = "Gera as contas a pagar das projecoes mensais ativas para os proximos meses (idempotente; agendar via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meses", type=int, default=12, help="Horizonte em meses (default: 12).")
+        parser.add_argument("--inicio", type=str, default="", help="Mes inicial no formato AAAA-MM (default: mes atual).")
+
+    def handle(self, *args, **options):
+        if options["meses"] < 1:
+            raise CommandError("--meses deve ser maior que zero.")
+        inicio = None
+        if options["inicio"]:
+            try:
+                ano, mes = options["inicio"].split("-")
+                inicio = date(int(ano), int(mes), 1)
+            except ValueError:
+                raise CommandError("--inicio deve estar no formato AAAA-MM.")
+
+        result = gerar_contas_recorrentes(meses=options["meses"], inicio=inicio)
+        self.stdout.write(self.style.SUCCESS(
+            f"OK. Projecoes: {result.projecoes} | Meses: {result.meses} | "
+            f"Criadas: {result.criadas} | Ja existentes: {result.ja_existentes}"
+        ))
@@ -26,6 +26,6 @@ class Command(BaseCommand):
         except FileNotFoundError as e:
             raise CommandError(str(e))
 
-        self.stdout.write(self.style.SUCCESS(f"OK. Criados: {result['criados']} | Erros: {len(result['erros'])}"))
+        self.stdout.write(self.style.SUCCESS(f"OK. Criados: {result['criados']} | Ja importados: {result['duplicados']} | Erros: {result['total_erros']}"))
         for err in result["erros"][:50]:
             self.stdout.write(self.style.WARNING(err))
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:23
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def preencher_hash_importacao(apps, schema_editor):
+    # Mesma regra de contas.services.importacao_csv.hash_conta_importada (copiada: migracao nao importa services).
+    ContaAPagar = apps.get_model("contas", "ContaAPagar")
+    ocorrencias = {}
+    alteradas = []
+    linhas = (
+        ContaAPagar.objects.filter(importado=True)
+        .order_by("id")
+        .only("id", "vencimento", "descricao", "centro_custo", "valor", "observacoes")
+    )
+    for conta in linhas.iterator(chunk_size=2000):
+        base = "|".join(
+            [
+                conta.vencimento.isoformat(),
+                conta.descricao.strip().upper(),
+                conta.centro_custo,
+                f"{conta.valor:.2f}",
+                conta.observacoes.strip(),
+            ]
+        )
+        ocorrencias[base] = ocorrencias.get(base, 0) + 1
+        conta.hash_importacao = hashlib.sha256(f"{base}|{ocorrencias[base]}".encode("utf-8")).hexdigest()
+        alteradas.append(conta)
+        if len(alteradas) >= 2000:
+            ContaAPagar.objects.bulk_update(alteradas, ["hash_importacao"])
+            alteradas = []
+    ContaAPagar.objects.bulk_update(alteradas, ["hash_importacao"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0003_contaapagar_pedido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contaapagar',
+            name='hash_importacao',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(preencher_hash_importacao, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contaapagar',
+            constraint=models.UniqueConstraint(condition=models.Q(('hash_importacao', ''), _negated=True), fields=('hash_importacao',), name='uniq_conta_hash_importacao'),
+        ),
+    ]
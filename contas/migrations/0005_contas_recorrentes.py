@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:36
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0004_contaapagar_hash_importacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contaapagar',
+            name='competencia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contaapagar',
+            name='projecao',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contas_geradas', to='contas.projecaomensal'),
+        ),
+        migrations.AddField(
+            model_name='projecaomensal',
+            name='dia_vencimento',
+            field=models.PositiveSmallIntegerField(default=10, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)]),
+        ),
+        migrations.AddConstraint(
+            model_name='contaapagar',
+            constraint=models.UniqueConstraint(condition=models.Q(('projecao__isnull', False)), fields=('projecao', 'competencia'), name='uniq_conta_projecao_competencia'),
+        ),
+    ]
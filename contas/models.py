@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 
@@ -79,6 +80,18 @@ class ContaAPagar(models.Model):
     importado = models.BooleanField(default=False, db_index=True)
     fonte_importacao = models.CharField(max_length=80, blank=True, default="")
     linha_importacao = models.IntegerField(blank=True, null=True)
+    # sha256 do conteudo normalizado da linha (ver importacao_csv.hash_conta_importada).
+    hash_importacao = models.CharField(max_length=64, blank=True, default="")
+
+    # Conta gerada a partir de uma ProjecaoMensal: (projecao, competencia) identifica a parcela do mes.
+    projecao = models.ForeignKey(
+        "ProjecaoMensal",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="contas_geradas",
+    )
+    competencia = models.DateField(blank=True, null=True)
 
     criado_em = models.DateTimeField(default=timezone.now, db_index=True)
     atualizado_em = models.DateTimeField(auto_now=True)
@@ -89,6 +102,18 @@ class ContaAPagar(models.Model):
             models.Index(fields=["status", "vencimento"], name="idx_conta_status_venc"),
             models.Index(fields=["centro_custo", "vencimento"], name="idx_conta_cc_venc"),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hash_importacao"],
+                condition=~models.Q(hash_importacao=""),
+                name="uniq_conta_hash_importacao",
+            ),
+            models.UniqueConstraint(
+                fields=["projecao", "competencia"],
+                condition=models.Q(projecao__isnull=False),
+                name="uniq_conta_projecao_competencia",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.vencimento} - {self.descricao} - {self.valor}"
@@ -112,6 +137,10 @@ class ProjecaoMensal(models.Model):
         default=CentroCustoChoices.OUTROS,
     )
     valor = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    # Dia do vencimento das contas geradas (meses mais curtos usam o ultimo dia).
+    dia_vencimento = models.PositiveSmallIntegerField(
+        default=10, validators=[MinValueValidator(1), MaxValueValidator(31)]
+    )
     ativo = models.BooleanField(default=True)
 
     def __str__(self) -> str:
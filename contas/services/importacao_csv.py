@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import itertools
 import re
 from decimal import Decimal, InvalidOperation
-from typing import IO, Optional, List
+from typing import IO, Dict, Optional, List
 
 from django.db import transaction
 from django.utils.dateparse import parse_date
 
 from contas.models import ContaAPagar, Categoria, CentroCustoChoices, StatusContaChoices
+from contas.services.resumo_service import invalidar_resumo_contas
+from core.services.arquivos_csv import linhas_com_amostra
 
 
 _RE_R = re.compile(r"R\$\s*", re.IGNORECASE)
@@ -93,7 +97,89 @@ def normalize_centro(value: str) -> str:
     return CentroCustoChoices.OUTROS
 
 
-@transaction.atomic
+TAMANHO_LOTE_IMPORTACAO = 1000
+LIMITE_ERROS_REPORTADOS = 500
+
+_ALIASES_COLUNAS = {
+    "vencimento": ["vencimento", "data", "data_vencimento"],
+    "descricao": ["descricao", "descrição", "historico", "histórico"],
+    "centro_custo": ["centro_custo", "centro", "centrodecusto", "cc"],
+    "valor": ["valor", "vlr", "valor_r$", "valor_rs"],
+    "observacao": ["observacao", "observação", "obs", "observacoes", "observações"],
+}
+
+
+def hash_conta_importada(vencimento, descricao: str, centro_custo: str, valor: Decimal, observacoes: str, ocorrencia: int = 1) -> str:
+    """
+    Identidade da linha importada (conteudo normalizado). `ocorrencia` separa linhas
+    identicas dentro do mesmo arquivo, para que reimportar nao duplique nem perca nenhuma.
+    """
+    conteudo = "|".join(
+        [vencimento.isoformat(), descricao.strip().upper(), centro_custo, f"{valor:.2f}", observacoes.strip(), str(ocorrencia)]
+    )
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _montar_conta(row: List[str], get_col) -> Optional[ContaAPagar]:
+    """Valida uma linha; None para linhas ignoradas (vazias, sem data, cabecalho repetido)."""
+    if not row or all(str(c).strip() == "" for c in row):
+        return None
+
+    data = parse_date_any(get_col(row, "vencimento", 0))
+    if not data:
+        # ignora lixo/cabeçalho repetido
+        return None
+
+    desc = str(get_col(row, "descricao", 1)).strip()
+    centro = normalize_centro(str(get_col(row, "centro_custo", 2)))
+
+    valor_raw = get_col(row, "valor", 3)
+    valor = parse_decimal_brl_any(valor_raw)
+
+    # se ainda não achou, tenta procurar em colunas 3..N mas ignora valores sem centavos (evita NF)
+    if valor is None:
+        for c in row[3:]:
+            v = parse_decimal_brl_any(c)
+            if v is None:
+                continue
+            # regra anti-NF: se for um número gigante e veio de texto solto, provavelmente NF
+            if abs(v) > Decimal("10000000.00"):
+                continue
+            valor = v
+            break
+
+    if valor is None:
+        raise ValueError(f"Valor inválido: {valor_raw!r}")
+
+    obs = str(get_col(row, "observacao", 4)).strip()
+    if len(obs) > 5000:
+        obs = obs[:5000]
+
+    return ContaAPagar(
+        vencimento=data,
+        descricao=desc[:255] if desc else "SEM DESCRICAO",
+        centro_custo=centro,
+        valor=valor,
+        status=StatusContaChoices.ABERTA,
+        observacoes=obs,
+        importado=True,
+    )
+
+
+def _gravar_lote(lote: List[ContaAPagar]) -> tuple[int, int]:
+    """Descarta hashes ja importados (uma query por lote) e insere o restante. Retorna (criados, duplicados)."""
+    # O exclude repete a condicao do indice unico parcial, para o banco poder usa-lo.
+    existentes = set(
+        ContaAPagar.objects.filter(hash_importacao__in=[c.hash_importacao for c in lote])
+        .exclude(hash_importacao="")
+        .values_list("hash_importacao", flat=True)
+    )
+    novos = [c for c in lote if c.hash_importacao not in existentes]
+    with transaction.atomic():
+        ContaAPagar.objects.bulk_create(novos, batch_size=TAMANHO_LOTE_IMPORTACAO, ignore_conflicts=True)
+    return len(novos), len(lote) - len(novos)
+
+
 def import_contas_csv(
     file: IO[str],
     *,
@@ -101,6 +187,7 @@ def import_contas_csv(
     exige_comprovante_padrao: bool = False,
     exige_boleto_padrao: bool = False,
     exige_nota_fiscal_padrao: bool = False,
+    tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO,
 ) -> dict:
     """
     CSV esperado (com ;):
@@ -108,111 +195,82 @@ def import_contas_csv(
 
     - usa SEMPRE a coluna "valor" (não pega NF da descrição)
     - se não existir header, tenta posição fixa (0..4)
+    - leitura em streaming e gravação em lotes (memória limitada ao lote)
+    - cada linha leva um hash do conteúdo: reimportar o mesmo arquivo não duplica contas
     """
     categoria_default = get_or_create_categoria_default()
 
-    raw = file.read()
-    # volta cursor
-    try:
-        file.seek(0)
-    except Exception:
-        pass
+    amostra, linhas = linhas_com_amostra(file)
+    if not amostra.strip():
+        return {"criados": 0, "duplicados": 0, "total_erros": 1, "erros": ["Arquivo vazio."]}
 
     # detecta delimitador (prioriza ;)
-    delimiter = ";" if raw.count(";") >= raw.count(",") else ","
-    try:
-        file.seek(0)
-    except Exception:
-        pass
-
-    # tenta DictReader
-    reader = csv.reader(file, delimiter=delimiter)
-    rows = list(reader)
-    if not rows:
-        return {"criados": 0, "erros": ["Arquivo vazio."]}
+    delimiter = ";" if amostra.count(";") >= amostra.count(",") else ","
+    reader = csv.reader(linhas, delimiter=delimiter)
 
     # detecta header
-    header = [h.strip().lstrip("\ufeff") for h in rows[0]]
+    primeira = next(reader, [])
+    header = [h.strip().lstrip("\ufeff") for h in primeira]
     has_header = any(h.lower() in ("vencimento", "descricao", "centro_custo", "centro", "valor", "observacao") for h in header)
-
-    criados = 0
-    erros: List[str] = []
-
     hmap = {header[i].strip().lower(): i for i in range(len(header))} if has_header else {}
-    aliases = {
-        "vencimento": ["vencimento", "data", "data_vencimento"],
-        "descricao": ["descricao", "descrição", "historico", "histórico"],
-        "centro_custo": ["centro_custo", "centro", "centrodecusto", "cc"],
-        "valor": ["valor", "vlr", "valor_r$", "valor_rs"],
-        "observacao": ["observacao", "observação", "obs", "observacoes", "observações"],
-    }
 
     # função para pegar colunas por header OU por posição
     def get_col(row, name, idx_default):
         if has_header:
-            for key in aliases.get(name, [name]):
+            for key in _ALIASES_COLUNAS.get(name, [name]):
                 if key in hmap and hmap[key] < len(row):
                     return row[hmap[key]]
             return ""
         else:
             return row[idx_default] if idx_default < len(row) else ""
 
-    start = 1 if has_header else 0
-    for idx in range(start, len(rows)):
-        row = rows[idx]
-        try:
-            if not row or all(str(c).strip() == "" for c in row):
-                continue
-
-            venc_raw = get_col(row, "vencimento", 0)
-            data = parse_date_any(venc_raw)
-            if not data:
-                # ignora lixo/cabeçalho repetido
-                continue
-
-            desc = str(get_col(row, "descricao", 1)).strip()
-            centro = normalize_centro(str(get_col(row, "centro_custo", 2)))
-
-            valor_raw = get_col(row, "valor", 3)
-            valor = parse_decimal_brl_any(valor_raw)
-
-            # se ainda não achou, tenta procurar em colunas 3..N mas ignora valores sem centavos (evita NF)
-            if valor is None:
-                for c in row[3:]:
-                    v = parse_decimal_brl_any(c)
-                    if v is None:
-                        continue
-                    # regra anti-NF: se for um número gigante e veio de texto solto, provavelmente NF
-                    if abs(v) > Decimal("10000000.00"):
-                        continue
-                    valor = v
-                    break
-
-            if valor is None:
-                raise ValueError(f"Valor inválido: {valor_raw!r}")
-
-            obs = str(get_col(row, "observacao", 4)).strip()
-            if len(obs) > 5000:
-                obs = obs[:5000]
-
-            ContaAPagar.objects.create(
-                vencimento=data,
-                descricao=desc[:255] if desc else "SEM DESCRICAO",
-                centro_custo=centro,
-                valor=valor,
-                status=StatusContaChoices.ABERTA,
-                categoria=categoria_default,  # pode trocar depois; mas não é obrigatório no model
-                observacoes=obs,
-                exige_comprovante=exige_comprovante_padrao,
-                exige_boleto=exige_boleto_padrao,
-                exige_nota_fiscal=exige_nota_fiscal_padrao,
-                importado=True,
-                fonte_importacao=fonte,
-                linha_importacao=idx + 1,
-            )
-            criados += 1
+    criados = duplicados = total_erros = 0
+    erros: List[str] = []
+    ocorrencias: Dict[str, int] = {}
+    lote: List[ContaAPagar] = []
+    rows = reader if has_header else itertools.chain([primeira], reader)
 
+    for numero, row in enumerate(rows, start=2 if has_header else 1):
+        try:
+            conta = _montar_conta(row, get_col)
         except Exception as e:
-            erros.append(f"Linha {idx+1}: {e}")
-
-    return {"criados": criados, "erros": erros}
+            total_erros += 1
+            if len(erros) < LIMITE_ERROS_REPORTADOS:
+                erros.append(f"Linha {numero}: {e}")
+            continue
+        if conta is None:
+            continue
+
+        base = hash_conta_importada(conta.vencimento, conta.descricao, conta.centro_custo, conta.valor, conta.observacoes)
+        ocorrencias[base] = ocorrencias.get(base, 0) + 1
+        conta.hash_importacao = (
+            base
+            if ocorrencias[base] == 1
+            else hash_conta_importada(
+                conta.vencimento, conta.descricao, conta.centro_custo, conta.valor, conta.observacoes, ocorrencias[base]
+            )
+        )
+        conta.categoria = categoria_default  # pode trocar depois; mas não é obrigatório no model
+        conta.exige_comprovante = exige_comprovante_padrao
+        conta.exige_boleto = exige_boleto_padrao
+        conta.exige_nota_fiscal = exige_nota_fiscal_padrao
+        conta.fonte_importacao = fonte
+        conta.linha_importacao = numero
+        lote.append(conta)
+
+        if len(lote) >= tamanho_lote:
+            novos, repetidos = _gravar_lote(lote)
+            criados += novos
+            duplicados += repetidos
+            lote = []
+
+    if lote:
+        novos, repetidos = _gravar_lote(lote)
+        criados += novos
+        duplicados += repetidos
+
+    if criados:
+        invalidar_resumo_contas()
+    if total_erros > len(erros):
+        erros.append(f"... e mais {total_erros - len(erros)} linha(s) com erro.")
+    return {"criados": criados, "duplicados": duplicados, "total_erros": total_erros, "erros": erros}
@@ -1,21 +1,27 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from typing import Optional
+
 from django.db.models import Sum
 
 from contas.models import ContaAPagar, RegraImposto
+from contas.services.resumo_service import intervalo_mes
 
 
-def calcular_imposto_mes(ano: int, mes: int) -> dict:
+def calcular_imposto_mes(ano: int, mes: int, total: Optional[Decimal] = None) -> dict:
+    """`total` permite reaproveitar a soma do mes ja calculada (ex.: dashboard)."""
     regra = RegraImposto.objects.filter(ativo=True).order_by("-id").first()
     percentual = regra.aliquota_percentual if regra else Decimal("0.000")
 
-    total = (
-        ContaAPagar.objects.filter(vencimento__year=ano, vencimento__month=mes)
-        .aggregate(t=Sum("valor"))
-        .get("t")
-        or Decimal("0.00")
-    )
+    if total is None:
+        inicio, fim = intervalo_mes(ano, mes)
+        total = (
+            ContaAPagar.objects.filter(vencimento__gte=inicio, vencimento__lt=fim)
+            .aggregate(t=Sum("valor"))
+            .get("t")
+            or Decimal("0.00")
+        )
 
     imposto = (total * (percentual / Decimal("100"))).quantize(Decimal("0.01"))
     return {
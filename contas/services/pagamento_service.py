@@ -4,6 +4,7 @@ from django.db import transaction
 from django.utils import timezone
 
 from contas.models import ContaAPagar, StatusContaChoices
+from contas.services.resumo_service import invalidar_resumo_contas
 
 
 @transaction.atomic
@@ -24,4 +25,5 @@ def confirmar_pagamento(conta: ContaAPagar) -> ContaAPagar:
     conta.status = StatusContaChoices.PAGA
     conta.pago_em = timezone.localdate()
     conta.save(update_fields=["status", "pago_em"])
+    transaction.on_commit(invalidar_resumo_contas)
     return conta
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from contas.models import ContaAPagar, ProjecaoMensal, StatusContaChoices
+from contas.services.resumo_service import invalidar_resumo_contas
+
+FONTE_RECORRENTE = "RECORRENTE"
+
+
+@dataclass(frozen=True)
+class GeracaoRecorrenteResult:
+    projecoes: int
+    meses: int
+    criadas: int
+    ja_existentes: int
+
+
+def competencias(inicio: date, meses: int) -> List[date]:
+    """Primeiro dia de cada um dos `meses` meses a partir de `inicio`."""
+    atual = inicio.replace(day=1)
+    resultado = []
+    for _ in range(max(meses, 0)):
+        resultado.append(atual)
+        atual = date(atual.year + 1, 1, 1) if atual.month == 12 else date(atual.year, atual.month + 1, 1)
+    return resultado
+
+
+def vencimento_na_competencia(competencia: date, dia: int) -> date:
+    ultimo_dia = calendar.monthrange(competencia.year, competencia.month)[1]
+    return competencia.replace(day=min(max(dia, 1), ultimo_dia))
+
+
+@transaction.atomic
+def gerar_contas_recorrentes(*, meses: int = 12, inicio: Optional[date] = None) -> GeracaoRecorrenteResult:
+    """
+    Materializa as ProjecaoMensal ativas como ContaAPagar para o horizonte de `meses` meses.
+    Chave (projecao, competencia): parcelas ja geradas (mesmo pagas ou editadas) nao sao
+    recriadas. Uma query para as projecoes, uma para as chaves existentes e um bulk_create.
+    """
+    meses_horizonte = competencias(inicio or timezone.localdate(), meses)
+    # select_for_update: execucoes concorrentes passam uma de cada vez (a segunda le as chaves ja com
+    # as parcelas da primeira), entao `criadas` e exato; so parcelas gravadas por fora deste servico
+    # entre a leitura e o insert seriam ignoradas pelo bulk_create e contadas a mais.
+    projecoes = list(ProjecaoMensal.objects.select_for_update().filter(ativo=True).order_by("id"))
+    if not projecoes or not meses_horizonte:
+        return GeracaoRecorrenteResult(len(projecoes), len(meses_horizonte), 0, 0)
+
+    existentes = set(
+        ContaAPagar.objects.filter(
+            projecao__in=projecoes,
+            competencia__gte=meses_horizonte[0],
+            competencia__lte=meses_horizonte[-1],
+        ).values_list("projecao_id", "competencia")
+    )
+
+    novas = [
+        ContaAPagar(
+            vencimento=vencimento_na_competencia(competencia, projecao.dia_vencimento),
+            descricao=(projecao.nome or f"Projeção #{projecao.pk}")[:255],
+            centro_custo=projecao.centro_custo,
+            categoria_id=projecao.categoria_id,
+            valor=projecao.valor,
+            status=StatusContaChoices.ABERTA,
+            observacoes=f"Gerada da projeção mensal #{projecao.pk} ({competencia:%m/%Y}).",
+            fonte_importacao=FONTE_RECORRENTE,
+            projecao=projecao,
+            competencia=competencia,
+        )
+        for projecao in projecoes
+        for competencia in meses_horizonte
+        if (projecao.pk, competencia) not in existentes
+    ]
+    # ignore_conflicts: rede de seguranca para parcela gravada por fora entre a leitura e o insert.
+    ContaAPagar.objects.bulk_create(novas, batch_size=1000, ignore_conflicts=True)
+    if novas:
+        transaction.on_commit(invalidar_resumo_contas)
+
+    return GeracaoRecorrenteResult(
+        projecoes=len(projecoes),
+        meses=len(meses_horizonte),
+        criadas=len(novas),
+        ja_existentes=len(existentes),
+    )
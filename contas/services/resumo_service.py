@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from contas.models import ContaAPagar, StatusContaChoices
+
+CACHE_VERSAO_RESUMO = "contas:resumo:versao"
+CACHE_TTL_RESUMO = 300
+SEM_CATEGORIA = "SEM CATEGORIA"
+
+
+def intervalo_mes(ano: int, mes: int) -> Tuple[date, date]:
+    """[inicio, fim) do mes: filtros por faixa usam os indices de vencimento (year/month nao usam)."""
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def _soma(filtro: Q):
+    return Coalesce(
+        Sum("valor", filter=filtro),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+
+
+def totais_painel(hoje: date) -> dict:
+    """
+    Totais do dashboard (mes geral, abertas do dia/semana/mes) em uma unica query
+    de agregacao condicional sobre a faixa de vencimentos que cobre mes e semana.
+    """
+    inicio_mes, fim_mes = intervalo_mes(hoje.year, hoje.month)
+    inicio_semana = hoje - timedelta(days=hoje.weekday())
+    fim_semana = inicio_semana + timedelta(days=7)
+
+    no_mes = Q(vencimento__gte=inicio_mes, vencimento__lt=fim_mes)
+    aberta = Q(status=StatusContaChoices.ABERTA)
+    no_dia = aberta & Q(vencimento=hoje)
+    na_semana = aberta & Q(vencimento__gte=inicio_semana, vencimento__lt=fim_semana)
+    abertas_mes = aberta & no_mes
+
+    return ContaAPagar.objects.filter(
+        vencimento__gte=min(inicio_mes, inicio_semana),
+        vencimento__lt=max(fim_mes, fim_semana),
+    ).aggregate(
+        total_mes=_soma(no_mes),
+        abertas_mes=Count("id", filter=abertas_mes),
+        pagas_mes=Count("id", filter=no_mes & Q(status=StatusContaChoices.PAGA)),
+        total_dia=_soma(no_dia),
+        qtd_dia=Count("id", filter=no_dia),
+        total_semana=_soma(na_semana),
+        qtd_semana=Count("id", filter=na_semana),
+        total_mes_abertas=_soma(abertas_mes),
+        qtd_mes_abertas=Count("id", filter=abertas_mes),
+    )
+
+
+def _versao_resumo() -> int:
+    versao = cache.get(CACHE_VERSAO_RESUMO)
+    if versao is None:
+        versao = 1
+        cache.add(CACHE_VERSAO_RESUMO, versao, None)
+    return versao
+
+
+def invalidar_resumo_contas() -> None:
+    """Chamar apos gravar contas: troca a versao e todos os resumos em cache expiram juntos."""
+    try:
+        cache.incr(CACHE_VERSAO_RESUMO)
+    except ValueError:
+        cache.set(CACHE_VERSAO_RESUMO, 2, None)
+
+
+def _calcular_resumo_mensal(ano: int, mes: int) -> dict:
+    inicio, fim = intervalo_mes(ano, mes)
+    linhas = (
+        ContaAPagar.objects.filter(vencimento__gte=inicio, vencimento__lt=fim)
+        .values("centro_custo", "categoria__nome", "status")
+        .annotate(total=Sum("valor"), qtd=Count("id"))
+        .order_by()
+    )
+
+    def acumular(destino: dict, chave: str, total: Decimal, qtd: int) -> None:
+        item = destino.setdefault(chave, {"total": Decimal("0.00"), "qtd": 0})
+        item["total"] += total
+        item["qtd"] += qtd
+
+    por_centro: dict = {}
+    por_categoria: dict = {}
+    por_status: dict = {s: {"total": Decimal("0.00"), "qtd": 0} for s in StatusContaChoices.values}
+    total = Decimal("0.00")
+    qtd = 0
+    for linha in linhas:
+        valor = linha["total"] or Decimal("0.00")
+        acumular(por_centro, linha["centro_custo"], valor, linha["qtd"])
+        acumular(por_categoria, linha["categoria__nome"] or SEM_CATEGORIA, valor, linha["qtd"])
+        acumular(por_status, linha["status"], valor, linha["qtd"])
+        total += valor
+        qtd += linha["qtd"]
+
+    def ordenar(grupos: dict) -> list:
+        return [
+            {"chave": chave, **valores}
+            for chave, valores in sorted(grupos.items(), key=lambda kv: (-kv[1]["total"], kv[0]))
+        ]
+
+    return {
+        "ano": ano,
+        "mes": mes,
+        "total": total,
+        "qtd": qtd,
+        "por_centro_custo": ordenar(por_centro),
+        "por_categoria": ordenar(por_categoria),
+        "por_status": por_status,
+    }
+
+
+def resumo_mensal_contas(ano: int, mes: int) -> dict:
+    """
+    Resumo do mes por centro de custo, categoria e status (uma query agrupada),
+    guardado em cache ate a proxima gravacao de contas (ou CACHE_TTL_RESUMO).
+    """
+    chave = f"contas:resumo:{_versao_resumo()}:{ano:04d}-{mes:02d}"
+    resumo = cache.get(chave)
+    if resumo is None:
+        resumo = _calcular_resumo_mensal(ano, mes)
+        cache.set(chave, resumo, CACHE_TTL_RESUMO)
+    return resumo
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+from datetime import date
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
@@ -13,6 +19,15 @@ from contas.services.importacao_csv import import_contas_csv
 import io
 
 
+def _consultas_fora_do_cache(ctx) -> list[str]:
+    """Consultas capturadas sem as do DatabaseCache (leitura/gravacao da tabela de cache)."""
+    return [
+        q["sql"]
+        for q in ctx.captured_queries
+        if "django_cache" not in q["sql"] and "SAVEPOINT" not in q["sql"]
+    ]
+
+
 class ContasRegrasTest(TestCase):
     def setUp(self):
         self.cat = Categoria.objects.create(nome="GERAL")
@@ -36,6 +51,24 @@ class ContasRegrasTest(TestCase):
         result = import_contas_csv(f, fonte="TEST", exige_comprovante_padrao=False)
         self.assertGreaterEqual(result["criados"], 1)
 
+    def test_reimportar_csv_nao_duplica_e_reporta_erros_por_linha(self):
+        csv_text = (
+            "vencimento;descricao;centro_custo;valor;observacao\n"
+            "10/01/2023;ALUGUEL;FM;R$ 1.900,00;\n"
+            "10/01/2023;ALUGUEL;FM;R$ 1.900,00;\n"
+            "11/01/2023;ENERGIA;ML;abc;\n"
+            "12/01/2023;AGUA;ML;150,10;obs\n"
+        )
+        primeira = import_contas_csv(io.StringIO(csv_text), fonte="TEST", tamanho_lote=2)
+        self.assertEqual(primeira["criados"], 3)  # linhas identicas no arquivo sao contas distintas
+        self.assertEqual(primeira["erros"], ["Linha 4: Valor inválido: 'abc'"])
+
+        segunda = import_contas_csv(io.StringIO(csv_text + "13/01/2023;GAS;FM;10,00;\n"), fonte="TEST")
+        self.assertEqual(segunda["criados"], 1)
+        self.assertEqual(segunda["duplicados"], 3)
+        self.assertEqual(ContaAPagar.objects.filter(importado=True).count(), 4)
+        self.assertEqual(ContaAPagar.objects.get(descricao="GAS").linha_importacao, 6)
+
     def test_confirma_pagamento_define_status_e_data(self):
         conta = ContaAPagar.objects.create(
             vencimento=timezone.localdate(),
@@ -75,6 +108,100 @@ class ContasDashboardViewTest(TestCase):
         self.assertContains(response, "123,45")
 
 
+class ImportCSVViewTest(TestCase):
+    def test_upload_latin1_importa_em_streaming(self):
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser("admin3", "admin3@example.com", "pass"))
+        conteudo = "vencimento;descricao;centro_custo;valor\n05/02/2024;MANUTENÇÃO;FM;99,90\n".encode("latin-1")
+
+        response = self.client.post(
+            reverse("contas:import_csv"),
+            data={"arquivo": SimpleUploadedFile("contas.csv", conteudo, content_type="text/csv")},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        conta = ContaAPagar.objects.get()
+        self.assertEqual(conta.descricao, "MANUTENÇÃO")
+        self.assertEqual(conta.valor, Decimal("99.90"))
+        self.assertEqual(len(conta.hash_importacao), 64)
+
+
+class ResumoContasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hoje = date(2024, 5, 15)  # quarta-feira
+        self.cat = Categoria.objects.create(nome="ALUGUEL")
+        base = {"centro_custo": "FM", "descricao": "Conta"}
+        ContaAPagar.objects.create(vencimento=self.hoje, valor=Decimal("100.00"), categoria=self.cat, **base)
+        ContaAPagar.objects.create(vencimento=date(2024, 5, 13), valor=Decimal("50.00"), **base)
+        ContaAPagar.objects.create(
+            vencimento=date(2024, 5, 2), valor=Decimal("30.00"), status=StatusContaChoices.PAGA, **base
+        )
+        ContaAPagar.objects.create(vencimento=date(2024, 6, 1), valor=Decimal("999.00"), **base)
+
+    def test_totais_painel_em_uma_query(self):
+        from contas.services.resumo_service import totais_painel
+
+        with self.assertNumQueries(1):
+            totais = totais_painel(self.hoje)
+
+        self.assertEqual(totais["total_mes"], Decimal("180.00"))
+        self.assertEqual((totais["abertas_mes"], totais["pagas_mes"]), (2, 1))
+        self.assertEqual((totais["total_dia"], totais["qtd_dia"]), (Decimal("100.00"), 1))
+        self.assertEqual((totais["total_semana"], totais["qtd_semana"]), (Decimal("150.00"), 2))
+        self.assertEqual(totais["total_mes_abertas"], Decimal("150.00"))
+
+    def test_resumo_mensal_em_cache_ate_nova_gravacao(self):
+        from contas.services.resumo_service import resumo_mensal_contas
+
+        resumo = resumo_mensal_contas(2024, 5)
+        self.assertEqual(resumo["total"], Decimal("180.00"))
+        self.assertEqual(
+            resumo["por_categoria"],
+            [
+                {"chave": "ALUGUEL", "total": Decimal("100.00"), "qtd": 1},
+                {"chave": "SEM CATEGORIA", "total": Decimal("80.00"), "qtd": 2},
+            ],
+        )
+        self.assertEqual(resumo["por_status"][StatusContaChoices.PAGA], {"total": Decimal("30.00"), "qtd": 1})
+        with CaptureQueriesContext(connection) as ctx:
+            resumo_mensal_contas(2024, 5)
+        self.assertEqual(_consultas_fora_do_cache(ctx), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            confirmar_pagamento(ContaAPagar.objects.get(vencimento=self.hoje))
+        resumo = resumo_mensal_contas(2024, 5)
+        self.assertEqual(resumo["por_status"][StatusContaChoices.PAGA], {"total": Decimal("130.00"), "qtd": 2})
+
+
+class ContasRecorrentesTest(TestCase):
+    def test_gera_horizonte_uma_vez_por_projecao_e_mes(self):
+        from contas.models import ProjecaoMensal
+        from contas.services.recorrencia_service import gerar_contas_recorrentes
+
+        aluguel = ProjecaoMensal.objects.create(
+            nome="Aluguel", centro_custo="FM", valor=Decimal("3500.00"), dia_vencimento=31
+        )
+        ProjecaoMensal.objects.create(nome="Internet", centro_custo="ML", valor=Decimal("199.90"))
+        ProjecaoMensal.objects.create(nome="Inativa", valor=Decimal("1.00"), ativo=False)
+
+        with self.assertNumQueries(5):  # savepoint, projecoes, existentes, insert, release
+            result = gerar_contas_recorrentes(meses=3, inicio=date(2024, 1, 20))
+
+        self.assertEqual((result.projecoes, result.criadas), (2, 6))
+        vencimentos = list(
+            ContaAPagar.objects.filter(projecao=aluguel).order_by("vencimento").values_list("vencimento", flat=True)
+        )
+        self.assertEqual(vencimentos, [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31)])
+
+        # Rodar de novo (horizonte maior) so cria os meses novos, mesmo com parcela ja paga.
+        ContaAPagar.objects.filter(projecao=aluguel, competencia=date(2024, 1, 1)).update(status=StatusContaChoices.PAGA)
+        out = io.StringIO()
+        call_command("gerar_contas_recorrentes", "--meses", "4", "--inicio", "2024-01", stdout=out)
+        self.assertIn("Criadas: 2 | Ja existentes: 6", out.getvalue())
+        self.assertEqual(ContaAPagar.objects.filter(projecao__isnull=False).count(), 8)
+
+
 class ContasPeriodoPDFViewTest(TestCase):
     def setUp(self):
         User = get_user_model()
@@ -22,12 +22,14 @@ from django.views.generic import (
 
 from core.services.permissoes import GroupRequiredMixin
 from core.services.paginacao import get_pagination_params
+from core.services.arquivos_csv import abrir_csv_texto
 
 from contas.forms import ContaAPagarForm, ConfirmarPagamentoForm, ImportCSVForm
 from contas.models import ContaAPagar, StatusContaChoices
 from contas.services.pagamento_service import confirmar_pagamento
 from contas.services.importacao_csv import import_contas_csv
 from contas.services.imposto_service import calcular_imposto_mes
+from contas.services.resumo_service import intervalo_mes, invalidar_resumo_contas, totais_painel
 
 
 class FinanceiroAccessMixin(GroupRequiredMixin):
@@ -42,24 +44,12 @@ class ContasDashboardView(FinanceiroAccessMixin, TemplateView):
         from django.utils import timezone
 
         hoje = timezone.localdate()
-        ano, mes = hoje.year, hoje.month
-        inicio_semana = hoje - timedelta(days=hoje.weekday())
-        fim_semana = inicio_semana + timedelta(days=6)
-
-        # OBS: seu campo no DB hoje está "vencimento"
-        qs_mes = ContaAPagar.objects.filter(vencimento__year=ano, vencimento__month=mes)
-        resumo = qs_mes.aggregate(
-            total=Sum("valor"),
-            abertas=Count("id", filter=Q(status=StatusContaChoices.ABERTA)),
-            pagas=Count("id", filter=Q(status=StatusContaChoices.PAGA)),
-        )
-        ctx["total_mes"] = resumo["total"] or 0
-        ctx["abertas_mes"] = resumo["abertas"] or 0
-        ctx["pagas_mes"] = resumo["pagas"] or 0
+        totais = totais_painel(hoje)
+        ctx.update(totais)
 
         # imposto (se sua tabela/regra existir)
         try:
-            ctx["imposto"] = calcular_imposto_mes(ano, mes)
+            ctx["imposto"] = calcular_imposto_mes(hoje.year, hoje.month, total=totais["total_mes"])
         except Exception:
             ctx["imposto"] = {
                 "regra_nome": "Sem regra ativa",
@@ -71,25 +61,11 @@ class ContasDashboardView(FinanceiroAccessMixin, TemplateView):
             ContaAPagar.objects.select_related("categoria")
             .order_by("-id")[:10]
         )
-        contas_abertas = ContaAPagar.objects.filter(status=StatusContaChoices.ABERTA)
         ctx["contas_dia"] = (
-            contas_abertas.filter(vencimento=hoje)
+            ContaAPagar.objects.filter(status=StatusContaChoices.ABERTA, vencimento=hoje)
             .select_related("categoria")
             .order_by("vencimento", "id")
         )
-        ctx["contas_semana"] = (
-            contas_abertas.filter(vencimento__range=(inicio_semana, fim_semana))
-            .select_related("categoria")
-            .order_by("vencimento", "id")
-        )
-        ctx["contas_mes"] = (
-            contas_abertas.filter(vencimento__year=ano, vencimento__month=mes)
-            .select_related("categoria")
-            .order_by("vencimento", "id")
-        )
-        ctx["total_dia"] = ctx["contas_dia"].aggregate(total=Sum("valor"))["total"] or 0
-        ctx["total_semana"] = ctx["contas_semana"].aggregate(total=Sum("valor"))["total"] or 0
-        ctx["total_mes_abertas"] = ctx["contas_mes"].aggregate(total=Sum("valor"))["total"] or 0
         return ctx
 
 
@@ -157,7 +133,8 @@ class ContasPeriodoPDFView(FinanceiroAccessMixin, View):
             contas = qs.filter(vencimento__range=(inicio_semana, fim_semana)).order_by("vencimento", "id")
             titulo = f"Contas da semana {inicio_semana:%d/%m/%Y} a {fim_semana:%d/%m/%Y}"
         else:
-            contas = qs.filter(vencimento__year=hoje.year, vencimento__month=hoje.month).order_by("vencimento", "id")
+            inicio_mes, fim_mes = intervalo_mes(hoje.year, hoje.month)
+            contas = qs.filter(vencimento__gte=inicio_mes, vencimento__lt=fim_mes).order_by("vencimento", "id")
             titulo = f"Contas do mes {hoje:%m/%Y}"
 
         total = contas.aggregate(total=Sum("valor"))["total"] or 0
@@ -205,8 +182,9 @@ class ContaListView(FinanceiroAccessMixin, ListView):
         ym = (self.request.GET.get("mes") or "").strip()
         if len(ym) == 7 and ym[4] == "-":
             y, m = ym.split("-")
-            if y.isdigit() and m.isdigit():
-                qs = qs.filter(vencimento__year=int(y), vencimento__month=int(m))
+            if y.isdigit() and m.isdigit() and 1 <= int(m) <= 12:
+                inicio, fim = intervalo_mes(int(y), int(m))
+                qs = qs.filter(vencimento__gte=inicio, vencimento__lt=fim)
 
         # importado = 1/0
         imp = (self.request.GET.get("importado") or "").strip()
@@ -241,6 +219,7 @@ class ContaCreateView(FinanceiroAccessMixin, CreateView):
         self.object = form.save(commit=False)
         self.object.importado = False
         self.object.save()
+        invalidar_resumo_contas()
         messages.success(self.request, "Conta criada.")
         return redirect(self.get_success_url())
 
@@ -250,6 +229,11 @@ class ContaUpdateView(FinanceiroAccessMixin, UpdateView):
     form_class = ContaAPagarForm
     template_name = "contas/conta_form.html"
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        invalidar_resumo_contas()
+        return response
+
     def get_success_url(self):
         messages.success(self.request, "Conta atualizada.")
         return reverse("contas:conta_detail", kwargs={"pk": self.object.pk})
@@ -260,6 +244,11 @@ class ContaDeleteView(FinanceiroAccessMixin, DeleteView):
     template_name = "contas/conta_confirm_delete.html"
     success_url = reverse_lazy("contas:conta_list")
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        invalidar_resumo_contas()
+        return response
+
     def delete(self, request, *args, **kwargs):
         messages.success(self.request, "Conta removida.")
         return super().delete(request, *args, **kwargs)
@@ -303,6 +292,7 @@ class ReabrirContaView(FinanceiroAccessMixin, View):
         conta.status = StatusContaChoices.ABERTA
         conta.pago_em = None
         conta.save(update_fields=["status", "pago_em"])
+        invalidar_resumo_contas()
         messages.success(request, "Conta reaberta.")
         return redirect("contas:conta_detail", pk=conta.pk)
 
@@ -319,26 +309,17 @@ class ImportCSVView(FinanceiroAccessMixin, FormView):
         arquivo = form.cleaned_data["arquivo"]
         exige = bool(form.cleaned_data.get("exige_comprovante_padrao", False))
 
-        # csv.reader precisa de texto; garantimos decoding
-        raw = arquivo.read()
-
-        # tenta utf-8 primeiro, depois latin-1
-        try:
-            text = raw.decode("utf-8")
-        except Exception:
-            text = raw.decode("latin-1", errors="ignore")
-
-        f = io.StringIO(text)
-
+        # csv.reader precisa de texto: decodifica em streaming (utf-8 ou latin-1)
         result = import_contas_csv(
-            f,
+            abrir_csv_texto(arquivo.file),
             fonte=f"UI:{arquivo.name}",
             exige_comprovante_padrao=exige,
         )
 
         messages.success(
             self.request,
-            f"Importação concluída. Criados: {result['criados']}. Erros: {len(result['erros'])}.",
+            f"Importação concluída. Criados: {result['criados']}. "
+            f"Já importados: {result['duplicados']}. Erros: {result['total_erros']}.",
         )
         if result["erros"]:
             for err in result["erros"][:10]:
@@ -5,6 +5,8 @@ import logging
 from django.contrib import messages
 from django.shortcuts import redirect
 
+from core.services.permissoes import carregar_grupos_da_request
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,7 +23,7 @@ class ForcePasswordChangeMiddleware:
         try:
             user = getattr(request, "user", None)
             if user and user.is_authenticated:
-                if user.groups.filter(name="troca_senha_obrigatoria").exists():
+                if "troca_senha_obrigatoria" in carregar_grupos_da_request(request):
                     password_change_path = "/accounts/password_change/"
                     allowed_paths = {
                         password_change_path,
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:40
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def criar_tabela_cache(apps, schema_editor):
+    # CACHES usa DatabaseCache; o migrate do deploy cria a tabela (idempotente).
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(criar_tabela_cache, migrations.RunPython.noop),
+    ]
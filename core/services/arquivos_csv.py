@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import codecs
+import io
+import itertools
+from typing import IO, Iterator
+
+AMOSTRA_PADRAO = 64 * 1024
+
+
+def _utf8_valido(arquivo: IO[bytes], *, bloco: int) -> bool:
+    """Decodifica o arquivo inteiro em blocos (memoria constante), parando no primeiro byte invalido."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while pedaco := arquivo.read(bloco):
+            decoder.decode(pedaco, final=False)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        arquivo.seek(0)
+    return True
+
+
+def abrir_csv_texto(arquivo: IO[bytes], *, amostra: int = AMOSTRA_PADRAO) -> IO[str]:
+    """
+    Envolve o upload binario em um leitor de texto sem carregar o arquivo inteiro:
+    utf-8 (com ou sem BOM) se o arquivo todo decodificar, senao latin-1. A validacao e uma
+    leitura a mais do arquivo; so a amostra inicial deixaria um acento latin-1 tardio virar U+FFFD.
+    """
+    encoding = "utf-8-sig" if _utf8_valido(arquivo, bloco=amostra) else "latin-1"
+    return io.TextIOWrapper(arquivo, encoding=encoding, newline="")
+
+
+def linhas_com_amostra(file: IO[str], *, tamanho: int = AMOSTRA_PADRAO) -> tuple[str, Iterator[str]]:
+    """Le uma amostra (ate o fim da linha) para detectar o delimitador e devolve o fluxo completo."""
+    amostra = file.read(tamanho)
+    if amostra and not amostra.endswith("\n"):
+        amostra += file.readline()
+    return amostra, itertools.chain(io.StringIO(amostra), file)
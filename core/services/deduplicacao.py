@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.services.normalizacao import normalizar_nome
+
+LIMIAR_PADRAO = 0.9
+# Chaves de bloco presentes em mais registros que isso ("LED", "LTDA") nao geram candidatos.
+LIMITE_BLOCO_PADRAO = 200
+TAMANHO_PREFIXO = 3
+
+
+@dataclass(frozen=True)
+class Registro:
+    id: int
+    nome: str
+    tokens: Tuple[str, ...]
+    numeros: frozenset
+    trigramas: frozenset
+
+
+@dataclass(frozen=True)
+class GrupoDuplicados:
+    principal_id: int
+    principal_nome: str
+    # (id, nome, similaridade com o principal)
+    duplicados: Tuple[Tuple[int, str, float], ...]
+
+
+def _tem_digito(token: str) -> bool:
+    return any(ch.isdigit() for ch in token)
+
+
+def preparar_registro(pk: int, nome: str) -> Registro:
+    tokens = tuple(normalizar_nome(nome).split())
+    trigramas = set()
+    for token in tokens:
+        marcado = f" {token} "
+        trigramas.update(marcado[i:i + 3] for i in range(len(marcado) - 2))
+    return Registro(
+        id=pk,
+        nome=nome,
+        tokens=tokens,
+        numeros=frozenset(t for t in tokens if _tem_digito(t)),
+        trigramas=frozenset(trigramas),
+    )
+
+
+def chaves_de_bloco(registro: Registro) -> set:
+    """Numeros inteiros (9W, 110V) e prefixo de cada palavra (LAMPADA/LAMP -> LAM)."""
+    return {t if _tem_digito(t) else t[:TAMANHO_PREFIXO] for t in registro.tokens if len(t) > 1}
+
+
+def _similaridade_tokens(a: Sequence[str], b: Sequence[str]) -> float:
+    """Dice sobre palavras, aceitando abreviacao por prefixo (BIV ~ BIVOLT)."""
+    if not a or not b:
+        return 0.0
+    restantes = list(b)
+    casados = 0
+    for token in a:
+        for i, outro in enumerate(restantes):
+            curto, longo = (token, outro) if len(token) <= len(outro) else (outro, token)
+            if token == outro or (len(curto) >= 2 and not _tem_digito(curto) and longo.startswith(curto)):
+                casados += 1
+                del restantes[i]
+                break
+    return 2 * casados / (len(a) + len(b))
+
+
+def similaridade(a: Registro, b: Registro) -> float:
+    """
+    Maior entre a similaridade por palavras e o Dice de trigramas (pega erros de digitacao).
+    Numeros diferentes (9W x 12W) nunca sao o mesmo item.
+    """
+    if a.numeros != b.numeros:
+        return 0.0
+    if not a.trigramas or not b.trigramas:
+        return 0.0
+    trigramas = 2 * len(a.trigramas & b.trigramas) / (len(a.trigramas) + len(b.trigramas))
+    return max(_similaridade_tokens(a.tokens, b.tokens), trigramas)
+
+
+def pares_candidatos(
+    registros: Sequence[Registro],
+    *,
+    limite_bloco: int = LIMITE_BLOCO_PADRAO,
+    minimo_chaves: int = 2,
+) -> Iterable[Tuple[int, int]]:
+    """
+    Blocking por indice invertido: so compara registros que dividem pelo menos
+    `minimo_chaves` chaves de bloco pouco frequentes (ou todas, se tiverem menos).
+    Gera pares de posicoes (i, j) com i < j.
+    """
+    chaves = [chaves_de_bloco(r) for r in registros]
+    indice: Dict[str, List[int]] = defaultdict(list)
+    for pos, ks in enumerate(chaves):
+        for k in ks:
+            indice[k].append(pos)
+
+    for pos, ks in enumerate(chaves):
+        raras = [k for k in ks if len(indice[k]) <= limite_bloco]
+        if not raras:
+            continue
+        contagem: Counter = Counter()
+        for k in raras:
+            for outro in indice[k]:
+                if outro > pos:
+                    contagem[outro] += 1
+        for outro, compartilhadas in contagem.items():
+            if compartilhadas >= min(minimo_chaves, len(raras), len(chaves[outro])):
+                yield pos, outro
+
+
+class _UniaoBusca:
+    def __init__(self, n: int):
+        self.pai = list(range(n))
+
+    def raiz(self, x: int) -> int:
+        while self.pai[x] != x:
+            self.pai[x] = self.pai[self.pai[x]]
+            x = self.pai[x]
+        return x
+
+    def unir(self, a: int, b: int) -> None:
+        ra, rb = self.raiz(a), self.raiz(b)
+        if ra != rb:
+            self.pai[max(ra, rb)] = min(ra, rb)
+
+
+def propor_grupos(
+    itens: Iterable[Tuple[int, str]],
+    *,
+    limiar: float = LIMIAR_PADRAO,
+    limite_bloco: int = LIMITE_BLOCO_PADRAO,
+    prioridade: Optional[Dict[int, int]] = None,
+) -> List[GrupoDuplicados]:
+    """
+    Agrupa (id, nome) quase duplicados. Pares com similaridade >= limiar entram no mesmo grupo
+    (fechamento transitivo). O principal e o de maior `prioridade` (ex.: tem sku); empate -> menor id.
+    """
+    registros = [preparar_registro(pk, nome) for pk, nome in itens]
+    prioridade = prioridade or {}
+    uniao = _UniaoBusca(len(registros))
+    for i, j in pares_candidatos(registros, limite_bloco=limite_bloco):
+        if similaridade(registros[i], registros[j]) >= limiar:
+            uniao.unir(i, j)
+
+    membros: Dict[int, List[int]] = defaultdict(list)
+    for pos in range(len(registros)):
+        membros[uniao.raiz(pos)].append(pos)
+
+    grupos: List[GrupoDuplicados] = []
+    for posicoes in membros.values():
+        if len(posicoes) < 2:
+            continue
+        posicoes.sort(key=lambda p: (-prioridade.get(registros[p].id, 0), registros[p].id))
+        principal = registros[posicoes[0]]
+        grupos.append(
+            GrupoDuplicados(
+                principal_id=principal.id,
+                principal_nome=principal.nome,
+                duplicados=tuple(
+                    (registros[p].id, registros[p].nome, round(similaridade(principal, registros[p]), 3))
+                    for p in posicoes[1:]
+                ),
+            )
+        )
+    grupos.sort(key=lambda g: g.principal_id)
+    return grupos
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+
+# Linhas acumuladas antes de devolver um pedaco ao cliente (CSV/XLSX em streaming).
+LINHAS_POR_PEDACO = 500
+
+_XML_INVALIDO_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _Eco:
+    """Pseudo-arquivo do csv.writer: devolve a linha escrita em vez de guardar."""
+
+    def write(self, valor: str) -> str:
+        return valor
+
+
+class _BufferSemSeek:
+    """Destino do ZipFile em streaming: sem tell/seek o zipfile grava com data descriptors."""
+
+    def __init__(self) -> None:
+        self._partes: list = []
+
+    def write(self, dados: bytes) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self) -> None:
+        pass
+
+    def retirar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def csv_em_streaming(cabecalho: Sequence[str], linhas: Iterable[Sequence]) -> Iterator[str]:
+    """Gera o CSV em pedacos de LINHAS_POR_PEDACO linhas (para StreamingHttpResponse)."""
+    writer = csv.writer(_Eco())
+    pedaco = [writer.writerow(cabecalho)]
+    for linha in linhas:
+        pedaco.append(writer.writerow([_texto(v) for v in linha]))
+        if len(pedaco) >= LINHAS_POR_PEDACO:
+            yield "".join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield "".join(pedaco)
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    "</Types>"
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    "</Relationships>"
+)
+
+
+def _workbook(nome_aba: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nome_aba[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    )
+
+
+def _celula(valor) -> str:
+    if isinstance(valor, bool):
+        valor = "SIM" if valor else "NAO"
+    if isinstance(valor, (int, float, Decimal)):
+        return f"<c><v>{valor}</v></c>"
+    texto = _XML_INVALIDO_RE.sub("", _texto(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _linha_xml(valores: Sequence) -> str:
+    return "<row>" + "".join(_celula(v) for v in valores) + "</row>"
+
+
+def xlsx_em_streaming(
+    cabecalho: Sequence[str], linhas: Iterable[Sequence], *, nome_aba: str = "Planilha"
+) -> Iterator[bytes]:
+    """
+    Gera um XLSX minimo (uma aba, celulas inline) sem dependencias externas.
+    O zip e escrito num destino sem seek, entao cada pedaco comprimido e devolvido
+    assim que fica pronto e a memoria nao cresce com o numero de linhas.
+    """
+    destino = _BufferSemSeek()
+    with zipfile.ZipFile(destino, mode="w", compression=zipfile.ZIP_DEFLATED) as arquivo:
+        arquivo.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        arquivo.writestr("_rels/.rels", _RELS)
+        arquivo.writestr("xl/workbook.xml", _workbook(nome_aba))
+        arquivo.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield destino.retirar()
+
+        with arquivo.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as planilha:
+            planilha.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                    + _linha_xml(cabecalho)
+                ).encode("utf-8")
+            )
+            pedaco = []
+            for linha in linhas:
+                pedaco.append(_linha_xml(linha))
+                if len(pedaco) >= LINHAS_POR_PEDACO:
+                    planilha.write("".join(pedaco).encode("utf-8"))
+                    pedaco = []
+                    dados = destino.retirar()
+                    if dados:
+                        yield dados
+            planilha.write(("".join(pedaco) + "</sheetData></worksheet>").encode("utf-8"))
+    yield destino.retirar()
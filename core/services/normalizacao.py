@@ -2,18 +2,22 @@ from __future__ import annotations
 
 import re
 import unicodedata
+from functools import lru_cache
 
 
 _SPACE_RE = re.compile(r"\s+")
 _PUNCT_RE = re.compile(r"[^\w\s]")
+_NAO_DIGITO_RE = re.compile(r"\D")
 
 
+@lru_cache(maxsize=65536)
 def normalizar_nome(valor: str) -> str:
     """
     - Remove acentos
     - Padroniza espaços
     - Remove pontuação (mantém letras/números/_)
     - Uppercase
+    Memoizada (LRU): importadores repetem os mesmos nomes em milhares de linhas.
     """
     if valor is None:
         return ""
@@ -32,3 +36,10 @@ def normalizar_nome(valor: str) -> str:
     sem_pontuacao = _SPACE_RE.sub(" ", sem_pontuacao).strip()
 
     return sem_pontuacao.upper()
+
+
+def somente_digitos(valor: str) -> str:
+    """CPF/CNPJ, telefone etc. sem mascara: '123.456.789-09' -> '12345678909'."""
+    if not valor:
+        return ""
+    return _NAO_DIGITO_RE.sub("", str(valor))
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import date
+
 from django.conf import settings
+from django.db.models import Q
 
 
 @dataclass(frozen=True)
@@ -35,3 +38,72 @@ def get_pagination_params(request) -> PaginationParams:
         page_size = default_size
 
     return PaginationParams(page=page, page_size=page_size)
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    object_list: list
+    page_size: int
+    has_next: bool
+    has_previous: bool
+    next_cursor: str
+    previous_cursor: str
+
+
+def _parse_cursor(raw: str) -> tuple[date, int] | None:
+    try:
+        data_txt, pk_txt = (raw or "").split("_", 1)
+        return date.fromisoformat(data_txt), int(pk_txt)
+    except ValueError:
+        return None
+
+
+def _build_cursor(obj, campo_data: str) -> str:
+    return f"{getattr(obj, campo_data).isoformat()}_{obj.pk}"
+
+
+def paginar_por_chave(queryset, request, *, campo_data: str, page_size: int) -> KeysetPage:
+    """
+    Paginação por chave (seek) em ordem decrescente de (campo_data, id).
+    Querystring:
+      ?apos=2026-02-20_153   -> próxima página (registros mais antigos)
+      ?antes=2026-02-20_120  -> página anterior (registros mais recentes)
+    Não executa COUNT(*) e o custo não cresce com a profundidade da página.
+    """
+    apos = _parse_cursor(request.GET.get("apos", ""))
+    antes = None if apos else _parse_cursor(request.GET.get("antes", ""))
+
+    rows: list = []
+    has_next = has_previous = False
+    if antes:
+        data_ref, pk_ref = antes
+        qs = queryset.filter(
+            Q(**{f"{campo_data}__gt": data_ref}) | Q(**{campo_data: data_ref, "pk__gt": pk_ref})
+        ).order_by(campo_data, "pk")
+        rows = list(qs[: page_size + 1])
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        has_next = True
+        if not has_previous:
+            # Chegou ao topo: devolve a primeira página completa.
+            antes = None
+
+    if not antes:
+        qs = queryset
+        if apos:
+            data_ref, pk_ref = apos
+            qs = qs.filter(Q(**{f"{campo_data}__lt": data_ref}) | Q(**{campo_data: data_ref, "pk__lt": pk_ref}))
+        rows = list(qs.order_by(f"-{campo_data}", "-pk")[: page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = apos is not None
+
+    return KeysetPage(
+        object_list=rows,
+        page_size=page_size,
+        has_next=bool(rows) and has_next,
+        has_previous=bool(rows) and has_previous,
+        next_cursor=_build_cursor(rows[-1], campo_data) if rows else "",
+        previous_cursor=_build_cursor(rows[0], campo_data) if rows else "",
+    )
@@ -1,8 +1,103 @@
 from __future__ import annotations
 
+import time
 from typing import Iterable
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.cache import cache
+
+CACHE_VERSAO_GRUPOS = "core:permissoes:grupos:versao"
+SESSAO_GRUPOS = "_permissoes_grupos"
+_ATRIBUTO_GRUPOS = "_grupos_snapshot"
+
+# A versao fica no cache compartilhado (DatabaseCache em settings.CACHES) para valer em todos os
+# workers. Na frente dele, uma copia por processo com TTL curto: requests seguidas nao consultam
+# a tabela do cache; a troca feita por outro worker chega em ate TTL_VERSAO_LOCAL segundos
+# (no proprio worker, na hora).
+TTL_VERSAO_LOCAL = 5
+_versao_local: dict = {}
+
+
+def _nova_versao() -> int:
+    # Se a chave sumir do cache (cull, clear), a versao recriada nunca repete a de um snapshot antigo.
+    return time.time_ns()
+
+
+def _guardar_versao_local(versao: int) -> int:
+    _versao_local.update(versao=versao, expira=time.monotonic() + TTL_VERSAO_LOCAL)
+    return versao
+
+
+def _versao_grupos() -> int:
+    if _versao_local.get("expira", 0) > time.monotonic():
+        return _versao_local["versao"]
+    versao = cache.get(CACHE_VERSAO_GRUPOS)
+    if versao is None:
+        versao = _nova_versao()
+        if not cache.add(CACHE_VERSAO_GRUPOS, versao, None):
+            versao = cache.get(CACHE_VERSAO_GRUPOS, versao)
+    return _guardar_versao_local(versao)
+
+
+def invalidar_grupos() -> None:
+    """Chamar apos mudar grupos/membros: snapshots de sessao com a versao antiga sao recarregados."""
+    try:
+        versao = cache.incr(CACHE_VERSAO_GRUPOS)
+    except ValueError:
+        versao = _nova_versao()
+        cache.set(CACHE_VERSAO_GRUPOS, versao, None)
+    _guardar_versao_local(versao)
+
+
+def grupos_do_usuario(user) -> frozenset[str]:
+    """
+    Nomes dos grupos do usuario. Consulta o banco uma vez por objeto de usuario
+    (na request, o middleware ja deixa o snapshot da sessao no request.user).
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, _ATRIBUTO_GRUPOS, None)
+    if grupos is None:
+        grupos = frozenset(user.groups.values_list("name", flat=True))
+        setattr(user, _ATRIBUTO_GRUPOS, grupos)
+    return grupos
+
+
+def usuario_em_grupos(user, grupos: Iterable[str]) -> bool:
+    return not grupos_do_usuario(user).isdisjoint(grupos)
+
+
+def carregar_grupos_da_request(request) -> frozenset[str]:
+    """
+    Snapshot dos grupos guardado na sessao; so volta ao banco se a versao mudou
+    ou a sessao e de outro usuario.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, _ATRIBUTO_GRUPOS, None)
+    if grupos is not None:
+        return grupos
+
+    versao = _versao_grupos()
+    snapshot = request.session.get(SESSAO_GRUPOS)
+    if snapshot and snapshot.get("usuario") == user.pk and snapshot.get("versao") == versao:
+        grupos = frozenset(snapshot["grupos"])
+        setattr(user, _ATRIBUTO_GRUPOS, grupos)
+        return grupos
+
+    grupos = grupos_do_usuario(user)
+    request.session[SESSAO_GRUPOS] = {"usuario": user.pk, "versao": versao, "grupos": sorted(grupos)}
+    return grupos
+
+
+def recarregar_grupos_da_request(request) -> frozenset[str]:
+    """Apos mudar os grupos do proprio usuario na request (ex.: troca de senha obrigatoria)."""
+    request.session.pop(SESSAO_GRUPOS, None)
+    user = getattr(request, "user", None)
+    if user is not None and hasattr(user, _ATRIBUTO_GRUPOS):
+        delattr(user, _ATRIBUTO_GRUPOS)
+    return carregar_grupos_da_request(request)
 
 
 class GroupRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -21,4 +116,4 @@ class GroupRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
             return True
         if not self.required_groups:
             return True
-        return user.groups.filter(name__in=list(self.required_groups)).exists()
+        return usuario_em_grupos(user, self.required_groups)
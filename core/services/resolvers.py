@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Type
+from typing import Callable, Dict, Iterable, Optional, Tuple, Type
 
 from django.db.models import Model, Q
 
@@ -57,3 +57,111 @@ def resolver_ou_criar_principal(
         nome_field_norm: n,
     }
     return main_model.objects.create(**payload)
+
+
+class ResolvedorNomes:
+    """
+    Cache em memoria nome_normalizado -> id do principal, para importadores.
+    - carrega os mapas alias->principal e nome->id de uma vez (tudo ou so os nomes do arquivo)
+    - resolve lotes de nomes em memoria
+    - em miss consulta o banco (alias e principal, um IN cada), o que cobre registros
+      inseridos por outra importacao depois da carga
+    Nomes nao encontrados nao sao cacheados como ausentes.
+    """
+
+    def __init__(
+        self,
+        main_model: Type[Model],
+        *,
+        alias_model: Optional[Type[Model]] = None,
+        alias_field: str = "nome_normalizado",
+        main_field: str = "nome_normalizado",
+        tamanho_lote: int = 1000,
+    ):
+        self.main_model = main_model
+        self.alias_model = alias_model
+        self.alias_field = alias_field
+        self.main_field = main_field
+        self.tamanho_lote = tamanho_lote
+        self._ids: Dict[str, int] = {}
+
+    def _buscar(self, normalizados: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Consulta o banco; normalizados=None carrega a tabela inteira."""
+        encontrados: Dict[str, int] = {}
+        pendentes = None if normalizados is None else set(normalizados)
+        if pendentes is not None and not pendentes:
+            return encontrados
+
+        if self.alias_model is not None:
+            qs = self.alias_model.objects.all()
+            if pendentes is not None:
+                qs = qs.filter(**{f"{self.alias_field}__in": pendentes})
+            encontrados.update(qs.values_list(self.alias_field, "principal_id").iterator())
+            if pendentes is not None:
+                pendentes -= encontrados.keys()
+                if not pendentes:
+                    return encontrados
+
+        qs = self.main_model.objects.order_by("id")
+        if pendentes is not None:
+            qs = qs.filter(**{f"{self.main_field}__in": pendentes})
+        for norm, pk in qs.values_list(self.main_field, "id").iterator():
+            # Alias tem prioridade; com nome repetido no principal vale o mais antigo.
+            encontrados.setdefault(norm, pk)
+        return encontrados
+
+    def carregar(self, nomes: Optional[Iterable[str]] = None) -> "ResolvedorNomes":
+        """Pre-carrega o cache (todos os registros, ou so os nomes informados)."""
+        if nomes is None:
+            self._ids.update(self._buscar())
+        else:
+            self.resolver_ids(nomes)
+        return self
+
+    def registrar(self, nome_normalizado: str, pk: int) -> None:
+        self._ids[nome_normalizado] = pk
+
+    def resolver_ids(self, nomes: Iterable[str]) -> Dict[str, int]:
+        """Retorna {nome_original: id} para os nomes encontrados (memoria, depois banco)."""
+        normalizados = {nome: normalizar_nome(nome) for nome in nomes}
+        faltantes = {n for n in normalizados.values() if n and n not in self._ids}
+        if faltantes:
+            self._ids.update(self._buscar(faltantes))
+        return {nome: self._ids[n] for nome, n in normalizados.items() if n in self._ids}
+
+    def resolver_id(self, nome: str) -> Optional[int]:
+        return self.resolver_ids([nome]).get(nome)
+
+    def resolver_ou_criar_ids(
+        self,
+        nomes: Iterable[str],
+        fabrica: Callable[[str, str], Model],
+        *,
+        ignorar_conflitos: bool = False,
+    ) -> Tuple[Dict[str, int], int]:
+        """
+        Resolve os nomes e cria os faltantes via bulk_create.
+        fabrica(nome_original, nome_normalizado) monta a instancia nao salva.
+        Use ignorar_conflitos=True quando nome_normalizado for unique: registros criados
+        em paralelo sao relidos em vez de quebrar a importacao.
+        Retorna ({nome_original: id}, quantidade criada).
+        """
+        nomes = list(dict.fromkeys(nomes))
+        ids = self.resolver_ids(nomes)
+
+        faltantes: Dict[str, str] = {}
+        for nome in nomes:
+            n = normalizar_nome(nome)
+            if n and nome not in ids:
+                faltantes.setdefault(n, nome)
+        if not faltantes:
+            return ids, 0
+
+        self.main_model.objects.bulk_create(
+            [fabrica(nome, n) for n, nome in faltantes.items()],
+            batch_size=self.tamanho_lote,
+            ignore_conflicts=ignorar_conflitos,
+        )
+        self._ids.update(self._buscar(faltantes))
+        ids.update(self.resolver_ids(nome for nome in nomes if nome not in ids))
+        return ids, len(faltantes)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.services.permissoes import invalidar_grupos
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def grupos_do_usuario_alterados(sender, action, **kwargs):
+    # Cobre user.groups.* e group.user_set.* (admin, comandos de provisionamento, troca de senha).
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidar_grupos()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def grupo_alterado(sender, **kwargs):
+    # Renomear/excluir um grupo muda o snapshot de todos os membros.
+    invalidar_grupos()
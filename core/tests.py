@@ -4,3 +4,153 @@ from django.test import TestCase
 class CoreSmokeTest(TestCase):
     def test_core_ok(self):
         self.assertTrue(True)
+
+
+class ArquivosCsvTest(TestCase):
+    def test_acento_latin1_depois_da_amostra_decodifica_o_arquivo_todo_em_latin1(self):
+        import io
+
+        from core.services.arquivos_csv import abrir_csv_texto
+
+        conteudo = "descricao;fornecedor\n" + "lampada;ACME\n" * 50 + "Lâmpada;Elétrica São João\n"
+        texto = abrir_csv_texto(io.BytesIO(conteudo.encode("latin-1")), amostra=64).read()
+        self.assertEqual(texto, conteudo)
+
+        utf8 = "descricao\n" + "x\n" * 50 + "Lâmpada\n"
+        self.assertEqual(abrir_csv_texto(io.BytesIO(("\ufeff" + utf8).encode("utf-8")), amostra=64).read(), utf8)
+
+
+class ResolvedorNomesTest(TestCase):
+    def test_resolve_em_memoria_e_consulta_banco_no_miss(self):
+        from compras.models import Fornecedor, FornecedorAlias
+        from core.services.resolvers import ResolvedorNomes
+
+        principal = Fornecedor.objects.create(nome="Eletrica Central LTDA")
+        FornecedorAlias.objects.create(principal=principal, nome="Elétrica Central")
+        resolvedor = ResolvedorNomes(Fornecedor, alias_model=FornecedorAlias).carregar()
+
+        with self.assertNumQueries(0):
+            ids = resolvedor.resolver_ids(["eletrica central", "ELETRICA CENTRAL LTDA."])
+        self.assertEqual(set(ids.values()), {principal.id})
+
+        # Inserido depois da carga (ex.: outra importacao): resolvido via banco no miss.
+        novo = Fornecedor.objects.create(nome="Fornecedor Novo")
+        self.assertEqual(resolvedor.resolver_id("fornecedor novo"), novo.id)
+        self.assertIsNone(resolvedor.resolver_id("Inexistente"))
+
+        ids, criados = resolvedor.resolver_ou_criar_ids(
+            ["Fornecedor Novo", "Outro Fornecedor", "outro fornecedor"],
+            lambda nome, norm: Fornecedor(nome=nome, nome_normalizado=norm),
+            ignorar_conflitos=True,
+        )
+        self.assertEqual(criados, 1)
+        self.assertEqual(ids["Outro Fornecedor"], ids["outro fornecedor"])
+        self.assertEqual(Fornecedor.objects.filter(nome_normalizado="OUTRO FORNECEDOR").count(), 1)
+
+
+class PermissoesGruposTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="comprador1", password="x")
+        self.user.groups.add(Group.objects.create(name="comprador"))
+        self.client.force_login(self.user)
+        self._novo_worker()
+
+    @staticmethod
+    def _novo_worker():
+        # Processo que ainda nao leu a versao (ou cuja copia local expirou).
+        from core.services import permissoes
+
+        permissoes._versao_local.clear()
+
+    def _consultas_de_grupo(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, [
+            q["sql"] for q in ctx.captured_queries if "auth_group" in q["sql"] or "django_cache" in q["sql"]
+        ]
+
+    def test_request_quente_nao_consulta_grupos(self):
+        from django.urls import reverse
+
+        url = reverse("compras:compra_list")
+        response, consultas = self._consultas_de_grupo(url)
+        self.assertEqual(response.status_code, 200)
+        # Versao no cache compartilhado + grupos do usuario.
+        self.assertEqual(len(consultas), 2)
+
+        response, consultas = self._consultas_de_grupo(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(consultas, [])
+
+        # Copia local expirada: so a leitura da versao, o snapshot da sessao continua valendo.
+        self._novo_worker()
+        response, consultas = self._consultas_de_grupo(url)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn("django_cache", consultas[0])
+
+    def test_troca_feita_por_outro_worker_chega_apos_o_ttl(self):
+        import time
+        from unittest.mock import patch
+
+        from django.core.cache import cache
+        from django.urls import reverse
+
+        from core.services.permissoes import CACHE_VERSAO_GRUPOS, TTL_VERSAO_LOCAL
+
+        url = reverse("compras:compra_list")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Outro worker tira o grupo e incrementa a versao compartilhada; a copia local deste nao muda.
+        self.user.groups.through.objects.filter(user=self.user).delete()
+        cache.incr(CACHE_VERSAO_GRUPOS)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        depois = time.monotonic() + TTL_VERSAO_LOCAL + 1
+        with patch("core.services.permissoes.time.monotonic", return_value=depois):
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_mudanca_de_grupo_invalida_snapshot(self):
+        from django.contrib.auth.models import Group
+        from django.urls import reverse
+
+        url = reverse("compras:compra_list")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.user.groups.clear()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        Group.objects.create(name="estoquista").user_set.add(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_versao_recriada_nao_reaproveita_snapshot(self):
+        from django.core.cache import cache
+        from django.urls import reverse
+
+        from core.services.permissoes import CACHE_VERSAO_GRUPOS
+
+        url = reverse("compras:compra_list")
+        cache.delete(CACHE_VERSAO_GRUPOS)
+        self._novo_worker()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Chave descartada do cache e grupo removido sem sinal: a nova versao nao casa com a da sessao.
+        cache.delete(CACHE_VERSAO_GRUPOS)
+        self._novo_worker()
+        self.user.groups.through.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_snapshot_memoizado_no_usuario(self):
+        from core.services.permissoes import grupos_do_usuario, usuario_em_grupos
+
+        with self.assertNumQueries(1):
+            self.assertEqual(grupos_do_usuario(self.user), frozenset({"comprador"}))
+            self.assertTrue(usuario_em_grupos(self.user, ("admin/gestor", "comprador")))
+            self.assertFalse(usuario_em_grupos(self.user, ("admin/gestor",)))
@@ -11,6 +11,7 @@ from django.views.generic import TemplateView, ListView
 from django.http import HttpResponse
 from pathlib import Path
 
+from core.services.permissoes import recarregar_grupos_da_request, usuario_em_grupos
 from importadores.services.resultado_diario_service import ResultadoDiarioService
 from estoque.models import EstoqueMovimento, SaidaOperacionalEstoque
 from vendas.models import ItemVenda
@@ -27,7 +28,7 @@ class HomeView(LoginRequiredMixin, TemplateView):
     def _is_admin_dashboard(user) -> bool:
         if not user or not user.is_authenticated:
             return False
-        if user.is_superuser or user.groups.filter(name="admin/gestor").exists():
+        if user.is_superuser or usuario_em_grupos(user, ("admin/gestor",)):
             return True
         return user.username.lower() in {"lucas", "tabatha"}
 
@@ -101,16 +102,7 @@ class HomeView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        try:
-            ctx["resultado_diario_dashboard"] = ResultadoDiarioService.payload_dashboard()
-        except Exception:
-            ctx["resultado_diario_dashboard"] = {
-                "data_referencia": None,
-                "linhas": [],
-                "total_vendas_geral": 0,
-                "total_saidas_geral": 0,
-                "resultado_geral": 0,
-            }
+        ctx["resultado_diario_dashboard"] = ResultadoDiarioService.payload_dashboard()
         if self._is_admin_dashboard(self.request.user):
             ctx["alertas_operacionais"] = self._build_alertas_operacionais()
         return ctx
@@ -156,6 +148,7 @@ class ForcedPasswordChangeView(PasswordChangeView):
         response = super().form_valid(form)
         grupo_forcar, _ = Group.objects.get_or_create(name="troca_senha_obrigatoria")
         self.request.user.groups.remove(grupo_forcar)
+        recarregar_grupos_da_request(self.request)
         self.request.session["senha_forcada_alertada"] = False
         messages.success(self.request, "Senha alterada com sucesso.")
         return response
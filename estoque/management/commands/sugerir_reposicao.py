@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import csv
+
+from django.core.management.base import BaseCommand
+
+from estoque.services.reposicao_service import CAMPOS_CSV_REPOSICAO, linhas_csv_reposicao, sugerir_reposicao
+
+
+class Command(BaseCommand):
+    help = "Gera o pedido de compra sugerido (CSV) a partir da demanda recente e dos parametros de estoque."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--saida", type=str, default="", help="Arquivo CSV (default: stdout).")
+        parser.add_argument("--dias-historico", type=int, default=84)
+        parser.add_argument("--prazo-entrega", type=int, default=7)
+        parser.add_argument("--cobertura", type=int, default=30)
+
+    def handle(self, *args, **options):
+        pedidos = sugerir_reposicao(
+            dias_historico=options["dias_historico"],
+            prazo_entrega_dias=options["prazo_entrega"],
+            dias_cobertura=options["cobertura"],
+        )
+        linhas = list(linhas_csv_reposicao(pedidos))
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8", newline="") as destino:
+                self._escrever(destino, linhas)
+            self.stdout.write(self.style.SUCCESS(
+                f"OK. {len(linhas)} item(ns) em {len(pedidos)} pedido(s) gravados em {options['saida']}"
+            ))
+        else:
+            self._escrever(self.stdout, linhas)
+
+    @staticmethod
+    def _escrever(destino, linhas) -> None:
+        writer = csv.DictWriter(destino, fieldnames=CAMPOS_CSV_REPOSICAO)
+        writer.writeheader()
+        writer.writerows(linhas)
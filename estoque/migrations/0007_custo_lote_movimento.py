@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:54
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_custo_lotes(apps, schema_editor):
+    Lote = apps.get_model("estoque", "Lote")
+    ProdutoEstoque = apps.get_model("estoque", "ProdutoEstoque")
+    EstoqueMovimento = apps.get_model("estoque", "EstoqueMovimento")
+    ItemCompra = apps.get_model("compras", "ItemCompra")
+
+    # Lotes de compra: preco do item; demais: custo medio atual do produto.
+    Lote.objects.filter(item_compra__isnull=False).update(
+        custo_unitario=Subquery(
+            ItemCompra.objects.filter(pk=OuterRef("item_compra_id")).values("preco_unitario")[:1]
+        )
+    )
+    for produto_id, custo in ProdutoEstoque.objects.values_list("produto_id", "custo_medio"):
+        if custo:
+            Lote.objects.filter(produto_id=produto_id, item_compra__isnull=True).update(custo_unitario=custo)
+
+    entradas = []
+    for mov in EstoqueMovimento.objects.filter(lote__isnull=False).select_related("lote").iterator(chunk_size=2000):
+        mov.custo_total = (mov.quantidade * (mov.lote.custo_unitario or Decimal("0"))).quantize(Decimal("0.01"))
+        entradas.append(mov)
+        if len(entradas) >= 2000:
+            EstoqueMovimento.objects.bulk_update(entradas, ["custo_total"])
+            entradas = []
+    if entradas:
+        EstoqueMovimento.objects.bulk_update(entradas, ["custo_total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0009_alter_compraevento_id'),
+        ('estoque', '0006_alter_produtoestoqueunidade_unidade_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoquemovimento',
+            name='custo_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='lote',
+            name='custo_unitario',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=14),
+        ),
+        migrations.RunPython(preencher_custo_lotes, migrations.RunPython.noop),
+    ]
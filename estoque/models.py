@@ -63,6 +63,8 @@ class Lote(models.Model):
     quantidade_restante = models.DecimalField(
         max_digits=14, decimal_places=3, validators=[MinValueValidator(Decimal("0.000"))], default=Decimal("0.000")
     )
+    # Custo unitario da entrada (preco da compra); consumido por FIFO nas saidas.
+    custo_unitario = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0.0000"))
 
     criado_em = models.DateTimeField(auto_now_add=True)
 
@@ -111,6 +113,8 @@ class EstoqueMovimento(models.Model):
     lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, blank=True, null=True, related_name="movimentos")
 
     observacao = models.CharField(max_length=255, blank=True, default="")
+    # Custo total do movimento: entrada = quantidade x custo do lote; saida = custo FIFO dos lotes consumidos.
+    custo_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
     criado_em = models.DateTimeField(auto_now_add=True)
 
     class Meta:
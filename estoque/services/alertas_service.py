@@ -40,3 +40,46 @@ def verificar_e_criar_alerta(produto: Produto) -> None:
             aberto.status = StatusAlerta.RESOLVIDO
             aberto.resolvido_em = timezone.now()
             aberto.save(update_fields=["status", "resolvido_em"])
+
+
+@transaction.atomic
+def verificar_alertas_produtos(produto_ids) -> None:
+    """Mesma regra de `verificar_e_criar_alerta`, para varios produtos com queries em lote."""
+    ids = list(produto_ids)
+    if not ids:
+        return
+    cfgs = {
+        produto_id: (saldo or Decimal("0.000"), minimo or Decimal("0.000"))
+        for produto_id, saldo, minimo in ProdutoEstoque.objects.filter(produto_id__in=ids).values_list(
+            "produto_id", "saldo_atual", "estoque_minimo"
+        )
+    }
+    abertos = {}
+    for alerta in AlertaEstoque.objects.filter(produto_id__in=ids, status=StatusAlerta.ABERTO).order_by("-criado_em", "-id"):
+        abertos.setdefault(alerta.produto_id, alerta)
+
+    novos, atualizar, resolver = [], [], []
+    for produto_id in ids:
+        saldo, minimo = cfgs.get(produto_id, (Decimal("0.000"), Decimal("0.000")))
+        aberto = abertos.get(produto_id)
+        if saldo <= minimo:
+            if aberto:
+                aberto.saldo_no_momento = saldo
+                aberto.minimo_configurado = minimo
+                atualizar.append(aberto)
+            else:
+                novos.append(
+                    AlertaEstoque(
+                        produto_id=produto_id,
+                        status=StatusAlerta.ABERTO,
+                        saldo_no_momento=saldo,
+                        minimo_configurado=minimo,
+                    )
+                )
+        elif aberto:
+            resolver.append(aberto.pk)
+
+    AlertaEstoque.objects.bulk_create(novos, batch_size=500)
+    AlertaEstoque.objects.bulk_update(atualizar, ["saldo_no_momento", "minimo_configurado"], batch_size=500)
+    if resolver:
+        AlertaEstoque.objects.filter(pk__in=resolver).update(status=StatusAlerta.RESOLVIDO, resolvido_em=timezone.now())
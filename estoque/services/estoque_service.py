@@ -15,6 +15,7 @@ from estoque.services.alertas_service import verificar_e_criar_alerta
 class MovimentoResult:
     movimento: EstoqueMovimento
     saldo_atual: Decimal
+    custo_total: Decimal = Decimal("0.00")
 
 
 def _get_cfg(produto: Produto) -> ProdutoEstoque:
@@ -37,6 +38,9 @@ def registrar_entrada(
         data_movimento = timezone.localdate()
 
     cfg = _get_cfg(produto)
+    # Sem preco informado, o lote assume o custo medio vigente.
+    custo_lote = preco_unitario if preco_unitario is not None else (cfg.custo_medio or Decimal("0"))
+    custo_total = (quantidade * custo_lote).quantize(Decimal("0.01"))
 
     lote = Lote.objects.create(
         produto=produto,
@@ -45,6 +49,7 @@ def registrar_entrada(
         data_entrada=data_movimento,
         quantidade_inicial=quantidade,
         quantidade_restante=quantidade,
+        custo_unitario=custo_lote,
     )
 
     mov = EstoqueMovimento.objects.create(
@@ -56,6 +61,7 @@ def registrar_entrada(
         item_compra=item_compra,
         lote=lote,
         observacao=observacao or "",
+        custo_total=custo_total,
     )
 
     # Atualiza custo médio se preço for informado (padrão ponderado)
@@ -75,7 +81,7 @@ def registrar_entrada(
     # Entrada pode resolver alerta
     verificar_e_criar_alerta(produto)
 
-    return MovimentoResult(movimento=mov, saldo_atual=cfg.saldo_atual)
+    return MovimentoResult(movimento=mov, saldo_atual=cfg.saldo_atual, custo_total=custo_total)
 
 
 @transaction.atomic
@@ -91,8 +97,9 @@ def registrar_saida(
 
     cfg = _get_cfg(produto)
 
-    # Consumir lotes por FIFO
+    # Consumir lotes por FIFO, acumulando o custo de cada lote consumido
     restante = quantidade
+    custo_total = Decimal("0.00")
     lotes = Lote.objects.select_for_update().filter(produto=produto, quantidade_restante__gt=Decimal("0.000")).order_by("data_entrada", "id")
 
     for lote in lotes:
@@ -101,18 +108,21 @@ def registrar_saida(
         consumir = min(lote.quantidade_restante, restante)
         lote.quantidade_restante = (lote.quantidade_restante - consumir).quantize(Decimal("0.001"))
         lote.save(update_fields=["quantidade_restante"])
+        custo_total += consumir * (lote.custo_unitario or Decimal("0"))
         restante -= consumir
 
     if restante > 0:
         # não tem saldo suficiente nos lotes (inconsistência), mas bloqueia para evitar negativo
         raise ValueError("Saldo insuficiente em lotes para registrar saída.")
 
+    custo_total = custo_total.quantize(Decimal("0.01"))
     mov = EstoqueMovimento.objects.create(
         produto=produto,
         tipo=TipoMovimento.SAIDA,
         quantidade=quantidade,
         data_movimento=data_movimento,
         observacao=observacao or "",
+        custo_total=custo_total,
     )
 
     novo_saldo = (cfg.saldo_atual or Decimal("0")) - quantidade
@@ -123,7 +133,7 @@ def registrar_saida(
 
     verificar_e_criar_alerta(produto)
 
-    return MovimentoResult(movimento=mov, saldo_atual=cfg.saldo_atual)
+    return MovimentoResult(movimento=mov, saldo_atual=cfg.saldo_atual, custo_total=custo_total)
 
 
 @transaction.atomic
@@ -157,6 +167,7 @@ def registrar_ajuste(
             data_entrada=data_movimento,
             quantidade_inicial=quantidade,
             quantidade_restante=quantidade,
+            custo_unitario=cfg.custo_medio or Decimal("0"),
         )
     else:
         # se negativo, consome FIFO
@@ -1,41 +1,206 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
 from django.db import transaction
+from django.utils import timezone
+
+from compras.models import CentroCustoChoices, Compra, CompraEvento, ItemCompra
+from estoque.models import EstoqueMovimento, Lote, ProdutoEstoque, ProdutoEstoqueUnidade, TipoMovimento, UnidadeLoja
+from estoque.services.alertas_service import verificar_alertas_produtos
+
+TAMANHO_LOTE_RECEBIMENTO = 500
+
+# Centro de custo da compra -> unidade que recebe a mercadoria (demais centros: unidade 1).
+UNIDADE_POR_CENTRO_CUSTO = {
+    CentroCustoChoices.FM: UnidadeLoja.LOJA_1,
+    CentroCustoChoices.ML: UnidadeLoja.LOJA_2,
+}
+
+
+@dataclass(frozen=True)
+class RecebimentoResult:
+    compras: int
+    movimentos_criados: int
+    itens_ignorados: int
+    produtos_atualizados: int
 
-from compras.models import Compra
-from estoque.services.estoque_service import registrar_entrada
+
+def unidade_da_compra(compra: Compra) -> str:
+    return UNIDADE_POR_CENTRO_CUSTO.get(compra.centro_custo, UnidadeLoja.LOJA_1)
 
 
 @transaction.atomic
-def dar_entrada_por_compra(compra: Compra) -> int:
+def receber_compras(compra_ids: Iterable[int]) -> RecebimentoResult:
     """
-    Cria movimentos de ENTRADA no estoque para cada item da compra.
-    - Não duplica: se já existirem movimentos vinculados a item_compra, ignora.
-    Retorna quantidade de movimentos criados.
+    Entrada em estoque de varias compras de uma vez:
+    - itens que ja tem ENTRADA vinculada sao ignorados (uma query para todos)
+    - Lote e EstoqueMovimento via bulk_create
+    - saldo/custo medio ponderado do ProdutoEstoque e saldo da unidade de destino via bulk_update
+    - alertas verificados uma vez por produto
     """
-    criados = 0
+    ids = sorted({int(pk) for pk in compra_ids})
+    compras = {c.pk: c for c in Compra.objects.filter(pk__in=ids).only("id", "data_compra", "centro_custo")}
+    itens = list(
+        ItemCompra.objects.filter(compra_id__in=compras).only(
+            "id", "compra_id", "produto_id", "quantidade", "preco_unitario"
+        ).order_by("compra_id", "id")
+    )
+    ja_recebidos = set(
+        EstoqueMovimento.objects.filter(item_compra_id__in=[i.pk for i in itens], tipo=TipoMovimento.ENTRADA)
+        .values_list("item_compra_id", flat=True)
+    )
+    pendentes = [i for i in itens if i.pk not in ja_recebidos]
+    if not pendentes:
+        return RecebimentoResult(len(compras), 0, len(itens), 0)
+
+    lotes: List[Lote] = []
+    movimentos: List[EstoqueMovimento] = []
+    # produto -> [quantidade, valor]; (produto, unidade) -> quantidade
+    entradas: Dict[int, List[Decimal]] = {}
+    por_unidade: Dict[Tuple[int, str], Decimal] = {}
+    for item in pendentes:
+        compra = compras[item.compra_id]
+        quantidade = (item.quantidade or Decimal("0")).quantize(Decimal("0.001"))
+        preco = item.preco_unitario or Decimal("0.00")
+        lote = Lote(
+            produto_id=item.produto_id,
+            compra_id=compra.pk,
+            item_compra_id=item.pk,
+            data_entrada=compra.data_compra,
+            quantidade_inicial=quantidade,
+            quantidade_restante=quantidade,
+            custo_unitario=preco,
+        )
+        lotes.append(lote)
+        movimentos.append(
+            EstoqueMovimento(
+                produto_id=item.produto_id,
+                tipo=TipoMovimento.ENTRADA,
+                quantidade=quantidade,
+                data_movimento=compra.data_compra,
+                compra_id=compra.pk,
+                item_compra_id=item.pk,
+                lote=lote,
+                observacao=f"Entrada por compra #{compra.pk}",
+                custo_total=(quantidade * preco).quantize(Decimal("0.01")),
+            )
+        )
+        acumulado = entradas.setdefault(item.produto_id, [Decimal("0"), Decimal("0")])
+        acumulado[0] += quantidade
+        acumulado[1] += quantidade * preco
+        chave = (item.produto_id, unidade_da_compra(compra))
+        por_unidade[chave] = por_unidade.get(chave, Decimal("0")) + quantidade
 
-    compra = (
-        Compra.objects.select_related("fornecedor")
-        .prefetch_related("itens__produto")
-        .get(pk=compra.pk)
+    Lote.objects.bulk_create(lotes, batch_size=TAMANHO_LOTE_RECEBIMENTO)
+    EstoqueMovimento.objects.bulk_create(movimentos, batch_size=TAMANHO_LOTE_RECEBIMENTO)
+
+    produto_ids = list(entradas)
+    existentes = set(ProdutoEstoque.objects.filter(produto_id__in=produto_ids).values_list("produto_id", flat=True))
+    ProdutoEstoque.objects.bulk_create(
+        [ProdutoEstoque(produto_id=pk) for pk in produto_ids if pk not in existentes],
+        batch_size=TAMANHO_LOTE_RECEBIMENTO,
+        ignore_conflicts=True,
+    )
+    cfgs = list(ProdutoEstoque.objects.select_for_update().filter(produto_id__in=produto_ids))
+    saldos_anteriores = {cfg.produto_id: cfg.saldo_atual or Decimal("0") for cfg in cfgs}
+    agora = timezone.now()
+    for cfg in cfgs:
+        quantidade, valor = entradas[cfg.produto_id]
+        saldo_previo = saldos_anteriores[cfg.produto_id]
+        novo_saldo = saldo_previo + quantidade
+        # Mesmo custo medio ponderado de registrar_entrada, aplicado ao total recebido.
+        if novo_saldo > 0:
+            cfg.custo_medio = (saldo_previo * (cfg.custo_medio or Decimal("0")) + valor) / novo_saldo
+        cfg.saldo_atual = novo_saldo
+        cfg.atualizado_em = agora
+    ProdutoEstoque.objects.bulk_update(
+        cfgs, ["saldo_atual", "custo_medio", "atualizado_em"], batch_size=TAMANHO_LOTE_RECEBIMENTO
     )
 
-    for item in compra.itens.all():
-        # já tem movimento para este item?
-        if item.movimentos_estoque.filter(tipo="ENTRADA").exists():
-            continue
+    _aplicar_saldos_unidade(por_unidade, saldos_anteriores, agora)
+    verificar_alertas_produtos(produto_ids)
+
+    return RecebimentoResult(
+        compras=len(compras),
+        movimentos_criados=len(movimentos),
+        itens_ignorados=len(itens) - len(pendentes),
+        produtos_atualizados=len(cfgs),
+    )
 
-        registrar_entrada(
-            produto=item.produto,
-            quantidade=(item.quantidade or Decimal("0")).quantize(Decimal("0.001")),
-            data_movimento=compra.data_compra,
-            compra=compra,
-            item_compra=item,
-            preco_unitario=(item.preco_unitario or Decimal('0.00')),
-            observacao=f"Entrada por compra #{compra.id}",
-        )
-        criados += 1
 
-    return criados
+def _aplicar_saldos_unidade(
+    por_unidade: Dict[Tuple[int, str], Decimal], saldos_anteriores: Dict[int, Decimal], agora
+) -> None:
+    """
+    Soma as entradas nas unidades de destino. Produto ainda sem saldo por unidade recebe as
+    duas unidades com o saldo anterior na unidade 1 (mesma regra de garantir_unidades_produto).
+    """
+    produto_ids = {produto_id for produto_id, _ in por_unidade}
+    linhas = {
+        (u.produto_id, u.unidade): u
+        for u in ProdutoEstoqueUnidade.objects.select_for_update().filter(produto_id__in=produto_ids)
+    }
+    com_unidades = {produto_id for produto_id, _ in linhas}
+    faltantes = []
+    for produto_id in produto_ids:
+        for unidade in (UnidadeLoja.LOJA_1, UnidadeLoja.LOJA_2):
+            if (produto_id, unidade) in linhas:
+                continue
+            inicial = Decimal("0.000")
+            if produto_id not in com_unidades and unidade == UnidadeLoja.LOJA_1:
+                inicial = saldos_anteriores.get(produto_id, Decimal("0.000")).quantize(Decimal("0.001"))
+            registro = ProdutoEstoqueUnidade(produto_id=produto_id, unidade=unidade, saldo_atual=inicial)
+            linhas[(produto_id, unidade)] = registro
+            faltantes.append(registro)
+    ProdutoEstoqueUnidade.objects.bulk_create(faltantes, batch_size=TAMANHO_LOTE_RECEBIMENTO)
+
+    alteradas = []
+    for chave, quantidade in por_unidade.items():
+        registro = linhas[chave]
+        registro.saldo_atual = ((registro.saldo_atual or Decimal("0")) + quantidade).quantize(Decimal("0.001"))
+        registro.atualizado_em = agora
+        alteradas.append(registro)
+    ProdutoEstoqueUnidade.objects.bulk_update(
+        alteradas, ["saldo_atual", "atualizado_em"], batch_size=TAMANHO_LOTE_RECEBIMENTO
+    )
+
+
+@transaction.atomic
+def confirmar_recebimento_compras(compra_ids: Iterable[int], *, usuario=None, observacao: str = "") -> RecebimentoResult:
+    """
+    Conferencia do estoque: compras APROVADAS passam a RECEBIDA, ganham o evento de
+    recebimento e dao entrada no estoque em lote. Outras situacoes sao ignoradas.
+    """
+    ids = list(
+        Compra.objects.select_for_update()
+        .filter(pk__in=list(compra_ids), status=Compra.StatusChoices.APROVADA)
+        .values_list("pk", flat=True)
+    )
+    if not ids:
+        return RecebimentoResult(0, 0, 0, 0)
+
+    Compra.objects.filter(pk__in=ids).update(
+        status=Compra.StatusChoices.RECEBIDA,
+        recebido_em=timezone.now(),
+        recebido_por=usuario,
+    )
+    detalhe = "Recebimento registrado via modulo de estoque apos conferencia."
+    if observacao:
+        detalhe = f"{detalhe} Observacao: {observacao}"
+    CompraEvento.objects.bulk_create(
+        [CompraEvento(compra_id=pk, tipo=CompraEvento.TipoEvento.RECEBIMENTO, usuario=usuario, detalhe=detalhe) for pk in ids],
+        batch_size=TAMANHO_LOTE_RECEBIMENTO,
+    )
+    return receber_compras(ids)
+
+
+def dar_entrada_por_compra(compra: Compra) -> int:
+    """
+    Cria movimentos de ENTRADA no estoque para cada item da compra.
+    - Não duplica: se já existirem movimentos vinculados a item_compra, ignora.
+    Retorna quantidade de movimentos criados.
+    """
+    return receber_compras([compra.pk]).movimentos_criados
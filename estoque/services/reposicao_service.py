@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import ROUND_CEILING, Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from compras.services.historico_precos_service import resumo_precos_produtos
+from estoque.models import EstoqueMovimento, ProdutoEstoque, ProdutoEstoqueUnidade, TipoMovimento
+
+SEM_UNIDADE = ""
+
+CAMPOS_CSV_REPOSICAO = [
+    "fornecedor",
+    "produto_id",
+    "produto",
+    "sku",
+    "saldo_atual",
+    "estoque_minimo",
+    "estoque_ideal",
+    "estoque_maximo",
+    "demanda_diaria",
+    "dias_cobertura",
+    "data_ruptura",
+    "quantidade_sugerida",
+    "preco_estimado",
+    "valor_estimado",
+]
+
+
+@dataclass(frozen=True)
+class DemandaUnidade:
+    unidade: str
+    saldo_atual: Decimal
+    demanda_diaria: Decimal
+    data_ruptura: Optional[date]
+
+
+@dataclass(frozen=True)
+class ItemSugestao:
+    produto_id: int
+    produto_nome: str
+    sku: str
+    saldo_atual: Decimal
+    estoque_minimo: Decimal
+    estoque_ideal: Decimal
+    estoque_maximo: Decimal
+    demanda_diaria: Decimal
+    dias_cobertura: Optional[int]
+    data_ruptura: Optional[date]
+    quantidade_sugerida: Decimal
+    fornecedor_id: Optional[int]
+    fornecedor_nome: str
+    preco_estimado: Decimal
+    valor_estimado: Decimal
+    por_unidade: Tuple[DemandaUnidade, ...]
+
+
+@dataclass(frozen=True)
+class PedidoSugerido:
+    fornecedor_id: Optional[int]
+    fornecedor_nome: str
+    itens: Tuple[ItemSugestao, ...]
+    valor_total: Decimal
+
+
+def _demanda_semanal(hoje: date, dias: int) -> Dict[Tuple[int, str], List[Decimal]]:
+    """
+    Uma query agrupada por (produto, unidade, dia); em Python vira uma serie de semanas
+    (indice 0 = semana mais recente). Demanda = saidas de venda (pedido ou PDF do caixa)
+    - devolucoes de venda; saidas operacionais e ajustes nao entram.
+    """
+    semanas = max(dias // 7, 1)
+    inicio = hoje - timedelta(days=semanas * 7 - 1)
+    quantidade = DecimalField(max_digits=14, decimal_places=3)
+    linhas = (
+        EstoqueMovimento.objects.filter(data_movimento__gte=inicio, data_movimento__lte=hoje)
+        .filter(
+            Q(tipo=TipoMovimento.SAIDA, venda_link__isnull=False)
+            | Q(tipo=TipoMovimento.SAIDA, movimentos_venda_pdf__isnull=False)
+            | Q(tipo=TipoMovimento.ENTRADA, venda_link__isnull=False)
+        )
+        .values(
+            "produto_id",
+            "data_movimento",
+            unidade=Coalesce(
+                "venda_link__venda__unidade_saida", "movimentos_venda_pdf__unidade", Value(SEM_UNIDADE)
+            ),
+        )
+        .annotate(
+            demanda=Sum(
+                Case(
+                    When(tipo=TipoMovimento.SAIDA, then=F("quantidade")),
+                    default=-F("quantidade"),
+                    output_field=quantidade,
+                )
+            )
+        )
+        .order_by()
+    )
+    series: Dict[Tuple[int, str], List[Decimal]] = {}
+    for linha in linhas:
+        serie = series.setdefault((linha["produto_id"], linha["unidade"]), [Decimal("0")] * semanas)
+        serie[(hoje - linha["data_movimento"]).days // 7] += linha["demanda"] or Decimal("0")
+    return series
+
+
+def _velocidade(serie: List[Decimal]) -> Decimal:
+    """Media movel ponderada das semanas (mais recente pesa mais), em unidades/dia."""
+    n = len(serie)
+    pesos = range(n, 0, -1)
+    ponderado = sum((Decimal(p) * max(q, Decimal("0")) for p, q in zip(pesos, serie)), Decimal("0"))
+    return (ponderado / Decimal(sum(pesos)) / 7).quantize(Decimal("0.001"))
+
+
+def _data_ruptura(hoje: date, saldo: Decimal, demanda: Decimal) -> Optional[date]:
+    if demanda <= 0:
+        return None
+    if saldo <= 0:
+        return hoje
+    return hoje + timedelta(days=int(saldo / demanda))
+
+
+def sugerir_reposicao(
+    *,
+    dias_historico: int = 84,
+    prazo_entrega_dias: int = 7,
+    dias_cobertura: int = 30,
+    meses_preco: int = 6,
+    hoje: Optional[date] = None,
+) -> List[PedidoSugerido]:
+    """
+    Sugestao de compra para o catalogo inteiro:
+    - demanda diaria por produto/unidade (media movel ponderada semanal dos movimentos)
+    - ruptura projetada = saldo / demanda
+    - pede quando o saldo projetado ao fim do prazo de entrega fica abaixo do minimo;
+      alvo = maior entre estoque_ideal e demanda x (prazo + cobertura), limitado ao maximo
+    - agrupa por fornecedor de menor preco recente (historico de precos)
+    """
+    hoje = hoje or timezone.localdate()
+    series = _demanda_semanal(hoje, dias_historico)
+
+    demanda_produto: Dict[int, Decimal] = {}
+    demanda_unidade: Dict[Tuple[int, str], Decimal] = {}
+    for (produto_id, unidade), serie in series.items():
+        velocidade = _velocidade(serie)
+        demanda_produto[produto_id] = demanda_produto.get(produto_id, Decimal("0")) + velocidade
+        if unidade:
+            demanda_unidade[(produto_id, unidade)] = velocidade
+
+    candidatos = []
+    for cfg in ProdutoEstoque.objects.filter(produto__ativo=True).values(
+        "produto_id",
+        "produto__nome",
+        "produto__sku",
+        "saldo_atual",
+        "estoque_minimo",
+        "estoque_ideal",
+        "estoque_maximo",
+    ):
+        produto_id = cfg["produto_id"]
+        saldo = cfg["saldo_atual"] or Decimal("0")
+        minimo, ideal, maximo = cfg["estoque_minimo"], cfg["estoque_ideal"], cfg["estoque_maximo"]
+        demanda = demanda_produto.get(produto_id, Decimal("0"))
+
+        projetado = saldo - demanda * prazo_entrega_dias
+        if projetado > minimo:
+            continue
+        alvo = max(ideal, minimo, demanda * (prazo_entrega_dias + dias_cobertura))
+        if maximo > 0:
+            alvo = min(alvo, maximo)
+        quantidade = (alvo - saldo).quantize(Decimal("1"), rounding=ROUND_CEILING)
+        if quantidade <= 0:
+            continue
+        candidatos.append((cfg, saldo, demanda, quantidade))
+
+    candidato_ids = [cfg["produto_id"] for cfg, _, _, _ in candidatos]
+    precos = resumo_precos_produtos(candidato_ids, meses=meses_preco, hoje=hoje)
+    saldos_unidade: Dict[int, List[Tuple[str, Decimal]]] = {}
+    for produto_id, unidade, saldo in ProdutoEstoqueUnidade.objects.filter(produto_id__in=candidato_ids).values_list(
+        "produto_id", "unidade", "saldo_atual"
+    ):
+        saldos_unidade.setdefault(produto_id, []).append((unidade, saldo))
+
+    pedidos: Dict[Optional[int], List[ItemSugestao]] = {}
+    nomes: Dict[Optional[int], str] = {None: "Sem fornecedor definido"}
+    for cfg, saldo, demanda, quantidade in candidatos:
+        produto_id = cfg["produto_id"]
+        preco = precos.get(produto_id)
+        fornecedor_id = preco.melhor_fornecedor_id if preco else None
+        if preco:
+            nomes[fornecedor_id] = preco.melhor_fornecedor_nome
+        preco_estimado = preco.melhor_ultimo_preco if preco else Decimal("0.00")
+        ruptura = _data_ruptura(hoje, saldo, demanda)
+        por_unidade = tuple(
+            DemandaUnidade(
+                unidade=unidade,
+                saldo_atual=saldo_unidade,
+                demanda_diaria=demanda_unidade.get((produto_id, unidade), Decimal("0.000")),
+                data_ruptura=_data_ruptura(hoje, saldo_unidade, demanda_unidade.get((produto_id, unidade), Decimal("0"))),
+            )
+            for unidade, saldo_unidade in sorted(saldos_unidade.get(produto_id, []))
+        )
+        pedidos.setdefault(fornecedor_id, []).append(
+            ItemSugestao(
+                produto_id=produto_id,
+                produto_nome=cfg["produto__nome"],
+                sku=cfg["produto__sku"],
+                saldo_atual=saldo,
+                estoque_minimo=cfg["estoque_minimo"],
+                estoque_ideal=cfg["estoque_ideal"],
+                estoque_maximo=cfg["estoque_maximo"],
+                demanda_diaria=demanda,
+                dias_cobertura=(ruptura - hoje).days if ruptura else None,
+                data_ruptura=ruptura,
+                quantidade_sugerida=quantidade,
+                fornecedor_id=fornecedor_id,
+                fornecedor_nome=nomes[fornecedor_id],
+                preco_estimado=preco_estimado,
+                valor_estimado=(quantidade * preco_estimado).quantize(Decimal("0.01")),
+                por_unidade=por_unidade,
+            )
+        )
+
+    resultado = [
+        PedidoSugerido(
+            fornecedor_id=fornecedor_id,
+            fornecedor_nome=nomes[fornecedor_id],
+            itens=tuple(sorted(itens, key=lambda i: (i.data_ruptura or date.max, i.produto_nome))),
+            valor_total=sum((i.valor_estimado for i in itens), Decimal("0.00")),
+        )
+        for fornecedor_id, itens in pedidos.items()
+    ]
+    # Fornecedores definidos primeiro (maior valor antes); "sem fornecedor" por ultimo.
+    resultado.sort(key=lambda p: (p.fornecedor_id is None, -p.valor_total, p.fornecedor_nome))
+    return resultado
+
+
+def linhas_csv_reposicao(pedidos: List[PedidoSugerido]):
+    """Linhas (dict) no formato de CAMPOS_CSV_REPOSICAO, uma por item sugerido."""
+    for pedido in pedidos:
+        for item in pedido.itens:
+            yield {
+                "fornecedor": pedido.fornecedor_nome,
+                "produto_id": item.produto_id,
+                "produto": item.produto_nome,
+                "sku": item.sku,
+                "saldo_atual": item.saldo_atual,
+                "estoque_minimo": item.estoque_minimo,
+                "estoque_ideal": item.estoque_ideal,
+                "estoque_maximo": item.estoque_maximo,
+                "demanda_diaria": item.demanda_diaria,
+                "dias_cobertura": "" if item.dias_cobertura is None else item.dias_cobertura,
+                "data_ruptura": item.data_ruptura.isoformat() if item.data_ruptura else "",
+                "quantidade_sugerida": item.quantidade_sugerida,
+                "preco_estimado": item.preco_estimado,
+                "valor_estimado": item.valor_estimado,
+            }
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from typing import Iterable
 
 from compras.models import Produto
 from estoque.models import ProdutoEstoque, ProdutoEstoqueUnidade, UnidadeLoja
@@ -36,3 +37,30 @@ def garantir_unidades_produto(produto: Produto) -> None:
             unidade=UnidadeLoja.LOJA_2,
             saldo_atual=Decimal("0.000"),
         )
+
+
+def garantir_unidades_produtos(produto_ids: Iterable[int]) -> None:
+    """Mesma regra de `garantir_unidades_produto` para varios produtos, com inserts em lote."""
+    ids = set(produto_ids)
+    if not ids:
+        return
+    presentes: dict[int, set[str]] = {}
+    for produto_id, unidade in ProdutoEstoqueUnidade.objects.filter(produto_id__in=ids).values_list(
+        "produto_id", "unidade"
+    ):
+        presentes.setdefault(produto_id, set()).add(unidade)
+    sem_unidades = ids - set(presentes)
+    saldos = dict(
+        ProdutoEstoque.objects.filter(produto_id__in=sem_unidades).values_list("produto_id", "saldo_atual")
+    )
+
+    faltantes = []
+    for produto_id in sorted(ids):
+        for unidade in (UnidadeLoja.LOJA_1, UnidadeLoja.LOJA_2):
+            if unidade in presentes.get(produto_id, ()):
+                continue
+            inicial = Decimal("0.000")
+            if produto_id in sem_unidades and unidade == UnidadeLoja.LOJA_1:
+                inicial = (saldos.get(produto_id) or Decimal("0.000")).quantize(Decimal("0.001"))
+            faltantes.append(ProdutoEstoqueUnidade(produto_id=produto_id, unidade=unidade, saldo_atual=inicial))
+    ProdutoEstoqueUnidade.objects.bulk_create(faltantes, batch_size=500, ignore_conflicts=True)
@@ -8,9 +8,11 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from django.test import override_settings
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from compras.models import Compra, Fornecedor, ItemCompra, Produto
@@ -29,6 +31,7 @@ from estoque.services.estoque_service import registrar_entrada, registrar_saida
 from estoque.services.contagem_service import aplicar_contagem_rapida
 from estoque.services.transferencias_service import transferir_entre_unidades, transferir_lote_entre_unidades
 from estoque.services.saida_operacional_service import registrar_saida_operacional_lote
+from importadores.models import CaixaRelatorioImportacao, CaixaRelatorioItem, MovimentoVendaEstoque
 
 
 class EstoqueRegrasTest(TestCase):
@@ -50,6 +53,20 @@ class EstoqueRegrasTest(TestCase):
         self.assertEqual(alerta.minimo_configurado, Decimal("5.000"))
 
 
+    def test_saida_registra_custo_fifo_dos_lotes(self):
+        produto = Produto.objects.create(nome="Produto FIFO", sku="FIFO-1", ativo=True)
+        registrar_entrada(produto=produto, quantidade=Decimal("2.000"), preco_unitario=Decimal("10.00"))
+        registrar_entrada(produto=produto, quantidade=Decimal("3.000"), preco_unitario=Decimal("20.00"))
+
+        resultado = registrar_saida(produto=produto, quantidade=Decimal("3.000"))
+        self.assertEqual(resultado.custo_total, Decimal("40.00"))
+        resultado.movimento.refresh_from_db()
+        self.assertEqual(resultado.movimento.custo_total, Decimal("40.00"))
+
+        resultado = registrar_saida(produto=produto, quantidade=Decimal("2.000"))
+        self.assertEqual(resultado.custo_total, Decimal("40.00"))
+
+
 class EstoqueStatisticsServiceTest(TestCase):
     def setUp(self):
         self.produto = Produto.objects.create(nome="Produto Estatistica", sku="EST-1", ativo=True)
@@ -411,3 +428,167 @@ class RecebimentoEstoqueFlowTest(TestCase):
         self.client.force_login(comprador)
         response = self.client.get(reverse("estoque:recebimento_list"))
         self.assertEqual(response.status_code, 403)
+
+
+class ReposicaoSugeridaTest(TestCase):
+    def setUp(self):
+        from compras.services.compras_service import ItemPayload, criar_compra_com_itens
+
+        hoje = timezone.localdate()
+        self.produto = Produto.objects.create(nome="Lampada Reposicao", sku="REP-1", ativo=True)
+        parado = Produto.objects.create(nome="Produto Parado", sku="REP-2", ativo=True)
+        ProdutoEstoque.objects.create(
+            produto=self.produto,
+            estoque_minimo=Decimal("5.000"),
+            estoque_ideal=Decimal("20.000"),
+            estoque_maximo=Decimal("40.000"),
+        )
+        ProdutoEstoque.objects.create(produto=parado, saldo_atual=Decimal("50.000"), estoque_minimo=Decimal("5.000"))
+
+        registrar_entrada(produto=self.produto, quantidade=Decimal("66.000"), data_movimento=hoje - timedelta(days=27))
+        for semana in range(4):
+            # Venda vinda do PDF do caixa (unidade no vinculo do movimento).
+            data = hoje - timedelta(days=7 * semana)
+            mov = registrar_saida(produto=self.produto, quantidade=Decimal("14.000"), data_movimento=data).movimento
+            importacao = CaixaRelatorioImportacao.objects.create(
+                data_referencia=data, unidade=UnidadeLoja.LOJA_2, arquivo_hash=f"rep-{semana}"
+            )
+            item = CaixaRelatorioItem.objects.create(importacao=importacao, codigo_mercadoria="REP-1")
+            MovimentoVendaEstoque.objects.create(
+                importacao=importacao, item=item, movimento_estoque=mov, unidade=UnidadeLoja.LOJA_2
+            )
+        ProdutoEstoqueUnidade.objects.create(produto=self.produto, unidade=UnidadeLoja.LOJA_2, saldo_atual=Decimal("10.000"))
+        # Saida operacional/ajuste: nao e demanda de venda.
+        registrar_entrada(produto=parado, quantidade=Decimal("45.000"), data_movimento=hoje - timedelta(days=27))
+        registrar_saida(produto=parado, quantidade=Decimal("45.000"), data_movimento=hoje)
+
+        self.barato = Fornecedor.objects.create(nome="Fornecedor Barato")
+        caro = Fornecedor.objects.create(nome="Fornecedor Caro")
+        for fornecedor, preco in ((self.barato, "8.00"), (caro, "11.00")):
+            criar_compra_com_itens(
+                fornecedor=fornecedor,
+                centro_custo="FM",
+                data_compra=hoje,
+                itens=[ItemPayload(produto=self.produto, quantidade=Decimal("10.000"), preco_unitario=Decimal(preco))],
+            )
+
+    def test_sugere_ate_o_maximo_no_fornecedor_mais_barato(self):
+        from estoque.services.reposicao_service import sugerir_reposicao
+
+        pedidos = sugerir_reposicao(dias_historico=28, prazo_entrega_dias=7, dias_cobertura=30)
+
+        self.assertEqual(len(pedidos), 1)
+        pedido = pedidos[0]
+        self.assertEqual(pedido.fornecedor_id, self.barato.id)
+        (item,) = pedido.itens
+        self.assertEqual(item.produto_id, self.produto.id)
+        self.assertEqual(item.saldo_atual, Decimal("10.000"))
+        self.assertEqual(item.demanda_diaria, Decimal("2.000"))
+        (unidade,) = item.por_unidade
+        self.assertEqual((unidade.unidade, unidade.demanda_diaria), (UnidadeLoja.LOJA_2, Decimal("2.000")))
+        self.assertEqual(item.data_ruptura, timezone.localdate() + timedelta(days=5))
+        # alvo = demanda x (prazo + cobertura) = 74, limitado ao maximo de 40
+        self.assertEqual(item.quantidade_sugerida, Decimal("30"))
+        self.assertEqual(pedido.valor_total, Decimal("240.00"))
+
+    def test_view_exporta_csv_e_command_grava_arquivo(self):
+        user_model = get_user_model()
+        estoquista = user_model.objects.create_user("estoquista_reposicao", password="pass")
+        Group.objects.get_or_create(name="estoquista")[0].user_set.add(estoquista)
+        self.client.force_login(estoquista)
+
+        resp = self.client.get(reverse("estoque:reposicao"), {"dias_historico": "28"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Fornecedor Barato")
+
+        resp = self.client.get(reverse("estoque:reposicao"), {"dias_historico": "28", "format": "csv"})
+        self.assertEqual(resp["Content-Type"], "text/csv; charset=utf-8")
+        linhas = resp.content.decode("utf-8").splitlines()
+        self.assertTrue(linhas[0].startswith("fornecedor,produto_id,produto"))
+        self.assertEqual(len(linhas), 2)
+        self.assertIn("Lampada Reposicao", linhas[1])
+
+        out = StringIO()
+        call_command("sugerir_reposicao", "--dias-historico", "28", stdout=out)
+        self.assertIn("REP-1", out.getvalue())
+        self.assertNotIn("REP-2", out.getvalue())
+
+
+class RecebimentoEmLoteTest(TestCase):
+    def _compra(self, fornecedor, centro, itens):
+        compra = Compra.objects.create(
+            fornecedor=fornecedor,
+            centro_custo=centro,
+            data_compra=timezone.localdate(),
+            status=Compra.StatusChoices.APROVADA,
+        )
+        for produto, quantidade, preco in itens:
+            ItemCompra.objects.create(
+                compra=compra, produto=produto, quantidade=Decimal(quantidade), preco_unitario=Decimal(preco)
+            )
+        return compra
+
+    def test_recebe_varias_compras_com_custo_medio_e_saldo_por_unidade(self):
+        from estoque.services.integracao_compras import confirmar_recebimento_compras
+
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor Conteiner")
+        antigo = Produto.objects.create(nome="Produto Com Saldo", sku="LOTE-1", ativo=True)
+        novo = Produto.objects.create(nome="Produto Novo", sku="LOTE-2", ativo=True)
+        registrar_entrada(produto=antigo, quantidade=Decimal("10.000"), preco_unitario=Decimal("10.00"))
+        AlertaEstoque.objects.create(produto=novo, saldo_no_momento=Decimal("0.000"))
+
+        compra_fm = self._compra(fornecedor, "FM", [(antigo, "10.000", "20.00"), (novo, "4.000", "5.00")])
+        compra_ml = self._compra(fornecedor, "ML", [(antigo, "5.000", "14.00")])
+
+        resultado = confirmar_recebimento_compras([compra_fm.pk, compra_ml.pk])
+
+        self.assertEqual(resultado.compras, 2)
+        self.assertEqual(resultado.movimentos_criados, 3)
+        cfg = ProdutoEstoque.objects.get(produto=antigo)
+        self.assertEqual(cfg.saldo_atual, Decimal("25.000"))
+        # (10 x 10 + 10 x 20 + 5 x 14) / 25
+        self.assertEqual(cfg.custo_medio, Decimal("14.8000"))
+        unidades = dict(ProdutoEstoqueUnidade.objects.filter(produto=antigo).values_list("unidade", "saldo_atual"))
+        self.assertEqual(unidades, {UnidadeLoja.LOJA_1: Decimal("20.000"), UnidadeLoja.LOJA_2: Decimal("5.000")})
+        self.assertEqual(Lote.objects.filter(compra=compra_fm).count(), 2)
+        self.assertEqual(
+            EstoqueMovimento.objects.get(item_compra__compra=compra_ml).lote.custo_unitario, Decimal("14.0000")
+        )
+        self.assertFalse(AlertaEstoque.objects.filter(produto=novo, status=StatusAlerta.ABERTO).exists())
+        compra_fm.refresh_from_db()
+        self.assertEqual(compra_fm.status, Compra.StatusChoices.RECEBIDA)
+        self.assertEqual(compra_fm.eventos.count(), 1)
+
+        # Compras ja recebidas nao dao nova entrada.
+        self.assertEqual(confirmar_recebimento_compras([compra_fm.pk]).movimentos_criados, 0)
+
+    def test_queries_nao_crescem_com_itens(self):
+        from estoque.services.integracao_compras import receber_compras
+
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor Queries")
+        produtos = [Produto.objects.create(nome=f"Produto Q{i}", sku=f"Q-{i}") for i in range(30)]
+        pequena = self._compra(fornecedor, "FM", [(produtos[0], "1.000", "1.00")])
+        grande = self._compra(fornecedor, "FM", [(p, "2.000", "3.00") for p in produtos[1:]])
+
+        with CaptureQueriesContext(connection) as pequena_ctx:
+            receber_compras([pequena.pk])
+        with CaptureQueriesContext(connection) as grande_ctx:
+            receber_compras([grande.pk])
+        self.assertEqual(len(grande_ctx), len(pequena_ctx))
+
+    def test_view_recebe_compras_selecionadas(self):
+        user_model = get_user_model()
+        estoquista = user_model.objects.create_user("estoquista_lote", password="pass")
+        Group.objects.get_or_create(name="estoquista")[0].user_set.add(estoquista)
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor View Lote")
+        produto = Produto.objects.create(nome="Produto View Lote", sku="VL-1")
+        compras = [self._compra(fornecedor, "FM", [(produto, "3.000", "2.00")]) for _ in range(2)]
+        self.client.force_login(estoquista)
+
+        resp = self.client.post(
+            reverse("estoque:recebimento_confirmar_lote"), data={"compras": [str(c.pk) for c in compras]}
+        )
+
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Compra.objects.filter(status=Compra.StatusChoices.RECEBIDA).count(), 2)
+        self.assertEqual(ProdutoEstoque.objects.get(produto=produto).saldo_atual, Decimal("6.000"))
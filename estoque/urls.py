@@ -2,6 +2,7 @@ from django.urls import path
 
 from estoque.views import (
     ConfirmarRecebimentoCompraView,
+    ConfirmarRecebimentoLoteView,
     ContagemRapidaView,
     EstoqueCompletoView,
     EstoqueDashboardView,
@@ -15,6 +16,7 @@ from estoque.views import (
     IndicadoresEstoqueView,
     RecebimentoCompraDetailView,
     RecebimentoCompraListView,
+    ReposicaoSugeridaView,
     TransferenciaCreateView,
 )
 
@@ -32,8 +34,10 @@ urlpatterns = [
     path("saidas-operacionais/", SaidaOperacionalView.as_view(), name="saida_operacional"),
     path("movimentos/", MovimentoListView.as_view(), name="movimento_list"),
     path("indicadores/", IndicadoresEstoqueView.as_view(), name="indicadores"),
+    path("reposicao/", ReposicaoSugeridaView.as_view(), name="reposicao"),
     path("entrada/compra/<int:compra_id>/", EntradaPorCompraView.as_view(), name="entrada_por_compra"),
     path("recebimentos/", RecebimentoCompraListView.as_view(), name="recebimento_list"),
+    path("recebimentos/confirmar/", ConfirmarRecebimentoLoteView.as_view(), name="recebimento_confirmar_lote"),
     path("recebimentos/<int:pk>/", RecebimentoCompraDetailView.as_view(), name="recebimento_detail"),
     path("recebimentos/<int:pk>/confirmar/", ConfirmarRecebimentoCompraView.as_view(), name="recebimento_confirmar"),
 ]
@@ -8,7 +8,7 @@ import unicodedata
 from django.contrib import messages
 from django.db import transaction
 from django.db.models import F
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.http import Http404
 from django.urls import reverse
@@ -16,8 +16,8 @@ from django.utils import timezone
 from django.views import View
 from django.views.generic import DetailView, ListView, TemplateView, UpdateView
 
-from compras.models import Compra, CompraEvento, Produto
-from core.services.permissoes import GroupRequiredMixin
+from compras.models import Compra, Produto
+from core.services.permissoes import GroupRequiredMixin, usuario_em_grupos
 from core.services.paginacao import get_pagination_params
 
 from estoque.forms import (
@@ -48,7 +48,8 @@ from estoque.services.contagem_service import (
 )
 from estoque.services.estoque_service import registrar_entrada, registrar_saida, registrar_ajuste
 from estoque.services.saida_operacional_service import registrar_saida_operacional_lote
-from estoque.services.integracao_compras import dar_entrada_por_compra
+from estoque.services.integracao_compras import confirmar_recebimento_compras, dar_entrada_por_compra
+from estoque.services.reposicao_service import CAMPOS_CSV_REPOSICAO, linhas_csv_reposicao, sugerir_reposicao
 from estoque.services.statistics_service import EstoqueStatisticsService
 from estoque.services.transferencias_service import transferir_lote_entre_unidades
 
@@ -62,9 +63,7 @@ def _is_admin_autorizado(user) -> bool:
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(
-        name__in=("admin/gestor", "compras/estoque", "estoquista")
-    ).exists()
+    return usuario_em_grupos(user, ("admin/gestor", "compras/estoque", "estoquista"))
 
 
 class EstoqueManageAccessMixin(GroupRequiredMixin):
@@ -513,7 +512,7 @@ class RecebimentoCompraDetailView(EstoqueManageAccessMixin, DetailView):
 
 class ConfirmarRecebimentoCompraView(EstoqueManageAccessMixin, View):
     def post(self, request, *args, **kwargs):
-        compra = Compra.objects.filter(pk=kwargs["pk"]).select_related("fornecedor").prefetch_related("itens__produto").first()
+        compra = Compra.objects.filter(pk=kwargs["pk"]).only("id", "status").first()
         if not compra:
             raise Http404("Compra nao encontrada.")
 
@@ -522,26 +521,37 @@ class ConfirmarRecebimentoCompraView(EstoqueManageAccessMixin, View):
             return redirect("estoque:recebimento_list")
 
         observacao = (request.POST.get("observacao_conferencia") or "").strip()
-        with transaction.atomic():
-            compra.status = Compra.StatusChoices.RECEBIDA
-            compra.recebido_em = timezone.now()
-            compra.recebido_por = request.user if request.user.is_authenticated else None
-            compra.save(update_fields=["status", "recebido_em", "recebido_por"])
-
-            criados = dar_entrada_por_compra(compra)
-            detalhe = "Recebimento registrado via modulo de estoque apos conferencia."
-            if observacao:
-                detalhe = f"{detalhe} Observacao: {observacao}"
-            CompraEvento.objects.create(
-                compra=compra,
-                tipo=CompraEvento.TipoEvento.RECEBIMENTO,
-                usuario=(request.user if request.user.is_authenticated else None),
-                detalhe=detalhe,
-            )
+        resultado = confirmar_recebimento_compras(
+            [compra.pk],
+            usuario=(request.user if request.user.is_authenticated else None),
+            observacao=observacao,
+        )
+        messages.success(
+            request,
+            f"Recebimento da compra #{compra.id} confirmado no estoque. Entradas geradas: {resultado.movimentos_criados}.",
+        )
+        return redirect("estoque:recebimento_list")
+
 
+class ConfirmarRecebimentoLoteView(EstoqueManageAccessMixin, View):
+    """Recebe de uma vez as compras aprovadas marcadas na fila (ex.: conteiner com varias notas)."""
+
+    def post(self, request, *args, **kwargs):
+        ids = [int(pk) for pk in request.POST.getlist("compras") if pk.isdigit()]
+        if not ids:
+            messages.error(request, "Selecione ao menos uma compra para receber.")
+            return redirect("estoque:recebimento_list")
+
+        resultado = confirmar_recebimento_compras(
+            ids,
+            usuario=(request.user if request.user.is_authenticated else None),
+            observacao=(request.POST.get("observacao_conferencia") or "").strip(),
+        )
+        if resultado.compras < len(set(ids)):
+            messages.warning(request, "Algumas compras selecionadas não estavam mais aprovadas e foram ignoradas.")
         messages.success(
             request,
-            f"Recebimento da compra #{compra.id} confirmado no estoque. Entradas geradas: {criados}.",
+            f"{resultado.compras} compra(s) recebida(s) no estoque. Entradas geradas: {resultado.movimentos_criados}.",
         )
         return redirect("estoque:recebimento_list")
 
@@ -586,6 +596,40 @@ class IndicadoresEstoqueView(EstoqueManageAccessMixin, TemplateView):
         return ctx
 
 
+class ReposicaoSugeridaView(EstoqueManageAccessMixin, TemplateView):
+    """Pedido de compra sugerido por fornecedor (?format=csv para exportar)."""
+
+    template_name = "estoque/reposicao.html"
+
+    def get(self, request, *args, **kwargs):
+        parse = IndicadoresEstoqueView._parse_positive_int
+        parametros = {
+            "dias_historico": parse(request.GET.get("dias_historico"), 84),
+            "prazo_entrega_dias": parse(request.GET.get("prazo_entrega"), 7),
+            "dias_cobertura": parse(request.GET.get("cobertura"), 30),
+        }
+        pedidos = sugerir_reposicao(**parametros)
+        if request.GET.get("format") == "csv":
+            response = HttpResponse(content_type="text/csv; charset=utf-8")
+            response["Content-Disposition"] = f'attachment; filename="reposicao_{timezone.localdate():%Y%m%d}.csv"'
+            writer = csv.DictWriter(response, fieldnames=CAMPOS_CSV_REPOSICAO)
+            writer.writeheader()
+            writer.writerows(linhas_csv_reposicao(pedidos))
+            return response
+        self._cached_payload = {
+            **parametros,
+            "pedidos": pedidos,
+            "total_itens": sum(len(p.itens) for p in pedidos),
+            "valor_total": sum((p.valor_total for p in pedidos), Decimal("0.00")),
+        }
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx.update(getattr(self, "_cached_payload", {}))
+        return ctx
+
+
 class TransferenciaCreateView(EstoqueManageAccessMixin, TemplateView):
     template_name = "estoque/transferencia_form.html"
     item_formset_prefix = "itens"
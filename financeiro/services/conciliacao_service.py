@@ -9,6 +9,7 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
 
+from boletos.services.exposicao_service import ExposicaoCreditoService
 from financeiro.models import (
     Conciliacao,
     ConciliacaoItem,
@@ -19,6 +20,7 @@ from financeiro.models import (
     TipoMovimentoChoices,
     TransacaoBancaria,
 )
+from importadores.services.resultado_diario_service import ResultadoDiarioService
 
 
 @dataclass
@@ -125,6 +127,8 @@ class ConciliacaoService:
 
             transacao.status_conciliacao = StatusConciliacaoChoices.CONCILIADA
             transacao.save(update_fields=["status_conciliacao"])
+            ExposicaoCreditoService.recalcular_por_recebiveis(recebiveis)
+            ResultadoDiarioService.atualizar_por_transacoes([transacao])
         return conciliacao
 
     @classmethod
@@ -166,6 +170,7 @@ class ConciliacaoService:
             )
             transacao.status_conciliacao = status
             transacao.save(update_fields=["status_conciliacao"])
+            ResultadoDiarioService.atualizar_por_transacoes([transacao])
         return conciliacao
 
     @staticmethod
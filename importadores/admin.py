@@ -5,6 +5,7 @@ from importadores.models import (
     CaixaRelatorioImportacao,
     CaixaRelatorioItem,
     MovimentoVendaEstoque,
+    ResultadoDiarioUnidade,
     UnidadeContaFinanceiraConfig,
 )
 
@@ -50,3 +51,10 @@ class UnidadeContaFinanceiraConfigAdmin(admin.ModelAdmin):
 class MovimentoVendaEstoqueAdmin(admin.ModelAdmin):
     list_display = ("id", "importacao", "item", "unidade", "tipo", "criado_em")
     list_filter = ("unidade", "tipo")
+
+
+@admin.register(ResultadoDiarioUnidade)
+class ResultadoDiarioUnidadeAdmin(admin.ModelAdmin):
+    list_display = ("data_referencia", "unidade", "total_vendas", "total_saidas", "resultado", "importacoes", "atualizado_em")
+    list_filter = ("unidade",)
+    date_hierarchy = "data_referencia"
@@ -3,6 +3,7 @@ from __future__ import annotations
 from django import forms
 
 from estoque.models import UnidadeLoja
+from importadores.services.importacao_caixa_service import TAMANHO_MAX_PDF
 
 
 class CaixaPDFUploadForm(forms.Form):
@@ -26,3 +27,39 @@ class CaixaPDFUploadForm(forms.Form):
         if arquivo.size > 15 * 1024 * 1024:
             raise forms.ValidationError("Arquivo PDF maior que 15 MB.")
         return arquivo
+
+
+class MultiplosArquivosInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultiplosArquivosField(forms.FileField):
+    widget = MultiplosArquivosInput
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
+
+
+class CaixaPDFLoteForm(forms.Form):
+    arquivos = MultiplosArquivosField(
+        required=True,
+        help_text="Selecione varios PDFs do Caixa Analitico ou um .zip com os PDFs.",
+    )
+    unidade_override = forms.ChoiceField(
+        required=False,
+        choices=[("", "Detectar do PDF")] + list(UnidadeLoja.choices),
+        help_text="Aplica a mesma unidade a todos os arquivos do lote.",
+    )
+
+    def clean_arquivos(self):
+        arquivos = self.cleaned_data["arquivos"]
+        for arquivo in arquivos:
+            nome = (arquivo.name or "").lower()
+            if not nome.endswith((".pdf", ".zip")):
+                raise forms.ValidationError(f"{arquivo.name}: envie arquivos .pdf ou .zip.")
+            if nome.endswith(".pdf") and arquivo.size > TAMANHO_MAX_PDF:
+                raise forms.ValidationError(f"{arquivo.name}: arquivo PDF maior que 15 MB.")
+        return arquivos
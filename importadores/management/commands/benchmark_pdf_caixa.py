@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from importadores.services.pdf_caixa_service import PDFCaixaService
+
+
+def gerar_corpus(destino: Path, *, arquivos: int, itens: int, seed: int) -> list[Path]:
+    """Relatorios de caixa sinteticos no layout do Caixa Analitico (itens + totalizacao)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rnd = random.Random(seed)
+    hoje = timezone.localdate()
+    caminhos = []
+    for n in range(arquivos):
+        data = hoje - timedelta(days=n // 2)
+        empresa = "MATRIZ" if n % 2 == 0 else "FILIAL"
+        caminho = destino / f"caixa_{empresa.lower()}_{data:%d%m%Y}.pdf"
+        pdf = canvas.Canvas(str(caminho), pagesize=A4)
+        linhas = [f"Empresa: {empresa}", f"Data: {data:%d/%m/%Y}", "Relatorio Caixa Analitico", ""]
+        for _ in range(itens):
+            linhas.append(f"{rnd.randint(1000, 99999)} LUMINARIA LED {rnd.randint(5, 200)}W {rnd.randint(1, 40)}")
+        formas = {
+            "Especie": rnd.randint(0, 500_000),
+            "Cartao de Credito": rnd.randint(0, 500_000),
+            "Cartao de Debito": rnd.randint(0, 500_000),
+            "Pix": rnd.randint(0, 500_000),
+        }
+        linhas += ["", "Totalizacao do Caixa", "Vendas"]
+        linhas += [f"{nome}: {valor / 100:.2f}".replace(".", ",") for nome, valor in formas.items()]
+        linhas.append(f"Total: {sum(formas.values()) / 100:.2f}".replace(".", ","))
+        linhas.append("Total Trocas: 0,00")
+
+        y = 800
+        for linha in linhas:
+            if y < 40:
+                pdf.showPage()
+                y = 800
+            pdf.drawString(40, y, linha)
+            y -= 14
+        pdf.save()
+        caminhos.append(caminho)
+    return caminhos
+
+
+class Command(BaseCommand):
+    help = "Mede extracao e parse dos PDFs de caixa (serial, pool de processos e cache) sobre um corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", help="Diretorio com PDFs reais; sem ele gera um corpus sintetico.")
+        parser.add_argument("--arquivos", type=int, default=14)
+        parser.add_argument("--itens", type=int, default=300, help="Linhas de item por PDF sintetico.")
+        parser.add_argument("--processos", type=int, default=4)
+        parser.add_argument("--repeticoes", type=int, default=20, help="Repeticoes do parse por arquivo.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _medir(self, nome: str, func, n: int) -> None:
+        inicio = time.perf_counter()
+        func()
+        duracao = (time.perf_counter() - inicio) * 1000
+        self.stdout.write(f"{nome:<28} {duracao:>9.1f} ms  {duracao / max(n, 1):>8.2f} ms/arquivo")
+
+    def handle(self, *args, **opts):
+        with tempfile.TemporaryDirectory() as tmp:
+            if opts["corpus"]:
+                caminhos = sorted(Path(opts["corpus"]).glob("*.pdf"))
+                if not caminhos:
+                    raise CommandError(f"Nenhum PDF em {opts['corpus']}")
+            else:
+                caminhos = gerar_corpus(Path(tmp), arquivos=opts["arquivos"], itens=opts["itens"], seed=opts["seed"])
+            conteudos = [c.read_bytes() for c in caminhos]
+        n = len(conteudos)
+        self.stdout.write(f"Corpus: {n} PDFs, {sum(map(len, conteudos)) / 1024:.0f} KiB")
+
+        chaves = [PDFCaixaService._cache_key_texto(PDFCaixaService.build_hash(raw)) for raw in conteudos]
+        cache.delete_many(chaves)
+        self._medir("extracao serial", lambda: PDFCaixaService.extract_texts(conteudos, processos=0), n)
+        cache.delete_many(chaves)
+        self._medir(
+            f"extracao {opts['processos']} processos",
+            lambda: PDFCaixaService.extract_texts(conteudos, processos=opts["processos"]),
+            n,
+        )
+        textos = []
+        self._medir("extracao em cache", lambda: textos.extend(PDFCaixaService.extract_texts(conteudos)), n)
+
+        falhas = [(c.name, t.erro) for c, t in zip(caminhos, textos) if t.erro]
+        validos = [(c.name, t.texto) for c, t in zip(caminhos, textos) if not t.erro]
+
+        def parse_todos():
+            for _ in range(opts["repeticoes"]):
+                for nome, texto in validos:
+                    try:
+                        PDFCaixaService.parse_caixa_text(texto, source_name=nome)
+                    except Exception:
+                        pass
+
+        self._medir(f"parse x{opts['repeticoes']}", parse_todos, len(validos) * opts["repeticoes"])
+        cache.delete_many(chaves)
+        for nome, erro in falhas:
+            self.stdout.write(self.style.WARNING(f"{nome}: {erro}"))
+        self.stdout.write(self.style.SUCCESS(f"OK. {len(validos)} de {n} PDFs com texto extraido."))
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from estoque.models import UnidadeLoja
+from importadores.services.importacao_caixa_service import (
+    SITUACAO_DUPLICADO,
+    SITUACAO_ERRO,
+    SITUACAO_IMPORTADO,
+    ImportacaoCaixaService,
+    expandir_arquivos,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa em lote os PDFs do Caixa Analitico (e ZIPs com PDFs) de um diretorio local: "
+        "ignora os ja importados, extrai em paralelo e baixa o estoque de cada relatorio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("diretorio", help="Diretorio com os PDFs/ZIPs.")
+        parser.add_argument("--recursivo", action="store_true", help="Inclui subdiretorios.")
+        parser.add_argument("--unidade", choices=UnidadeLoja.values, default="", help="Forca a unidade de todos.")
+        parser.add_argument(
+            "--processos",
+            type=int,
+            default=None,
+            help="Processos de extracao (padrao: settings.IMPORTADORES_PDF_PROCESSOS).",
+        )
+
+    def handle(self, *args, **options):
+        base = Path(options["diretorio"])
+        if not base.is_dir():
+            raise CommandError(f"Diretorio nao encontrado: {base}")
+        padrao = "**/*" if options["recursivo"] else "*"
+        caminhos = sorted(p for p in base.glob(padrao) if p.is_file() and p.suffix.lower() in (".pdf", ".zip"))
+        if not caminhos:
+            raise CommandError(f"Nenhum PDF/ZIP em {base}")
+
+        try:
+            arquivos = expandir_arquivos((p.name, p.read_bytes()) for p in caminhos)
+        except ValidationError as exc:
+            raise CommandError("; ".join(exc.messages)) from exc
+
+        resultados = ImportacaoCaixaService.importar_lote(
+            arquivos,
+            usuario=None,
+            unidade_override=options["unidade"],
+            processos=options["processos"],
+        )
+        estilos = {
+            SITUACAO_IMPORTADO: self.style.SUCCESS,
+            SITUACAO_DUPLICADO: self.style.WARNING,
+            SITUACAO_ERRO: self.style.ERROR,
+        }
+        for r in resultados:
+            self.stdout.write(estilos[r.situacao](f"{r.nome}: {r.situacao} {r.mensagem}"))
+
+        contagem = {situacao: 0 for situacao in estilos}
+        for r in resultados:
+            contagem[r.situacao] += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"OK. PDFs: {len(resultados)} | importados: {contagem[SITUACAO_IMPORTADO]} | "
+                f"duplicados: {contagem[SITUACAO_DUPLICADO]} | com erro: {contagem[SITUACAO_ERRO]}"
+            )
+        )
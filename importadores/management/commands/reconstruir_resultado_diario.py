@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from importadores.services.resultado_diario_service import ResultadoDiarioService
+
+
+class Command(BaseCommand):
+    help = (
+        "Recria o resultado diario por unidade (vendas dos PDFs de caixa x saidas bancarias confirmadas). "
+        "Usar na implantacao ou apos mudar a conta financeira de uma unidade."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--inicio", help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--fim", help="Data final (AAAA-MM-DD).")
+
+    @staticmethod
+    def _data(valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, "%Y-%m-%d").date()
+        except ValueError as exc:
+            raise CommandError(f"Data invalida: {valor}. Use AAAA-MM-DD.") from exc
+
+    def handle(self, *args, **options):
+        total = ResultadoDiarioService.reconstruir(inicio=self._data(options["inicio"]), fim=self._data(options["fim"]))
+        self.stdout.write(self.style.SUCCESS(f"OK. Linhas (dia x unidade) geradas: {total}"))
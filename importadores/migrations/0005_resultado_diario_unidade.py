@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:26
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importadores', '0004_alter_caixarelatorioimportacao_unidade_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultadoDiarioUnidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_referencia', models.DateField()),
+                ('unidade', models.CharField(choices=[('LOJA_1', 'FM COMERCIO - UNIDADE 1'), ('LOJA_2', 'ML COMERCIO - UNIDADE 2')], max_length=20)),
+                ('total_vendas', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_saidas', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('resultado', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('importacoes', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-data_referencia', 'unidade'],
+                'indexes': [models.Index(fields=['unidade', 'data_referencia'], name='idx_resultado_diario_unid_data')],
+                'constraints': [models.UniqueConstraint(fields=('data_referencia', 'unidade'), name='uniq_resultado_diario_data_unid')],
+            },
+        ),
+    ]
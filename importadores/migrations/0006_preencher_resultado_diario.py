@@ -0,0 +1,78 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:10
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+# Mesma regra de ResultadoDiarioService.reconstruir, com os models historicos.
+STATUS_VENDAS = ("SUCESSO", "PARCIAL")
+STATUS_SAIDAS = ("CONCILIADA", "DIVERGENTE", "IGNORADA")
+CENTAVOS = Decimal("0.01")
+
+
+def preencher_resultado_diario(apps, schema_editor):
+    CaixaRelatorioImportacao = apps.get_model("importadores", "CaixaRelatorioImportacao")
+    ResultadoDiarioUnidade = apps.get_model("importadores", "ResultadoDiarioUnidade")
+    UnidadeContaFinanceiraConfig = apps.get_model("importadores", "UnidadeContaFinanceiraConfig")
+    TransacaoBancaria = apps.get_model("financeiro", "TransacaoBancaria")
+
+    vendas = {
+        (data, unidade): (total or Decimal("0.00"), qtd)
+        for data, unidade, total, qtd in CaixaRelatorioImportacao.objects.filter(status__in=STATUS_VENDAS)
+        .order_by()
+        .values("data_referencia", "unidade")
+        .annotate(total=Sum("total_vendas"), qtd=Count("id"))
+        .values_list("data_referencia", "unidade", "total", "qtd")
+    }
+
+    contas = {}
+    for unidade, conta_id in UnidadeContaFinanceiraConfig.objects.filter(ativa=True).values_list(
+        "unidade", "conta_bancaria_id"
+    ):
+        contas.setdefault(conta_id, []).append(unidade)
+    saidas = {}
+    datas_saidas = set()
+    for conta_id, data, total in (
+        TransacaoBancaria.objects.filter(tipo_movimento="SAIDA", status_conciliacao__in=STATUS_SAIDAS)
+        .order_by()
+        .values("conta_id", "data_lancamento")
+        .annotate(total=Sum("valor"))
+        .values_list("conta_id", "data_lancamento", "total")
+    ):
+        datas_saidas.add(data)
+        for unidade in contas.get(conta_id, []):
+            saidas[(data, unidade)] = (total or Decimal("0.00")).quantize(CENTAVOS)
+
+    datas = {data for data, _ in vendas} | datas_saidas
+    unidades = [valor for valor, _ in ResultadoDiarioUnidade._meta.get_field("unidade").choices]
+    registros = []
+    for data in sorted(datas):
+        for unidade in unidades:
+            total_vendas, importacoes = vendas.get((data, unidade), (Decimal("0.00"), 0))
+            total_vendas = total_vendas.quantize(CENTAVOS)
+            total_saidas = saidas.get((data, unidade), Decimal("0.00"))
+            registros.append(
+                ResultadoDiarioUnidade(
+                    data_referencia=data,
+                    unidade=unidade,
+                    total_vendas=total_vendas,
+                    total_saidas=total_saidas,
+                    resultado=(total_vendas - total_saidas).quantize(CENTAVOS),
+                    importacoes=importacoes,
+                )
+            )
+    ResultadoDiarioUnidade.objects.all().delete()
+    ResultadoDiarioUnidade.objects.bulk_create(registros, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0001_initial'),
+        ('importadores', '0005_resultado_diario_unidade'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_resultado_diario, migrations.RunPython.noop),
+    ]
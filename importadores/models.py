@@ -168,3 +168,30 @@ class MovimentoVendaEstoque(models.Model):
                 name="uniq_mov_venda_item_mov",
             )
         ]
+
+
+class ResultadoDiarioUnidade(models.Model):
+    """
+    Resultado do dia por unidade: vendas dos PDFs de caixa (SUCESSO/PARCIAL) menos as saidas
+    bancarias confirmadas da conta da unidade. Mantido por ResultadoDiarioService.
+    """
+
+    data_referencia = models.DateField()
+    unidade = models.CharField(max_length=20, choices=UnidadeLoja.choices)
+    total_vendas = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    total_saidas = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    resultado = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    importacoes = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-data_referencia", "unidade"]
+        constraints = [
+            models.UniqueConstraint(fields=["data_referencia", "unidade"], name="uniq_resultado_diario_data_unid"),
+        ]
+        indexes = [
+            models.Index(fields=["unidade", "data_referencia"], name="idx_resultado_diario_unid_data"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Resultado {self.data_referencia} - {self.unidade}: {self.resultado}"
@@ -3,9 +3,12 @@ from __future__ import annotations
 from decimal import Decimal
 
 from django.db import transaction
+from django.utils import timezone
 
 from compras.models import Produto
-from estoque.models import EstoqueMovimento, ProdutoEstoqueUnidade, TipoMovimento
+from estoque.models import EstoqueMovimento, Lote, ProdutoEstoque, ProdutoEstoqueUnidade, TipoMovimento
+from estoque.services.alertas_service import verificar_alertas_produtos
+from estoque.services.unidade_estoque_service import garantir_unidades_produtos
 
 from importadores.models import (
     CaixaImportacaoInconsistencia,
@@ -14,93 +17,155 @@ from importadores.models import (
     MovimentoVendaEstoque,
 )
 
+TAMANHO_LOTE_BAIXA = 500
+
 
 class EstoqueBaixaService:
     @classmethod
     @transaction.atomic
     def baixar_itens_por_importacao(cls, importacao: CaixaRelatorioImportacao) -> dict[str, int]:
-        baixados = 0
-        inconsistentes = 0
-        detectados = 0
-
-        for item in importacao.itens.select_for_update().all():
-            detectados += 1
-            result = cls._baixar_item(importacao, item)
-            if result:
-                baixados += 1
-            else:
-                inconsistentes += 1
-
-        importacao.itens_detectados = detectados
-        importacao.itens_baixados = baixados
-        importacao.itens_inconsistentes = inconsistentes
-        importacao.save(update_fields=["itens_detectados", "itens_baixados", "itens_inconsistentes", "atualizado_em"])
-        return {
-            "detectados": detectados,
-            "baixados": baixados,
-            "inconsistentes": inconsistentes,
-        }
-
-    @classmethod
-    def _baixar_item(cls, importacao: CaixaRelatorioImportacao, item: CaixaRelatorioItem) -> bool:
-        codigo = (item.codigo_mercadoria or "").strip()
-        produto = Produto.objects.filter(sku=codigo).first()
-        if not produto:
-            cls._registrar_inconsistencia(importacao, item, "Produto nao encontrado para codigo de mercadoria.")
-            return False
-
-        estoque, _ = ProdutoEstoqueUnidade.objects.select_for_update().get_or_create(
-            produto=produto,
-            unidade=importacao.unidade,
-            defaults={"saldo_atual": Decimal("0.000")},
+        """
+        Baixa de estoque das vendas do PDF, em lote:
+        - SKUs resolvidos numa query IN; saldos da unidade, saldos consolidados e lotes
+          travados numa query ordenada cada (ordem fixa evita deadlock entre importacoes)
+        - por item: saldo da unidade e consolidado debitados e lotes consumidos por FIFO
+          (sem lote suficiente, o restante sai sem custo, como na saida operacional)
+        - movimentos, vinculos e inconsistencias via bulk_create; saldos, lotes e itens via bulk_update
+        """
+        itens = list(importacao.itens.select_for_update().order_by("id"))
+        codigos = {(item.codigo_mercadoria or "").strip() for item in itens} - {""}
+        produtos: dict[str, int] = {}
+        for produto_id, sku in Produto.objects.filter(sku__in=codigos).order_by("id").values_list("id", "sku"):
+            produtos.setdefault(sku, produto_id)
+        produto_ids = sorted(set(produtos.values()))
+
+        garantir_unidades_produtos(produto_ids)
+        existentes = set(ProdutoEstoque.objects.filter(produto_id__in=produto_ids).values_list("produto_id", flat=True))
+        ProdutoEstoque.objects.bulk_create(
+            [ProdutoEstoque(produto_id=pk) for pk in produto_ids if pk not in existentes],
+            batch_size=TAMANHO_LOTE_BAIXA,
+            ignore_conflicts=True,
         )
-
-        qtd = item.quantidade or Decimal("0.000")
-        if qtd <= 0:
-            cls._registrar_inconsistencia(importacao, item, "Quantidade invalida para baixa.")
-            return False
-
-        if estoque.saldo_atual < qtd:
-            cls._registrar_inconsistencia(
-                importacao,
-                item,
-                f"Saldo insuficiente na unidade ({estoque.saldo_atual}) para baixar {qtd}.",
+        saldos_unidade = {
+            u.produto_id: u
+            for u in ProdutoEstoqueUnidade.objects.select_for_update()
+            .filter(produto_id__in=produto_ids, unidade=importacao.unidade)
+            .order_by("produto_id")
+        }
+        cfgs = {
+            cfg.produto_id: cfg
+            for cfg in ProdutoEstoque.objects.select_for_update().filter(produto_id__in=produto_ids).order_by("produto_id")
+        }
+        lotes: dict[int, list[Lote]] = {}
+        for lote in (
+            Lote.objects.select_for_update()
+            .filter(produto_id__in=produto_ids, quantidade_restante__gt=Decimal("0.000"))
+            .order_by("produto_id", "data_entrada", "id")
+        ):
+            lotes.setdefault(lote.produto_id, []).append(lote)
+
+        observacao = f"VENDA PDF Caixa (importacao #{importacao.id}, unidade {importacao.unidade})"
+        baixas: list[tuple[CaixaRelatorioItem, EstoqueMovimento]] = []
+        inconsistencias: list[CaixaImportacaoInconsistencia] = []
+        lotes_alterados: dict[int, Lote] = {}
+        for item in itens:
+            produto_id = produtos.get((item.codigo_mercadoria or "").strip())
+            qtd = item.quantidade or Decimal("0.000")
+            erro = ""
+            if not produto_id:
+                erro = "Produto nao encontrado para codigo de mercadoria."
+            elif qtd <= 0:
+                erro = "Quantidade invalida para baixa."
+            elif saldos_unidade[produto_id].saldo_atual < qtd:
+                erro = f"Saldo insuficiente na unidade ({saldos_unidade[produto_id].saldo_atual}) para baixar {qtd}."
+            elif cfgs[produto_id].saldo_atual < qtd:
+                erro = f"Saldo consolidado insuficiente ({cfgs[produto_id].saldo_atual}) para baixar {qtd}."
+            if erro:
+                inconsistencias.append(
+                    CaixaImportacaoInconsistencia(
+                        importacao=importacao,
+                        codigo=item.codigo_mercadoria,
+                        descricao=erro,
+                        detalhes=item.descricao,
+                    )
+                )
+                item.estoque_baixado = False
+                item.mensagem = erro[:255]
+                continue
+
+            unidade = saldos_unidade[produto_id]
+            unidade.saldo_atual = (unidade.saldo_atual - qtd).quantize(Decimal("0.001"))
+            cfg = cfgs[produto_id]
+            cfg.saldo_atual = (cfg.saldo_atual - qtd).quantize(Decimal("0.001"))
+
+            restante = qtd
+            custo_total = Decimal("0.00")
+            for lote in lotes.get(produto_id, []):
+                if restante <= 0:
+                    break
+                consumir = min(lote.quantidade_restante, restante)
+                if consumir <= 0:
+                    continue
+                lote.quantidade_restante = (lote.quantidade_restante - consumir).quantize(Decimal("0.001"))
+                custo_total += consumir * (lote.custo_unitario or Decimal("0"))
+                restante -= consumir
+                lotes_alterados[lote.pk] = lote
+
+            item.produto_id = produto_id
+            item.estoque_baixado = True
+            item.mensagem = ""
+            baixas.append(
+                (
+                    item,
+                    EstoqueMovimento(
+                        produto_id=produto_id,
+                        tipo=TipoMovimento.SAIDA,
+                        quantidade=qtd,
+                        data_movimento=importacao.data_referencia,
+                        observacao=observacao,
+                        custo_total=custo_total.quantize(Decimal("0.01")),
+                    ),
+                )
             )
-            return False
-
-        estoque.saldo_atual = (estoque.saldo_atual - qtd).quantize(Decimal("0.001"))
-        estoque.save(update_fields=["saldo_atual", "atualizado_em"])
 
-        mov = EstoqueMovimento.objects.create(
-            produto=produto,
-            tipo=TipoMovimento.SAIDA,
-            quantidade=qtd,
-            data_movimento=importacao.data_referencia,
-            observacao=f"VENDA PDF Caixa (importacao #{importacao.id}, unidade {importacao.unidade})",
+        EstoqueMovimento.objects.bulk_create([mov for _, mov in baixas], batch_size=TAMANHO_LOTE_BAIXA)
+        MovimentoVendaEstoque.objects.bulk_create(
+            [
+                MovimentoVendaEstoque(
+                    importacao=importacao,
+                    item=item,
+                    movimento_estoque=mov,
+                    unidade=importacao.unidade,
+                    tipo="VENDA",
+                )
+                for item, mov in baixas
+            ],
+            batch_size=TAMANHO_LOTE_BAIXA,
         )
-        MovimentoVendaEstoque.objects.create(
-            importacao=importacao,
-            item=item,
-            movimento_estoque=mov,
-            unidade=importacao.unidade,
-            tipo="VENDA",
+        CaixaImportacaoInconsistencia.objects.bulk_create(inconsistencias, batch_size=TAMANHO_LOTE_BAIXA)
+        CaixaRelatorioItem.objects.bulk_update(
+            itens, ["produto", "estoque_baixado", "mensagem"], batch_size=TAMANHO_LOTE_BAIXA
         )
 
-        item.produto = produto
-        item.estoque_baixado = True
-        item.mensagem = ""
-        item.save(update_fields=["produto", "estoque_baixado", "mensagem"])
-        return True
-
-    @staticmethod
-    def _registrar_inconsistencia(importacao: CaixaRelatorioImportacao, item: CaixaRelatorioItem, descricao: str) -> None:
-        CaixaImportacaoInconsistencia.objects.create(
-            importacao=importacao,
-            codigo=item.codigo_mercadoria,
-            descricao=descricao,
-            detalhes=item.descricao,
+        baixados = {item.produto_id for item, _ in baixas}
+        agora = timezone.now()
+        unidades_alteradas = [u for pk, u in saldos_unidade.items() if pk in baixados]
+        cfgs_alterados = [cfg for pk, cfg in cfgs.items() if pk in baixados]
+        for registro in unidades_alteradas + cfgs_alterados:
+            registro.atualizado_em = agora
+        ProdutoEstoqueUnidade.objects.bulk_update(
+            unidades_alteradas, ["saldo_atual", "atualizado_em"], batch_size=TAMANHO_LOTE_BAIXA
         )
-        item.estoque_baixado = False
-        item.mensagem = descricao[:255]
-        item.save(update_fields=["estoque_baixado", "mensagem"])
+        ProdutoEstoque.objects.bulk_update(cfgs_alterados, ["saldo_atual", "atualizado_em"], batch_size=TAMANHO_LOTE_BAIXA)
+        Lote.objects.bulk_update(list(lotes_alterados.values()), ["quantidade_restante"], batch_size=TAMANHO_LOTE_BAIXA)
+        verificar_alertas_produtos(sorted(baixados))
 
+        importacao.itens_detectados = len(itens)
+        importacao.itens_baixados = len(baixas)
+        importacao.itens_inconsistentes = len(inconsistencias)
+        importacao.save(update_fields=["itens_detectados", "itens_baixados", "itens_inconsistentes", "atualizado_em"])
+        return {
+            "detectados": importacao.itens_detectados,
+            "baixados": importacao.itens_baixados,
+            "inconsistentes": importacao.itens_inconsistentes,
+        }
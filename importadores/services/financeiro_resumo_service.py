@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+from datetime import date
 from decimal import Decimal
+from typing import Iterable
 
 from django.db.models import Sum
 
@@ -37,3 +39,36 @@ class FinanceiroResumoService:
         )
         return total.quantize(Decimal("0.01"))
 
+    @classmethod
+    def unidades_por_conta(cls) -> dict[int, list[str]]:
+        """conta_id -> unidades com config ativa apontando para a conta."""
+        contas: dict[int, list[str]] = {}
+        for unidade, conta_id in UnidadeContaFinanceiraConfig.objects.filter(ativa=True).values_list(
+            "unidade", "conta_bancaria_id"
+        ):
+            contas.setdefault(conta_id, []).append(unidade)
+        return contas
+
+    @classmethod
+    def saidas_confirmadas_por_dia_unidade(cls, datas: Iterable[date]) -> dict[tuple[date, str], Decimal]:
+        """Mesma regra de `total_saidas_confirmadas_por_unidade` para varias datas, numa agregacao."""
+        datas = set(datas)
+        contas = cls.unidades_por_conta()
+        if not datas or not contas:
+            return {}
+        totais: dict[tuple[date, str], Decimal] = {}
+        for conta_id, data_lancamento, total in (
+            TransacaoBancaria.objects.filter(
+                conta_id__in=contas,
+                data_lancamento__in=datas,
+                tipo_movimento=TipoMovimentoChoices.SAIDA,
+                status_conciliacao__in=cls.STATUS_FINAIS,
+            )
+            .order_by()
+            .values("conta_id", "data_lancamento")
+            .annotate(total=Sum("valor"))
+            .values_list("conta_id", "data_lancamento", "total")
+        ):
+            for unidade in contas[conta_id]:
+                totais[(data_lancamento, unidade)] = (total or Decimal("0.00")).quantize(Decimal("0.01"))
+        return totais
@@ -1,6 +1,13 @@
 from __future__ import annotations
 
+import io
+import zipfile
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Iterable, Optional, Sequence
+
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.db import IntegrityError, transaction
 
 from importadores.models import (
@@ -10,6 +17,45 @@ from importadores.models import (
 )
 from importadores.services.estoque_baixa_service import EstoqueBaixaService
 from importadores.services.pdf_caixa_service import PDFCaixaService
+from importadores.services.resultado_diario_service import ResultadoDiarioService
+
+# Limites do lote (upload multiplo/ZIP e backfill por diretorio)
+MAX_ARQUIVOS_LOTE = 400
+TAMANHO_MAX_PDF = 15 * 1024 * 1024
+
+SITUACAO_IMPORTADO = "IMPORTADO"
+SITUACAO_DUPLICADO = "DUPLICADO"
+SITUACAO_ERRO = "ERRO"
+
+
+@dataclass(frozen=True)
+class ResultadoArquivoCaixa:
+    nome: str
+    situacao: str
+    mensagem: str = ""
+    importacao: Optional[CaixaRelatorioImportacao] = None
+
+
+def expandir_arquivos(arquivos: Iterable[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    """(nome, conteudo) dos PDFs enviados, abrindo os ZIPs (so entradas .pdf, sem recursao)."""
+    saida: list[tuple[str, bytes]] = []
+    for nome, raw in arquivos:
+        if nome.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(raw)) as pacote:
+                    for info in pacote.infolist():
+                        if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                            continue
+                        if info.file_size > TAMANHO_MAX_PDF:
+                            raise ValidationError(f"{nome}: {info.filename} maior que 15 MB.")
+                        saida.append((PurePath(info.filename).name, pacote.read(info)))
+            except zipfile.BadZipFile as exc:
+                raise ValidationError(f"{nome}: arquivo ZIP invalido.") from exc
+        else:
+            saida.append((PurePath(nome).name, raw))
+        if len(saida) > MAX_ARQUIVOS_LOTE:
+            raise ValidationError(f"Lote com mais de {MAX_ARQUIVOS_LOTE} PDFs.")
+    return saida
 
 
 class ImportacaoCaixaService:
@@ -20,23 +66,38 @@ class ImportacaoCaixaService:
             raise ValidationError("Arquivo PDF vazio.")
 
         arquivo_hash = PDFCaixaService.build_hash(raw)
-        text = PDFCaixaService.extract_text_from_pdf_bytes(raw)
-        parsed = PDFCaixaService.parse_caixa_text(
-            text,
+        parsed = PDFCaixaService.parse_pdf_cached(
+            raw,
+            arquivo_hash=arquivo_hash,
             unidade_override=unidade_override,
             data_override=data_referencia_override,
             source_name=getattr(uploaded_file, "name", "") or "",
         )
 
         uploaded_file.seek(0)
+        return cls._persistir(
+            parsed,
+            arquivo=uploaded_file,
+            arquivo_nome=getattr(uploaded_file, "name", "") or "",
+            arquivo_hash=arquivo_hash,
+            usuario=usuario,
+        )
+
+    @classmethod
+    @transaction.atomic
+    def _persistir(cls, parsed, *, arquivo, arquivo_nome: str, arquivo_hash: str, usuario) -> CaixaRelatorioImportacao:
+        """
+        Grava a importacao, baixa o estoque e atualiza o resultado do dia numa unica transacao:
+        se a baixa falhar nada fica gravado e o mesmo PDF pode ser reenviado.
+        """
         try:
             with transaction.atomic():
                 importacao = CaixaRelatorioImportacao.objects.create(
                     data_referencia=parsed["data_referencia"],
                     unidade=parsed["unidade"],
                     empresa_nome=parsed["empresa_nome"],
-                    arquivo_pdf=uploaded_file,
-                    arquivo_nome=getattr(uploaded_file, "name", "") or "",
+                    arquivo_pdf=arquivo,
+                    arquivo_nome=arquivo_nome,
                     arquivo_hash=arquivo_hash,
                     total_vendas=parsed["total_vendas"],
                     total_trocas=parsed.get("total_trocas") or 0,
@@ -44,21 +105,100 @@ class ImportacaoCaixaService:
                     status=StatusImportacaoPDFChoices.SUCESSO,
                     criado_por=usuario if getattr(usuario, "is_authenticated", False) else None,
                 )
-
-                for item in parsed["itens"]:
-                    CaixaRelatorioItem.objects.create(
-                        importacao=importacao,
-                        codigo_mercadoria=item["codigo_mercadoria"],
-                        descricao=item.get("descricao", ""),
-                        quantidade=item["quantidade"],
-                    )
         except IntegrityError as exc:
             raise ValidationError(
                 "Este PDF ja foi importado para a mesma data e unidade (idempotencia ativa)."
             ) from exc
+        CaixaRelatorioItem.objects.bulk_create(
+            [
+                CaixaRelatorioItem(
+                    importacao=importacao,
+                    codigo_mercadoria=item["codigo_mercadoria"],
+                    descricao=item.get("descricao", ""),
+                    quantidade=item["quantidade"],
+                )
+                for item in parsed["itens"]
+            ],
+            batch_size=500,
+        )
 
         resumo_baixa = EstoqueBaixaService.baixar_itens_por_importacao(importacao)
         if resumo_baixa["inconsistentes"] > 0:
             importacao.status = StatusImportacaoPDFChoices.PARCIAL
             importacao.save(update_fields=["status", "atualizado_em"])
+        ResultadoDiarioService.atualizar([(importacao.data_referencia, importacao.unidade)])
         return importacao
+
+    @classmethod
+    def importar_lote(
+        cls,
+        arquivos: Sequence[tuple[str, bytes]],
+        *,
+        usuario,
+        unidade_override: str = "",
+        processos: int | None = None,
+    ) -> list[ResultadoArquivoCaixa]:
+        """
+        Importa varios PDFs de caixa (ZIPs ja expandidos por `expandir_arquivos`).
+        - duplicados (mesmo hash ja importado ou repetido no lote) saem numa unica query
+        - o texto dos restantes e extraido em paralelo (PDFCaixaService.extract_texts)
+        - cada PDF e gravado e baixado no estoque na sua propria transacao: a falha de um nao desfaz os
+          outros e nao deixa importacao sem baixa
+        Devolve um resultado por arquivo, na ordem recebida.
+        """
+        hashes = [PDFCaixaService.build_hash(raw) for _, raw in arquivos]
+        ja_importados = set(
+            CaixaRelatorioImportacao.objects.filter(arquivo_hash__in=set(hashes)).values_list(
+                "arquivo_hash", flat=True
+            )
+        )
+
+        resultados: list[Optional[ResultadoArquivoCaixa]] = [None] * len(arquivos)
+        pendentes: list[int] = []
+        vistos: set[str] = set()
+        for pos, ((nome, raw), arquivo_hash) in enumerate(zip(arquivos, hashes)):
+            if not raw:
+                resultados[pos] = ResultadoArquivoCaixa(nome, SITUACAO_ERRO, "Arquivo PDF vazio.")
+            elif arquivo_hash in ja_importados:
+                resultados[pos] = ResultadoArquivoCaixa(nome, SITUACAO_DUPLICADO, "PDF ja importado anteriormente.")
+            elif arquivo_hash in vistos:
+                resultados[pos] = ResultadoArquivoCaixa(nome, SITUACAO_DUPLICADO, "PDF repetido no lote.")
+            else:
+                vistos.add(arquivo_hash)
+                pendentes.append(pos)
+
+        textos = PDFCaixaService.extract_texts([arquivos[pos][1] for pos in pendentes], processos=processos)
+        for pos, extraido in zip(pendentes, textos):
+            nome, raw = arquivos[pos]
+            try:
+                if extraido.erro:
+                    raise ValidationError(extraido.erro)
+                parsed = PDFCaixaService.parse_pdf_cached(
+                    raw,
+                    arquivo_hash=extraido.arquivo_hash,
+                    text=extraido.texto,
+                    unidade_override=unidade_override,
+                    source_name=nome,
+                )
+                importacao = cls._persistir(
+                    parsed,
+                    arquivo=ContentFile(raw, name=nome),
+                    arquivo_nome=nome,
+                    arquivo_hash=extraido.arquivo_hash,
+                    usuario=usuario,
+                )
+            except ValidationError as exc:
+                resultados[pos] = ResultadoArquivoCaixa(nome, SITUACAO_ERRO, "; ".join(exc.messages))
+                continue
+            except Exception as exc:
+                resultados[pos] = ResultadoArquivoCaixa(nome, SITUACAO_ERRO, f"Falha na importacao: {exc}")
+                continue
+            resultados[pos] = ResultadoArquivoCaixa(
+                nome,
+                SITUACAO_IMPORTADO,
+                f"{importacao.get_unidade_display()} {importacao.data_referencia:%d/%m/%Y}: "
+                f"vendas {importacao.total_vendas}, itens baixados {importacao.itens_baixados}/"
+                f"{importacao.itens_detectados}.",
+                importacao,
+            )
+        return resultados
@@ -1,14 +1,75 @@
 from __future__ import annotations
 
 import hashlib
+import os
 import re
+from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
-from typing import Any
+from typing import Any, Sequence
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 
 from estoque.models import UnidadeLoja
+from importadores.services.pdf_extracao import extrair_texto_pdf, extrair_textos_em_processos
+
+# Texto extraido e resultado do parse ficam no cache pelo hash do arquivo:
+# reenvio do mesmo PDF nao passa de novo pelo pypdf.
+CACHE_PREFIXO_PDF_CAIXA = "importadores:caixa_pdf"
+CACHE_TTL_PDF_CAIXA = 60 * 60 * 24
+
+# Caracteres lidos depois do titulo "Totalizacao do Caixa".
+TAMANHO_SECAO_TOTALIZACAO = 4000
+
+_DATA = r"(\d{2}[\/\-.]\d{2}[\/\-.]\d{2,4})"
+_DATA_RES = tuple(
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        rf"\bData\s*[:\-]?\s*{_DATA}",
+        rf"\bRelatorio\s*[:\-]?\s*{_DATA}",
+        rf"\bPeriodo\s*[:\-]?\s*{_DATA}",
+        rf"\bEmiss[aã]o\s*[:\-]?\s*{_DATA}",
+        r"\b(\d{2}[\/\-.]\d{2}[\/\-.]\d{4})\b",
+    )
+)
+_NOME_DDMMAAAA_RE = re.compile(r"(?<!\d)(\d{2})(\d{2})(\d{4})(?!\d)")
+_NOME_AAAAMMDD_RE = re.compile(r"(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)")
+_EMPRESA_RES = (
+    re.compile(r"\bEmpresa\s*[:\-]\s*([A-Za-z0-9\s\/\-\._]+)", re.IGNORECASE),
+    re.compile(r"\bUnidade\s*[:\-]\s*([A-Za-z0-9\s\/\-\._]+)", re.IGNORECASE),
+)
+_TOTALIZACAO_RE = re.compile(r"Totaliza[cç][aã]o do Caixa", re.IGNORECASE)
+_TOTAL_VENDAS_RE = re.compile(r"Vendas.{0,400}?TOTAL\s*[:\-]\s*([0-9\.\,]+)", re.IGNORECASE | re.DOTALL)
+_TOTAL_RE = re.compile(r"\bTOTAL\s*[:\-]\s*([0-9\.\,]+)", re.IGNORECASE)
+_LINHA_VALOR_RE = re.compile(r"^\s*([^\n\r:]+?)\s*:\s*([0-9\.\,]+)\s*$", re.IGNORECASE | re.MULTILINE)
+# Padrão comum: CODIGO DESCRICAO QTD
+_ITEM_RE = re.compile(
+    r"^\s*(?P<codigo>\d{3,})\s+(?P<descricao>.+?)\s+(?P<qtd>\d+[\,\.]?\d{0,3})\s*$",
+    flags=re.MULTILINE,
+)
+_ESPACOS_RE = re.compile(r"\s+")
+_SEM_ACENTO = str.maketrans("ÉÊÃÁÀÇÍÓÔÚ", "EEAAACIOOU")
+
+_ALIASES_VENDAS = {
+    "ESPECIE": "ESPECIE",
+    "DUPLICATA": "DUPLICATA",
+    "BOLETO": "BOLETO",
+    "CARTAO DE CREDITO": "CARTAO_CREDITO",
+    "CARTAO DE DEBITO": "CARTAO_DEBITO",
+    "PIX": "PIX",
+    "PIX OFF": "PIX_OFF",
+    "TOTAL": "TOTAL",
+    "TOTAL TROCAS": "TOTAL_TROCAS",
+}
+
+
+@dataclass(frozen=True)
+class TextoPDFCaixa:
+    arquivo_hash: str
+    texto: str
+    erro: str = ""
 
 
 class PDFCaixaService:
@@ -18,22 +79,103 @@ class PDFCaixaService:
 
     @classmethod
     def extract_text_from_pdf_bytes(cls, raw: bytes) -> str:
-        try:
-            from pypdf import PdfReader  # type: ignore
-        except Exception as exc:
-            raise ValidationError(
-                "Biblioteca pypdf nao instalada. Instale com: pip install pypdf"
-            ) from exc
-
-        import io
-
-        reader = PdfReader(io.BytesIO(raw))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        text = "\n".join(pages)
-        if not text.strip():
-            raise ValidationError("Nao foi possivel extrair texto do PDF informado.")
+        return extrair_texto_pdf(raw)
+
+    @staticmethod
+    def _cache_key_texto(arquivo_hash: str) -> str:
+        return f"{CACHE_PREFIXO_PDF_CAIXA}:texto:{arquivo_hash}"
+
+    @classmethod
+    def extract_text_cached(cls, raw: bytes, arquivo_hash: str = "") -> str:
+        """Texto do PDF, reaproveitando extracoes anteriores do mesmo arquivo."""
+        arquivo_hash = arquivo_hash or cls.build_hash(raw)
+        key = cls._cache_key_texto(arquivo_hash)
+        text = cache.get(key)
+        if text is None:
+            text = cls.extract_text_from_pdf_bytes(raw)
+            cache.set(key, text, CACHE_TTL_PDF_CAIXA)
         return text
 
+    @classmethod
+    def extract_texts(cls, conteudos: Sequence[bytes], *, processos: int | None = None) -> list[TextoPDFCaixa]:
+        """
+        Extrai varios PDFs (upload em lote), na ordem recebida.
+        Arquivos ja no cache nao sao reprocessados; os demais vao para um pool de
+        `processos` processos (padrao: settings.IMPORTADORES_PDF_PROCESSOS, limitado
+        aos nucleos da maquina; 0/1 = serial).
+        Falhas de extracao voltam em `erro` em vez de interromper o lote.
+        """
+        if processos is None:
+            processos = getattr(settings, "IMPORTADORES_PDF_PROCESSOS", 0)
+        processos = min(processos, os.cpu_count() or 1)
+        hashes = [cls.build_hash(raw) for raw in conteudos]
+        em_cache = cache.get_many([cls._cache_key_texto(h) for h in set(hashes)])
+
+        pendentes: dict[str, bytes] = {}
+        for arquivo_hash, raw in zip(hashes, conteudos):
+            if cls._cache_key_texto(arquivo_hash) not in em_cache:
+                pendentes.setdefault(arquivo_hash, raw)
+
+        extraidos: dict[str, tuple[str, str]] = {}
+        if len(pendentes) > 1 and processos > 1:
+            resultados = extrair_textos_em_processos(list(pendentes.values()), processos)
+            extraidos = dict(zip(pendentes, resultados))
+        else:
+            for arquivo_hash, raw in pendentes.items():
+                try:
+                    extraidos[arquivo_hash] = (cls.extract_text_from_pdf_bytes(raw), "")
+                except ValidationError as exc:
+                    extraidos[arquivo_hash] = ("", "; ".join(exc.messages))
+                except Exception as exc:
+                    extraidos[arquivo_hash] = ("", f"PDF ilegivel: {exc}")
+        cache.set_many(
+            {cls._cache_key_texto(h): text for h, (text, erro) in extraidos.items() if not erro},
+            CACHE_TTL_PDF_CAIXA,
+        )
+
+        saida = []
+        for arquivo_hash in hashes:
+            text = em_cache.get(cls._cache_key_texto(arquivo_hash))
+            if text is not None:
+                saida.append(TextoPDFCaixa(arquivo_hash, text))
+            else:
+                text, erro = extraidos[arquivo_hash]
+                saida.append(TextoPDFCaixa(arquivo_hash, text, erro))
+        return saida
+
+    @classmethod
+    def parse_pdf_cached(
+        cls,
+        raw: bytes,
+        *,
+        arquivo_hash: str = "",
+        text: str | None = None,
+        unidade_override: str = "",
+        data_override=None,
+        source_name: str = "",
+    ) -> dict[str, Any]:
+        """
+        parse_caixa_text sobre o texto do PDF, com o resultado no cache por hash
+        do arquivo + overrides (a mesma previa/reenvio nao extrai nem analisa de novo).
+        """
+        arquivo_hash = arquivo_hash or cls.build_hash(raw)
+        chave_args = hashlib.sha1(
+            f"{unidade_override}|{data_override or ''}|{source_name}".encode("utf-8")
+        ).hexdigest()[:16]
+        key = f"{CACHE_PREFIXO_PDF_CAIXA}:parse:{arquivo_hash}:{chave_args}"
+        parsed = cache.get(key)
+        if parsed is None:
+            if text is None:
+                text = cls.extract_text_cached(raw, arquivo_hash)
+            parsed = cls.parse_caixa_text(
+                text,
+                unidade_override=unidade_override,
+                data_override=data_override,
+                source_name=source_name,
+            )
+            cache.set(key, parsed, CACHE_TTL_PDF_CAIXA)
+        return parsed
+
     @classmethod
     def parse_caixa_text(
         cls,
@@ -45,8 +187,10 @@ class PDFCaixaService:
         data_ref = data_override or cls._extract_data(text) or cls._extract_data_from_filename(source_name)
         empresa = cls._extract_empresa(text)
         unidade = unidade_override or cls._infer_unidade(text, empresa)
-        vendas_detalhadas = cls._extract_vendas_detalhadas(text)
-        total_vendas = cls._extract_total_vendas(text) or vendas_detalhadas.get("TOTAL")
+        # Secao localizada uma vez e reusada pelo total e pelo detalhamento
+        section = cls._locate_totalizacao(text)
+        vendas_detalhadas = cls._extract_vendas_detalhadas(text, section)
+        total_vendas = cls._extract_total_vendas(text, section) or vendas_detalhadas.get("TOTAL")
         total_trocas = vendas_detalhadas.get("TOTAL_TROCAS", Decimal("0.00"))
         itens = cls._extract_itens_vendidos(text)
 
@@ -69,15 +213,8 @@ class PDFCaixaService:
 
     @staticmethod
     def _extract_data(text: str):
-        patterns = [
-            r"\bData\s*[:\-]?\s*(\d{2}[\/\-.]\d{2}[\/\-.]\d{2,4})",
-            r"\bRelatorio\s*[:\-]?\s*(\d{2}[\/\-.]\d{2}[\/\-.]\d{2,4})",
-            r"\bPeriodo\s*[:\-]?\s*(\d{2}[\/\-.]\d{2}[\/\-.]\d{2,4})",
-            r"\bEmiss[aã]o\s*[:\-]?\s*(\d{2}[\/\-.]\d{2}[\/\-.]\d{2,4})",
-            r"\b(\d{2}[\/\-.]\d{2}[\/\-.]\d{4})\b",
-        ]
-        for pattern in patterns:
-            m = re.search(pattern, text, flags=re.IGNORECASE)
+        for pattern in _DATA_RES:
+            m = pattern.search(text)
             if m:
                 parsed = PDFCaixaService._parse_flexible_date(m.group(1))
                 if parsed:
@@ -90,13 +227,13 @@ class PDFCaixaService:
             return None
         base = source_name.rsplit(".", 1)[0]
         # ddmmyyyy
-        m1 = re.search(r"(?<!\d)(\d{2})(\d{2})(\d{4})(?!\d)", base)
+        m1 = _NOME_DDMMAAAA_RE.search(base)
         if m1:
             parsed = PDFCaixaService._parse_flexible_date(f"{m1.group(1)}/{m1.group(2)}/{m1.group(3)}")
             if parsed:
                 return parsed
         # yyyymmdd
-        m2 = re.search(r"(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)", base)
+        m2 = _NOME_AAAAMMDD_RE.search(base)
         if m2:
             try:
                 return datetime.strptime(f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}", "%Y-%m-%d").date()
@@ -121,12 +258,8 @@ class PDFCaixaService:
 
     @staticmethod
     def _extract_empresa(text: str) -> str:
-        patterns = [
-            r"\bEmpresa\s*[:\-]\s*([A-Za-z0-9\s\/\-\._]+)",
-            r"\bUnidade\s*[:\-]\s*([A-Za-z0-9\s\/\-\._]+)",
-        ]
-        for pattern in patterns:
-            m = re.search(pattern, text, flags=re.IGNORECASE)
+        for pattern in _EMPRESA_RES:
+            m = pattern.search(text)
             if m:
                 return m.group(1).strip()[:120]
         return ""
@@ -141,116 +274,68 @@ class PDFCaixaService:
         return ""
 
     @staticmethod
-    def _extract_total_vendas(text: str) -> Decimal | None:
-        section_patterns = [
-            r"Totaliza[cç][aã]o do Caixa(.{0,2000})",
-            r"TOTALIZA[ÇC][AÃ]O DO CAIXA(.{0,2000})",
-        ]
-        for sp in section_patterns:
-            m = re.search(sp, text, flags=re.IGNORECASE | re.DOTALL)
-            if not m:
-                continue
-            section = m.group(1)
-            mv = re.search(
-                r"Vendas.{0,400}?TOTAL\s*[:\-]\s*([0-9\.\,]+)",
-                section,
-                flags=re.IGNORECASE | re.DOTALL,
-            )
+    def _extract_total_vendas(text: str, section: str | None = None) -> Decimal | None:
+        if section is None:
+            section = PDFCaixaService._locate_totalizacao(text)
+        if section is not None:
+            mv = _TOTAL_VENDAS_RE.search(section)
             if mv:
                 return PDFCaixaService._to_decimal_br(mv.group(1))
 
-        fallback = re.findall(r"\bTOTAL\s*[:\-]\s*([0-9\.\,]+)", text, flags=re.IGNORECASE)
+        fallback = _TOTAL_RE.findall(text)
         if fallback:
             return PDFCaixaService._to_decimal_br(fallback[-1])
         return None
 
     @staticmethod
-    def _extract_vendas_detalhadas(text: str) -> dict[str, Decimal]:
+    def _extract_vendas_detalhadas(text: str, section: str | None = None) -> dict[str, Decimal]:
         details: dict[str, Decimal] = {}
-        section = PDFCaixaService._extract_totalizacao_section(text)
+        if section is None:
+            section = PDFCaixaService._locate_totalizacao(text)
+        section = text if section is None else section
         if not section:
             return details
 
-        aliases = {
-            "ESPECIE": "ESPECIE",
-            "DUPLICATA": "DUPLICATA",
-            "BOLETO": "BOLETO",
-            "CARTAO DE CREDITO": "CARTAO_CREDITO",
-            "CARTAO DE DEBITO": "CARTAO_DEBITO",
-            "PIX": "PIX",
-            "PIX OFF": "PIX_OFF",
-            "TOTAL": "TOTAL",
-            "TOTAL TROCAS": "TOTAL_TROCAS",
-        }
-
-        line_pattern = re.compile(r"^\s*([^\n\r:]+?)\s*:\s*([0-9\.\,]+)\s*$", re.IGNORECASE | re.MULTILINE)
-        for label_raw, value_raw in line_pattern.findall(section):
-            label_norm = PDFCaixaService._normalize_label(label_raw)
-            canonical = aliases.get(label_norm)
+        for label_raw, value_raw in _LINHA_VALOR_RE.findall(section):
+            canonical = _ALIASES_VENDAS.get(PDFCaixaService._normalize_label(label_raw))
             if not canonical:
                 continue
             details[canonical] = PDFCaixaService._to_decimal_br(value_raw)
 
         return details
 
+    @staticmethod
+    def _locate_totalizacao(text: str) -> str | None:
+        """Trecho apos o titulo 'Totalizacao do Caixa' (None se o titulo nao aparece)."""
+        m = _TOTALIZACAO_RE.search(text)
+        if not m:
+            return None
+        return text[m.end():m.end() + TAMANHO_SECAO_TOTALIZACAO]
+
     @staticmethod
     def _extract_totalizacao_section(text: str) -> str:
-        patterns = [
-            r"Totaliza[cç][aã]o do Caixa(.{0,4000})",
-            r"TOTALIZA[ÇC][AÃ]O DO CAIXA(.{0,4000})",
-        ]
-        for pattern in patterns:
-            m = re.search(pattern, text, flags=re.IGNORECASE | re.DOTALL)
-            if m:
-                return m.group(1)
-        return text
+        section = PDFCaixaService._locate_totalizacao(text)
+        return text if section is None else section
 
     @staticmethod
     def _normalize_label(label: str) -> str:
-        cleaned = (label or "").upper()
-        replacements = {
-            "É": "E",
-            "Ê": "E",
-            "Ã": "A",
-            "Á": "A",
-            "À": "A",
-            "Ç": "C",
-            "Í": "I",
-            "Ó": "O",
-            "Ô": "O",
-            "Ú": "U",
-        }
-        for src, dst in replacements.items():
-            cleaned = cleaned.replace(src, dst)
-        cleaned = re.sub(r"\s+", " ", cleaned).strip()
-        return cleaned
+        cleaned = (label or "").upper().translate(_SEM_ACENTO)
+        return _ESPACOS_RE.sub(" ", cleaned).strip()
 
     @staticmethod
     def _extract_itens_vendidos(text: str) -> list[dict[str, Any]]:
-        items: list[dict[str, Any]] = []
-
-        # Padrão comum: CODIGO DESCRICAO QTD
-        line_pattern = re.compile(
-            r"^\s*(?P<codigo>\d{3,})\s+(?P<descricao>.+?)\s+(?P<qtd>\d+[\,\.]?\d{0,3})\s*$",
-            flags=re.MULTILINE,
-        )
-        for match in line_pattern.finditer(text):
+        # Remove duplicidades triviais da extração textual
+        dedup = {}
+        for match in _ITEM_RE.finditer(text):
             qtd = PDFCaixaService._to_decimal_br(match.group("qtd"))
             if qtd <= 0:
                 continue
-            items.append(
-                {
-                    "codigo_mercadoria": match.group("codigo").strip(),
-                    "descricao": match.group("descricao").strip()[:255],
-                    "quantidade": qtd,
-                }
-            )
-
-        # Remove duplicidades triviais da extração textual
-        dedup = {}
-        for item in items:
-            key = (item["codigo_mercadoria"], item["descricao"], str(item["quantidade"]))
-            dedup[key] = item
+            item = {
+                "codigo_mercadoria": match.group("codigo").strip(),
+                "descricao": match.group("descricao").strip()[:255],
+                "quantidade": qtd,
+            }
+            dedup[(item["codigo_mercadoria"], item["descricao"], str(qtd))] = item
         return list(dedup.values())
 
     @staticmethod
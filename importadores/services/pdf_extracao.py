@@ -0,0 +1,46 @@
+"""
+Extracao de texto dos PDFs de caixa.
+
+Modulo sem dependencia de models: e o alvo dos processos do pool (contexto spawn),
+que importam apenas isto e o pypdf, sem subir o Django.
+"""
+from __future__ import annotations
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Sequence
+
+from django.core.exceptions import ValidationError
+
+
+def extrair_texto_pdf(raw: bytes) -> str:
+    try:
+        from pypdf import PdfReader  # type: ignore
+    except Exception as exc:
+        raise ValidationError(
+            "Biblioteca pypdf nao instalada. Instale com: pip install pypdf"
+        ) from exc
+
+    reader = PdfReader(io.BytesIO(raw))
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    if not text.strip():
+        raise ValidationError("Nao foi possivel extrair texto do PDF informado.")
+    return text
+
+
+def _extrair_no_processo(raw: bytes) -> tuple[str, str]:
+    """(texto, erro): excecoes viram mensagem para atravessar o limite do processo."""
+    try:
+        return extrair_texto_pdf(raw), ""
+    except ValidationError as exc:
+        return "", "; ".join(exc.messages)
+    except Exception as exc:
+        return "", f"PDF ilegivel: {exc}"
+
+
+def extrair_textos_em_processos(conteudos: Sequence[bytes], processos: int) -> list[tuple[str, str]]:
+    """Extrai varios PDFs em paralelo; resultados na ordem de `conteudos`."""
+    processos = min(processos, len(conteudos))
+    with ProcessPoolExecutor(max_workers=processos, mp_context=get_context("spawn")) as pool:
+        return list(pool.map(_extrair_no_processo, conteudos))
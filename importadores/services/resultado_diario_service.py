@@ -1,66 +1,144 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from datetime import date, timedelta
 from decimal import Decimal
+from typing import Iterable, Optional, Tuple
 
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
 from estoque.models import UnidadeLoja
+from financeiro.models import TipoMovimentoChoices, TransacaoBancaria
 
-from importadores.models import CaixaRelatorioImportacao, StatusImportacaoPDFChoices
+from importadores.models import CaixaRelatorioImportacao, ResultadoDiarioUnidade, StatusImportacaoPDFChoices
 from importadores.services.financeiro_resumo_service import FinanceiroResumoService
 
+# (data_referencia, unidade)
+Par = Tuple[date, str]
+
+AGRUPAMENTOS_SERIE = ("dia", "mes")
+
+CAMPOS_RESULTADO = ["total_vendas", "total_saidas", "resultado", "importacoes", "atualizado_em"]
+
 
 class ResultadoDiarioService:
+    """
+    Le e mantem ResultadoDiarioUnidade. O painel da home e a serie historica leem so a tabela;
+    o importador de PDF e a conciliacao do OFX chamam `atualizar` para os dias que tocaram.
+    """
+
+    STATUS_VALIDOS = (StatusImportacaoPDFChoices.SUCESSO, StatusImportacaoPDFChoices.PARCIAL)
+
     @classmethod
-    def obter_data_referencia_dashboard(cls):
-        ontem = timezone.localdate() - timedelta(days=1)
-        existe_ontem = CaixaRelatorioImportacao.objects.filter(
-            data_referencia=ontem,
-            status__in=[StatusImportacaoPDFChoices.SUCESSO, StatusImportacaoPDFChoices.PARCIAL],
-        ).exists()
-        if existe_ontem:
-            return ontem
-        ultima = (
-            CaixaRelatorioImportacao.objects.filter(
-                status__in=[StatusImportacaoPDFChoices.SUCESSO, StatusImportacaoPDFChoices.PARCIAL]
+    @transaction.atomic
+    def atualizar(cls, pares: Iterable[Par]) -> int:
+        """Refaz os pares (dia, unidade) informados a partir das importacoes e transacoes (upsert)."""
+        pares = {(data, unidade) for data, unidade in pares if data and unidade}
+        if not pares:
+            return 0
+        datas = {data for data, _ in pares}
+        vendas = {
+            (data, unidade): (total or Decimal("0.00"), qtd)
+            for data, unidade, total, qtd in CaixaRelatorioImportacao.objects.filter(
+                data_referencia__in=datas, status__in=cls.STATUS_VALIDOS
             )
-            .order_by("-data_referencia")
-            .first()
+            .order_by()
+            .values("data_referencia", "unidade")
+            .annotate(total=Sum("total_vendas"), qtd=Count("id"))
+            .values_list("data_referencia", "unidade", "total", "qtd")
+        }
+        saidas = FinanceiroResumoService.saidas_confirmadas_por_dia_unidade(datas)
+
+        agora = timezone.now()
+        registros = []
+        for par in sorted(pares):
+            total_vendas, importacoes = vendas.get(par, (Decimal("0.00"), 0))
+            total_vendas = total_vendas.quantize(Decimal("0.01"))
+            total_saidas = saidas.get(par, Decimal("0.00"))
+            registros.append(
+                ResultadoDiarioUnidade(
+                    data_referencia=par[0],
+                    unidade=par[1],
+                    total_vendas=total_vendas,
+                    total_saidas=total_saidas,
+                    resultado=(total_vendas - total_saidas).quantize(Decimal("0.01")),
+                    importacoes=importacoes,
+                    atualizado_em=agora,
+                )
+            )
+        ResultadoDiarioUnidade.objects.bulk_create(
+            registros,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["data_referencia", "unidade"],
+            update_fields=CAMPOS_RESULTADO,
         )
-        return ultima.data_referencia if ultima else None
+        return len(registros)
 
     @classmethod
-    def resumo_por_unidade(cls, data_referencia):
+    def atualizar_por_transacoes(cls, transacoes: Iterable[TransacaoBancaria]) -> int:
+        """Dias/unidades afetados por transacoes bancarias de saida (ex.: apos conciliar)."""
+        transacoes = [t for t in transacoes if t.tipo_movimento == TipoMovimentoChoices.SAIDA]
+        if not transacoes:
+            return 0
+        contas = FinanceiroResumoService.unidades_por_conta()
+        return cls.atualizar(
+            (t.data_lancamento, unidade) for t in transacoes for unidade in contas.get(t.conta_id, [])
+        )
+
+    @classmethod
+    @transaction.atomic
+    def reconstruir(cls, *, inicio: Optional[date] = None, fim: Optional[date] = None) -> int:
+        """Recria a tabela no periodo (sem datas: tudo), ex.: apos mudar a conta de uma unidade."""
+        def periodo(campo: str) -> Q:
+            filtro = Q()
+            if inicio:
+                filtro &= Q(**{f"{campo}__gte": inicio})
+            if fim:
+                filtro &= Q(**{f"{campo}__lte": fim})
+            return filtro
+
+        datas = set(
+            CaixaRelatorioImportacao.objects.filter(periodo("data_referencia"), status__in=cls.STATUS_VALIDOS)
+            .order_by()
+            .values_list("data_referencia", flat=True)
+            .distinct()
+        )
+        datas.update(
+            TransacaoBancaria.objects.filter(
+                periodo("data_lancamento"),
+                tipo_movimento=TipoMovimentoChoices.SAIDA,
+                status_conciliacao__in=FinanceiroResumoService.STATUS_FINAIS,
+            )
+            .order_by()
+            .values_list("data_lancamento", flat=True)
+            .distinct()
+        )
+        ResultadoDiarioUnidade.objects.filter(periodo("data_referencia")).delete()
+        return cls.atualizar((data, unidade) for data in datas for unidade in UnidadeLoja.values)
+
+    @staticmethod
+    def _resumo(registros: Iterable[ResultadoDiarioUnidade]) -> dict:
+        por_unidade = {r.unidade: r for r in registros}
         rows = []
         total_vendas_geral = Decimal("0.00")
         total_saidas_geral = Decimal("0.00")
-
         for unidade in UnidadeLoja.values:
-            total_vendas = (
-                CaixaRelatorioImportacao.objects.filter(
-                    data_referencia=data_referencia,
-                    unidade=unidade,
-                    status__in=[StatusImportacaoPDFChoices.SUCESSO, StatusImportacaoPDFChoices.PARCIAL],
-                ).aggregate(total=Sum("total_vendas"))["total"]
-                or Decimal("0.00")
-            )
-            total_saidas = FinanceiroResumoService.total_saidas_confirmadas_por_unidade(
-                data_referencia=data_referencia,
-                unidade=unidade,
-            )
-            resultado = (total_vendas - total_saidas).quantize(Decimal("0.01"))
+            registro = por_unidade.get(unidade)
+            vendas = registro.total_vendas if registro else Decimal("0.00")
+            saidas = registro.total_saidas if registro else Decimal("0.00")
             rows.append(
                 {
                     "unidade": unidade,
-                    "vendas": total_vendas.quantize(Decimal("0.01")),
-                    "saidas": total_saidas.quantize(Decimal("0.01")),
-                    "resultado": resultado,
+                    "vendas": vendas,
+                    "saidas": saidas,
+                    "resultado": (vendas - saidas).quantize(Decimal("0.01")),
                 }
             )
-            total_vendas_geral += total_vendas
-            total_saidas_geral += total_saidas
+            total_vendas_geral += vendas
+            total_saidas_geral += saidas
 
         return {
             "linhas": rows,
@@ -69,10 +147,31 @@ class ResultadoDiarioService:
             "resultado_geral": (total_vendas_geral - total_saidas_geral).quantize(Decimal("0.01")),
         }
 
+    @classmethod
+    def obter_data_referencia_dashboard(cls):
+        """Ontem, se houve importacao de caixa; senao o ultimo dia importado."""
+        ontem = timezone.localdate() - timedelta(days=1)
+        com_vendas = ResultadoDiarioUnidade.objects.filter(importacoes__gt=0)
+        if com_vendas.filter(data_referencia=ontem).exists():
+            return ontem
+        ultima = com_vendas.order_by("-data_referencia").first()
+        return ultima.data_referencia if ultima else None
+
+    @classmethod
+    def resumo_por_unidade(cls, data_referencia):
+        return cls._resumo(ResultadoDiarioUnidade.objects.filter(data_referencia=data_referencia))
+
     @classmethod
     def payload_dashboard(cls):
-        data_ref = cls.obter_data_referencia_dashboard()
-        if not data_ref:
+        """Painel da home numa query: as linhas de ontem e do ultimo dia com importacao."""
+        ontem = timezone.localdate() - timedelta(days=1)
+        com_vendas = ResultadoDiarioUnidade.objects.filter(importacoes__gt=0)
+        ultima = com_vendas.order_by("-data_referencia").values("data_referencia")[:1]
+        registros = list(
+            ResultadoDiarioUnidade.objects.filter(Q(data_referencia=ontem) | Q(data_referencia=Subquery(ultima)))
+        )
+        datas_com_vendas = {r.data_referencia for r in registros if r.importacoes}
+        if not datas_com_vendas:
             return {
                 "data_referencia": None,
                 "linhas": [],
@@ -80,7 +179,46 @@ class ResultadoDiarioService:
                 "total_saidas_geral": Decimal("0.00"),
                 "resultado_geral": Decimal("0.00"),
             }
-        resumo = cls.resumo_por_unidade(data_ref)
+        data_ref = ontem if ontem in datas_com_vendas else max(datas_com_vendas)
+        resumo = cls._resumo(r for r in registros if r.data_referencia == data_ref)
         resumo["data_referencia"] = data_ref
         return resumo
 
+    @classmethod
+    def serie(
+        cls,
+        *,
+        inicio: date,
+        fim: date,
+        unidade: str = "",
+        agrupar: str = "dia",
+    ) -> list[dict]:
+        """
+        Serie de vendas/saidas/resultado no periodo (por dia ou por mes), somando as
+        unidades ou filtrando uma. Le so a tabela pre-agregada.
+        """
+        if agrupar not in AGRUPAMENTOS_SERIE:
+            raise ValueError(f"Agrupamento invalido: {agrupar}. Use: {', '.join(AGRUPAMENTOS_SERIE)}.")
+        if unidade and unidade not in UnidadeLoja.values:
+            raise ValueError(f"Unidade invalida: {unidade}.")
+        qs = ResultadoDiarioUnidade.objects.filter(data_referencia__range=(inicio, fim))
+        if unidade:
+            qs = qs.filter(unidade=unidade)
+        if agrupar == "mes":
+            qs = qs.annotate(periodo=TruncMonth("data_referencia"))
+        else:
+            qs = qs.annotate(periodo=F("data_referencia"))
+        linhas = (
+            qs.values("periodo")
+            .annotate(vendas=Sum("total_vendas"), saidas=Sum("total_saidas"), resultado=Sum("resultado"))
+            .order_by("periodo")
+        )
+        return [
+            {
+                "periodo": linha["periodo"],
+                "vendas": linha["vendas"].quantize(Decimal("0.01")),
+                "saidas": linha["saidas"].quantize(Decimal("0.01")),
+                "resultado": linha["resultado"].quantize(Decimal("0.01")),
+            }
+            for linha in linhas
+        ]
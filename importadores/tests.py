@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import io
+import shutil
+import tempfile
+import zipfile
 from datetime import timedelta
+from pathlib import Path
 from decimal import Decimal
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
 
+from compras.models import Produto
+from financeiro.services.conciliacao_service import ConciliacaoService
 from financeiro.models import (
     ContaBancaria,
     ExtratoImportacao,
@@ -17,11 +29,27 @@ from financeiro.models import (
     TipoMovimentoChoices,
     TransacaoBancaria,
 )
-from importadores.models import CaixaRelatorioImportacao, UnidadeContaFinanceiraConfig
-from importadores.services.importacao_caixa_service import ImportacaoCaixaService
+from importadores.models import (
+    CaixaImportacaoInconsistencia,
+    CaixaRelatorioImportacao,
+    CaixaRelatorioItem,
+    MovimentoVendaEstoque,
+    ResultadoDiarioUnidade,
+    UnidadeContaFinanceiraConfig,
+)
+from importadores.services.importacao_caixa_service import (
+    SITUACAO_DUPLICADO,
+    SITUACAO_ERRO,
+    SITUACAO_IMPORTADO,
+    ImportacaoCaixaService,
+)
+from importadores.services.estoque_baixa_service import EstoqueBaixaService
 from importadores.services.pdf_caixa_service import PDFCaixaService
+from importadores.services.pdf_extracao import extrair_textos_em_processos
 from importadores.services.resultado_diario_service import ResultadoDiarioService
-from estoque.models import UnidadeLoja
+from estoque.models import EstoqueMovimento, Lote, ProdutoEstoque, ProdutoEstoqueUnidade, UnidadeLoja
+from estoque.services.estoque_service import registrar_entrada
+from estoque.services.unidade_estoque_service import garantir_unidades_produto
 
 
 class PDFCaixaServiceTest(TestCase):
@@ -50,6 +78,73 @@ class PDFCaixaServiceTest(TestCase):
         self.assertEqual(parsed["vendas_detalhadas"]["PIX_OFF"], Decimal("5139.00"))
         self.assertEqual(parsed["data_referencia"].strftime("%d/%m/%Y"), "17/02/2026")
 
+    def test_total_sem_secao_usa_ultimo_total_do_texto(self):
+        text = "Empresa: FILIAL\nData: 18/02/2026\nVendas TOTAL: 10,00\nTOTAL: 25,50\n"
+        parsed = PDFCaixaService.parse_caixa_text(text)
+        self.assertEqual(parsed["unidade"], UnidadeLoja.LOJA_2)
+        self.assertEqual(parsed["total_vendas"], Decimal("25.50"))
+
+
+MEDIA_TESTES = tempfile.mkdtemp(prefix="importadores-tests-")
+
+
+def _pdf_caixa(*linhas: str) -> bytes:
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    y = 800
+    for linha in linhas:
+        pdf.drawString(40, y, linha)
+        y -= 14
+    pdf.save()
+    return buffer.getvalue()
+
+
+class PDFCaixaCacheTest(TestCase):
+    TEXTO = """
+    Empresa: MATRIZ
+    Data: 20/02/2026
+    Totalizacao do Caixa
+    Vendas
+    Total: 300,00
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @patch("importadores.services.pdf_caixa_service.PDFCaixaService.extract_text_from_pdf_bytes")
+    def test_reenvio_nao_extrai_nem_analisa_de_novo(self, mock_extract):
+        mock_extract.return_value = self.TEXTO
+        raw = b"%PDF-1.4 cache"
+        with patch.object(PDFCaixaService, "parse_caixa_text", wraps=PDFCaixaService.parse_caixa_text) as mock_parse:
+            p1 = PDFCaixaService.parse_pdf_cached(raw, source_name="caixa.pdf")
+            p2 = PDFCaixaService.parse_pdf_cached(raw, source_name="caixa.pdf")
+            PDFCaixaService.parse_pdf_cached(raw, source_name="caixa.pdf", unidade_override=UnidadeLoja.LOJA_2)
+        self.assertEqual(p1, p2)
+        self.assertEqual(p1["total_vendas"], Decimal("300.00"))
+        self.assertEqual(mock_extract.call_count, 1)
+        self.assertEqual(mock_parse.call_count, 2)
+
+    def test_extract_texts_reporta_falha_por_arquivo_e_reusa_cache(self):
+        valido = _pdf_caixa("Empresa: MATRIZ", "Data: 20/02/2026", "TOTAL: 1,00")
+        resultados = PDFCaixaService.extract_texts([valido, b"nao e pdf", valido], processos=0)
+        self.assertEqual([bool(r.erro) for r in resultados], [False, True, False])
+        self.assertIn("MATRIZ", resultados[0].texto)
+        self.assertEqual(resultados[0].arquivo_hash, PDFCaixaService.build_hash(valido))
+
+        with patch("importadores.services.pdf_caixa_service.PDFCaixaService.extract_text_from_pdf_bytes") as mock_extract:
+            self.assertEqual(PDFCaixaService.extract_texts([valido])[0].texto, resultados[0].texto)
+        mock_extract.assert_not_called()
+
+    def test_extracao_em_processos(self):
+        conteudos = [_pdf_caixa(f"Empresa: LOJA {n}", "TOTAL: 1,00") for n in (1, 2)]
+        resultados = extrair_textos_em_processos(conteudos + [b"corrompido"], 2)
+        self.assertIn("LOJA 1", resultados[0][0])
+        self.assertIn("LOJA 2", resultados[1][0])
+        self.assertEqual(resultados[2][0], "")
+        self.assertTrue(resultados[2][1])
+
 
 class ImportacaoCaixaIdempotenciaTest(TestCase):
     def setUp(self):
@@ -75,6 +170,163 @@ class ImportacaoCaixaIdempotenciaTest(TestCase):
         self.assertEqual(CaixaRelatorioImportacao.objects.count(), 1)
 
 
+def _relatorio(empresa: str, data: str, total: str) -> bytes:
+    return _pdf_caixa(f"Empresa: {empresa}", f"Data: {data}", "Totalizacao do Caixa", "Vendas", f"Total: {total}")
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, IMPORTADORES_PDF_PROCESSOS=0)
+class ImportacaoCaixaLoteTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TESTES, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_superuser("lote", "lote@example.com", "pass")
+        self.dia1 = _relatorio("MATRIZ", "10/02/2026", "100,00")
+        self.dia2 = _relatorio("FILIAL", "10/02/2026", "200,00")
+        self.dia3 = _relatorio("MATRIZ", "11/02/2026", "300,00")
+
+    def _zip(self, **arquivos: bytes) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as pacote:
+            for nome, raw in arquivos.items():
+                pacote.writestr(f"semana/{nome}", raw)
+            pacote.writestr("leia-me.txt", "ignorado")
+        return buffer.getvalue()
+
+    def test_lote_reporta_resultado_por_arquivo(self):
+        ImportacaoCaixaService.importar_lote([("antigo.pdf", self.dia1)], usuario=self.user)
+
+        resultados = ImportacaoCaixaService.importar_lote(
+            [
+                ("dia1.pdf", self.dia1),
+                ("dia2.pdf", self.dia2),
+                ("dia2_copia.pdf", self.dia2),
+                ("dia3.pdf", self.dia3),
+                ("quebrado.pdf", b"%PDF-1.4 quebrado"),
+            ],
+            usuario=self.user,
+        )
+        self.assertEqual(
+            [r.situacao for r in resultados],
+            [SITUACAO_DUPLICADO, SITUACAO_IMPORTADO, SITUACAO_DUPLICADO, SITUACAO_IMPORTADO, SITUACAO_ERRO],
+        )
+        self.assertEqual(CaixaRelatorioImportacao.objects.count(), 3)
+        filial = resultados[1].importacao
+        self.assertEqual(filial.unidade, UnidadeLoja.LOJA_2)
+        self.assertEqual(filial.total_vendas, Decimal("200.00"))
+        self.assertEqual(filial.arquivo_nome, "dia2.pdf")
+
+    def test_falha_na_baixa_desfaz_a_importacao(self):
+        with patch.object(EstoqueBaixaService, "baixar_itens_por_importacao", side_effect=RuntimeError("lock")):
+            resultados = ImportacaoCaixaService.importar_lote([("dia1.pdf", self.dia1)], usuario=self.user)
+        self.assertEqual(resultados[0].situacao, SITUACAO_ERRO)
+        self.assertFalse(CaixaRelatorioImportacao.objects.exists())
+
+        resultados = ImportacaoCaixaService.importar_lote([("dia1.pdf", self.dia1)], usuario=self.user)
+        self.assertEqual(resultados[0].situacao, SITUACAO_IMPORTADO)
+        self.assertEqual(
+            ResultadoDiarioUnidade.objects.get(data_referencia=resultados[0].importacao.data_referencia).total_vendas,
+            Decimal("100.00"),
+        )
+
+    def test_view_aceita_varios_pdfs_e_zip(self):
+        self.client.force_login(self.user)
+        resp = self.client.post(
+            reverse("importadores:caixa_importar_lote"),
+            {
+                "arquivos": [
+                    SimpleUploadedFile("dia1.pdf", self.dia1, content_type="application/pdf"),
+                    SimpleUploadedFile("semana.zip", self._zip(**{"dia2.pdf": self.dia2, "dia3.pdf": self.dia3})),
+                ]
+            },
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            [r.nome for r in resp.context["resultados"]], ["dia1.pdf", "dia2.pdf", "dia3.pdf"]
+        )
+        self.assertEqual(CaixaRelatorioImportacao.objects.count(), 3)
+
+    def test_command_backfill_de_diretorio(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "dia1.pdf").write_bytes(self.dia1)
+            (Path(tmp) / "resto.zip").write_bytes(self._zip(**{"dia2.pdf": self.dia2}))
+            out = io.StringIO()
+            call_command("importar_caixa_pdfs", tmp, stdout=out)
+            call_command("importar_caixa_pdfs", tmp, stdout=out)
+        self.assertEqual(CaixaRelatorioImportacao.objects.count(), 2)
+        self.assertIn("importados: 2", out.getvalue())
+        self.assertIn("duplicados: 2", out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES)
+class EstoqueBaixaEmLoteTest(TestCase):
+    def setUp(self):
+        self.lampada = Produto.objects.create(nome="Lampada", sku="1001")
+        registrar_entrada(produto=self.lampada, quantidade=Decimal("5.000"), preco_unitario=Decimal("10.00"))
+        registrar_entrada(produto=self.lampada, quantidade=Decimal("5.000"), preco_unitario=Decimal("20.00"))
+        garantir_unidades_produto(self.lampada)
+        self.fita = Produto.objects.create(nome="Fita", sku="1002")
+        registrar_entrada(produto=self.fita, quantidade=Decimal("2.000"), preco_unitario=Decimal("3.00"))
+        garantir_unidades_produto(self.fita)
+
+    def _importacao(self, itens, sufixo="a"):
+        importacao = CaixaRelatorioImportacao.objects.create(
+            data_referencia=timezone.localdate(),
+            unidade=UnidadeLoja.LOJA_1,
+            arquivo_pdf=SimpleUploadedFile(f"caixa_{sufixo}.pdf", b"%PDF-1.4 x"),
+            arquivo_hash=sufixo * 64,
+        )
+        CaixaRelatorioItem.objects.bulk_create(
+            [CaixaRelatorioItem(importacao=importacao, codigo_mercadoria=c, quantidade=Decimal(q)) for c, q in itens]
+        )
+        return importacao
+
+    def test_baixa_unidade_consolidado_e_lotes_fifo(self):
+        importacao = self._importacao([("1001", "7"), ("1002", "3"), ("9999", "1"), ("1001", "2")])
+        resumo = EstoqueBaixaService.baixar_itens_por_importacao(importacao)
+
+        self.assertEqual(resumo, {"detectados": 4, "baixados": 2, "inconsistentes": 2})
+        self.assertEqual(
+            ProdutoEstoqueUnidade.objects.get(produto=self.lampada, unidade=UnidadeLoja.LOJA_1).saldo_atual,
+            Decimal("1.000"),
+        )
+        self.assertEqual(ProdutoEstoque.objects.get(produto=self.lampada).saldo_atual, Decimal("1.000"))
+        self.assertEqual(
+            list(Lote.objects.filter(produto=self.lampada).values_list("quantidade_restante", flat=True)),
+            [Decimal("0.000"), Decimal("1.000")],
+        )
+        custos = MovimentoVendaEstoque.objects.filter(importacao=importacao).order_by("item_id").values_list(
+            "movimento_estoque__custo_total", flat=True
+        )
+        # 5 x 10 + 2 x 20, depois 2 x 20
+        self.assertEqual(list(custos), [Decimal("90.00"), Decimal("40.00")])
+        self.assertEqual(ProdutoEstoque.objects.get(produto=self.fita).saldo_atual, Decimal("2.000"))
+        self.assertEqual(
+            set(CaixaImportacaoInconsistencia.objects.filter(importacao=importacao).values_list("codigo", flat=True)),
+            {"1002", "9999"},
+        )
+        self.assertEqual(importacao.itens.filter(estoque_baixado=True, produto=self.lampada).count(), 2)
+
+    def test_queries_nao_crescem_com_itens(self):
+        produtos = [Produto.objects.create(nome=f"Produto {i}", sku=f"2{i:03d}") for i in range(20)]
+        for produto in produtos:
+            registrar_entrada(produto=produto, quantidade=Decimal("5.000"))
+            garantir_unidades_produto(produto)
+        pequena = self._importacao([("1001", "1"), ("8888", "1")], sufixo="p")
+        grande = self._importacao([(p.sku, "1") for p in produtos] + [("8888", "1")], sufixo="g")
+
+        with CaptureQueriesContext(connection) as pequena_ctx:
+            EstoqueBaixaService.baixar_itens_por_importacao(pequena)
+        with CaptureQueriesContext(connection) as grande_ctx:
+            EstoqueBaixaService.baixar_itens_por_importacao(grande)
+        self.assertEqual(grande.itens_baixados, 20)
+        self.assertEqual(EstoqueMovimento.objects.filter(observacao__contains=f"#{grande.pk}").count(), 20)
+        self.assertEqual(len(grande_ctx), len(pequena_ctx))
+
+
 class ResultadoDiarioServiceTest(TestCase):
     def setUp(self):
         user_model = get_user_model()
@@ -123,8 +375,54 @@ class ResultadoDiarioServiceTest(TestCase):
         )
 
     def test_resultado_dia(self):
-        payload = ResultadoDiarioService.payload_dashboard()
+        self.assertEqual(ResultadoDiarioService.reconstruir(), len(UnidadeLoja.values))
+        with self.assertNumQueries(1):
+            payload = ResultadoDiarioService.payload_dashboard()
         self.assertEqual(payload["data_referencia"], self.data_ref)
         self.assertEqual(payload["total_vendas_geral"], Decimal("1000.00"))
         self.assertEqual(payload["total_saidas_geral"], Decimal("250.00"))
         self.assertEqual(payload["resultado_geral"], Decimal("750.00"))
+
+    def test_conciliacao_e_importacao_atualizam_o_dia(self):
+        ResultadoDiarioService.reconstruir()
+        saida = TransacaoBancaria.objects.create(
+            conta=self.conta,
+            importacao=self.importacao_fin,
+            data_lancamento=self.data_ref,
+            valor=Decimal("100.00"),
+            tipo_movimento=TipoMovimentoChoices.SAIDA,
+            descricao="Tarifa",
+            idempotency_key="saida-100",
+        )
+        ConciliacaoService.ignorar(saida, self.user)
+        linha = ResultadoDiarioUnidade.objects.get(data_referencia=self.data_ref, unidade=UnidadeLoja.LOJA_1)
+        self.assertEqual(linha.total_saidas, Decimal("350.00"))
+        self.assertEqual(linha.resultado, Decimal("650.00"))
+
+        with patch(
+            "importadores.services.pdf_caixa_service.PDFCaixaService.extract_text_from_pdf_bytes",
+            return_value=f"Empresa: MATRIZ\nData: {self.data_ref:%d/%m/%Y}\nTotalizacao do Caixa\nVendas\nTotal: 40,00\n",
+        ), override_settings(MEDIA_ROOT=MEDIA_TESTES):
+            ImportacaoCaixaService.importar_pdf(
+                uploaded_file=SimpleUploadedFile("caixa3.pdf", b"%PDF-1.4 resultado"), usuario=self.user
+            )
+        linha.refresh_from_db()
+        self.assertEqual((linha.total_vendas, linha.importacoes), (Decimal("1040.00"), 2))
+        self.assertEqual(ResultadoDiarioService.payload_dashboard()["resultado_geral"], Decimal("690.00"))
+
+    def test_serie_mensal_e_api(self):
+        ResultadoDiarioService.reconstruir()
+        serie = ResultadoDiarioService.serie(inicio=self.data_ref, fim=self.data_ref, agrupar="mes")
+        self.assertEqual(len(serie), 1)
+        self.assertEqual(serie[0]["periodo"], self.data_ref.replace(day=1))
+        self.assertEqual(serie[0]["resultado"], Decimal("750.00"))
+
+        self.client.force_login(get_user_model().objects.create_superuser("gestor", "g@example.com", "pass"))
+        url = reverse("importadores:resultado_diario_serie")
+        resp = self.client.get(url, {"inicio": self.data_ref.isoformat(), "unidade": UnidadeLoja.LOJA_1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            resp.json()["linhas"],
+            [{"periodo": self.data_ref.isoformat(), "vendas": "1000.00", "saidas": "250.00", "resultado": "750.00"}],
+        )
+        self.assertEqual(self.client.get(url, {"agrupar": "semana"}).status_code, 400)
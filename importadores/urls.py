@@ -1,12 +1,20 @@
 from django.urls import path
 
-from importadores.views import CaixaImportacaoDetailView, CaixaImportacaoListView, CaixaImportarView
+from importadores.views import (
+    CaixaImportacaoDetailView,
+    CaixaImportacaoListView,
+    CaixaImportarLoteView,
+    CaixaImportarView,
+    ResultadoDiarioSerieView,
+)
 
 app_name = "importadores"
 
 urlpatterns = [
     path("caixa/importar/", CaixaImportarView.as_view(), name="caixa_importar"),
+    path("caixa/importar/lote/", CaixaImportarLoteView.as_view(), name="caixa_importar_lote"),
     path("caixa/importacoes/", CaixaImportacaoListView.as_view(), name="caixa_importacoes"),
     path("caixa/importacoes/<int:pk>/", CaixaImportacaoDetailView.as_view(), name="caixa_importacao_detail"),
+    path("resultado-diario/serie/", ResultadoDiarioSerieView.as_view(), name="resultado_diario_serie"),
 ]
 
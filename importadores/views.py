@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
+from decimal import Decimal
+
 from django.contrib import messages
 from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
 from django.views.generic import DetailView, ListView, TemplateView
 
 from core.services.paginacao import get_pagination_params
 from core.services.permissoes import GroupRequiredMixin
-from importadores.forms import CaixaPDFUploadForm
+from importadores.forms import CaixaPDFLoteForm, CaixaPDFUploadForm
 from importadores.models import CaixaRelatorioImportacao
-from importadores.services.importacao_caixa_service import ImportacaoCaixaService
+from importadores.services.importacao_caixa_service import (
+    SITUACAO_ERRO,
+    SITUACAO_IMPORTADO,
+    ImportacaoCaixaService,
+    expandir_arquivos,
+)
+from importadores.services.resultado_diario_service import ResultadoDiarioService
 
 
 class ImportadoresAccessMixin(GroupRequiredMixin):
@@ -53,6 +65,43 @@ class CaixaImportarView(ImportadoresAccessMixin, TemplateView):
         return self.render_to_response(self.get_context_data(form=CaixaPDFUploadForm()))
 
 
+class CaixaImportarLoteView(ImportadoresAccessMixin, TemplateView):
+    template_name = "importadores/caixa_importar_lote.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["form"] = kwargs.get("form") or CaixaPDFLoteForm()
+        ctx["resultados"] = kwargs.get("resultados") or []
+        return ctx
+
+    def post(self, request, *args, **kwargs):
+        form = CaixaPDFLoteForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.render_to_response(self.get_context_data(form=form))
+        try:
+            arquivos = expandir_arquivos((f.name, f.read()) for f in form.cleaned_data["arquivos"])
+        except ValidationError as exc:
+            messages.error(request, f"Falha na importacao: {'; '.join(exc.messages)}")
+            return self.render_to_response(self.get_context_data(form=form))
+        if not arquivos:
+            messages.error(request, "Nenhum PDF encontrado nos arquivos enviados.")
+            return self.render_to_response(self.get_context_data(form=form))
+
+        resultados = ImportacaoCaixaService.importar_lote(
+            arquivos,
+            usuario=request.user,
+            unidade_override=form.cleaned_data.get("unidade_override") or "",
+        )
+        importados = sum(1 for r in resultados if r.situacao == SITUACAO_IMPORTADO)
+        erros = sum(1 for r in resultados if r.situacao == SITUACAO_ERRO)
+        messages.success(
+            request,
+            f"Lote processado: {importados} importado(s), {len(resultados) - importados - erros} duplicado(s), "
+            f"{erros} com erro.",
+        )
+        return self.render_to_response(self.get_context_data(form=CaixaPDFLoteForm(), resultados=resultados))
+
+
 class CaixaImportacaoListView(ImportadoresAccessMixin, ListView):
     template_name = "importadores/caixa_importacao_list.html"
     context_object_name = "importacoes"
@@ -73,3 +122,42 @@ class CaixaImportacaoDetailView(ImportadoresAccessMixin, DetailView):
     template_name = "importadores/caixa_importacao_detail.html"
     context_object_name = "importacao"
     model = CaixaRelatorioImportacao
+
+
+class ResultadoDiarioSerieView(ImportadoresAccessMixin, View):
+    """
+    Serie do resultado diario em JSON (graficos de tendencia).
+    Querystring: ?inicio=2026-01-01&fim=2026-06-30&unidade=LOJA_1&agrupar=mes
+    """
+
+    required_groups = ("admin/gestor", "financeiro")
+
+    @staticmethod
+    def _parse_data(valor: str, padrao):
+        try:
+            return datetime.strptime(valor, "%Y-%m-%d").date() if valor else padrao
+        except ValueError:
+            return padrao
+
+    def get(self, request, *args, **kwargs):
+        hoje = timezone.localdate()
+        inicio = self._parse_data(request.GET.get("inicio", ""), hoje - timedelta(days=90))
+        fim = self._parse_data(request.GET.get("fim", ""), hoje)
+        unidade = (request.GET.get("unidade") or "").strip()
+        agrupar = (request.GET.get("agrupar") or "dia").strip()
+        try:
+            linhas = ResultadoDiarioService.serie(inicio=inicio, fim=fim, unidade=unidade, agrupar=agrupar)
+        except ValueError as exc:
+            return JsonResponse({"erro": str(exc)}, status=400)
+        return JsonResponse(
+            {
+                "inicio": inicio.isoformat(),
+                "fim": fim.isoformat(),
+                "unidade": unidade,
+                "agrupar": agrupar,
+                "linhas": [
+                    {k: (v.isoformat() if k == "periodo" else str(v) if isinstance(v, Decimal) else v) for k, v in linha.items()}
+                    for linha in linhas
+                ],
+            }
+        )
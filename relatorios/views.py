@@ -12,6 +12,7 @@ from django.views.generic import TemplateView
 from boletos.models import Boleto
 from compras.models import Compra
 from contas.models import ContaAPagar
+from contas.services.resumo_service import resumo_mensal_contas
 from estoque.models import EstoqueMovimento, TransferenciaEstoque
 
 
@@ -54,6 +55,7 @@ class RelatoriosDashboardView(LoginRequiredMixin, TemplateView):
 
         ctx.update(
             {
+                "resumo_contas_mes": resumo_mensal_contas(hoje.year, hoje.month),
                 "kpi_total_compras": float(Compra.objects.aggregate(total=Sum("valor_total"))["total"] or 0),
                 "kpi_contas_abertas": float(mapa_contas.get("ABERTA", 0)),
                 "kpi_boletos_abertos": int(Boleto.objects.filter(status="ABERTO").count()),
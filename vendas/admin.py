@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from django.contrib import admin
 
-from vendas.models import ItemVenda, Venda, VendaBoleto, VendaEvento, VendaMovimentoEstoque, VendaPagamento, VendaRecebivel
+from vendas.models import CuboVendaMensal, ItemVenda, Venda, VendaBoleto, VendaEvento, VendaMovimentoEstoque, VendaPagamento, VendaRecebivel
 
 
 class ItemVendaInline(admin.TabularInline):
@@ -28,7 +28,7 @@ class VendaAdmin(admin.ModelAdmin):
 
 @admin.register(ItemVenda)
 class ItemVendaAdmin(admin.ModelAdmin):
-    list_display = ("id", "venda", "produto", "quantidade", "preco_unitario", "desconto", "subtotal")
+    list_display = ("id", "venda", "produto", "quantidade", "preco_unitario", "desconto", "subtotal", "custo_unitario")
     search_fields = ("venda__id", "produto__nome", "produto__nome_normalizado")
     autocomplete_fields = ("venda", "produto")
 
@@ -65,3 +65,11 @@ class VendaPagamentoAdmin(admin.ModelAdmin):
     list_display = ("id", "venda", "tipo_pagamento", "valor", "criado_em")
     list_filter = ("tipo_pagamento", "criado_em")
     autocomplete_fields = ("venda",)
+
+
+@admin.register(CuboVendaMensal)
+class CuboVendaMensalAdmin(admin.ModelAdmin):
+    list_display = ("mes", "produto", "unidade", "vendedor", "tipo_pagamento", "quantidade", "receita", "custo")
+    list_filter = ("mes", "unidade", "tipo_pagamento")
+    search_fields = ("produto__nome",)
+    autocomplete_fields = ("produto", "vendedor")
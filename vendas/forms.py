@@ -10,6 +10,7 @@ from django.utils import timezone
 
 from boletos.models import Cliente
 from core.services.formato_brl import payment_label
+from core.services.permissoes import usuario_em_grupos
 from vendas.models import ItemVenda, TipoPagamentoChoices, Venda
 
 
@@ -29,7 +30,7 @@ class VendaForm(forms.ModelForm):
         self.fields["data_venda"].input_formats = ["%Y-%m-%d"]
 
         if self.user and self.user.is_authenticated:
-            is_manager = self.user.is_superuser or self.user.groups.filter(name="admin/gestor").exists()
+            is_manager = self.user.is_superuser or usuario_em_grupos(self.user, ("admin/gestor",))
             if self.instance.pk is None:
                 self.fields["vendedor"].initial = self.user
             if not is_manager:
@@ -110,7 +111,7 @@ class ClienteRapidoForm(forms.ModelForm):
         digits = re.sub(r"\D", "", raw)
         if len(digits) not in (11, 14):
             raise forms.ValidationError("Informe um CPF (11 dígitos) ou CNPJ (14 dígitos).")
-        if Cliente.objects.filter(cpf_cnpj=digits).exists():
+        if Cliente.objects.filter(documento=digits).exists():
             raise forms.ValidationError("Já existe cliente cadastrado com este CPF/CNPJ.")
         return digits
 
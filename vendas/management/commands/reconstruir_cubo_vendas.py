@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from vendas.services.cubo_vendas_service import reconstruir_cubo_vendas
+
+
+class Command(BaseCommand):
+    help = "Recria o cubo de analise de vendas (mes x produto x unidade x vendedor x pagamento) a partir das vendas faturadas."
+
+    def handle(self, *args, **options):
+        total = reconstruir_cubo_vendas()
+        self.stdout.write(self.style.SUCCESS(f"OK. Celulas do cubo geradas: {total}"))
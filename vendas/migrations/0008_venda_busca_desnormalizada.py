@@ -0,0 +1,66 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.services.normalizacao import normalizar_nome
+
+PAGAMENTO_BITS = {
+    "PIX": 1,
+    "CREDITO": 2,
+    "DEBITO": 4,
+    "AVISTA": 8,
+    "PARCELADO_BOLETO": 16,
+    "PARCELADO": 32,
+}
+
+
+def preencher_campos_busca(apps, schema_editor):
+    Venda = apps.get_model("vendas", "Venda")
+    VendaPagamento = apps.get_model("vendas", "VendaPagamento")
+
+    mascaras: dict[int, int] = {}
+    for venda_id, tipo in VendaPagamento.objects.values_list("venda_id", "tipo_pagamento").iterator():
+        mascaras[venda_id] = mascaras.get(venda_id, 0) | PAGAMENTO_BITS.get(tipo, 0)
+
+    lote = []
+    for venda in Venda.objects.select_related("cliente").only("id", "tipo_pagamento", "cliente__nome").iterator(chunk_size=2000):
+        venda.cliente_nome_normalizado = normalizar_nome(venda.cliente.nome)
+        venda.tipos_pagamento_mascara = mascaras.get(venda.id, 0) | PAGAMENTO_BITS.get(venda.tipo_pagamento, 0)
+        lote.append(venda)
+        if len(lote) >= 2000:
+            Venda.objects.bulk_update(lote, ["cliente_nome_normalizado", "tipos_pagamento_mascara"])
+            lote = []
+    if lote:
+        Venda.objects.bulk_update(lote, ["cliente_nome_normalizado", "tipos_pagamento_mascara"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boletos', '0007_add_cliente_data_nascimento'),
+        ('vendas', '0007_vendapagamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='cliente_nome_normalizado',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='tipos_pagamento_mascara',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_campos_busca, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data_venda', 'id'], name='idx_venda_data_id'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['cliente_nome_normalizado', 'data_venda'], name='idx_venda_cli_nome_data'),
+        ),
+    ]
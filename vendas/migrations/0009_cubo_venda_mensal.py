@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:50
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_custo_itens_faturados(apps, schema_editor):
+    # Sem historico de custo: usa o custo medio atual como melhor aproximacao.
+    ItemVenda = apps.get_model("vendas", "ItemVenda")
+    ProdutoEstoque = apps.get_model("estoque", "ProdutoEstoque")
+    custos = dict(ProdutoEstoque.objects.values_list("produto_id", "custo_medio"))
+    for produto_id, custo in custos.items():
+        if custo:
+            ItemVenda.objects.filter(
+                produto_id=produto_id,
+                venda__status__in=["FATURADA", "FINALIZADA"],
+            ).update(custo_unitario=custo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0009_alter_compraevento_id'),
+        ('estoque', '0006_alter_produtoestoqueunidade_unidade_and_more'),
+        ('vendas', '0008_venda_busca_desnormalizada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemvenda',
+            name='custo_unitario',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=14),
+        ),
+        migrations.RunPython(preencher_custo_itens_faturados, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CuboVendaMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('unidade', models.CharField(choices=[('LOJA_1', 'FM COMERCIO - UNIDADE 1'), ('LOJA_2', 'ML COMERCIO - UNIDADE 2')], default='LOJA_1', max_length=20)),
+                ('tipo_pagamento', models.CharField(choices=[('PIX', 'PIX'), ('CREDITO', 'CREDITO'), ('DEBITO', 'DEBITO'), ('AVISTA', 'ESPECIE'), ('PARCELADO_BOLETO', 'BOLETO'), ('PARCELADO', 'CREDITO NA LOJA')], max_length=25)),
+                ('quantidade', models.DecimalField(decimal_places=3, default=Decimal('0.000'), max_digits=14)),
+                ('receita', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('custo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('itens', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='cubo_vendas', to='compras.produto')),
+                ('vendedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cubo_vendas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-mes', 'produto_id'],
+                'indexes': [models.Index(fields=['mes', 'produto'], name='idx_cubo_mes_produto'), models.Index(fields=['mes', 'unidade'], name='idx_cubo_mes_unidade'), models.Index(fields=['mes', 'vendedor'], name='idx_cubo_mes_vendedor')],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'produto', 'unidade', 'vendedor', 'tipo_pagamento'), name='uniq_cubo_venda_chave')],
+            },
+        ),
+    ]
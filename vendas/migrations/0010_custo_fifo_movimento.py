@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:54
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def preencher_custo_movimentos(apps, schema_editor):
+    # Saidas antigas nao tem custo FIFO gravado: usa o custo unitario do item (custo medio).
+    VendaMovimentoEstoque = apps.get_model("vendas", "VendaMovimentoEstoque")
+    ItemVenda = apps.get_model("vendas", "ItemVenda")
+    custos = dict(ItemVenda.objects.filter(custo_unitario__gt=0).values_list("id", "custo_unitario"))
+    lote = []
+    for registro in VendaMovimentoEstoque.objects.filter(item_venda_id__in=list(custos)).iterator(chunk_size=2000):
+        registro.custo_total = (registro.quantidade * custos[registro.item_venda_id]).quantize(Decimal("0.01"))
+        lote.append(registro)
+        if len(lote) >= 2000:
+            VendaMovimentoEstoque.objects.bulk_update(lote, ["custo_total"])
+            lote = []
+    if lote:
+        VendaMovimentoEstoque.objects.bulk_update(lote, ["custo_total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0007_custo_lote_movimento'),
+        ('vendas', '0009_cubo_venda_mensal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendamovimentoestoque',
+            name='custo_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.RunPython(preencher_custo_movimentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 07:10
+
+from django.db import migrations
+
+
+def criar_indice_trigrama(apps, schema_editor):
+    # Filtro do historico por trecho do nome (LIKE '%x%'); sem equivalente no SQLite.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_venda_cli_nome_trgm "
+        "ON vendas_venda USING gin (cliente_nome_normalizado gin_trgm_ops)"
+    )
+
+
+def remover_indice_trigrama(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS idx_venda_cli_nome_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vendas", "0010_custo_fifo_movimento"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_trigrama, remover_indice_trigrama),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:46
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def juntar_celulas_sem_vendedor(apps, schema_editor):
+    # Faturamentos concorrentes sem vendedor podiam duplicar a celula: soma na primeira e apaga o resto.
+    CuboVendaMensal = apps.get_model("vendas", "CuboVendaMensal")
+    celulas = {}
+    excluir = []
+    for celula in CuboVendaMensal.objects.filter(vendedor__isnull=True).order_by("id"):
+        chave = (celula.mes, celula.produto_id, celula.unidade, celula.tipo_pagamento)
+        principal = celulas.setdefault(chave, celula)
+        if principal is celula:
+            continue
+        principal.quantidade += celula.quantidade
+        principal.receita += celula.receita
+        principal.custo += celula.custo
+        principal.itens += celula.itens
+        principal.alterada = True
+        excluir.append(celula.id)
+    if not excluir:
+        return
+    CuboVendaMensal.objects.filter(id__in=excluir).delete()
+    CuboVendaMensal.objects.bulk_update(
+        [c for c in celulas.values() if getattr(c, "alterada", False)],
+        ["quantidade", "receita", "custo", "itens"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0011_historico_preco_fornecedor'),
+        ('vendas', '0011_venda_cliente_nome_trigrama'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='cubovendamensal',
+            name='uniq_cubo_venda_chave',
+        ),
+        migrations.RunPython(juntar_celulas_sem_vendedor, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cubovendamensal',
+            constraint=models.UniqueConstraint(models.F('mes'), models.F('produto'), models.F('unidade'), django.db.models.functions.comparison.Coalesce('vendedor', models.Value(0)), models.F('tipo_pagamento'), name='uniq_cubo_venda_chave'),
+        ),
+    ]
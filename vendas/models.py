@@ -5,10 +5,13 @@ from decimal import Decimal
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from boletos.models import Boleto, Cliente
 from compras.models import Produto
+from core.services.normalizacao import normalizar_nome
 from estoque.models import EstoqueMovimento, UnidadeLoja
 from financeiro.models import Recebivel
 
@@ -30,6 +33,24 @@ class TipoPagamentoChoices(models.TextChoices):
     CREDITO_LOJA = "PARCELADO", "CREDITO NA LOJA"
 
 
+# Bit fixo por forma de pagamento (nao derivar da ordem das choices: o valor e persistido).
+PAGAMENTO_BITS = {
+    TipoPagamentoChoices.PIX: 1,
+    TipoPagamentoChoices.CREDITO: 2,
+    TipoPagamentoChoices.DEBITO: 4,
+    TipoPagamentoChoices.ESPECIE: 8,
+    TipoPagamentoChoices.BOLETO: 16,
+    TipoPagamentoChoices.CREDITO_LOJA: 32,
+}
+
+
+def mascara_pagamentos(tipos) -> int:
+    mascara = 0
+    for tipo in tipos:
+        mascara |= PAGAMENTO_BITS.get(tipo, 0)
+    return mascara
+
+
 class TipoDocumentoVendaChoices(models.TextChoices):
     VENDA = "VENDA", "Venda"
     ORCAMENTO = "ORCAMENTO", "Orcamento"
@@ -84,6 +105,9 @@ class Venda(models.Model):
         default=TipoPagamentoChoices.ESPECIE,
         db_index=True,
     )
+    # Desnormalizacoes para filtros da listagem sem JOIN/DISTINCT.
+    cliente_nome_normalizado = models.CharField(max_length=255, blank=True, default="", editable=False)
+    tipos_pagamento_mascara = models.PositiveIntegerField(default=0, editable=False)
     numero_parcelas = models.PositiveSmallIntegerField(
         default=1,
         validators=[MinValueValidator(1), MaxValueValidator(36)],
@@ -128,6 +152,10 @@ class Venda(models.Model):
             models.Index(fields=["cliente", "data_venda"], name="idx_venda_cliente_data"),
             models.Index(fields=["tipo_pagamento", "data_venda"], name="idx_venda_pgto_data"),
             models.Index(fields=["tipo_documento", "data_venda"], name="idx_venda_doc_data"),
+            models.Index(fields=["data_venda", "id"], name="idx_venda_data_id"),
+            models.Index(fields=["cliente_nome_normalizado", "data_venda"], name="idx_venda_cli_nome_data"),
+            # Busca por trecho do nome (LIKE '%x%'): indice GIN pg_trgm criado so no PostgreSQL
+            # pela migracao 0011 (fora do estado do model para o SQLite seguir funcionando).
         ]
 
     def clean(self):
@@ -148,7 +176,34 @@ class Venda(models.Model):
         pk = self.pk or 0
         return f"{prefixo}-{pk:06d}"
 
+    def _campos_busca_atualizados(self, update_fields) -> list[str]:
+        campos: list[str] = []
+        if update_fields is None or "cliente" in update_fields:
+            if self.cliente_id:
+                self.cliente_nome_normalizado = self.cliente.nome_normalizado or normalizar_nome(self.cliente.nome)
+                campos.append("cliente_nome_normalizado")
+        if update_fields is None or "tipo_pagamento" in update_fields:
+            tipos = [self.tipo_pagamento]
+            if self.pk:
+                tipos.extend(self.pagamentos.values_list("tipo_pagamento", flat=True))
+            self.tipos_pagamento_mascara = mascara_pagamentos(tipos)
+            campos.append("tipos_pagamento_mascara")
+        return campos
+
+    @classmethod
+    def recalcular_mascara_pagamentos(cls, venda_id: int) -> None:
+        """Para gravacoes de VendaPagamento fora do Venda.save (inline do admin, create/delete direto)."""
+        tipo = cls.objects.filter(pk=venda_id).values_list("tipo_pagamento", flat=True).first()
+        if tipo is None:
+            return
+        tipos = [tipo, *VendaPagamento.objects.filter(venda_id=venda_id).values_list("tipo_pagamento", flat=True)]
+        cls.objects.filter(pk=venda_id).update(tipos_pagamento_mascara=mascara_pagamentos(tipos))
+
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        campos_busca = self._campos_busca_atualizados(update_fields)
+        if update_fields is not None and campos_busca:
+            kwargs["update_fields"] = list(dict.fromkeys([*update_fields, *campos_busca]))
         super().save(*args, **kwargs)
         esperado = self._codigo_esperado()
         if self.codigo_identificacao != esperado:
@@ -188,6 +243,16 @@ class VendaPagamento(models.Model):
     def __str__(self) -> str:
         return f"Venda {self.venda_id} - {self.tipo_pagamento} - {self.valor}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Venda.recalcular_mascara_pagamentos(self.venda_id)
+
+    def delete(self, *args, **kwargs):
+        venda_id = self.venda_id
+        resultado = super().delete(*args, **kwargs)
+        Venda.recalcular_mascara_pagamentos(venda_id)
+        return resultado
+
 
 class ItemVenda(models.Model):
     venda = models.ForeignKey(Venda, on_delete=models.CASCADE, related_name="itens")
@@ -209,6 +274,8 @@ class ItemVenda(models.Model):
         validators=[MinValueValidator(Decimal("0.00"))],
     )
     subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    # Custo unitario FIFO registrado no faturamento (base do cubo de analise e da margem).
+    custo_unitario = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0.0000"))
     criado_em = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -260,6 +327,8 @@ class VendaMovimentoEstoque(models.Model):
     movimento = models.OneToOneField(EstoqueMovimento, on_delete=models.PROTECT, related_name="venda_link")
     tipo = models.CharField(max_length=10, choices=TipoMovimentoVendaChoices.choices, db_index=True)
     quantidade = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal("0.000"))
+    # Custo FIFO efetivamente consumido (saida) ou devolvido (reversao).
+    custo_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
     criado_em = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -341,3 +410,49 @@ class FechamentoCaixaDiario(models.Model):
 
     def __str__(self) -> str:
         return f"Fechamento {self.data_referencia:%d/%m/%Y} #{self.id}"
+
+
+class CuboVendaMensal(models.Model):
+    """
+    Pre-agregado de vendas faturadas por mes x produto x unidade x vendedor x forma de pagamento.
+    Mantido incrementalmente no faturamento/cancelamento (cubo_vendas_service).
+    """
+
+    mes = models.DateField()
+    produto = models.ForeignKey(Produto, on_delete=models.PROTECT, related_name="cubo_vendas")
+    unidade = models.CharField(max_length=20, choices=UnidadeLoja.choices, default=UnidadeLoja.LOJA_1)
+    vendedor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="cubo_vendas",
+    )
+    tipo_pagamento = models.CharField(max_length=25, choices=TipoPagamentoChoices.choices)
+    quantidade = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal("0.000"))
+    receita = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    custo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    itens = models.IntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-mes", "produto_id"]
+        constraints = [
+            # Coalesce: vendedor nulo e uma celula so (NULLs seriam distintos no indice unico).
+            models.UniqueConstraint(
+                "mes",
+                "produto",
+                "unidade",
+                Coalesce("vendedor", Value(0)),
+                "tipo_pagamento",
+                name="uniq_cubo_venda_chave",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["mes", "produto"], name="idx_cubo_mes_produto"),
+            models.Index(fields=["mes", "unidade"], name="idx_cubo_mes_unidade"),
+            models.Index(fields=["mes", "vendedor"], name="idx_cubo_mes_vendedor"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.mes:%m/%Y} {self.produto_id} {self.unidade} {self.receita}"
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncMonth
+
+from vendas.models import CuboVendaMensal, ItemVenda, StatusVendaChoices, Venda
+
+# Dimensao -> campos retornados (id + rotulo quando houver).
+DIMENSOES_CUBO: dict[str, tuple[str, ...]] = {
+    "mes": ("mes",),
+    "produto": ("produto_id", "produto__nome"),
+    "unidade": ("unidade",),
+    "vendedor": ("vendedor_id", "vendedor__username"),
+    "tipo_pagamento": ("tipo_pagamento",),
+}
+
+ORDENACOES_CUBO = ("receita", "quantidade", "custo", "margem", "itens")
+
+
+def _to_dec_2(valor: Decimal) -> Decimal:
+    return (valor or Decimal("0.00")).quantize(Decimal("0.01"))
+
+
+def _chave_item(venda: Venda, item: ItemVenda) -> tuple:
+    return (
+        venda.data_venda.replace(day=1),
+        item.produto_id,
+        venda.unidade_saida,
+        venda.vendedor_id,
+        venda.tipo_pagamento,
+    )
+
+
+@transaction.atomic
+def aplicar_venda_no_cubo(venda: Venda, sinal: int = 1) -> int:
+    """
+    Soma (sinal=1, faturamento) ou subtrai (sinal=-1, cancelamento) os itens da venda no cubo.
+    Retorna quantas celulas do cubo foram tocadas.
+    """
+    acumulado: dict[tuple, list] = {}
+    for item in venda.itens.all():
+        linha = acumulado.setdefault(_chave_item(venda, item), [Decimal("0.000"), Decimal("0.00"), Decimal("0.00"), 0])
+        linha[0] += item.quantidade or Decimal("0.000")
+        linha[1] += item.subtotal or Decimal("0.00")
+        linha[2] += _to_dec_2((item.quantidade or Decimal("0")) * (item.custo_unitario or Decimal("0")))
+        linha[3] += 1
+
+    chaves = [
+        {"mes": mes, "produto_id": produto_id, "unidade": unidade, "vendedor_id": vendedor_id, "tipo_pagamento": tipo}
+        for mes, produto_id, unidade, vendedor_id, tipo in acumulado
+    ]
+    # Upsert: garante as celulas (conflito = ja existe, inclusive criada em paralelo) e soma com F().
+    CuboVendaMensal.objects.bulk_create(
+        [CuboVendaMensal(**chave) for chave in chaves], batch_size=500, ignore_conflicts=True
+    )
+    for chave, (qtd, receita, custo, itens) in zip(chaves, acumulado.values()):
+        CuboVendaMensal.objects.filter(**chave).update(
+            quantidade=F("quantidade") + qtd * sinal,
+            receita=F("receita") + receita * sinal,
+            custo=F("custo") + custo * sinal,
+            itens=F("itens") + itens * sinal,
+        )
+    return len(acumulado)
+
+
+@transaction.atomic
+def reconstruir_cubo_vendas() -> int:
+    """Recria o cubo inteiro a partir dos itens das vendas faturadas/finalizadas."""
+    CuboVendaMensal.objects.all().delete()
+    linhas = (
+        ItemVenda.objects.filter(venda__status__in=[StatusVendaChoices.FATURADA, StatusVendaChoices.FINALIZADA])
+        .annotate(mes=TruncMonth("venda__data_venda"))
+        .values("mes", "produto_id", "venda__unidade_saida", "venda__vendedor_id", "venda__tipo_pagamento")
+        .annotate(
+            qtd=Sum("quantidade"),
+            total=Sum("subtotal"),
+            custo_total=Sum(
+                ExpressionWrapper(
+                    F("quantidade") * F("custo_unitario"),
+                    output_field=DecimalField(max_digits=20, decimal_places=4),
+                )
+            ),
+            n_itens=Count("id"),
+        )
+        .order_by()
+    )
+    registros = [
+        CuboVendaMensal(
+            mes=row["mes"],
+            produto_id=row["produto_id"],
+            unidade=row["venda__unidade_saida"],
+            vendedor_id=row["venda__vendedor_id"],
+            tipo_pagamento=row["venda__tipo_pagamento"],
+            quantidade=row["qtd"] or Decimal("0.000"),
+            receita=_to_dec_2(row["total"]),
+            custo=_to_dec_2(row["custo_total"]),
+            itens=row["n_itens"],
+        )
+        for row in linhas.iterator()
+    ]
+    CuboVendaMensal.objects.bulk_create(registros, batch_size=1000)
+    return len(registros)
+
+
+def consultar_cubo(
+    *,
+    inicio: date,
+    fim: date,
+    dimensoes: Iterable[str] = (),
+    produto_ids: Iterable[int] | None = None,
+    unidades: Iterable[str] | None = None,
+    vendedor_ids: Iterable[int] | None = None,
+    tipos_pagamento: Iterable[str] | None = None,
+    ordenar_por: str = "-receita",
+    limite: int | None = None,
+) -> list[dict]:
+    """
+    Fatia o cubo por qualquer subconjunto de dimensoes (mes, produto, unidade, vendedor,
+    tipo_pagamento) no intervalo de meses [inicio, fim]. Sem dimensoes retorna o total do periodo.
+    """
+    dimensoes = list(dict.fromkeys(dimensoes))
+    invalidas = [d for d in dimensoes if d not in DIMENSOES_CUBO]
+    if invalidas:
+        raise ValueError(f"Dimensoes invalidas: {', '.join(invalidas)}.")
+    if ordenar_por.lstrip("-") not in ORDENACOES_CUBO:
+        raise ValueError(f"Ordenacao invalida: {ordenar_por}.")
+
+    qs = CuboVendaMensal.objects.filter(mes__range=(inicio.replace(day=1), fim.replace(day=1)))
+    if produto_ids is not None:
+        qs = qs.filter(produto_id__in=list(produto_ids))
+    if unidades is not None:
+        qs = qs.filter(unidade__in=list(unidades))
+    if vendedor_ids is not None:
+        qs = qs.filter(vendedor_id__in=list(vendedor_ids))
+    if tipos_pagamento is not None:
+        qs = qs.filter(tipo_pagamento__in=list(tipos_pagamento))
+
+    # Apelidos distintos dos campos: annotate() nao aceita reusar o nome do campo somado.
+    medidas = {
+        "soma_quantidade": Sum("quantidade"),
+        "soma_receita": Sum("receita"),
+        "soma_custo": Sum("custo"),
+        "soma_itens": Sum("itens"),
+    }
+    campos = [campo for d in dimensoes for campo in DIMENSOES_CUBO[d]]
+    if campos:
+        ordem = ordenar_por.replace(ordenar_por.lstrip("-"), f"soma_{ordenar_por.lstrip('-')}")
+        qs = qs.values(*campos).annotate(**medidas, soma_margem=Sum("receita") - Sum("custo"))
+        brutas = list(qs.order_by(ordem, *campos)[:limite])
+    else:
+        brutas = [qs.aggregate(**medidas)]
+
+    linhas: list[dict] = []
+    for bruta in brutas:
+        linha = {campo: bruta[campo] for campo in campos}
+        linha["quantidade"] = bruta["soma_quantidade"] or Decimal("0.000")
+        linha["receita"] = _to_dec_2(bruta["soma_receita"])
+        linha["custo"] = _to_dec_2(bruta["soma_custo"])
+        linha["margem"] = linha["receita"] - linha["custo"]
+        linha["itens"] = bruta["soma_itens"] or 0
+        linha["margem_percentual"] = (
+            (linha["margem"] / linha["receita"] * 100).quantize(Decimal("0.01")) if linha["receita"] else Decimal("0.00")
+        )
+        linhas.append(linha)
+    return linhas
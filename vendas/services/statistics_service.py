@@ -7,7 +7,7 @@ from django.db.models import Count, DateTimeField, DecimalField, F, Sum, Value
 from django.db.models.functions import Coalesce, ExtractHour
 from django.utils import timezone
 
-from vendas.models import StatusVendaChoices, Venda
+from vendas.models import StatusVendaChoices, TipoMovimentoVendaChoices, Venda, VendaMovimentoEstoque
 
 
 class VendasStatisticsService:
@@ -100,3 +100,44 @@ class VendasStatisticsService:
             "vendas_por_hora": vendas_por_hora,
             "pico_horario": pico_horario,
         }
+
+    @staticmethod
+    def relatorio_margem(inicio, fim) -> dict:
+        """
+        Margem por produto no periodo em uma unica agregacao:
+        receita dos itens faturados x custo FIFO gravado nas saidas de estoque da venda.
+        """
+        linhas = list(
+            VendaMovimentoEstoque.objects.filter(
+                tipo=TipoMovimentoVendaChoices.SAIDA,
+                venda__data_venda__range=(inicio, fim),
+                venda__status__in=[StatusVendaChoices.FATURADA, StatusVendaChoices.FINALIZADA],
+            )
+            .values("item_venda__produto_id", "item_venda__produto__nome")
+            .annotate(
+                quantidade=Coalesce(Sum("quantidade"), Value(Decimal("0.000"))),
+                receita=Coalesce(Sum("item_venda__subtotal"), Value(Decimal("0.00"))),
+                custo=Coalesce(Sum("custo_total"), Value(Decimal("0.00"))),
+            )
+            .annotate(margem=F("receita") - F("custo"))
+            .order_by("-margem", "item_venda__produto__nome")
+        )
+        receita_total = sum((row["receita"] for row in linhas), Decimal("0.00"))
+        custo_total = sum((row["custo"] for row in linhas), Decimal("0.00"))
+        for row in linhas:
+            row["margem_percentual"] = (
+                (row["margem"] / row["receita"] * 100).quantize(Decimal("0.01")) if row["receita"] else Decimal("0.00")
+            )
+        return {
+            "data_inicio": inicio,
+            "data_fim": fim,
+            "linhas": linhas,
+            "receita_total": receita_total,
+            "custo_total": custo_total,
+            "margem_total": receita_total - custo_total,
+            "margem_percentual": (
+                ((receita_total - custo_total) / receita_total * 100).quantize(Decimal("0.01"))
+                if receita_total
+                else Decimal("0.00")
+            ),
+        }
@@ -11,6 +11,8 @@ from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from boletos.models import Boleto, StatusBoletoChoices
+from boletos.services.estatisticas_service import invalidar_estatisticas_boletos
+from boletos.services.exposicao_service import ExposicaoCreditoService
 from compras.models import Produto
 from estoque.models import ProdutoEstoque, ProdutoEstoqueUnidade, UnidadeLoja
 from estoque.services.estoque_service import registrar_entrada, registrar_saida
@@ -30,6 +32,7 @@ from vendas.models import (
     VendaPagamento,
     VendaRecebivel,
 )
+from vendas.services.cubo_vendas_service import aplicar_venda_no_cubo
 from vendas.services.totais_service import recalcular_totais
 
 
@@ -224,6 +227,21 @@ def faturar_venda(venda: Venda, usuario=None) -> FaturamentoResult:
                 f"Saldo insuficiente em {venda.get_unidade_saida_display()} para produto {item.produto.nome}."
             )
 
+    total_a_prazo = _total_pagamentos_tipo(venda, (TipoPagamentoChoices.CREDITO_LOJA, TipoPagamentoChoices.BOLETO))
+    total_boleto = _total_pagamentos_tipo(venda, (TipoPagamentoChoices.BOLETO,))
+    if total_a_prazo <= 0 and venda.tipo_pagamento in (TipoPagamentoChoices.CREDITO_LOJA, TipoPagamentoChoices.BOLETO):
+        total_a_prazo = _to_dec_2(venda.total_final)
+        if venda.tipo_pagamento == TipoPagamentoChoices.BOLETO:
+            total_boleto = _to_dec_2(venda.total_final)
+
+    if total_a_prazo > 0:
+        ExposicaoCreditoService.validar_credito(venda.cliente, total_a_prazo)
+
+    # Custo medio como referencia; substituido pelo custo FIFO de cada saida abaixo.
+    for item in itens:
+        cfg = cfg_map.get(item.produto_id)
+        item.custo_unitario = cfg.custo_medio if cfg else Decimal("0.0000")
+
     movimentos_criados = 0
     recebiveis_criados = 0
     boletos_criados = 0
@@ -257,15 +275,12 @@ def faturar_venda(venda: Venda, usuario=None) -> FaturamentoResult:
             movimento=mov_result.movimento,
             tipo=TipoMovimentoVendaChoices.SAIDA,
             quantidade=_to_dec_3(item.quantidade),
+            custo_total=mov_result.custo_total,
         )
+        if item.quantidade:
+            item.custo_unitario = (mov_result.custo_total / item.quantidade).quantize(Decimal("0.0001"))
         movimentos_criados += 1
-
-    total_a_prazo = _total_pagamentos_tipo(venda, (TipoPagamentoChoices.CREDITO_LOJA, TipoPagamentoChoices.BOLETO))
-    total_boleto = _total_pagamentos_tipo(venda, (TipoPagamentoChoices.BOLETO,))
-    if total_a_prazo <= 0 and venda.tipo_pagamento in (TipoPagamentoChoices.CREDITO_LOJA, TipoPagamentoChoices.BOLETO):
-        total_a_prazo = _to_dec_2(venda.total_final)
-        if venda.tipo_pagamento == TipoPagamentoChoices.BOLETO:
-            total_boleto = _to_dec_2(venda.total_final)
+    ItemVenda.objects.bulk_update(itens, ["custo_unitario"])
 
     eh_prazo = total_a_prazo > 0
     if eh_prazo:
@@ -318,6 +333,7 @@ def faturar_venda(venda: Venda, usuario=None) -> FaturamentoResult:
                 )
                 if created:
                     boletos_criados += 1
+                    transaction.on_commit(invalidar_estatisticas_boletos)
                 VendaBoleto.objects.get_or_create(
                     venda=venda,
                     numero_parcela=numero_parcela,
@@ -332,6 +348,9 @@ def faturar_venda(venda: Venda, usuario=None) -> FaturamentoResult:
     venda.save(update_fields=["status", "faturada_em", "faturada_por", "atualizado_em"])
 
     registrar_evento(venda, TipoEventoVendaChoices.FATURAMENTO, usuario, "Venda faturada")
+    aplicar_venda_no_cubo(venda, sinal=1)
+    if eh_prazo:
+        ExposicaoCreditoService.recalcular(venda.cliente_id)
 
     return FaturamentoResult(
         venda=venda,
@@ -377,7 +396,8 @@ def cancelar_venda(venda: Venda, usuario=None, motivo: str = "") -> Cancelamento
     recebiveis_cancelados = 0
     boletos_cancelados = 0
 
-    if venda.status in (StatusVendaChoices.FATURADA, StatusVendaChoices.FINALIZADA):
+    estava_faturada = venda.status in (StatusVendaChoices.FATURADA, StatusVendaChoices.FINALIZADA)
+    if estava_faturada:
         saidas = (
             VendaMovimentoEstoque.objects.select_related("item_venda__produto")
             .filter(venda=venda, tipo=TipoMovimentoVendaChoices.SAIDA)
@@ -390,9 +410,14 @@ def cancelar_venda(venda: Venda, usuario=None, motivo: str = "") -> Cancelamento
                 tipo=TipoMovimentoVendaChoices.REVERSAO,
             ).exists():
                 continue
+            # Devolve ao estoque pelo custo FIFO da saida (saidas antigas sem custo usam o custo medio).
+            custo_unitario = None
+            if registro.custo_total > 0 and registro.quantidade:
+                custo_unitario = (registro.custo_total / registro.quantidade).quantize(Decimal("0.0001"))
             mov_result = registrar_entrada(
                 produto=registro.item_venda.produto,
                 quantidade=_to_dec_3(registro.quantidade),
+                preco_unitario=custo_unitario,
                 data_movimento=timezone.localdate(),
                 observacao=(
                     f"Reversao por cancelamento da venda #{venda.id} "
@@ -412,6 +437,7 @@ def cancelar_venda(venda: Venda, usuario=None, motivo: str = "") -> Cancelamento
                 movimento=mov_result.movimento,
                 tipo=TipoMovimentoVendaChoices.REVERSAO,
                 quantidade=_to_dec_3(registro.quantidade),
+                custo_total=mov_result.custo_total,
             )
             reversoes_estoque += 1
 
@@ -426,11 +452,16 @@ def cancelar_venda(venda: Venda, usuario=None, motivo: str = "") -> Cancelamento
             vinculo.boleto.status = StatusBoletoChoices.CANCELADO
             vinculo.boleto.save(update_fields=["status", "atualizado_em"])
             boletos_cancelados += 1
+            transaction.on_commit(invalidar_estatisticas_boletos)
 
     venda.status = StatusVendaChoices.CANCELADA
     venda.cancelada_em = timezone.now()
     venda.cancelada_por = usuario if getattr(usuario, "is_authenticated", False) else None
     venda.save(update_fields=["status", "cancelada_em", "cancelada_por", "atualizado_em"])
+    if recebiveis_cancelados or boletos_cancelados:
+        ExposicaoCreditoService.recalcular(venda.cliente_id)
+    if estava_faturada:
+        aplicar_venda_no_cubo(venda, sinal=-1)
 
     registrar_evento(
         venda,
@@ -5,17 +5,20 @@ from decimal import Decimal
 
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
-from boletos.models import Cliente
+from boletos.models import Cliente, ExposicaoCreditoCliente
+from boletos.services.boletos_service import ControleFiadoService
 from compras.models import Compra, Fornecedor, ItemCompra, Produto
-from estoque.models import EstoqueMovimento, ProdutoEstoque, ProdutoEstoqueUnidade, UnidadeLoja
+from estoque.models import EstoqueMovimento, Lote, ProdutoEstoque, ProdutoEstoqueUnidade, UnidadeLoja
 from estoque.services.estoque_service import registrar_entrada
 from estoque.services.integracao_compras import dar_entrada_por_compra
 from financeiro.models import Recebivel, StatusRecebivelChoices
 from vendas.models import (
+    CuboVendaMensal,
     FechamentoCaixaDiario,
     StatusVendaChoices,
     TipoDocumentoVendaChoices,
@@ -23,9 +26,12 @@ from vendas.models import (
     Venda,
     VendaEvento,
     VendaMovimentoEstoque,
+    VendaPagamento,
     VendaRecebivel,
 )
+from vendas.services.cubo_vendas_service import aplicar_venda_no_cubo, consultar_cubo, reconstruir_cubo_vendas
 from vendas.services.fechamento_caixa_service import gerar_fechamento_caixa
+from vendas.services.statistics_service import VendasStatisticsService
 from vendas.services.vendas_service import (
     ItemVendaPayload,
     cancelar_venda,
@@ -124,6 +130,117 @@ class VendasServiceTest(TestCase):
         )
         self.assertEqual(total, venda.total_final)
 
+    def test_faturamento_a_prazo_atualiza_exposicao_credito(self):
+        venda = self._criar_venda_base(tipo_pagamento=TipoPagamentoChoices.CREDITO_LOJA, parcelas=2)
+        venda.status = StatusVendaChoices.CONFIRMADA
+        venda.save(update_fields=["status"])
+
+        faturar_venda(venda, self.user)
+        exposicao = ExposicaoCreditoCliente.objects.get(cliente=self.cliente)
+        self.assertEqual(exposicao.valor_recebiveis_aberto, venda.total_final)
+        self.assertEqual(exposicao.valor_exposicao_total, venda.total_final)
+
+        cancelar_venda(venda, self.user, "teste")
+        exposicao.refresh_from_db()
+        self.assertEqual(exposicao.valor_exposicao_total, Decimal("0.00"))
+
+    def test_faturamento_a_prazo_respeita_limite_de_credito(self):
+        ControleFiadoService.estabelecer_limite(self.cliente, Decimal("100.00"))
+        venda = self._criar_venda_base(tipo_pagamento=TipoPagamentoChoices.CREDITO_LOJA)
+        venda.status = StatusVendaChoices.CONFIRMADA
+        venda.save(update_fields=["status"])
+
+        with self.assertRaisesMessage(ValueError, "Limite de crédito excedido"):
+            faturar_venda(venda, self.user)
+        venda.refresh_from_db()
+        self.assertEqual(venda.status, StatusVendaChoices.CONFIRMADA)
+        self.assertFalse(VendaRecebivel.objects.filter(venda=venda).exists())
+
+    def test_cubo_vendas_acompanha_faturamento_e_cancelamento(self):
+        Lote.objects.filter(produto=self.produto).update(custo_unitario=Decimal("60.0000"))
+        vendas = []
+        for _ in range(2):
+            venda = self._criar_venda_base()
+            venda.status = StatusVendaChoices.CONFIRMADA
+            venda.save(update_fields=["status"])
+            faturar_venda(venda, self.user)
+            vendas.append(venda)
+
+        hoje = timezone.localdate()
+        linhas = consultar_cubo(inicio=hoje, fim=hoje, dimensoes=["produto", "vendedor"])
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual(linhas[0]["produto_id"], self.produto.id)
+        self.assertEqual(linhas[0]["quantidade"], Decimal("4.000"))
+        self.assertEqual(linhas[0]["receita"], Decimal("380.00"))
+        self.assertEqual(linhas[0]["custo"], Decimal("240.00"))
+        self.assertEqual(linhas[0]["margem"], Decimal("140.00"))
+
+        cancelar_venda(vendas[0], self.user, "teste")
+        total = consultar_cubo(inicio=hoje, fim=hoje)[0]
+        self.assertEqual(total["receita"], Decimal("190.00"))
+        self.assertEqual(total["itens"], 1)
+
+        self.assertEqual(reconstruir_cubo_vendas(), 1)
+        self.assertEqual(consultar_cubo(inicio=hoje, fim=hoje)[0]["custo"], Decimal("120.00"))
+
+        with self.assertRaises(ValueError):
+            consultar_cubo(inicio=hoje, fim=hoje, dimensoes=["cliente"])
+
+    def test_cubo_venda_sem_vendedor_usa_uma_celula(self):
+        venda = self._criar_venda_base()
+        Venda.objects.filter(pk=venda.pk).update(vendedor=None)
+        venda.refresh_from_db()
+        aplicar_venda_no_cubo(venda)
+        aplicar_venda_no_cubo(venda)
+
+        celulas = CuboVendaMensal.objects.filter(vendedor__isnull=True)
+        self.assertEqual(celulas.count(), 1)
+        self.assertEqual(celulas.get().quantidade, Decimal("4.000"))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CuboVendaMensal.objects.create(
+                mes=celulas.get().mes,
+                produto=self.produto,
+                unidade=venda.unidade_saida,
+                vendedor=None,
+                tipo_pagamento=venda.tipo_pagamento,
+            )
+
+    def test_relatorio_margem_usa_custo_fifo_da_saida(self):
+        produto = Produto.objects.create(nome="Produto Margem", sku="MRG-1", ativo=True)
+        registrar_entrada(produto=produto, quantidade=Decimal("1.000"), preco_unitario=Decimal("30.00"))
+        registrar_entrada(produto=produto, quantidade=Decimal("5.000"), preco_unitario=Decimal("50.00"))
+        venda = criar_venda_com_itens(
+            cliente=self.cliente,
+            vendedor=self.user,
+            data_venda=timezone.localdate(),
+            tipo_pagamento=TipoPagamentoChoices.PIX,
+            numero_parcelas=1,
+            intervalo_parcelas_dias=30,
+            acrescimo=Decimal("0.00"),
+            observacoes="",
+            itens=[ItemVendaPayload(produto=produto, quantidade=Decimal("2.000"), preco_unitario=Decimal("100.00"))],
+        )
+        venda.status = StatusVendaChoices.CONFIRMADA
+        venda.save(update_fields=["status"])
+        faturar_venda(venda, self.user)
+
+        saida = VendaMovimentoEstoque.objects.get(venda=venda, tipo="SAIDA")
+        self.assertEqual(saida.custo_total, Decimal("80.00"))
+        self.assertEqual(venda.itens.get().custo_unitario, Decimal("40.0000"))
+
+        hoje = timezone.localdate()
+        relatorio = VendasStatisticsService.relatorio_margem(hoje, hoje)
+        self.assertEqual(len(relatorio["linhas"]), 1)
+        self.assertEqual(relatorio["linhas"][0]["receita"], Decimal("200.00"))
+        self.assertEqual(relatorio["linhas"][0]["custo"], Decimal("80.00"))
+        self.assertEqual(relatorio["margem_total"], Decimal("120.00"))
+        self.assertEqual(relatorio["margem_percentual"], Decimal("60.00"))
+
+        cancelar_venda(venda, self.user, "teste")
+        self.assertEqual(VendasStatisticsService.relatorio_margem(hoje, hoje)["linhas"], [])
+        reversao = VendaMovimentoEstoque.objects.get(venda=venda, tipo="REVERSAO")
+        self.assertEqual(reversao.custo_total, Decimal("80.00"))
+
     def test_cancelamento_reverte_estoque_e_recebiveis(self):
         venda = self._criar_venda_base(tipo_pagamento=TipoPagamentoChoices.CREDITO_LOJA, parcelas=2)
         venda.status = StatusVendaChoices.CONFIRMADA
@@ -402,6 +519,43 @@ class VendasViewUXTest(TestCase):
         self.assertContains(resp, "vend</td>")
         self.assertNotContains(resp, "outro_vendedor</td>")
 
+    def test_historico_busca_cliente_sem_acento(self):
+        cliente_acento = Cliente.objects.create(nome="João Conceição", cpf_cnpj="12312312312")
+        Venda.objects.create(cliente=cliente_acento, vendedor=self.vendedor)
+        Venda.objects.create(cliente=self.cliente, vendedor=self.vendedor)
+        self.client.force_login(self.gerente)
+        resp = self.client.get(reverse("vendas:venda_historico"), {"cliente": "joao conceicao"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([v.cliente_id for v in resp.context["vendas"]], [cliente_acento.pk])
+        # Trecho do meio do nome (sobrenome) tambem encontra.
+        resp = self.client.get(reverse("vendas:venda_historico"), {"cliente": "conceicao"})
+        self.assertEqual([v.cliente_id for v in resp.context["vendas"]], [cliente_acento.pk])
+
+    def test_historico_paginacao_por_chave(self):
+        hoje = timezone.localdate()
+        vendas = [
+            Venda.objects.create(cliente=self.cliente, vendedor=self.vendedor, data_venda=hoje - timedelta(days=i % 3))
+            for i in range(25)
+        ]
+        esperado = sorted(vendas, key=lambda v: (v.data_venda, v.pk), reverse=True)
+        self.client.force_login(self.gerente)
+
+        resp = self.client.get(reverse("vendas:venda_historico"))
+        pagina = resp.context["pagina"]
+        self.assertEqual([v.pk for v in pagina.object_list], [v.pk for v in esperado[:20]])
+        self.assertTrue(pagina.has_next)
+        self.assertFalse(pagina.has_previous)
+        self.assertEqual(resp.context["resumo_filtrado"]["total_vendas"], 25)
+
+        resp = self.client.get(reverse("vendas:venda_historico"), {"apos": pagina.next_cursor})
+        pagina = resp.context["pagina"]
+        self.assertEqual([v.pk for v in pagina.object_list], [v.pk for v in esperado[20:]])
+        self.assertFalse(pagina.has_next)
+        self.assertTrue(pagina.has_previous)
+
+        resp = self.client.get(reverse("vendas:venda_historico"), {"antes": pagina.previous_cursor})
+        self.assertEqual([v.pk for v in resp.context["pagina"].object_list], [v.pk for v in esperado[:20]])
+
     def test_alteracao_registra_log_no_historico(self):
         venda = criar_venda_com_itens(
             cliente=self.cliente,
@@ -559,3 +713,44 @@ class FechamentoCaixaTest(TestCase):
         resp = self.client.get(reverse("vendas:venda_historico"), {"tipo_pagamento": TipoPagamentoChoices.CREDITO})
         self.assertEqual(resp.status_code, 200)
         self.assertContains(resp, "Crédito")
+
+    def test_cubo_json_por_unidade_e_mes(self):
+        self.client.force_login(self.gerente)
+        resp = self.client.get(reverse("vendas:cubo"), {"dimensoes": "unidade,mes"})
+        self.assertEqual(resp.status_code, 200)
+        linha = resp.json()["linhas"][0]
+        self.assertEqual(linha["unidade"], "LOJA_1")
+        self.assertEqual(linha["mes"], timezone.localdate().strftime("%Y-%m"))
+        self.assertEqual(linha["receita"], "90.00")
+
+        resp = self.client.get(reverse("vendas:cubo"), {"dimensoes": "cliente"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_tela_margem_por_produto(self):
+        self.client.force_login(self.gerente)
+        resp = self.client.get(reverse("vendas:margem"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Produto Fechamento")
+
+    def test_historico_filtra_por_pagamento_secundario(self):
+        venda = Venda.objects.create(cliente=self.cliente, tipo_pagamento=TipoPagamentoChoices.PIX)
+        VendaPagamento.objects.create(venda=venda, tipo_pagamento=TipoPagamentoChoices.DEBITO, valor=Decimal("10.00"))
+        venda.save(update_fields=["tipo_pagamento"])
+
+        self.client.force_login(self.gerente)
+        resp = self.client.get(reverse("vendas:venda_historico"), {"tipo_pagamento": TipoPagamentoChoices.DEBITO})
+        self.assertEqual([v.pk for v in resp.context["vendas"]], [venda.pk])
+
+    def test_mascara_acompanha_pagamento_gravado_fora_da_venda(self):
+        venda = Venda.objects.create(cliente=self.cliente, tipo_pagamento=TipoPagamentoChoices.PIX)
+        pagamento = VendaPagamento.objects.create(
+            venda=venda, tipo_pagamento=TipoPagamentoChoices.DEBITO, valor=Decimal("10.00")
+        )
+        self.client.force_login(self.gerente)
+        url = reverse("vendas:venda_historico")
+        resp = self.client.get(url, {"tipo_pagamento": TipoPagamentoChoices.DEBITO})
+        self.assertEqual([v.pk for v in resp.context["vendas"]], [venda.pk])
+
+        pagamento.delete()
+        resp = self.client.get(url, {"tipo_pagamento": TipoPagamentoChoices.DEBITO})
+        self.assertEqual(list(resp.context["vendas"]), [])
@@ -18,7 +18,9 @@ from vendas.views import (
     VendaPDFView,
     VendaListView,
     VendaUpdateView,
+    VendasCuboView,
     VendasDashboardView,
+    VendasMargemView,
 )
 
 app_name = "vendas"
@@ -27,6 +29,8 @@ urlpatterns = [
     path("", VendaListView.as_view(), name="venda_list"),
     path("historico/", VendaListView.as_view(), name="venda_historico"),
     path("dashboard/", VendasDashboardView.as_view(), name="dashboard"),
+    path("analise/cubo/", VendasCuboView.as_view(), name="cubo"),
+    path("analise/margem/", VendasMargemView.as_view(), name="margem"),
     path("fechamentos/", FechamentoCaixaListView.as_view(), name="fechamento_caixa_list"),
     path("fechamentos/gerar/", FechamentoCaixaGerarView.as_view(), name="fechamento_caixa_gerar"),
     path("fechamentos/<int:pk>/pdf/", FechamentoCaixaPDFView.as_view(), name="fechamento_caixa_pdf"),
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import io
-from datetime import timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib import messages
-from django.db.models import Count, DecimalField, Prefetch, Q, Sum, Value
+from django.db.models import Count, DecimalField, F, Prefetch, Sum, Value
 from django.db.models.functions import Coalesce
 from django.http import FileResponse, HttpResponse, JsonResponse
 from django.shortcuts import redirect
@@ -16,13 +16,16 @@ from django.utils import timezone
 from django.views import View
 from django.views.generic import CreateView, DetailView, ListView, TemplateView, UpdateView
 
+from boletos.services.exposicao_service import ExposicaoCreditoService
 from compras.models import ItemCompra, Produto
-from core.services.paginacao import get_pagination_params
-from core.services.permissoes import GroupRequiredMixin
+from core.services.normalizacao import normalizar_nome
+from core.services.paginacao import get_pagination_params, paginar_por_chave
+from core.services.permissoes import GroupRequiredMixin, usuario_em_grupos
 from core.services.formato_brl import format_brl, payment_label, unit_label
 from estoque.models import ProdutoEstoque, ProdutoEstoqueUnidade
 from vendas.forms import CancelarVendaForm, ClienteRapidoForm, FechamentoCaixaForm, ItemVendaFormSet, VendaForm
 from vendas.models import (
+    PAGAMENTO_BITS,
     FechamentoCaixaDiario,
     ItemVenda,
     StatusVendaChoices,
@@ -31,6 +34,7 @@ from vendas.models import (
     Venda,
     VendaPagamento,
 )
+from vendas.services.cubo_vendas_service import DIMENSOES_CUBO, consultar_cubo
 from vendas.services.statistics_service import VendasStatisticsService
 from vendas.services.fechamento_caixa_service import gerar_fechamento_caixa
 from vendas.services.vendas_service import (
@@ -49,7 +53,7 @@ class VendasAccessMixin(GroupRequiredMixin):
 
     def _is_manager(self) -> bool:
         user = self.request.user
-        return bool(user.is_superuser or user.groups.filter(name="admin/gestor").exists())
+        return bool(user.is_superuser or usuario_em_grupos(user, ("admin/gestor",)))
 
 
 def _escape_pdf_text(value: str) -> str:
@@ -220,7 +224,23 @@ def _persistir_pagamentos(venda: Venda, pagamentos: list[dict]) -> None:
         )
         principal = max(normalizados, key=lambda x: x["valor"])
         venda.tipo_pagamento = principal["tipo_pagamento"]
-        venda.save(update_fields=["tipo_pagamento", "atualizado_em"])
+    # Sempre salva tipo_pagamento para recalcular a mascara de formas de pagamento.
+    venda.save(update_fields=["tipo_pagamento", "atualizado_em"])
+
+
+def _validar_credito_cliente(request, cliente, pagamentos: list[dict]) -> bool:
+    valor_prazo = sum(
+        (p["valor"] for p in pagamentos if p["tipo_pagamento"] in (TipoPagamentoChoices.CREDITO_LOJA, TipoPagamentoChoices.BOLETO)),
+        Decimal("0.00"),
+    )
+    if cliente is None or valor_prazo <= 0:
+        return True
+    try:
+        ExposicaoCreditoService.validar_credito(cliente, valor_prazo)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return False
+    return True
 
 
 def _build_produtos_info_map() -> dict[str, dict]:
@@ -381,18 +401,11 @@ class VendaListView(VendasAccessMixin, ListView):
     template_name = "vendas/venda_list.html"
     context_object_name = "vendas"
 
-    def get_paginate_by(self, queryset):
-        return get_pagination_params(self.request).page_size
-
     def get_queryset(self):
-        qs = (
-            Venda.objects.select_related("cliente", "vendedor")
-            .prefetch_related("itens", "pagamentos")
-            .order_by("-data_venda", "-id")
-        )
+        qs = Venda.objects.all()
         status = (self.request.GET.get("status") or "").strip()
         tipo_documento = (self.request.GET.get("tipo_documento") or "").strip()
-        cliente = (self.request.GET.get("cliente") or "").strip()
+        cliente = normalizar_nome(self.request.GET.get("cliente") or "")
         vendedor = (self.request.GET.get("vendedor") or "").strip()
         tipo_pagamento = (self.request.GET.get("tipo_pagamento") or "").strip()
         data_inicio = (self.request.GET.get("data_inicio") or "").strip()
@@ -403,11 +416,14 @@ class VendaListView(VendasAccessMixin, ListView):
         if tipo_documento:
             qs = qs.filter(tipo_documento=tipo_documento)
         if cliente:
-            qs = qs.filter(cliente__nome__icontains=cliente)
+            qs = qs.filter(cliente_nome_normalizado__contains=cliente)
         if vendedor:
             qs = qs.filter(vendedor__username__istartswith=vendedor)
         if tipo_pagamento:
-            qs = qs.filter(Q(tipo_pagamento=tipo_pagamento) | Q(pagamentos__tipo_pagamento=tipo_pagamento)).distinct()
+            bit = PAGAMENTO_BITS.get(tipo_pagamento)
+            if not bit:
+                return qs.none()
+            qs = qs.alias(pgto_bit=F("tipos_pagamento_mascara").bitand(bit)).filter(pgto_bit__gt=0)
         if data_inicio:
             qs = qs.filter(data_venda__gte=data_inicio)
         if data_fim:
@@ -418,7 +434,14 @@ class VendaListView(VendasAccessMixin, ListView):
         ctx = super().get_context_data(**kwargs)
         periodo = self.request.GET.get("periodo", "30")
         periodo_dias = int(periodo) if periodo.isdigit() else 30
-        base_filtrada = self.get_queryset()
+        base_filtrada = self.object_list
+        pagina = paginar_por_chave(
+            base_filtrada.select_related("cliente", "vendedor").prefetch_related("itens__produto", "pagamentos"),
+            self.request,
+            campo_data="data_venda",
+            page_size=get_pagination_params(self.request).page_size,
+        )
+        # Contagem e totais do filtro numa unica consulta (sem COUNT(*) extra de paginador).
         resumo_filtrado = base_filtrada.aggregate(
             total_vendas=Count("id"),
             total_final=Coalesce(
@@ -431,7 +454,11 @@ class VendaListView(VendasAccessMixin, ListView):
             ),
         )
         querydict = self.request.GET.copy()
-        querydict.pop("page", None)
+        for key in ("page", "apos", "antes"):
+            querydict.pop(key, None)
+        ctx["vendas"] = ctx["object_list"] = pagina.object_list
+        ctx["pagina"] = pagina
+        ctx["is_paginated"] = pagina.has_next or pagina.has_previous
         ctx["status_choices"] = StatusVendaChoices.choices
         ctx["tipo_documento_choices"] = TipoDocumentoVendaChoices.choices
         ctx["tipo_pagamento_choices"] = [(value, payment_label(value)) for value, _ in TipoPagamentoChoices.choices]
@@ -520,6 +547,8 @@ class VendaCreateView(VendasAccessMixin, CreateView):
                 f"A soma das formas de pagamento ({format_brl(total_pagamentos_previstos)}) deve ser igual ao total da venda ({format_brl(total_previsto)}).",
             )
             return self.form_invalid(form)
+        if not _validar_credito_cliente(self.request, form.cleaned_data.get("cliente"), pagamentos_previstos):
+            return self.form_invalid(form)
 
         self.object = form.save(commit=False)
         if not self._is_manager():
@@ -550,7 +579,7 @@ class VendaCreateView(VendasAccessMixin, CreateView):
     def _usuario_pode_autorizar_desconto(self, user) -> bool:
         if not user or not user.is_authenticated:
             return False
-        if user.is_superuser or user.groups.filter(name="admin/gestor").exists():
+        if user.is_superuser or usuario_em_grupos(user, ("admin/gestor",)):
             return True
         return user.username.lower() in {"lucas", "tabatha"}
 
@@ -671,6 +700,8 @@ class VendaUpdateView(VendasAccessMixin, UpdateView):
                 f"A soma das formas de pagamento ({format_brl(total_pagamentos_previstos)}) deve ser igual ao total da venda ({format_brl(total_previsto)}).",
             )
             return self.form_invalid(form)
+        if not _validar_credito_cliente(self.request, form.cleaned_data.get("cliente"), pagamentos_previstos):
+            return self.form_invalid(form)
 
         before = self.get_object()
         change_log = self._build_change_log(before, form, formset)
@@ -757,7 +788,7 @@ class VendaUpdateView(VendasAccessMixin, UpdateView):
     def _usuario_pode_autorizar_desconto(self, user) -> bool:
         if not user or not user.is_authenticated:
             return False
-        if user.is_superuser or user.groups.filter(name="admin/gestor").exists():
+        if user.is_superuser or usuario_em_grupos(user, ("admin/gestor",)):
             return True
         return user.username.lower() in {"lucas", "tabatha"}
 
@@ -1202,6 +1233,82 @@ class VendasDashboardView(VendasAccessMixin, TemplateView):
         return ctx
 
 
+class VendasCuboView(GroupRequiredMixin, View):
+    """
+    Fatias do cubo de vendas em JSON.
+    Querystring:
+      ?inicio=2026-01&fim=2026-12&dimensoes=produto,mes&unidade=LOJA_1&ordenar=-margem&limite=20
+    """
+
+    required_groups = ("admin/gestor",)
+
+    @staticmethod
+    def _parse_mes(valor: str, padrao):
+        try:
+            return datetime.strptime(valor, "%Y-%m").date() if valor else padrao
+        except ValueError:
+            return padrao
+
+    @staticmethod
+    def _lista(request, nome: str):
+        valores = [v for v in request.GET.getlist(nome) if v]
+        return valores or None
+
+    def get(self, request, *args, **kwargs):
+        hoje = timezone.localdate()
+        inicio = self._parse_mes(request.GET.get("inicio", ""), hoje.replace(month=1, day=1))
+        fim = self._parse_mes(request.GET.get("fim", ""), hoje)
+        dimensoes = [d.strip() for d in request.GET.get("dimensoes", "").split(",") if d.strip()]
+        limite = request.GET.get("limite", "")
+        produto_ids = self._lista(request, "produto")
+        vendedor_ids = self._lista(request, "vendedor")
+        try:
+            linhas = consultar_cubo(
+                inicio=inicio,
+                fim=fim,
+                dimensoes=dimensoes,
+                produto_ids=[int(v) for v in produto_ids] if produto_ids else None,
+                unidades=self._lista(request, "unidade"),
+                vendedor_ids=[int(v) for v in vendedor_ids] if vendedor_ids else None,
+                tipos_pagamento=self._lista(request, "tipo_pagamento"),
+                ordenar_por=request.GET.get("ordenar", "-receita"),
+                limite=int(limite) if limite.isdigit() else None,
+            )
+        except ValueError as exc:
+            return JsonResponse({"erro": str(exc), "dimensoes_validas": list(DIMENSOES_CUBO)}, status=400)
+        return JsonResponse(
+            {
+                "inicio": inicio.strftime("%Y-%m"),
+                "fim": fim.strftime("%Y-%m"),
+                "dimensoes": dimensoes,
+                "linhas": [
+                    {k: (v.isoformat()[:7] if k == "mes" else str(v) if isinstance(v, Decimal) else v) for k, v in linha.items()}
+                    for linha in linhas
+                ],
+            }
+        )
+
+
+class VendasMargemView(GroupRequiredMixin, TemplateView):
+    template_name = "vendas/margem.html"
+    required_groups = ("admin/gestor",)
+
+    @staticmethod
+    def _parse_data(valor: str, padrao):
+        try:
+            return datetime.strptime(valor, "%Y-%m-%d").date() if valor else padrao
+        except ValueError:
+            return padrao
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        hoje = timezone.localdate()
+        inicio = self._parse_data(self.request.GET.get("inicio", ""), hoje.replace(day=1))
+        fim = self._parse_data(self.request.GET.get("fim", ""), hoje)
+        ctx["relatorio"] = VendasStatisticsService.relatorio_margem(inicio, fim)
+        return ctx
+
+
 class FechamentoCaixaListView(VendasAccessMixin, ListView):
     model = FechamentoCaixaDiario
     template_name = "vendas/fechamento_caixa_list.html"